@@ -0,0 +1,30 @@
+"""Add keyset listing indexes for memories/documents
+
+Revision ID: 3c1f2a7d9e41
+Revises: 77d9b0593a71
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1f2a7d9e41'
+down_revision: Union[str, Sequence[str], None] = '77d9b0593a71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_memories_user_created', 'memories', ['user_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_documents_user_created', 'documents', ['user_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_documents_user_created', table_name='documents')
+    op.drop_index('ix_memories_user_created', table_name='memories')
@@ -0,0 +1,71 @@
+"""Add user_usage.latency_ms and the usage rollup tables
+
+Revision ID: 5b2e9c4f7a13
+Revises: 8e4b6d2c1a57
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2e9c4f7a13'
+down_revision: Union[str, Sequence[str], None] = '8e4b6d2c1a57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+ROLLUP_TABLES = ('usage_hourly', 'usage_daily')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'latency_ms' not in [c['name'] for c in inspector.get_columns('user_usage')]:
+        op.add_column('user_usage', sa.Column('latency_ms', sa.Integer(), nullable=True))
+
+    # The API's startup create_all may already have created the tables
+    for table in ROLLUP_TABLES:
+        if inspector.has_table(table):
+            continue
+        op.create_table(
+            table,
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('provider', sa.String(), nullable=False),
+            sa.Column('model_name', sa.String(), nullable=False),
+            sa.Column('period_start', sa.DateTime(timezone=True), nullable=False),
+            sa.Column('calls', sa.Integer(), nullable=False),
+            sa.Column('tokens_in', sa.Integer(), nullable=False),
+            sa.Column('tokens_out', sa.Integer(), nullable=False),
+            sa.Column('estimated_cost', sa.Float(), nullable=False),
+            sa.Column('latency_count', sa.Integer(), nullable=False),
+            sa.Column('latency_sum_ms', sa.Integer(), nullable=False),
+            sa.Column('latency_histogram', sa.JSON(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('user_id', 'provider', 'model_name', 'period_start', name=f'uq_{table}_key')
+        )
+        op.create_index(op.f(f'ix_{table}_id'), table, ['id'], unique=False)
+        op.create_index(f'ix_{table}_user_period', table, ['user_id', 'period_start'], unique=False)
+
+    if not inspector.has_table('usage_rollup_state'):
+        op.create_table(
+            'usage_rollup_state',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('last_usage_id', sa.Integer(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+    # Existing user_usage rows are picked up by the first rollup run (watermark starts at 0)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('usage_rollup_state')
+    for table in ROLLUP_TABLES:
+        op.drop_table(table)
+    op.drop_column('user_usage', 'latency_ms')
@@ -0,0 +1,134 @@
+"""Add normalized tag index (tags, memory_tags) and backfill it
+
+Revision ID: 8e4b6d2c1a57
+Revises: 3c1f2a7d9e41
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+import ast
+import json
+from collections import defaultdict
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e4b6d2c1a57'
+down_revision: Union[str, Sequence[str], None] = '3c1f2a7d9e41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _tag_names(tags):
+    # Frozen copy of app.services.tag_index.clean_tags (same names as the write hooks keep)
+    if not tags:
+        return []
+    if isinstance(tags, str):
+        try:
+            tags = json.loads(tags)
+        except ValueError:
+            try:
+                tags = ast.literal_eval(tags)
+            except (ValueError, SyntaxError):
+                tags = tags.split(",")
+        if isinstance(tags, str):
+            tags = [tags]
+    if not isinstance(tags, (list, tuple, set)):
+        return []
+    names = []
+    for tag in tags:
+        if not isinstance(tag, str):
+            continue
+        tag = tag.strip()
+        if tag and tag not in names:
+            names.append(tag)
+    return names
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    # The API's startup create_all may already have created the tables
+    if not sa.inspect(bind).has_table('tags'):
+        op.create_table(
+            'tags',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(), nullable=False),
+            sa.Column('normalized', sa.String(), nullable=False),
+            sa.Column('memory_count', sa.Integer(), nullable=False),
+            sa.Column('document_count', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('user_id', 'name', name='uq_tags_user_name')
+        )
+        op.create_index(op.f('ix_tags_id'), 'tags', ['id'], unique=False)
+        op.create_index('ix_tags_user_normalized', 'tags', ['user_id', 'normalized'], unique=False,
+                        postgresql_ops={'normalized': 'text_pattern_ops'})
+    if not sa.inspect(bind).has_table('memory_tags'):
+        op.create_table(
+            'memory_tags',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('tag_id', sa.Integer(), nullable=False),
+            sa.Column('memory_id', sa.Integer(), nullable=True),
+            sa.Column('document_id', sa.Integer(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.ForeignKeyConstraint(['tag_id'], ['tags.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['memory_id'], ['memories.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_memory_tags_id'), 'memory_tags', ['id'], unique=False)
+        op.create_index(op.f('ix_memory_tags_user_id'), 'memory_tags', ['user_id'], unique=False)
+        op.create_index(op.f('ix_memory_tags_memory_id'), 'memory_tags', ['memory_id'], unique=False)
+        op.create_index(op.f('ix_memory_tags_document_id'), 'memory_tags', ['document_id'], unique=False)
+        op.create_index('ix_memory_tags_tag_memory', 'memory_tags', ['tag_id', 'memory_id'], unique=False)
+        op.create_index('ix_memory_tags_tag_document', 'memory_tags', ['tag_id', 'document_id'], unique=False)
+
+    # Tag filters go through memory_tags now; the JSON containment indexes would only cost writes
+    if bind.dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_memories_tags_gin")
+        op.execute("DROP INDEX IF EXISTS ix_documents_tags_gin")
+
+    # Rebuild from the JSON tags columns for every user. Rows the flush hooks wrote between the
+    # startup create_all and this upgrade only cover that user's newest writes, so they are replaced.
+    tags = sa.table('tags', sa.column('id'), sa.column('user_id'), sa.column('name'), sa.column('normalized'),
+                    sa.column('memory_count'), sa.column('document_count'))
+    links = sa.table('memory_tags', sa.column('user_id'), sa.column('tag_id'), sa.column('memory_id'), sa.column('document_id'))
+    bind.execute(sa.delete(links))
+    bind.execute(sa.delete(tags))
+
+    counts = defaultdict(lambda: [0, 0])
+    owners = defaultdict(list)
+    for slot, table in enumerate(('memories', 'documents')):
+        source = sa.table(table, sa.column('id'), sa.column('user_id'), sa.column('tags', sa.JSON))
+        for owner_id, user_id, raw in bind.execute(sa.select(source.c.id, source.c.user_id, source.c.tags).where(source.c.tags.isnot(None))):
+            for name in _tag_names(raw):
+                counts[(user_id, name)][slot] += 1
+                owners[(user_id, name)].append((slot, owner_id))
+
+    if counts:
+        op.bulk_insert(tags, [
+            {"user_id": user_id, "name": name, "normalized": name.lower(), "memory_count": c[0], "document_count": c[1]}
+            for (user_id, name), c in counts.items()
+        ])
+        tag_ids = {(user_id, name): tag_id for tag_id, user_id, name in bind.execute(sa.select(tags.c.id, tags.c.user_id, tags.c.name))}
+        op.bulk_insert(links, [
+            {
+                "user_id": key[0],
+                "tag_id": tag_ids[key],
+                "memory_id": owner_id if slot == 0 else None,
+                "document_id": owner_id if slot == 1 else None
+            }
+            for key, refs in owners.items() for slot, owner_id in refs
+        ])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('memory_tags')
+    op.drop_table('tags')
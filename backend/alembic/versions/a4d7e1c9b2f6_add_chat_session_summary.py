@@ -0,0 +1,34 @@
+"""Add rolling summary columns to chat_sessions
+
+Revision ID: a4d7e1c9b2f6
+Revises: 5b2e9c4f7a13
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4d7e1c9b2f6'
+down_revision: Union[str, Sequence[str], None] = '5b2e9c4f7a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    columns = [c['name'] for c in sa.inspect(op.get_bind()).get_columns('chat_sessions')]
+    if 'summary' not in columns:
+        op.add_column('chat_sessions', sa.Column('summary', sa.Text(), nullable=True))
+    if 'summary_through_id' not in columns:
+        op.add_column('chat_sessions', sa.Column('summary_through_id', sa.Integer(), nullable=True))
+    # Existing sessions are summarized on their next turn (in the background)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('chat_sessions', 'summary_through_id')
+    op.drop_column('chat_sessions', 'summary')
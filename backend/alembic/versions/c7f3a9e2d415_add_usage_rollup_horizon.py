@@ -0,0 +1,34 @@
+"""Add the rollup horizon to usage_rollup_state
+
+Revision ID: c7f3a9e2d415
+Revises: a4d7e1c9b2f6
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7f3a9e2d415'
+down_revision: Union[str, Sequence[str], None] = 'a4d7e1c9b2f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    columns = [c['name'] for c in sa.inspect(op.get_bind()).get_columns('usage_rollup_state')]
+    if 'horizon_id' not in columns:
+        op.add_column('usage_rollup_state', sa.Column('horizon_id', sa.Integer(), nullable=True))
+    if 'horizon_at' not in columns:
+        op.add_column('usage_rollup_state', sa.Column('horizon_at', sa.DateTime(timezone=True), nullable=True))
+    # The first run after the upgrade takes a horizon; rows past the watermark wait one lag
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('usage_rollup_state', 'horizon_at')
+    op.drop_column('usage_rollup_state', 'horizon_id')
@@ -0,0 +1,78 @@
+"""Add the entity index (entities, entity_aliases, entity_postings)
+
+Revision ID: e5b9c2d7f314
+Revises: c7f3a9e2d415
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b9c2d7f314'
+down_revision: Union[str, Sequence[str], None] = 'c7f3a9e2d415'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    # The API's startup create_all may already have created the tables
+    if not sa.inspect(bind).has_table('entities'):
+        op.create_table(
+            'entities',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(), nullable=False),
+            sa.Column('normalized_name', sa.String(), nullable=False),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('user_id', 'normalized_name', name='uq_entities_user_name')
+        )
+        op.create_index(op.f('ix_entities_id'), 'entities', ['id'], unique=False)
+    if not sa.inspect(bind).has_table('entity_aliases'):
+        op.create_table(
+            'entity_aliases',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('entity_id', sa.Integer(), nullable=False),
+            sa.Column('alias', sa.String(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.ForeignKeyConstraint(['entity_id'], ['entities.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('user_id', 'alias', name='uq_entity_aliases_user_alias')
+        )
+        op.create_index(op.f('ix_entity_aliases_id'), 'entity_aliases', ['id'], unique=False)
+        op.create_index(op.f('ix_entity_aliases_entity_id'), 'entity_aliases', ['entity_id'], unique=False)
+    if not sa.inspect(bind).has_table('entity_postings'):
+        op.create_table(
+            'entity_postings',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('entity_id', sa.Integer(), nullable=False),
+            sa.Column('chunk_id', sa.Integer(), nullable=True),
+            sa.Column('fact_id', sa.Integer(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.ForeignKeyConstraint(['entity_id'], ['entities.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['chunk_id'], ['chunks.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['fact_id'], ['facts.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_entity_postings_id'), 'entity_postings', ['id'], unique=False)
+        op.create_index(op.f('ix_entity_postings_chunk_id'), 'entity_postings', ['chunk_id'], unique=False)
+        op.create_index(op.f('ix_entity_postings_fact_id'), 'entity_postings', ['fact_id'], unique=False)
+        op.create_index('ix_entity_postings_entity_chunk', 'entity_postings', ['entity_id', 'chunk_id'], unique=False)
+        op.create_index('ix_entity_postings_entity_fact', 'entity_postings', ['entity_id', 'fact_id'], unique=False)
+    # Postings for existing chunks / facts are backfilled by the backfill_entity_index maintenance task
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('entity_postings')
+    op.drop_table('entity_aliases')
+    op.drop_table('entities')
@@ -1,13 +1,14 @@
 from typing import AsyncGenerator
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError
+from jose import JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.db.session import AsyncSessionLocal
 from app.core.config import settings
 from app.models.user import User
 from app.core import security
+from app.services.auth_cache import auth_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
 
@@ -30,41 +31,23 @@ async def get_current_user(
     # Check for API Key (starts with bv_sk_)
     if token.startswith("bv_sk_"):
         import hashlib
-        from app.models.api_key import ApiKey
-        from datetime import datetime
         
         hashed = hashlib.sha256(token.encode()).hexdigest()
         
-        result = await db.execute(select(ApiKey).where(ApiKey.key_hash == hashed, ApiKey.is_active == True))
-        api_key_obj = result.scalars().first()
-        
-        if not api_key_obj:
-             raise credentials_exception
-             
-        # Update usage stats
-        api_key_obj.last_used_at = datetime.now()
-        await db.commit()
-        
-        # Get user
-        result_user = await db.execute(select(User).where(User.id == api_key_obj.user_id))
-        user = result_user.scalars().first()
-        if not user:
-            raise credentials_exception
-        return user
-
-    try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
-        user_id: str = payload.get("sub")
+        # Cached lookup; usage (last_used_at) is written in batches by the auth cache
+        user_id = await auth_cache.resolve_api_key(db, hashed)
         if user_id is None:
+             raise credentials_exception
+    else:
+        try:
+            user_id = auth_cache.decode_token(token)
+            if user_id is None:
+                raise credentials_exception
+        except (JWTError, ValueError):
             raise credentials_exception
-    except JWTError:
-        raise credentials_exception
     
-    # Async query
-    result = await db.execute(select(User).where(User.id == int(user_id)))
-    user = result.scalars().first()
+    # Cached user snapshot (no query on a hit)
+    user = await auth_cache.get_user(db, user_id)
     
     if user is None:
         raise credentials_exception
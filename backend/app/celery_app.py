@@ -1,5 +1,7 @@
 import os
 from celery import Celery
+from celery.signals import worker_process_init
+from app.core.config import settings
 
 # Get Redis URL from env, default to validation value or loopback
 BROKER_URL = os.environ.get("CELERY_BROKER_URL", "redis://localhost:6379/0")
@@ -8,16 +10,60 @@ celery_app = Celery(
     "brain_vault_worker",
     broker=BROKER_URL,
     backend=BROKER_URL,
-    include=["app.worker"]
+    include=["app.worker", "app.maintenance"]
 )
-print("Celery App Initialized with include=['app.worker']")
+print("Celery App Initialized with include=['app.worker', 'app.maintenance']")
 
 celery_app.conf.task_routes = {
     "app.worker.process_memory_metadata_task": "celery",
     "app.worker.ingest_memory_task": "celery",
     "app.worker.dedupe_memory_task": "celery",
+    "app.worker.delete_closure_task": "celery",
+    "app.worker.ingest_import_batch_task": "celery",
+    # Maintenance runs on its own worker (see docker-compose celery_maintenance)
+    "app.maintenance.*": "maintenance",
 }
 
+# Periodic maintenance (run `celery -A app.celery_app beat`)
+celery_app.conf.beat_schedule = {
+    "recluster-memories": {
+        "task": "app.maintenance.recluster_memories_task",
+        "schedule": settings.CLUSTER_INTERVAL_SECONDS,
+        "options": {"expires": settings.CLUSTER_INTERVAL_SECONDS},
+    },
+    "decay-feedback-scores": {
+        "task": "app.maintenance.decay_feedback_scores_task",
+        "schedule": settings.FEEDBACK_DECAY_INTERVAL_SECONDS,
+        "options": {"expires": settings.FEEDBACK_DECAY_INTERVAL_SECONDS},
+    },
+    "reconcile-vectors": {
+        "task": "app.maintenance.reconcile_vectors_task",
+        "schedule": settings.RECONCILE_INTERVAL_SECONDS,
+        "options": {"expires": settings.RECONCILE_INTERVAL_SECONDS},
+    },
+    "flush-usage": {
+        "task": "app.maintenance.flush_usage_task",
+        "schedule": settings.USAGE_FLUSH_INTERVAL_SECONDS,
+        "options": {"expires": settings.USAGE_FLUSH_INTERVAL_SECONDS},
+    },
+    "compact-usage": {
+        "task": "app.maintenance.compact_usage_task",
+        "schedule": settings.USAGE_COMPACT_INTERVAL_SECONDS,
+        "options": {"expires": settings.USAGE_COMPACT_INTERVAL_SECONDS},
+    },
+    "backfill-entity-index": {
+        "task": "app.maintenance.backfill_entity_index_task",
+        "schedule": settings.ENTITY_BACKFILL_INTERVAL_SECONDS,
+        "options": {"expires": settings.ENTITY_BACKFILL_INTERVAL_SECONDS},
+    },
+}
+
+@worker_process_init.connect
+def warm_up_embeddings(**kwargs):
+    # Each worker process loads its own models before taking tasks
+    from app.services.embeddings import embedding_providers
+    embedding_providers.warm_up()
+
 # Optional: Retry customization
 celery_app.conf.update(
     task_serializer="json",
@@ -1,3 +1,4 @@
+from pydantic import model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 import os
@@ -26,6 +27,11 @@ class Settings(BaseSettings):
             return self.DATABASE_URL
         return f"sqlite:///{os.path.join(BASE_DIR, 'brain_vault.db')}"
     
+    # Connection pool (db/session.py pooled_engine; the default engine uses NullPool)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+
     # Vector DB (Pinecone)
     PINECONE_API_KEY: str = os.getenv("PINECONE_API_KEY", "")
     PINECONE_ENV: str = os.getenv("PINECONE_ENV", "gcp-starter") # Optional for new clients
@@ -51,10 +57,112 @@ class Settings(BaseSettings):
     # Retrieval Config
     ENABLE_BM25_FILTER: bool = True
     MAX_DAILY_TOKENS: int = 100_000
-    
+
+    # Usage Metering (services/usage_meter.py)
+    USAGE_COUNTER_HOURS: int = 48 # Hourly per-user counters kept in Redis
+    USAGE_FLUSH_BATCH: int = 500 # Queued usage rows per INSERT into user_usage
+    USAGE_FLUSH_INTERVAL_SECONDS: int = 60 # Beat interval of the usage flush (+ rollup)
+    USAGE_ROLLUP_BATCH: int = 5000 # user_usage rows folded into the rollups per transaction
+    USAGE_ROLLUP_LAG_SECONDS: int = 300 # Ids are rolled up only once every insert that could still hold a lower one has ended
+    USAGE_RAW_RETENTION_DAYS: int = 30 # Older raw rows are deleted once rolled up
+    USAGE_HOURLY_RETENTION_DAYS: int = 90 # Older hourly rollups are deleted (daily ones are kept)
+    USAGE_HOURLY_MAX_RANGE_DAYS: int = 31 # Longer analytics ranges are served from daily rollups
+    USAGE_COMPACT_INTERVAL_SECONDS: int = 86400
+
+    # Auth Cache (services/auth_cache.py)
+    AUTH_CACHE_TTL_SECONDS: int = 60 # Upper bound on staleness if an invalidation is missed
+    AUTH_CACHE_SIZE: int = 10_000 # Entries per table (tokens, API keys, users)
+    API_KEY_LAST_USED_FLUSH_SECONDS: int = 30 # API key last_used_at is written in batches this often
+
+    # Embeddings (services/embeddings.py)
+    EMBEDDING_PROVIDER: str = "bedrock" # Index vectors; switching requires re-embedding the index
+    CHUNKING_EMBEDDING_PROVIDER: str = "bedrock" # Semantic chunk boundaries; "local" avoids a remote call per sentence
+    LOCAL_EMBEDDING_MODEL_PATH: Optional[str] = None # Dir with model.onnx (or model_quantized.onnx) + tokenizer.json
+    LOCAL_EMBEDDING_QUANTIZE: bool = True # Quantize to int8 on first load
+    LOCAL_EMBEDDING_BATCH_SIZE: int = 32
+    LOCAL_EMBEDDING_THREADS: int = 2
+    LOCAL_EMBEDDING_MAX_LENGTH: int = 256 # Tokens per input; with EMBEDDING_PROVIDER=local keep it >= CHUNK_MAX_TOKENS
+
+    # Chunking (services/chunker.py)
+    CHUNK_MAX_TOKENS: int = 400 # Per chunk; well inside Titan v2's 8k input limit, sized for retrieval
+    CHUNK_OVERLAP_TOKENS: int = 50 # Carried over when a chunk is cut by the budget
+    CHUNK_MIN_TOKENS: int = 40 # A semantic break does not end a chunk smaller than this
+    SEMANTIC_CHUNK_MIN_TOKENS: int = 800 # Shorter texts skip sentence embeddings (linear chunker only)
+    BOUNDARY_WINDOW: int = 3 # Sentences compared on each side of a gap by the lexical pre-filter
+    BOUNDARY_COHESIVE_SIMILARITY: float = 0.3 # Lexical cosine at or above which a gap is not a break
+    BOUNDARY_MIN_TERMS: int = 6 # Content words each window needs before "no shared words" counts as a break
+
+    # Provider Router (services/provider_router.py)
+    ROUTER_EWMA_ALPHA: float = 0.2 # Weight of the newest call in latency / error rate averages
+    ROUTER_MAX_ERROR_RATE: float = 0.5 # Models above this are tried last
+    ROUTER_BREAKER_FAILURES: int = 3 # Consecutive failures that open a model's breaker (throttling opens it at once)
+    ROUTER_BREAKER_COOLDOWN_SECONDS: int = 30 # First open period; doubles on each re-open
+    ROUTER_BREAKER_MAX_COOLDOWN_SECONDS: int = 600
+    ROUTER_CLIENT_MAX_RETRIES: int = 0 # Per client; the router fails over to the next model instead
+
+    # Chat History (services/chat_history.py)
+    CHAT_HISTORY_TOKENS: int = 2000 # Recent messages sent verbatim per agent turn
+    CHAT_HISTORY_MAX_MESSAGES: int = 40 # Unsummarized messages read per turn
+    CHAT_SUMMARY_BATCH_TOKENS: int = 600 # Older messages are folded into the summary once they reach this
+    CHAT_SUMMARY_MAX_WORDS: int = 200 # Length cap of the rolling summary
+
+    # Context API (ContextBuilder)
+    CONTEXT_CANDIDATES: int = 15 # Retrieval results packed per request
+    CONTEXT_CACHE_TTL_SECONDS: int = 30 # Repeat queries within this window reuse the packed context
+    CONTEXT_CACHE_SIZE: int = 512 # Entries kept per process
+
+    # Knowledge Graph (Fact traversal)
+    GRAPH_MAX_HOPS: int = 2
+    GRAPH_FAN_OUT: int = 8 # Max edges expanded per node
+    GRAPH_MAX_FACTS: int = 40 # Max facts collected per walk
+    GRAPH_SYNC_INTERVAL_SECONDS: int = 10 # Pull new facts written by workers
+    GRAPH_REBUILD_SECONDS: int = 900 # Full rebuild drops superseded edges
+    GRAPH_MAX_USERS: int = 256 # Graphs kept in memory (LRU)
+
+    # Entity Index
+    ENTITY_MAX_POSTINGS: int = 200 # Postings read per query
+    ENTITY_PREFILTER_MAX: int = 50 # Score entity chunks directly when the set is this small
+    ENTITY_BOOST: float = 1.2 # Score multiplier for chunks mentioning a query entity
+    ENTITY_BACKFILL_INTERVAL_SECONDS: int = 3600 # Postings for vaults that predate the index
+    ENTITY_BACKFILL_USERS_PER_RUN: int = 50
+
+    # Dedupe & Clustering
+    DEDUPE_MIN_SIMILARITY: float = 40.0 # Percent; new memory is flagged "similar-content" above this
+    CLUSTER_SIMILARITY_THRESHOLD: float = 0.85 # Cosine; mutual neighbours above this share a cluster
+    CLUSTER_NEIGHBOURS: int = 10 # k of the kNN graph
+    CLUSTER_INTERVAL_SECONDS: int = 600
+    CLUSTER_INCREMENTAL_MAX: int = 200 # Changed memories per user handled by ANN queries; more -> full O(N^2) pass
+
+    # Maintenance (Celery beat)
+    MAINTENANCE_MAX_BACKLOG: int = 500 # Skip a run while the ingestion queue is longer than this
+    FEEDBACK_DECAY_INTERVAL_SECONDS: int = 86400
+    FEEDBACK_HALF_LIFE_DAYS: float = 30.0
+    RECONCILE_INTERVAL_SECONDS: int = 21600
+    RECONCILE_GRACE_SECONDS: int = 3600 # A difference must persist this long before it is repaired
+    RECONCILE_MAX_REPAIRS: int = 5000 # Per kind, per run
+    RECONCILE_REINDEX_BATCH: int = 50
+
+    # Deletion
+    DELETE_VECTOR_BATCH: int = 1000 # Pinecone max ids per delete call
+    DELETE_INLINE_MAX: int = 500 # Larger closures (vectors + chunks) run as a background job
+
+    # Bulk Import
+    IMPORT_BATCH_SIZE: int = 500 # Rows per insert batch and items per ingestion job
+
     # Dual Index Support
     PINECONE_SPARSE_HOST: Optional[str] = None # Host for the Sparse Index (DotProduct)
 
+    @model_validator(mode="after")
+    def check_local_embedding_length(self):
+        # The local model truncates its input: chunks longer than its window lose their tail from the index
+        if self.EMBEDDING_PROVIDER == "local" and self.LOCAL_EMBEDDING_MAX_LENGTH < self.CHUNK_MAX_TOKENS:
+            print(
+                f"Warning: LOCAL_EMBEDDING_MAX_LENGTH ({self.LOCAL_EMBEDDING_MAX_LENGTH}) is below CHUNK_MAX_TOKENS "
+                f"({self.CHUNK_MAX_TOKENS}); local index embeddings will truncate chunks. "
+                f"Lower CHUNK_MAX_TOKENS or raise LOCAL_EMBEDDING_MAX_LENGTH (up to the model's limit)."
+            )
+        return self
+
     model_config = SettingsConfigDict(
         env_file=os.path.join(BASE_DIR, ".env"),
         extra="ignore"
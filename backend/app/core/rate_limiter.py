@@ -2,16 +2,48 @@ from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
+from starlette.requests import Request
 from app.core.config import settings
+import hashlib
 import redis
 
 # Initialize Redis connection
 # We can use the same Redis instance as Celery
 redis_url = settings.REDIS_URL
 
-# Create Limiter instance
-# key_func=get_remote_address uses the IP address of the client
-limiter = Limiter(key_func=get_remote_address, storage_uri=redis_url)
+def account_key(request: Request) -> str:
+    """
+    Rate limit key: the account making the request, so users behind one NAT don't share a
+    limit and one user can't spread requests over several IPs.
+    - Bearer JWT -> user id (decoded via the auth cache, no DB)
+    - API key -> user id if the auth cache knows it, else the key itself (hashed)
+    - /drop/{token} -> the drop token
+    - anything else -> client IP
+    """
+    from app.services.auth_cache import auth_cache
+
+    auth = request.headers.get("authorization", "")
+    scheme, _, token = auth.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        if token.startswith("bv_sk_"):
+            key_hash = hashlib.sha256(token.encode()).hexdigest()
+            user_id = auth_cache.cached_api_key_owner(key_hash)
+            return f"user:{user_id}" if user_id is not None else f"key:{key_hash[:32]}"
+        try:
+            user_id = auth_cache.decode_token(token)
+            if user_id is not None:
+                return f"user:{user_id}"
+        except Exception:
+            # Invalid token: the endpoint rejects it; limit by IP meanwhile
+            pass
+
+    drop_token = request.path_params.get("token")
+    if drop_token:
+        return f"drop:{hashlib.sha256(drop_token.encode()).hexdigest()[:32]}"
+    return get_remote_address(request)
+
+# Create Limiter instance, keyed per account (IP only for anonymous requests)
+limiter = Limiter(key_func=account_key, storage_uri=redis_url)
 
 def init_rate_limiter(app):
     """
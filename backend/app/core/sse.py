@@ -0,0 +1,24 @@
+"""
+Server-Sent Events helpers for streaming endpoints (StreamingResponse with text/event-stream).
+"""
+import json
+from typing import Any, AsyncIterator, Dict
+from fastapi.responses import StreamingResponse
+
+# Keep proxies (nginx) from buffering the stream
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def sse_response(events: AsyncIterator[Dict[str, Any]], **kwargs) -> StreamingResponse:
+    """
+    Stream {"type": ..., ...} dicts as SSE frames named after their type.
+    """
+    async def frames():
+        async for event in events:
+            yield sse_event(event["type"], {k: v for k, v in event.items() if k != "type"})
+
+    return StreamingResponse(frames(), media_type="text/event-stream", headers=SSE_HEADERS, **kwargs)
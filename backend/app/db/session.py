@@ -26,3 +26,33 @@ AsyncSessionLocal = sessionmaker(
     class_=AsyncSession,
     expire_on_commit=False
 )
+
+# Pooled engine for long-lived, single-event-loop processes (MCP server).
+# The default engine stays on NullPool: Celery tasks run each job on a fresh event loop,
+# and pooled asyncpg connections cannot cross loops.
+pool_args = {} if "sqlite" in database_url else {
+    "pool_size": settings.DB_POOL_SIZE,
+    "max_overflow": settings.DB_MAX_OVERFLOW,
+    "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+    "pool_pre_ping": True,
+}
+pooled_engine = create_async_engine(
+    database_url,
+    connect_args=connect_args,
+    future=True,
+    **pool_args
+)
+
+PooledSessionLocal = sessionmaker(
+    autocommit=False, 
+    autoflush=False, 
+    bind=pooled_engine,
+    class_=AsyncSession,
+    expire_on_commit=False
+)
+
+# Flush hooks keeping tags / memory_tags in sync with Memory.tags and Document.tags
+import app.services.tag_index  # noqa: E402,F401
+
+# Flush hooks dropping cached users / API keys when they change
+import app.services.auth_cache  # noqa: E402,F401
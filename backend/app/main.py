@@ -1,7 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.routers import auth, retrieval, llm, documents, memory, export, prompts, llm_api, inbox, user_keys, ws, settings as user_settings, feedback, chat_api, ingest
+from app.routers import auth, retrieval, llm, documents, memory, export, prompts, llm_api, inbox, user_keys, ws, settings as user_settings, feedback, chat_api, ingest, entities, account, vault_import, usage
 from app.db.base import Base
 from app.db.session import engine
 import app.models # Register models
@@ -24,6 +24,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Rate Limiter
@@ -38,6 +39,7 @@ app.include_router(documents.router, prefix=f"{settings.API_V1_STR}/documents",
 app.include_router(ingest.router, prefix=f"{settings.API_V1_STR}/ingest", tags=["ingest"])
 app.include_router(memory.router, prefix=f"{settings.API_V1_STR}/memory", tags=["memory"])
 app.include_router(export.router, prefix=f"{settings.API_V1_STR}/export", tags=["export"])
+app.include_router(vault_import.router, prefix=f"{settings.API_V1_STR}/import", tags=["import"])
 app.include_router(prompts.router, prefix=f"{settings.API_V1_STR}/prompts", tags=["prompts"])
 
 # Mount MCP Server (SSE)
@@ -64,16 +66,18 @@ app.include_router(user_keys.router, prefix=f"{settings.API_V1_STR}/user", tags=
 app.include_router(user_settings.router, prefix=f"{settings.API_V1_STR}/user", tags=["user-settings"])
 app.include_router(feedback.router, prefix=f"{settings.API_V1_STR}/feedback", tags=["feedback"])
 app.include_router(chat_api.router, prefix=f"{settings.API_V1_STR}/chat", tags=["chat"])
+app.include_router(entities.router, prefix=f"{settings.API_V1_STR}/entities", tags=["entities"])
 from app.routers import user_api_keys
 app.include_router(user_api_keys.router, prefix=f"{settings.API_V1_STR}/user", tags=["api-keys"])
+app.include_router(account.router, prefix=f"{settings.API_V1_STR}/user", tags=["account"])
+app.include_router(usage.router, prefix=f"{settings.API_V1_STR}/usage", tags=["usage"])
 app.include_router(ws.router, prefix="/ws", tags=["websocket"])
 
 
 @app.on_event("startup")
 async def startup_event():
     # Start background tasks
-    from app.services.dedupe_job import dedupe_service
-    from app.db.session import AsyncSessionLocal
+    # (Periodic maintenance runs from Celery beat, see app/maintenance.py)
     import asyncio
     
     from app.services.websocket import manager
@@ -83,9 +87,27 @@ async def startup_event():
         await conn.run_sync(Base.metadata.create_all)
 
     # We run it as a background task
-    asyncio.create_task(dedupe_service.run_periodic_check(AsyncSessionLocal))
     asyncio.create_task(manager.start_redis_listener())
 
+    # Auth cache: invalidations from other processes, batched API key last_used_at writes
+    from app.services.auth_cache import auth_cache
+    asyncio.create_task(auth_cache.listen())
+    asyncio.create_task(auth_cache.run_last_used_flusher())
+
+    # Context cache: drop users' packed contexts when another process writes their data
+    from app.services.context_builder import context_builder
+    asyncio.create_task(context_builder.listen())
+
+    # Load / warm embedding models off the event loop (local ONNX sessions take a moment)
+    from app.services.embeddings import embedding_providers
+    asyncio.create_task(asyncio.to_thread(embedding_providers.warm_up))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Write API key uses collected since the last batch
+    from app.services.auth_cache import auth_cache
+    await auth_cache.flush_last_used()
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to MemWyre API", "status": "running"}
@@ -0,0 +1,190 @@
+"""
+Maintenance jobs scheduled by Celery beat (see celery_app.conf.beat_schedule).
+They run on the dedicated "maintenance" queue so API processes and the ingestion
+worker never carry maintenance load.
+"""
+import json
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+import redis
+from redis.exceptions import LockError
+from app.celery_app import celery_app
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.worker import run_async
+
+# Queue consumed by the ingestion worker; maintenance backs off while it is busy
+INGESTION_QUEUE = "celery"
+
+
+def _redis() -> redis.Redis:
+    return redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+
+def get_job_stats(name: str) -> Dict[str, str]:
+    return _redis().hgetall(f"maintenance:stats:{name}")
+
+
+def run_job(name: str, job: Callable[[Optional[datetime]], Any], lock_timeout: int = 3600) -> Dict[str, Any]:
+    """
+    Run one maintenance job with:
+    - Backpressure: skipped while the ingestion queue is longer than MAINTENANCE_MAX_BACKLOG
+    - Concurrency limit: a Redis lock per job, so overlapping beats / replicas never run it twice
+    - Timing: duration, status and result kept in the "maintenance:stats:<name>" hash
+    `job` receives the start time of the previous successful run (None on the first run).
+    """
+    r = _redis()
+    stats_key = f"maintenance:stats:{name}"
+
+    backlog = r.llen(INGESTION_QUEUE)
+    if backlog > settings.MAINTENANCE_MAX_BACKLOG:
+        print(f"Maintenance: Skipping {name}, ingestion backlog is {backlog}")
+        r.hset(stats_key, mapping={"last_skipped_at": datetime.now(timezone.utc).isoformat(), "skip_reason": "backpressure"})
+        return {"status": "skipped", "reason": "backpressure"}
+
+    lock = r.lock(f"maintenance:lock:{name}", timeout=lock_timeout)
+    if not lock.acquire(blocking=False):
+        print(f"Maintenance: Skipping {name}, previous run still in progress")
+        return {"status": "skipped", "reason": "running"}
+
+    started = datetime.now(timezone.utc)
+    t0 = time.monotonic()
+    try:
+        last = r.hget(stats_key, "last_success_started_at")
+        since = datetime.fromisoformat(last) if last else None
+
+        result = job(since)
+        duration_ms = int((time.monotonic() - t0) * 1000)
+        r.hset(stats_key, mapping={
+            "status": "success",
+            "last_success_started_at": started.isoformat(),
+            "last_duration_ms": duration_ms,
+            "last_result": json.dumps(result, default=str)
+        })
+        print(f"Maintenance: {name} finished in {duration_ms}ms: {result}")
+        return {"status": "success", "duration_ms": duration_ms, "result": result}
+    except Exception as e:
+        duration_ms = int((time.monotonic() - t0) * 1000)
+        r.hset(stats_key, mapping={
+            "status": "failed",
+            "last_failed_at": started.isoformat(),
+            "last_duration_ms": duration_ms,
+            "last_error": str(e)[:500]
+        })
+        print(f"Maintenance: {name} failed after {duration_ms}ms: {e}")
+        return {"status": "failed", "error": str(e)}
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            pass  # Lock expired during a very long run
+
+
+@celery_app.task
+def recluster_memories_task():
+    """
+    Re-cluster memories of users whose vault changed since the last pass.
+    """
+    from app.services.dedupe_job import dedupe_service
+
+    def _job(since):
+        return run_async(dedupe_service.run_periodic_check(AsyncSessionLocal, since=since))
+
+    return run_job("recluster", _job)
+
+
+@celery_app.task
+def decay_feedback_scores_task():
+    """
+    Exponential decay of Chunk.feedback_score (half-life FEEDBACK_HALF_LIFE_DAYS),
+    so old clicks and thumbs stop dominating the ranking.
+    """
+    from sqlalchemy import update, func
+    from app.models.document import Chunk
+
+    async def _decay(since):
+        now = datetime.now(timezone.utc)
+        elapsed_days = (now - since).total_seconds() / 86400 if since else 1.0
+        factor = 0.5 ** (elapsed_days / settings.FEEDBACK_HALF_LIFE_DAYS)
+
+        async with AsyncSessionLocal() as db:
+            decayed = await db.execute(
+                update(Chunk)
+                .where(func.abs(Chunk.feedback_score) >= 0.01)
+                .values(feedback_score=Chunk.feedback_score * factor)
+            )
+            # Snap residue to zero so the next run skips these rows
+            zeroed = await db.execute(
+                update(Chunk)
+                .where(Chunk.feedback_score != 0, func.abs(Chunk.feedback_score) < 0.01)
+                .values(feedback_score=0.0)
+            )
+            await db.commit()
+        return {"factor": round(factor, 4), "decayed": decayed.rowcount, "zeroed": zeroed.rowcount}
+
+    return run_job("feedback_decay", lambda since: run_async(_decay(since)))
+
+
+@celery_app.task
+def reconcile_vectors_task(dry_run: bool = False):
+    """
+    Delete orphan vectors and re-index ghost chunks/facts (see ReconciliationService).
+    """
+    from app.services.reconciliation import reconciliation_service
+
+    def _job(since):
+        return run_async(reconciliation_service.reconcile(AsyncSessionLocal, dry_run=dry_run))
+
+    return run_job("reconcile_vectors", _job, lock_timeout=4 * 3600)
+
+
+@celery_app.task
+def flush_usage_task():
+    """
+    Write LLM usage rows queued in Redis by the usage meter to user_usage, in batches,
+    then fold the new rows into the hourly / daily rollups.
+    """
+    from app.services.usage_meter import usage_meter
+    from app.services.usage_rollup import usage_rollup_service
+
+    async def _flush(since):
+        try:
+            rows = await usage_meter.flush_pending(AsyncSessionLocal)
+        finally:
+            await usage_meter.close()
+        rolled_up = await usage_rollup_service.rollup(AsyncSessionLocal)
+        return {"rows": rows, "rolled_up": rolled_up}
+
+    return run_job("flush_usage", lambda since: run_async(_flush(since)), lock_timeout=600)
+
+
+@celery_app.task
+def compact_usage_task():
+    """
+    Usage retention: delete rolled-up raw rows and old hourly rollups (see UsageRollupService.compact).
+    """
+    from app.services.usage_rollup import usage_rollup_service
+
+    return run_job("compact_usage", lambda since: run_async(usage_rollup_service.compact(AsyncSessionLocal)))
+
+
+@celery_app.task
+def backfill_entity_index_task():
+    """
+    Build entity postings for users whose chunks / facts predate the entity index.
+    Walks users by id, ENTITY_BACKFILL_USERS_PER_RUN per run; the watermark is kept in Redis,
+    so once every existing user is done a run only looks at new sign-ups.
+    """
+    from app.services.entity_index import entity_index
+
+    watermark_key = "maintenance:entity_backfill:last_user_id"
+
+    def _job(since):
+        r = _redis()
+        after = int(r.get(watermark_key) or 0)
+        result = run_async(entity_index.backfill_users(AsyncSessionLocal, after, settings.ENTITY_BACKFILL_USERS_PER_RUN))
+        r.set(watermark_key, result["last_user_id"])
+        return result
+
+    return run_job("backfill_entity_index", _job)
@@ -9,4 +9,6 @@ from .cluster import MemoryCluster
 from .feedback import FeedbackEvent as Feedback
 from .history import MemoryHistory as History
 from .fact import Fact
-from .usage import UserUsage
+from .usage import UserUsage, UsageHourly, UsageDaily, UsageRollupState
+from .entity import Entity, EntityAlias, EntityPosting
+from .tag import Tag, MemoryTag
@@ -18,6 +18,10 @@ class ChatSession(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
 
+    # Rolling summary of the messages before the agent's recent window (services/chat_history.py)
+    summary = Column(Text, nullable=True)
+    summary_through_id = Column(Integer, nullable=True) # Last ChatMessage.id folded into summary
+
     # Relations
     messages = relationship("ChatMessage", back_populates="session", cascade="all, delete-orphan")
     user = relationship("User", back_populates="chat_sessions")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, JSON, Float
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, JSON, Float, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base import Base
@@ -20,6 +20,10 @@ class Document(Base):
     user = relationship("User", backref="documents")
     chunks = relationship("Chunk", back_populates="document", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_documents_user_created", "user_id", "created_at", "id"),
+    )
+
 class Chunk(Base):
     __tablename__ = "chunks"
 
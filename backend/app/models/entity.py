@@ -0,0 +1,60 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, UniqueConstraint, Index
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+class Entity(Base):
+    """
+    Entity Dictionary entry (Person, Org, Project, ...).
+    Built from Chunk.entities and Fact.subject at ingest time.
+    """
+    __tablename__ = "entities"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    name = Column(String, nullable=False) # Display name as first seen, e.g. "Acme Corp."
+    normalized_name = Column(String, nullable=False) # Canonical key, e.g. "acme"
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    aliases = relationship("EntityAlias", back_populates="entity", cascade="all, delete-orphan")
+    postings = relationship("EntityPosting", back_populates="entity", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "normalized_name", name="uq_entities_user_name"),
+    )
+
+class EntityAlias(Base):
+    """
+    Normalized surface form -> Entity. Every entity has at least its own canonical key as alias.
+    """
+    __tablename__ = "entity_aliases"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    entity_id = Column(Integer, ForeignKey("entities.id", ondelete="CASCADE"), nullable=False, index=True)
+    alias = Column(String, nullable=False)
+
+    entity = relationship("Entity", back_populates="aliases")
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "alias", name="uq_entity_aliases_user_alias"),
+    )
+
+class EntityPosting(Base):
+    """
+    Inverted posting: Entity -> Chunk or Fact mentioning it.
+    """
+    __tablename__ = "entity_postings"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    entity_id = Column(Integer, ForeignKey("entities.id", ondelete="CASCADE"), nullable=False)
+    chunk_id = Column(Integer, ForeignKey("chunks.id", ondelete="CASCADE"), nullable=True, index=True)
+    fact_id = Column(Integer, ForeignKey("facts.id", ondelete="CASCADE"), nullable=True, index=True)
+
+    entity = relationship("Entity", back_populates="postings")
+
+    __table_args__ = (
+        Index("ix_entity_postings_entity_chunk", "entity_id", "chunk_id"),
+        Index("ix_entity_postings_entity_fact", "entity_id", "fact_id"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, JSON, Float, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, JSON, Float, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base import Base
@@ -31,3 +31,8 @@ class Memory(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     user = relationship("User", backref="memories")
+
+    __table_args__ = (
+        # Keyset listing: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+        Index("ix_memories_user_created", "user_id", "created_at", "id"),
+    )
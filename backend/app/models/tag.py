@@ -0,0 +1,41 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, UniqueConstraint, Index
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+class Tag(Base):
+    """
+    Per-user tag dictionary with usage counts.
+    Maintained on every flush from Memory.tags / Document.tags (see services/tag_index.py).
+    """
+    __tablename__ = "tags"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    name = Column(String, nullable=False) # Exactly as stored in the JSON tags column
+    normalized = Column(String, nullable=False) # Lowercased, for prefix search
+    memory_count = Column(Integer, default=0, nullable=False)
+    document_count = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "name", name="uq_tags_user_name"),
+        # Prefix autocomplete: WHERE user_id = ? AND normalized LIKE 'pre%'
+        Index("ix_tags_user_normalized", "user_id", "normalized", postgresql_ops={"normalized": "text_pattern_ops"}),
+    )
+
+class MemoryTag(Base):
+    """
+    Tag -> Memory or Document carrying it.
+    """
+    __tablename__ = "memory_tags"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    tag_id = Column(Integer, ForeignKey("tags.id", ondelete="CASCADE"), nullable=False)
+    memory_id = Column(Integer, ForeignKey("memories.id", ondelete="CASCADE"), nullable=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=True, index=True)
+
+    __table_args__ = (
+        Index("ix_memory_tags_tag_memory", "tag_id", "memory_id"),
+        Index("ix_memory_tags_tag_document", "tag_id", "document_id"),
+    )
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float
+from sqlalchemy import Column, Integer, String, DateTime, Float, JSON, UniqueConstraint, Index
+from sqlalchemy.orm import declared_attr
 from sqlalchemy.sql import func
 from app.db.base import Base
 
@@ -8,8 +9,53 @@ class UserUsage(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, nullable=False, index=True)
     provider = Column(String, nullable=False) # "openai", "gemini", "bedrock"
-    model_name = Column(String, nullable=True) 
+    model_name = Column(String, nullable=True)
     tokens_in = Column(Integer, default=0)
     tokens_out = Column(Integer, default=0)
     estimated_cost = Column(Float, default=0.0)
+    latency_ms = Column(Integer, nullable=True) # Provider call duration
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
+
+class _UsageRollup:
+    """
+    Usage per (user, provider, model, period), rolled up from user_usage (see services/usage_rollup.py).
+    """
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, nullable=False)
+    provider = Column(String, nullable=False)
+    model_name = Column(String, nullable=False, default="") # "" when the row had none
+    period_start = Column(DateTime(timezone=True), nullable=False)
+    calls = Column(Integer, default=0, nullable=False)
+    tokens_in = Column(Integer, default=0, nullable=False)
+    tokens_out = Column(Integer, default=0, nullable=False)
+    estimated_cost = Column(Float, default=0.0, nullable=False)
+    latency_count = Column(Integer, default=0, nullable=False) # Calls with a measured latency
+    latency_sum_ms = Column(Integer, default=0, nullable=False)
+    latency_histogram = Column(JSON, nullable=True) # Counts per LATENCY_BUCKETS_MS bucket (+ overflow)
+
+    @declared_attr
+    def __table_args__(cls):
+        return (
+            UniqueConstraint("user_id", "provider", "model_name", "period_start", name=f"uq_{cls.__tablename__}_key"),
+            # Range scans per user: WHERE user_id = ? AND period_start BETWEEN ...
+            Index(f"ix_{cls.__tablename__}_user_period", "user_id", "period_start"),
+        )
+
+class UsageHourly(_UsageRollup, Base):
+    __tablename__ = "usage_hourly"
+
+class UsageDaily(_UsageRollup, Base):
+    __tablename__ = "usage_daily"
+
+class UsageRollupState(Base):
+    """
+    Single row: the last user_usage id included in the rollups, and the horizon the next
+    run may advance it to (the highest id seen at horizon_at, see services/usage_rollup.py).
+    """
+    __tablename__ = "usage_rollup_state"
+
+    id = Column(Integer, primary_key=True)
+    last_usage_id = Column(Integer, default=0, nullable=False)
+    horizon_id = Column(Integer, nullable=True)
+    horizon_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
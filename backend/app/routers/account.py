@@ -0,0 +1,42 @@
+from typing import Any
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api import deps
+from app.models.user import User
+from app.services.deletion_service import deletion_service
+
+router = APIRouter()
+
+@router.delete("/vault", response_model=Any)
+async def delete_vault(
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+) -> Any:
+    """
+    Delete all memories, documents, facts and vectors of the current user (account is kept).
+    Runs in the background; poll GET /user/deletion-jobs/{job_id}.
+    """
+    return await deletion_service.delete(db, "user", current_user.id, current_user.id)
+
+@router.delete("/account", response_model=Any)
+async def delete_account(
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+) -> Any:
+    """
+    Delete the vault and the account itself (API keys, chat sessions, usage).
+    """
+    return await deletion_service.delete(db, "user", current_user.id, current_user.id, delete_account=True)
+
+@router.get("/deletion-jobs/{job_id}", response_model=Any)
+async def get_deletion_job(
+    job_id: str,
+    current_user: User = Depends(deps.get_current_user)
+) -> Any:
+    """
+    Status and progress of a background deletion.
+    """
+    job = await deletion_service.get_job(job_id)
+    if not job or job["user_id"] != current_user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
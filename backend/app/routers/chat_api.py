@@ -12,6 +12,7 @@ from app.models.chat import ChatSession, ChatMessage, MessageRole
 from app.services.agent_service import agent_service
 from app.services.llm_service import llm_service
 from app.db.session import AsyncSessionLocal
+from app.core.sse import sse_response
 
 router = APIRouter()
 
@@ -155,6 +156,48 @@ async def send_message(
     )
 
 
+@router.post("/sessions/{session_id}/message/stream")
+async def stream_message(
+    session_id: int,
+    message_in: ChatMessageCreate,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+) -> Any:
+    """
+    Send a message to the agent and stream the reply as Server-Sent Events:
+    token, tool_start, tool_end, sources, then done (the saved message) or error.
+    """
+    result = await db.execute(select(ChatSession).where(ChatSession.id == session_id, ChatSession.user_id == current_user.id))
+    session = result.scalars().first()
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    needs_title = session.title == "New Chat"
+
+    async def events():
+        async for event in agent_service.stream_message(
+            session_id=session_id,
+            user_id=current_user.id,
+            message=message_in.content,
+            model=message_in.model,
+            temperature=message_in.temperature,
+            max_tokens=message_in.max_tokens
+        ):
+            if event["type"] == "done":
+                # The request session may already be closed while streaming: use a fresh one
+                async with AsyncSessionLocal() as stream_db:
+                    stream_session = await stream_db.get(ChatSession, session_id)
+                    if stream_session:
+                        stream_session.updated_at = datetime.utcnow()
+                        await stream_db.commit()
+                if needs_title:
+                    # Runs once the stream has been sent
+                    background_tasks.add_task(update_chat_title_task, session_id, f"User: {message_in.content}\nAI: {event['content']}")
+            yield event
+
+    return sse_response(events(), background=background_tasks)
+
+
 @router.get("/sessions/{session_id}/history", response_model=List[ChatMessageResponse])
 async def get_history(
     session_id: int,
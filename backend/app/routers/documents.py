@@ -15,6 +15,8 @@ from app.services.vector_store import vector_store
 from app.services.ingestion import ingestion_service
 from app.services.metadata_extraction import metadata_service
 from app.services.retrieval_service import retrieval_service
+from app.services.entity_index import entity_index
+from app.services.context_builder import context_builder
 from app.db.session import AsyncSessionLocal
 
 # Wrapper to run in background with fresh session
@@ -105,6 +107,7 @@ async def upload_document(
     )
     
     # Store Chunks in DB
+    new_chunks = []
     for i, (embedding_id, chunk_content) in enumerate(zip(ids, documents_content)):
         # Extract enrichment from metadata
         meta = metadatas[i]
@@ -133,10 +136,15 @@ async def upload_document(
             summary=meta.get("summary"),
             generated_qas=qas,
             entities=entities,
+            tokens_count=meta.get("tokens_count"),
             metadata_json=meta 
         )
         db.add(chunk)
+        new_chunks.append(chunk)
         
+    await db.flush()
+    await entity_index.index_chunks(db, current_user.id, new_chunks)
+
     await db.commit()
     
     # Trigger background auto-tagging
@@ -190,20 +198,13 @@ async def delete_document(
     db: AsyncSession = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_user)
 ) -> Any:
-    result = await db.execute(select(Document).where(Document.id == doc_id, Document.user_id == current_user.id))
-    document = result.scalars().first()
-    if not document:
+    result = await db.execute(select(Document.id).where(Document.id == doc_id, Document.user_id == current_user.id))
+    if not result.scalar():
         raise HTTPException(status_code=404, detail="Document not found")
-        
-    # Delete from Vector Store
-    chunk_ids = [chunk.embedding_id for chunk in document.chunks if chunk.embedding_id]
-    if chunk_ids:
-        await vector_store.delete(ids=chunk_ids)
-        
-    await db.delete(document)
-    await db.commit()
-    
-    return {"status": "success"}
+
+    # Chunks, facts, feedback and all their vectors (background job for large documents)
+    from app.services.deletion_service import deletion_service
+    return await deletion_service.delete(db, "document", doc_id, current_user.id)
 
 from pydantic import BaseModel
 
@@ -284,6 +285,7 @@ async def create_memory(
                 db.add(memory)
                 
                 # Save Chunks
+                new_chunks = []
                 for i, (embedding_id, chunk_content) in enumerate(zip(ids, documents_content)):
                     meta = metadatas[i]
                     
@@ -310,9 +312,14 @@ async def create_memory(
                         summary=meta.get("summary"),
                         generated_qas=qas,
                         entities=entities,
+                        tokens_count=meta.get("tokens_count"),
                         metadata_json=meta
                     )
                     db.add(chunk)
+                    new_chunks.append(chunk)
+
+                await db.flush()
+                await entity_index.index_chunks(db, current_user.id, new_chunks)
 
                 await db.commit()
                 
@@ -377,6 +384,7 @@ async def update_document(
     )
     
     # Store new chunks in DB
+    new_chunks = []
     for i, (embedding_id, chunk_content) in enumerate(zip(ids, documents_content)):
         # Parse logic if needed for complex metadata, but for update we trust ingestion returns plain dicts unless we parse them
         # Logic similar to create_memory...
@@ -403,10 +411,15 @@ async def update_document(
             summary=meta.get("summary"),
             generated_qas=qas,
             entities=entities,
+            tokens_count=meta.get("tokens_count"),
             metadata_json=meta
         )
         db.add(chunk)
+        new_chunks.append(chunk)
     
+    await db.flush()
+    await entity_index.index_chunks(db, current_user.id, new_chunks)
+
     await db.commit()
     
     # Add to Vector Store
@@ -419,6 +432,8 @@ async def update_document(
         )
     except Exception as e:
         print(f"Vector Store Error: {e}")
+
+    await context_builder.publish_invalidation(current_user.id)
     
     return {"status": "success", "document_id": document.id, "chunks": len(ids)}
 
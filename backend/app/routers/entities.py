@@ -0,0 +1,121 @@
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from pydantic import BaseModel
+from app.api import deps
+from app.models.user import User
+from app.models.entity import Entity, EntityAlias, EntityPosting
+from app.services.entity_index import entity_index
+
+router = APIRouter()
+
+class AliasCreate(BaseModel):
+    alias: str
+
+@router.get("/", response_model=List[Any])
+async def list_entities(
+    prefix: Optional[str] = None,
+    limit: int = Query(50, le=500),
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+) -> Any:
+    """
+    List the user's entities (optionally by name prefix) with posting counts.
+    """
+    return await entity_index.list_entities(current_user.id, db, prefix=prefix, limit=limit)
+
+@router.get("/{entity_id}", response_model=Any)
+async def get_entity(
+    entity_id: int,
+    limit: int = Query(50, le=500),
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+) -> Any:
+    """
+    Get an entity with its aliases and the chunks / facts that mention it.
+    """
+    from app.models.document import Chunk
+    from app.models.fact import Fact
+
+    result = await db.execute(select(Entity).where(Entity.id == entity_id, Entity.user_id == current_user.id))
+    entity = result.scalars().first()
+    if not entity:
+        raise HTTPException(status_code=404, detail="Entity not found")
+
+    aliases = await db.execute(select(EntityAlias.alias).where(EntityAlias.entity_id == entity_id))
+
+    chunk_stmt = (
+        select(Chunk)
+        .join(EntityPosting, EntityPosting.chunk_id == Chunk.id)
+        .where(EntityPosting.entity_id == entity_id)
+        .order_by(Chunk.id.desc())
+        .limit(limit)
+    )
+    chunks = (await db.execute(chunk_stmt)).scalars().all()
+
+    fact_stmt = (
+        select(Fact)
+        .join(EntityPosting, EntityPosting.fact_id == Fact.id)
+        .where(EntityPosting.entity_id == entity_id, Fact.is_superseded == False)
+        .order_by(Fact.id.desc())
+        .limit(limit)
+    )
+    facts = (await db.execute(fact_stmt)).scalars().all()
+
+    return {
+        "id": entity.id,
+        "name": entity.name,
+        "normalized_name": entity.normalized_name,
+        "aliases": aliases.scalars().all(),
+        "chunks": [
+            {
+                "id": c.id,
+                "memory_id": c.memory_id,
+                "document_id": c.document_id,
+                "text": c.text[:200] + "..." if len(c.text) > 200 else c.text
+            }
+            for c in chunks
+        ],
+        "facts": [
+            {
+                "id": f.id,
+                "subject": f.subject,
+                "predicate": f.predicate,
+                "object": f.object,
+                "valid_from": f.valid_from,
+                "valid_until": f.valid_until
+            }
+            for f in facts
+        ]
+    }
+
+@router.post("/{entity_id}/aliases", response_model=Any)
+async def add_alias(
+    entity_id: int,
+    alias_in: AliasCreate,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+) -> Any:
+    """
+    Map another name onto this entity (e.g. a nickname), so queries using it hit the same postings.
+    """
+    result = await db.execute(select(Entity).where(Entity.id == entity_id, Entity.user_id == current_user.id))
+    if not result.scalars().first():
+        raise HTTPException(status_code=404, detail="Entity not found")
+
+    key = await entity_index.add_alias(db, current_user.id, entity_id, alias_in.alias)
+    if not key:
+        raise HTTPException(status_code=409, detail="Alias is empty or already used by another entity")
+    return {"status": "success", "alias": key}
+
+@router.post("/rebuild", response_model=Any)
+async def rebuild_index(
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+) -> Any:
+    """
+    Backfill the entity index from existing chunks and facts.
+    """
+    postings = await entity_index.rebuild_user_index(current_user.id, db)
+    return {"status": "success", "postings": postings}
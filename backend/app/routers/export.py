@@ -1,78 +1,72 @@
 from typing import Any
 from fastapi import APIRouter, Depends
-from fastapi.responses import Response
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
-import json
+from fastapi.responses import StreamingResponse
 
 from app.api import deps
 from app.models.user import User
-from app.models.memory import Memory
-from app.models.document import Document
+from app.services.export_service import export_service
 
 router = APIRouter()
 
+def _stream(chunks, filename: str, media_type: str, gzip: bool) -> StreamingResponse:
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        export_service.encode(chunks, gzip=gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
 @router.get("/json")
 async def export_json(
-    db: AsyncSession = Depends(deps.get_db),
+    include_chunks: bool = False,
+    include_facts: bool = False,
+    include_embeddings: bool = False,
+    gzip: bool = False,
+    current_user: User = Depends(deps.get_current_user)
+) -> Any:
+    """
+    Stream the vault as one JSON document: {"version", "memories", "documents"[, "chunks"][, "facts"]}.
+    """
+    chunks = export_service.to_json(
+        current_user.id,
+        include_chunks=include_chunks or include_embeddings,
+        include_facts=include_facts,
+        include_embeddings=include_embeddings
+    )
+    return _stream(chunks, "brain_vault_export.json", "application/json", gzip)
+
+@router.get("/ndjson")
+async def export_ndjson(
+    include_chunks: bool = False,
+    include_facts: bool = False,
+    include_embeddings: bool = False,
+    gzip: bool = False,
     current_user: User = Depends(deps.get_current_user)
 ) -> Any:
-    result_mem = await db.execute(select(Memory).where(Memory.user_id == current_user.id))
-    memories = result_mem.scalars().all()
-    
-    result_doc = await db.execute(select(Document).where(Document.user_id == current_user.id))
-    documents = result_doc.scalars().all()
-    
-    data = {
-        "memories": [
-            {
-                "id": m.id,
-                "title": m.title,
-                "content": m.content,
-                "created_at": m.created_at.isoformat() if m.created_at else None
-            } for m in memories
-        ],
-        "documents": [
-            {
-                "id": d.id,
-                "title": d.title,
-                "source": d.source,
-                "file_type": d.file_type,
-                "created_at": d.created_at.isoformat() if d.created_at else None
-            } for d in documents
-        ]
-    }
-    
-    return Response(
-        content=json.dumps(data, indent=2),
-        media_type="application/json",
-        headers={"Content-Disposition": "attachment; filename=brain_vault_export.json"}
+    """
+    Stream the vault as newline-delimited JSON, one {"type": ..., ...} record per line.
+    """
+    chunks = export_service.to_ndjson(
+        current_user.id,
+        include_chunks=include_chunks or include_embeddings,
+        include_facts=include_facts,
+        include_embeddings=include_embeddings
     )
+    return _stream(chunks, "brain_vault_export.ndjson", "application/x-ndjson", gzip)
 
 @router.get("/md")
 async def export_markdown(
-    db: AsyncSession = Depends(deps.get_db),
+    include_chunks: bool = False,
+    include_facts: bool = False,
+    gzip: bool = False,
     current_user: User = Depends(deps.get_current_user)
 ) -> Any:
-    result_mem = await db.execute(select(Memory).where(Memory.user_id == current_user.id))
-    memories = result_mem.scalars().all()
-    
-    result_doc = await db.execute(select(Document).where(Document.user_id == current_user.id))
-    documents = result_doc.scalars().all()
-    
-    md_content = f"# Brain Vault Export for {current_user.email}\n\n"
-    
-    md_content += "## Memories\n\n"
-    for m in memories:
-        md_content += f"### {m.title}\n{m.content}\n\n"
-        
-    md_content += "## Documents\n\n"
-    for d in documents:
-        md_content += f"### {d.title}\nSource: {d.source}\n\n"
-        # We could add chunk content here if we wanted
-        
-    return Response(
-        content=md_content,
-        media_type="text/markdown",
-        headers={"Content-Disposition": "attachment; filename=brain_vault_export.md"}
+    chunks = export_service.to_markdown(
+        current_user.id,
+        current_user.email,
+        include_chunks=include_chunks,
+        include_facts=include_facts
     )
+    return _stream(chunks, "brain_vault_export.md", "text/markdown", gzip)
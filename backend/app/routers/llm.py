@@ -10,6 +10,7 @@ from app.services.vector_store import vector_store
 from app.services.llm_service import llm_service
 from app.services.usage_service import usage_service
 from app.core.guardrails import guardrails
+from app.core.sse import sse_response
 
 router = APIRouter()
 from app.core.rate_limiter import limiter
@@ -28,6 +29,67 @@ class ChatResponse(BaseModel):
 from app.models.memory import Memory
 from app.models.document import Document
 
+async def _retrieve_context(chat_request: ChatRequest, user_id: int, db: AsyncSession) -> List[str]:
+    where_clause = {"user_id": user_id}
+    if chat_request.filter:
+        # Ensure IDs are integers
+        if "document_id" in chat_request.filter:
+            try:
+                chat_request.filter["document_id"] = int(chat_request.filter["document_id"])
+            except:
+                pass
+        if "memory_id" in chat_request.filter:
+            try:
+                chat_request.filter["memory_id"] = int(chat_request.filter["memory_id"])
+            except:
+                pass
+        
+        # ChromaDB/Pinecone filter adaptation
+        # Pinecone uses $and for multiple conditions filter={"$and": [...]}
+        # But specific "document_id" is simple scalar.
+        # Only use $and if we have multiple keys.
+        if len(chat_request.filter) > 0:
+            where_clause.update(chat_request.filter)
+        
+    results = await vector_store.query(chat_request.query, n_results=chat_request.top_k, where=where_clause)
+    
+    context = []
+    if results["documents"] and results.get("distances"):
+        # Filter by relevance (Distance Threshold)
+        # Threshold depends on metric. Chroma default is L2. 
+        # Lower is better. < 1.0 is usually good, > 1.5 is often irrelevant.
+        threshold = 1.5 
+        
+        for i, doc in enumerate(results["documents"][0]):
+            distance = results["distances"][0][i]
+            
+            # Fallback: If doc text is missing (e.g. from old migration), fetch from DB
+            if not doc and results["metadatas"][0][i]:
+                meta = results["metadatas"][0][i]
+                try:
+                    if meta.get("memory_id"):
+                        result = await db.execute(select(Memory).where(Memory.id == int(meta["memory_id"])))
+                        mem = result.scalars().first()
+                        if mem:
+                            doc = mem.content
+                    elif meta.get("document_id"):
+                         result = await db.execute(select(Document).where(Document.id == int(meta["document_id"])))
+                         doc_obj = result.scalars().first()
+                         if doc_obj:
+                             # This might be full content, but better than nothing
+                             doc = doc_obj.content
+                except Exception as e:
+                    print(f"Fallback fetch failed: {e}")
+
+            if distance < threshold:
+                if doc:
+                    context.append(doc)
+    elif results["documents"]:
+         # Fallback if no distances returned (unlikely)
+         context = results["documents"][0]
+
+    return context
+
 @router.post("/chat", response_model=ChatResponse)
 @limiter.limit("15/minute")
 async def chat_with_llm(
@@ -48,63 +110,7 @@ async def chat_with_llm(
              raise HTTPException(status_code=429, detail="Daily LLM budget exceeded.")
 
         # 1. Retrieve context
-        where_clause = {"user_id": current_user.id}
-        if chat_request.filter:
-            # Ensure IDs are integers
-            if "document_id" in chat_request.filter:
-                try:
-                    chat_request.filter["document_id"] = int(chat_request.filter["document_id"])
-                except:
-                    pass
-            if "memory_id" in request.filter:
-                try:
-                    chat_request.filter["memory_id"] = int(chat_request.filter["memory_id"])
-                except:
-                    pass
-            
-            # ChromaDB/Pinecone filter adaptation
-            # Pinecone uses $and for multiple conditions filter={"$and": [...]}
-            # But specific "document_id" is simple scalar.
-            # Only use $and if we have multiple keys.
-            if len(chat_request.filter) > 0:
-                where_clause.update(chat_request.filter)
-            
-        results = await vector_store.query(chat_request.query, n_results=chat_request.top_k, where=where_clause)
-        
-        context = []
-        if results["documents"] and results.get("distances"):
-            # Filter by relevance (Distance Threshold)
-            # Threshold depends on metric. Chroma default is L2. 
-            # Lower is better. < 1.0 is usually good, > 1.5 is often irrelevant.
-            threshold = 1.5 
-            
-            for i, doc in enumerate(results["documents"][0]):
-                distance = results["distances"][0][i]
-                
-                # Fallback: If doc text is missing (e.g. from old migration), fetch from DB
-                if not doc and results["metadatas"][0][i]:
-                    meta = results["metadatas"][0][i]
-                    try:
-                        if meta.get("memory_id"):
-                            result = await db.execute(select(Memory).where(Memory.id == int(meta["memory_id"])))
-                            mem = result.scalars().first()
-                            if mem:
-                                doc = mem.content
-                        elif meta.get("document_id"):
-                             result = await db.execute(select(Document).where(Document.id == int(meta["document_id"])))
-                             doc_obj = result.scalars().first()
-                             if doc_obj:
-                                 # This might be full content, but better than nothing
-                                 doc = doc_obj.content
-                    except Exception as e:
-                        print(f"Fallback fetch failed: {e}")
-
-                if distance < threshold:
-                    if doc:
-                        context.append(doc)
-        elif results["documents"]:
-             # Fallback if no distances returned (unlikely)
-             context = results["documents"][0]
+        context = await _retrieve_context(chat_request, current_user.id, db)
 
         # 2. Generate response
         response = await llm_service.generate_response(
@@ -122,6 +128,46 @@ async def chat_with_llm(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Chat failed: {str(e)}")
 
+@router.post("/chat/stream")
+@limiter.limit("15/minute")
+async def stream_chat_with_llm(
+    request: Request,
+    chat_request: ChatRequest,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+) -> Any:
+    """
+    Chat with LLM using retrieved context, streamed as Server-Sent Events:
+    context (the retrieved snippets), token (partial text), then done (the full response).
+    """
+    try:
+        guardrails.validate_input(chat_request.query)
+
+        if not await usage_service.check_budget(current_user.id):
+             raise HTTPException(status_code=429, detail="Daily LLM budget exceeded.")
+
+        context = await _retrieve_context(chat_request, current_user.id, db)
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Chat failed: {str(e)}")
+
+    async def events():
+        yield {"type": "context", "context": context}
+        parts = []
+        async for text in llm_service.stream_response(
+            query=chat_request.query,
+            context=context,
+            provider=chat_request.provider,
+            api_key=chat_request.api_key,
+            user_id=current_user.id
+        ):
+            parts.append(text)
+            yield {"type": "token", "content": text}
+        yield {"type": "done", "response": "".join(parts)}
+
+    return sse_response(events())
+
 class SuggestTagsRequest(BaseModel):
     content: str
     existing_tags: List[str] = []
@@ -208,7 +208,9 @@ async def retrieve_context(
     ctx = await context_builder.build_context(
         query=request.query,
         user_id=current_user.id,
-        limit_tokens=request.limit_tokens or 2000
+        limit_tokens=request.limit_tokens or 2000,
+        view=request.task_type,
+        db=db
     )
     
     return ContextResponse(
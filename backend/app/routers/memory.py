@@ -1,12 +1,14 @@
 from typing import List, Any
 from pydantic import BaseModel
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 import uuid
 import random
-from datetime import datetime, timedelta
-from sqlalchemy import or_
+import json
+import base64
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import or_, not_, and_, func, cast, case, literal, null, tuple_, union_all, DateTime
 from sqlalchemy.orm import selectinload
 
 from app.api import deps
@@ -16,12 +18,20 @@ from app.schemas.memory import Memory as MemorySchema, MemoryCreate, MemoryUpdat
 from app.services.vector_store import vector_store
 from app.services.ingestion import ingestion_service
 from app.services.metadata_extraction import metadata_service
+from app.services.entity_index import entity_index
+from app.services.tag_index import tag_index
+from app.services.context_builder import context_builder
 from app.db.session import AsyncSessionLocal
 from app.worker import process_memory_metadata_task, ingest_memory_task, dedupe_memory_task
 
 
 router = APIRouter()
 
+class TagCount(BaseModel):
+    name: str
+    memory_count: int
+    document_count: int
+
 @router.get("/agent-facts", response_model=List[MemorySchema])
 async def get_agent_facts(
     db: AsyncSession = Depends(deps.get_db),
@@ -30,13 +40,12 @@ async def get_agent_facts(
     """
     Retrieve memories created by agents (source_llm='agent' or tags=['auto-fact']).
     """
-    from sqlalchemy import cast, String
     result = await db.execute(
         select(Memory).where(
             Memory.user_id == current_user.id,
             or_(
                 Memory.source_llm == "agent",
-                cast(Memory.tags, String).contains("auto-fact")
+                tag_index.has_tag(Memory.id, current_user.id, "auto-fact")
             )
         ).order_by(Memory.created_at.desc())
     )
@@ -44,29 +53,40 @@ async def get_agent_facts(
 
 @router.get("/tags", response_model=List[str])
 async def get_all_tags(
+    prefix: str | None = None,
+    limit: int | None = Query(None, le=1000),
     db: AsyncSession = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_user)
 ) -> Any:
     """
-    Get all unique tags used by the current user.
+    Get all unique tags used by the current user (optionally only those starting with `prefix`).
     """
-    # Fetch all memories with tags for this user
-    result = await db.execute(select(Memory.tags).where(
-        Memory.user_id == current_user.id, 
-        Memory.tags != None
-    ))
-    memories = result.all()
-    
-    unique_tags = set()
-    for mem in memories:
-        # mem is a Row
-        tags_val = mem.tags if hasattr(mem, 'tags') else mem[0]
-        if tags_val:
-            for tag in tags_val:
-                if tag:
-                    unique_tags.add(tag)
-                    
-    return sorted(list(unique_tags))
+    return await tag_index.tag_names(db, current_user.id, prefix=prefix, limit=limit)
+
+@router.get("/tags/search", response_model=List[TagCount])
+async def search_tags(
+    prefix: str = "",
+    limit: int = Query(20, le=200),
+    kind: str = Query("all", pattern="^(memory|document|all)$"),
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+) -> Any:
+    """
+    Tag autocomplete: tags starting with `prefix` (case-insensitive), most used first.
+    """
+    tags = await tag_index.list_tags(db, current_user.id, prefix=prefix, limit=limit, kind=kind, by_count=True)
+    return [{"name": t.name, "memory_count": t.memory_count, "document_count": t.document_count} for t in tags]
+
+@router.post("/tags/rebuild")
+async def rebuild_tags(
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+) -> Any:
+    """
+    Rebuild the tag index from the tags stored on memories and documents.
+    """
+    count = await tag_index.rebuild_user_tags(db, current_user.id)
+    return {"status": "success", "tags": count}
 
 
 
@@ -198,72 +218,119 @@ async def check_duplicate(
         print(f"Check duplicate failed: {e}")
         return {"is_duplicate": False, "percent": 0.0}
 
+def _encode_cursor(sort_key: Any, kind: str, row_id: int) -> str:
+    if isinstance(sort_key, datetime):
+        sort_key = sort_key.isoformat()
+    raw = json.dumps({"s": sort_key, "k": kind, "i": row_id})
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_cursor(cursor: str, dialect: str):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        sort_key = data["s"] if dialect == "sqlite" else datetime.fromisoformat(data["s"])
+        return sort_key, data["k"], int(data["i"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+# Rows without created_at sort as the oldest instead of dropping out of the keyset comparison
+SORT_KEY_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def _sort_key(column, dialect: str):
+    # SQLite stores server-default and Python timestamps in different text formats; julianday() normalizes them
+    if dialect == "sqlite":
+        return func.julianday(func.coalesce(column, SORT_KEY_EPOCH.strftime("%Y-%m-%d %H:%M:%S")))
+    return func.coalesce(column, literal(SORT_KEY_EPOCH, DateTime(timezone=True)))
+
 @router.get("/", response_model=List[MemorySchema])
 async def read_memories(
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, le=1000),
     tag: str | None = None,
+    cursor: str | None = None,
     db: AsyncSession = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_user)
 ) -> Any:
     """
-    Retrieve memories and documents.
+    Retrieve memories and documents, newest first.
+    Memories and documents are merged in SQL (UNION ALL) and paginated by keyset on
+    (created_at, kind, id): pass the X-Next-Cursor response header back as `cursor`.
+    `skip` still works (OFFSET) for old clients.
     """
-    from sqlalchemy import not_, cast, String, and_
-    
-    # Build query filters
-    filters = [
+    dialect = db.get_bind().dialect.name
+
+    # 1. Memories (list-view columns only)
+    mem_filters = [
         Memory.user_id == current_user.id,
         Memory.status == "approved",
         or_(Memory.source_llm.is_(None), Memory.source_llm != "agent"),
-        not_(cast(Memory.tags, String).contains("auto-fact"))
+        not_(tag_index.has_tag(Memory.id, current_user.id, "auto-fact"))
     ]
-    
     if tag:
-        filters.append(cast(Memory.tags, String).contains(tag))
+        mem_filters.append(tag_index.has_tag(Memory.id, current_user.id, tag))
 
-    # Fetch Memories
-    result_mem = await db.execute(select(Memory).where(and_(*filters)))
-    memories = result_mem.scalars().all()
-    
-    # Fetch Documents
-    result_doc = await db.execute(select(Document).where(Document.user_id == current_user.id))
-    documents = result_doc.scalars().all()
-    
-    results = []
-    
-    for mem in memories:
-        results.append({
-            "id": f"mem_{mem.id}",
-            "title": mem.title,
-            "content": mem.content,
-            "user_id": mem.user_id,
-            "created_at": mem.created_at,
-            "updated_at": mem.updated_at,
-            "tags": mem.tags,
-            "type": "memory"
-        })
-        
-    for doc in documents:
-        # Check if document is actually a memory
-        doc_type = "memory" if doc.doc_type == "memory" else "document"
-        
-        results.append({
-            "id": f"doc_{doc.id}",
-            "title": doc.title,
-            "content": doc.content if doc.content else f"Uploaded Document: {doc.source} ({doc.file_type})",
-            "user_id": doc.user_id,
-            "created_at": doc.created_at,
-            "updated_at": None,
-            "type": doc_type,
-            "tags": doc.tags
-        })
-    
-    # Sort by created_at desc
-    results.sort(key=lambda x: x["created_at"], reverse=True)
-    
-    # Apply pagination
-    return results[skip : skip + limit]
+    mem_q = select(
+        literal("mem").label("kind"),
+        Memory.id.label("id"),
+        Memory.title.label("title"),
+        Memory.content.label("content"),
+        Memory.user_id.label("user_id"),
+        Memory.created_at.label("created_at"),
+        Memory.updated_at.label("updated_at"),
+        Memory.tags.label("tags"),
+        literal("memory").label("type"),
+        _sort_key(Memory.created_at, dialect).label("sort_key")
+    ).where(*mem_filters)
+
+    # 2. Documents
+    doc_filters = [Document.user_id == current_user.id]
+    if tag:
+        doc_filters.append(tag_index.has_tag(Document.id, current_user.id, tag))
+
+    placeholder = literal("Uploaded Document: ") + func.coalesce(Document.source, "") + " (" + func.coalesce(Document.file_type, "") + ")"
+    doc_q = select(
+        literal("doc").label("kind"),
+        Document.id.label("id"),
+        Document.title.label("title"),
+        case((or_(Document.content.is_(None), Document.content == ""), placeholder), else_=Document.content).label("content"),
+        Document.user_id.label("user_id"),
+        Document.created_at.label("created_at"),
+        cast(null(), DateTime(timezone=True)).label("updated_at"),
+        Document.tags.label("tags"),
+        case((Document.doc_type == "memory", "memory"), else_="document").label("type"),
+        _sort_key(Document.created_at, dialect).label("sort_key")
+    ).where(*doc_filters)
+
+    # 3. Merge + keyset page
+    merged = union_all(mem_q, doc_q).subquery()
+    stmt = select(merged).order_by(merged.c.sort_key.desc(), merged.c.kind.desc(), merged.c.id.desc())
+
+    if cursor:
+        sort_key, kind, row_id = _decode_cursor(cursor, dialect)
+        stmt = stmt.where(tuple_(merged.c.sort_key, merged.c.kind, merged.c.id) < tuple_(sort_key, kind, row_id))
+    elif skip:
+        stmt = stmt.offset(skip)
+
+    rows = (await db.execute(stmt.limit(limit + 1))).all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = _encode_cursor(last.sort_key, last.kind, last.id)
+
+    return [
+        {
+            "id": f"{row.kind}_{row.id}",
+            "title": row.title,
+            "content": row.content,
+            "user_id": row.user_id,
+            "created_at": row.created_at,
+            "updated_at": row.updated_at,
+            "tags": row.tags,
+            "type": row.type
+        }
+        for row in rows
+    ]
 
 @router.get("/review", response_model=Any)
 async def get_daily_review(
@@ -370,6 +437,7 @@ async def update_memory(
         from sqlalchemy import delete
         await db.execute(delete(Chunk).where(Chunk.memory_id == memory.id))
         
+        new_chunks = []
         for i, (embedding_id, chunk_content) in enumerate(zip(ids, documents_content)):
             meta = metadatas[i]
             
@@ -395,10 +463,15 @@ async def update_memory(
                 summary=meta.get("summary"),
                 generated_qas=qas,
                 entities=entities,
+                tokens_count=meta.get("tokens_count"),
                 metadata_json=meta
             )
             db.add(chunk)
+            new_chunks.append(chunk)
             
+        await db.flush()
+        await entity_index.index_chunks(db, current_user.id, new_chunks)
+
         await db.commit()
 
     try:
@@ -415,6 +488,8 @@ async def update_memory(
         # For example, you might want to revert the DB commit or raise an HTTPException.
         # For this change, we'll let the function continue and return the memory.
 
+    await context_builder.publish_invalidation(current_user.id)
+
     # Return with prefix
     return {
         "id": f"mem_{memory.id}",
@@ -434,56 +509,30 @@ async def delete_memory(
     current_user: User = Depends(deps.get_current_user)
 ) -> Any:
     """
-    Delete a memory or document.
+    Delete a memory or document with everything derived from it (chunks, facts, vectors).
+    Large deletes run in the background and return a job_id (see GET /user/deletion-jobs/{job_id}).
     """
+    from app.services.deletion_service import deletion_service
+
     if memory_id.startswith("doc_"):
         # Handle Document Deletion
         doc_id = int(memory_id.split("_")[1])
-        result = await db.execute(
-            select(Document)
-            .where(Document.id == doc_id, Document.user_id == current_user.id)
-            .options(selectinload(Document.chunks))
-        )
-        document = result.scalars().first()
-        if not document:
+        result = await db.execute(select(Document.id).where(Document.id == doc_id, Document.user_id == current_user.id))
+        if not result.scalar():
             raise HTTPException(status_code=404, detail="Document not found")
-        
-        # Delete chunks from vector store?
-        for chunk in document.chunks:
-            if chunk.embedding_id:
-                await vector_store.delete(ids=[chunk.embedding_id])
-        
-        await db.delete(document)
-        await db.commit()
-        return {"status": "success", "id": memory_id}
-        
-    elif memory_id.startswith("mem_"):
-        # Handle Memory Deletion
-        mem_id = int(memory_id.split("_")[1])
-        result = await db.execute(select(Memory).where(Memory.id == mem_id, Memory.user_id == current_user.id))
-        memory = result.scalars().first()
-        if not memory:
-            raise HTTPException(status_code=404, detail="Memory not found")
-        
-        if memory.embedding_id:
-            await vector_store.delete(ids=[memory.embedding_id])
-            
-        await db.delete(memory)
-        await db.commit()
-        return {"status": "success", "id": memory_id}
-    
-    else:
-        # Fallback for old int IDs if any
-        try:
-            mem_id = int(memory_id)
-            result = await db.execute(select(Memory).where(Memory.id == mem_id, Memory.user_id == current_user.id))
-            memory = result.scalars().first()
-            if not memory:
-                raise HTTPException(status_code=404, detail="Memory not found")
-            if memory.embedding_id:
-                await vector_store.delete(ids=[memory.embedding_id])
-            await db.delete(memory)
-            await db.commit()
-            return {"status": "success", "id": memory_id}
-        except ValueError:
-             raise HTTPException(status_code=400, detail="Invalid ID format")
+
+        outcome = await deletion_service.delete(db, "document", doc_id, current_user.id)
+        return {"id": memory_id, **outcome}
+
+    # Handle Memory Deletion ("mem_<id>", or old int IDs)
+    try:
+        mem_id = int(memory_id.split("_")[1]) if memory_id.startswith("mem_") else int(memory_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid ID format")
+
+    result = await db.execute(select(Memory.id).where(Memory.id == mem_id, Memory.user_id == current_user.id))
+    if not result.scalar():
+        raise HTTPException(status_code=404, detail="Memory not found")
+
+    outcome = await deletion_service.delete(db, "memory", mem_id, current_user.id)
+    return {"id": memory_id, **outcome}
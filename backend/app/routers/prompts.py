@@ -5,8 +5,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api import deps
 from app.models.user import User
-from app.services.vector_store import vector_store
-from app.services.ingestion import ingestion_service
+from app.services.context_builder import context_builder
+from app.services.token_counter import token_counter
 
 router = APIRouter()
 
@@ -21,7 +21,6 @@ class PromptGenerationResponse(BaseModel):
     context_used: List[str]
     token_count: int
 
-@router.post("/generate", response_model=PromptGenerationResponse)
 @router.post("/generate", response_model=PromptGenerationResponse)
 async def generate_prompt(
     request: PromptGenerationRequest,
@@ -31,28 +30,19 @@ async def generate_prompt(
     """
     Generate a polished prompt with retrieved context.
     """
-    # 1. Retrieve Context
-    # We use a higher top_k to get enough candidates, then filter/truncate
-    results = await vector_store.query(request.query, n_results=10, where={"user_id": current_user.id})
-    
-    retrieved_texts = []
-    if results["documents"]:
-        retrieved_texts = results["documents"][0]
-        
-    # 2. Compact Context (Token Budgeting)
-    selected_context = []
-    current_tokens = 0
-    
-    for text in retrieved_texts:
-        tokens = ingestion_service.count_tokens(text)
-        if current_tokens + tokens > request.context_size:
-            break
-        selected_context.append(text)
-        current_tokens += tokens
-        
+    # 1. Retrieve + pack context (shared context API: RetrievalService views, token budget, cache)
+    ctx = await context_builder.build_context(
+        query=request.query,
+        user_id=current_user.id,
+        limit_tokens=request.context_size,
+        view=request.template_id,
+        db=db
+    )
+    selected_context = ctx["snippets"]
+
     context_str = "\n\n---\n\n".join(selected_context)
     
-    # 3. Apply Template
+    # 2. Apply Template
     if request.template_id == "code":
         template = f"""You are an expert coding assistant. Use the following context to answer the user's request.
 
@@ -85,7 +75,7 @@ QUESTION:
 {request.query}
 """
 
-    total_tokens = ingestion_service.count_tokens(template)
+    total_tokens = token_counter.count(template)
 
     return PromptGenerationResponse(
         prompt=template,
@@ -0,0 +1,33 @@
+from typing import Any, Optional
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api import deps
+from app.models.user import User
+from app.services.usage_rollup import usage_rollup_service, GROUP_BY, _utc
+
+router = APIRouter()
+
+@router.get("/analytics", response_model=Any)
+async def usage_analytics(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    group_by: str = Query("period"),
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+) -> Any:
+    """
+    LLM usage over [start, end) (default: the last 7 days): tokens, cost and latency
+    percentiles, grouped by period (hour or day, depending on the range), provider or model.
+    Served from the usage rollups, so new calls show up after the next usage flush.
+    """
+    if group_by not in GROUP_BY:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {', '.join(GROUP_BY)}")
+
+    # Bounds without an offset are taken as UTC (comparable with the aware defaults and rollups)
+    end = _utc(end) if end else datetime.now(timezone.utc)
+    start = _utc(start) if start else end - timedelta(days=7)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    return await usage_rollup_service.analytics(db, current_user.id, start, end, group_by=group_by)
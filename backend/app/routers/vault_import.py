@@ -0,0 +1,35 @@
+from typing import Any
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api import deps
+from app.models.user import User
+from app.services.import_service import import_service, read_archive
+
+router = APIRouter()
+
+@router.post("/", response_model=Any)
+async def import_vault(
+    file: UploadFile = File(...),
+    reuse_embeddings: bool = True,
+    extract_metadata: bool = False,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+) -> Any:
+    """
+    Bulk import an archive produced by /export/ndjson or /export/json (optionally gzipped).
+    Rows are inserted in batches; embeddings included in the archive are reused, everything
+    else is ingested by one background job per batch. An invalid archive imports nothing
+    (batches already written are removed again).
+    """
+    try:
+        return await import_service.import_archive(
+            db,
+            current_user.id,
+            read_archive(file.file),
+            reuse_embeddings=reuse_embeddings,
+            extract_metadata=extract_metadata
+        )
+    except (ValueError, UnicodeDecodeError, OSError) as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=f"Invalid archive, nothing was imported: {e}")
@@ -1,6 +1,6 @@
 import logging
 import json
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator
 from datetime import datetime
 
 # LangChain Imports
@@ -22,10 +22,15 @@ from app.models.chat import ChatMessage, ChatSession, MessageRole
 from app.services.llm_service import llm_service
 from app.services.vector_store import vector_store
 from app.services.retrieval_service import retrieval_service
+from app.services.context_builder import context_builder
+from app.services.chat_history import chat_history_manager
 from sqlalchemy.future import select
 
 logger = logging.getLogger(__name__)
 
+# Token budget of the context pre-fetched into each agent turn
+PREFETCH_TOKENS = 1500
+
 # --- 1. Custom Memory History ---
 class SQLChatMessageHistory(BaseChatMessageHistory):
     def __init__(self, session_id: str, user_id: int):
@@ -99,6 +104,40 @@ def save_fact_tool(fact: str):
     # We will need to bind user_id to the tool when creating the agent.
     return "Error: User context missing from tool execution."
 
+def add_sources(sources: List[Dict[str, Any]], observation: Any):
+    """
+    Parse a search_memory observation ("Source: Title [ID: 123]\nContent: ...") into sources,
+    skipping ones already present (by ID, or title if there is no ID).
+    """
+    import re
+
+    if not isinstance(observation, str) or "Source: " not in observation:
+        return
+    parts = observation.split("Source: ")
+    for part in parts[1:]:
+        # title_line might look like "My Doc [ID: 5]"
+        title_line = part.split("\nContent:")[0].strip()
+
+        # Parse ID if present
+        doc_id = None
+        title_text = title_line
+
+        # Check for [ID: ...] pattern
+        id_match = re.search(r"\[ID: (.*?)\]", title_line)
+        if id_match:
+            doc_id = id_match.group(1)
+            title_text = title_line.replace(f"[ID: {doc_id}]", "").strip()
+
+        # Extract Content
+        content_text = ""
+        if "\nContent:" in part:
+            content_text = part.split("\nContent:", 1)[1].strip()
+
+        exists = any((doc_id and s.get("id") == doc_id) or (not doc_id and s.get("title") == title_text) for s in sources)
+        if not exists:
+            sources.append({"title": title_text, "id": doc_id, "content": content_text})
+
+
 # --- 3. Agent Service ---
 
 class AgentService:
@@ -106,16 +145,19 @@ class AgentService:
         # Allow overriding provider via settings? for now default to configured.
         pass
         
-    async def process_message(
-        self, 
-        session_id: int, 
-        user_id: int, 
-        message: str, 
-        model: str = "gpt-3.5-turbo",
-        temperature: float = 0.7,
-        max_tokens: int = 2048
-    ) -> Dict[str, Any]:
-        
+    async def _prepare(
+        self,
+        session_id: int,
+        user_id: int,
+        message: str,
+        model: str,
+        temperature: float,
+        max_tokens: int
+    ):
+        """
+        Build the agent graph, save the user message and assemble the input messages.
+        Returns (graph, input messages, chat history).
+        """
         # 1. Setup Chat History
         chat_history = SQLChatMessageHistory(session_id=str(session_id), user_id=user_id)
         
@@ -149,15 +191,13 @@ class AgentService:
                     model_kwargs={"temperature": temperature, "maxTokens": max_tokens}
                 )
             else:
-                if settings.OPENAI_API_KEY: return ChatOpenAI(api_key=settings.OPENAI_API_KEY, model="gpt-4o", temperature=temperature, max_tokens=max_tokens)
-                if google_key: return ChatGoogleGenerativeAI(google_api_key=google_key, model="gemini-2.5-flash", temperature=temperature, max_output_tokens=max_tokens)
-                # Fallback check for Bedrock Nova if configured via implicit Boto3 env vars
+                # No model picked: cheapest healthy chat-tier model on system credentials
+                from app.services.provider_router import provider_router, NoProviderAvailable
                 try:
-                    return ChatBedrock(model_id="apac.amazon.nova-pro-v1:0", model_kwargs={"temperature": temperature})
-                except:
-                    pass
-                    
-                raise ValueError("No LLM API keys configured.")
+                    routed, _ = provider_router.client_for("chat", temperature=temperature, max_tokens=max_tokens)
+                    return routed
+                except NoProviderAvailable:
+                    raise ValueError("No LLM API keys configured.")
 
         llm = get_llm(model)
              
@@ -259,35 +299,29 @@ class AgentService:
         
         # 5.0 Update History with User Message
         await chat_history.add_message(HumanMessage(content=message))
-        history_messages = await chat_history.aget_messages()
+        # Token-budgeted recent window plus the rolling summary (not the whole session)
+        history_messages = await chat_history_manager.load(session_id)
         
         # 5.1 PRE-FETCH CONTEXT (Smart RAG)
         # Instead of waiting for tool use, we proactively fetch relevant context
         # This gives the agent "reasoning text" immediately.
         context_str = ""
         try:
-            # We need a db session for retrieval
-            async with AsyncSessionLocal() as db:
-                # Top k=3 for immediate context
-                results = await retrieval_service.search_memories(
-                    query=message,
-                    user_id=user_id,
-                    db=db,
-                    top_k=3
-                )
-                if results:
-                    formatted_ctx = []
-                    for res in results:
-                        meta = res["metadata"]
-                        title = meta.get("title", "Untitled")
-                        # Include summary if available for denser context
-                        content = res["text"]
-                        if meta.get("summary"):
-                             content = f"Summary: {meta['summary']}\nDetails: {content}"
-                        formatted_ctx.append(f"Source: {title}\nContent: {content}")
-                    
-                    if formatted_ctx:
-                        context_str = "\n\n=== RELEVANT MEMORY CONTEXT ===\n" + "\n---\n".join(formatted_ctx) + "\n=============================\n"
+            # Shared context API: same retrieval path, packing and cache as the other clients
+            ctx = await context_builder.build_context(
+                query=message,
+                user_id=user_id,
+                limit_tokens=PREFETCH_TOKENS
+            )
+            formatted_ctx = []
+            for item in ctx["items"]:
+                title = item["metadata"].get("title", "Untitled")
+                # Summaries are chosen by the packer when the full chunk does not fit
+                label = "Summary" if item["kind"] == "summary" else "Content"
+                formatted_ctx.append(f"Source: {title}\n{label}: {item['text']}")
+
+            if formatted_ctx:
+                context_str = "\n\n=== RELEVANT MEMORY CONTEXT ===\n" + "\n---\n".join(formatted_ctx) + "\n=============================\n"
         except Exception as e:
             logger.error(f"Context pre-fetch failed: {e}")
 
@@ -306,6 +340,18 @@ class AgentService:
         
         # history_messages already includes the current user message (added at L245)
         input_messages = [instruction_msg] + history_messages
+        return app, input_messages, chat_history
+
+    async def process_message(
+        self, 
+        session_id: int, 
+        user_id: int, 
+        message: str, 
+        model: str = "gpt-3.5-turbo",
+        temperature: float = 0.7,
+        max_tokens: int = 2048
+    ) -> Dict[str, Any]:
+        app, input_messages, chat_history = await self._prepare(session_id, user_id, message, model, temperature, max_tokens)
         
         try:
             # invoke returns a dict with keys like 'messages' (list of BaseMessage)
@@ -320,53 +366,12 @@ class AgentService:
                 output = "No response generated."
 
             # Extract Sources from tool executions in message history
-            sources = []
-            # We scan messages for ToolMessage or AIMessage with tool_calls
-            # But our specific source logic relied on "observation" strings from "search_memory"
-            # In LangGraph, tool outputs are ToolMessages.
             from langchain_core.messages import ToolMessage
-            
+
+            sources = []
             for msg in messages_out:
                 if isinstance(msg, ToolMessage) and msg.name == "search_memory":
-                    observation = msg.content
-                    # Parse the observation string which mimics document content
-                    # Format: "Source: Title [ID: 123]\nContent: ..."
-                    if isinstance(observation, str) and "Source: " in observation:
-                        parts = observation.split("Source: ")
-                        for part in parts[1:]:
-                            # title_line might look like "My Doc [ID: 5]"
-                            title_line = part.split("\nContent:")[0].strip()
-                            
-                            # Parse ID if present
-                            doc_id = None
-                            title_text = title_line
-                            
-                            import re
-                            # Check for [ID: ...] pattern
-                            id_match = re.search(r"\[ID: (.*?)\]", title_line)
-                            if id_match:
-                                doc_id = id_match.group(1)
-                                title_text = title_line.replace(f"[ID: {doc_id}]", "").strip()
-                            
-                            # Extract Content
-                            content_text = ""
-                            if "\nContent:" in part:
-                                content_text = part.split("\nContent:", 1)[1].strip()
-
-                            source_obj = {"title": title_text, "id": doc_id, "content": content_text}
-                            
-                            # Add if unique by ID (or title if no ID)
-                            exists = False
-                            for s in sources:
-                                if doc_id and s.get("id") == doc_id:
-                                    exists = True
-                                    break
-                                if not doc_id and s.get("title") == title_text:
-                                    exists = True
-                                    break
-                            
-                            if not exists:
-                                sources.append(source_obj)
+                    add_sources(sources, msg.content)
 
             # Save AI Response and get ID
             ai_message_id = await chat_history.add_message(AIMessage(content=output))
@@ -384,4 +389,56 @@ class AgentService:
                 "sources": []
             }
 
+    async def stream_message(
+        self,
+        session_id: int,
+        user_id: int,
+        message: str,
+        model: str = "gpt-3.5-turbo",
+        temperature: float = 0.7,
+        max_tokens: int = 2048
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Same run as process_message, as events while it happens:
+        - {"type": "token", "content"}: partial model output
+        - {"type": "tool_start", "tool", "input"} / {"type": "tool_end", "tool"}
+        - {"type": "sources", "sources"}: new sources found by search_memory
+        - {"type": "done", "content", "sources", "message_id"}: final answer, saved to history
+        - {"type": "error", "detail"}
+        """
+        try:
+            app, input_messages, chat_history = await self._prepare(session_id, user_id, message, model, temperature, max_tokens)
+
+            output = ""
+            sources: List[Dict[str, Any]] = []
+            async for event in app.astream_events({"messages": input_messages}, version="v2"):
+                kind = event["event"]
+                if kind == "on_chat_model_stream":
+                    text = event["data"]["chunk"].text
+                    if text:
+                        yield {"type": "token", "content": text}
+                elif kind == "on_chat_model_end":
+                    # The answer is the last model call that did not ask for tools
+                    out = event["data"].get("output")
+                    if isinstance(out, AIMessage) and not out.tool_calls:
+                        output = out.text
+                elif kind == "on_tool_start":
+                    yield {"type": "tool_start", "tool": event["name"], "input": event["data"].get("input")}
+                elif kind == "on_tool_end":
+                    if event["name"] == "search_memory":
+                        found = len(sources)
+                        result = event["data"].get("output")
+                        add_sources(sources, getattr(result, "content", result))
+                        if len(sources) > found:
+                            yield {"type": "sources", "sources": sources[found:]}
+                    yield {"type": "tool_end", "tool": event["name"]}
+
+            output = output or "No response generated."
+            ai_message_id = await chat_history.add_message(AIMessage(content=output))
+            yield {"type": "done", "content": output, "sources": sources, "message_id": ai_message_id}
+
+        except Exception as e:
+            logger.error(f"Agent stream failed: {e}")
+            yield {"type": "error", "detail": "I'm sorry, I encountered an error while thinking."}
+
 agent_service = AgentService()
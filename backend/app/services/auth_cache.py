@@ -0,0 +1,253 @@
+"""
+Auth Cache: Authenticate most requests without touching the database.
+- Decoded JWTs (token -> user id, until min(TTL, token exp))
+- API keys (sha256 -> key id / user id)
+- Users (id -> column snapshot), rebuilt into a session-bound User without a SELECT
+- last_used_at for API keys is collected in memory and written in one batch
+  every API_KEY_LAST_USED_FLUSH_SECONDS (authenticated reads do no writes)
+
+Invalidation: any ORM flush touching a User or ApiKey drops its entries here and is
+published on AUTH_INVALIDATION_CHANNEL, so other API / MCP processes drop them too.
+Bulk deletes (account deletion) call invalidate() explicitly. AUTH_CACHE_TTL_SECONDS bounds
+staleness if a message is lost.
+"""
+import asyncio
+import copy
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional, Tuple
+from jose import jwt
+from sqlalchemy import event, update, bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.util import identity_key
+
+from app.core.config import settings
+from app.models.user import User
+from app.models.api_key import ApiKey
+
+AUTH_INVALIDATION_CHANNEL = "brain_vault_auth"
+
+
+class _TTLCache:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._data: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    def put(self, key, value, ttl: float):
+        if ttl <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def pop(self, key):
+        self._data.pop(key, None)
+
+    def drop_where(self, predicate):
+        for key in [k for k, (_, v) in self._data.items() if predicate(k, v)]:
+            del self._data[key]
+
+    def clear(self):
+        self._data.clear()
+
+
+class AuthCache:
+    def __init__(self):
+        self._tokens = _TTLCache(settings.AUTH_CACHE_SIZE)  # jwt -> user id
+        self._api_keys = _TTLCache(settings.AUTH_CACHE_SIZE)  # key hash -> (key id, user id)
+        self._users = _TTLCache(settings.AUTH_CACHE_SIZE)  # user id -> column snapshot
+        self._last_used: Dict[int, datetime] = {}  # key id -> last use, not yet written
+        self._redis = None
+
+    # --- Lookups ---
+
+    def decode_token(self, token: str) -> Optional[int]:
+        """
+        User id from a JWT (None if it has no subject). Raises JWTError for invalid tokens.
+        """
+        user_id = self._tokens.get(token)
+        if user_id is not None:
+            return user_id
+
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        sub = payload.get("sub")
+        if sub is None:
+            return None
+        user_id = int(sub)
+
+        ttl = settings.AUTH_CACHE_TTL_SECONDS
+        if payload.get("exp"):
+            ttl = min(ttl, payload["exp"] - time.time())
+        self._tokens.put(token, user_id, ttl)
+        return user_id
+
+    def cached_api_key_owner(self, key_hash: str) -> Optional[int]:
+        """
+        User id of an API key if it is cached here (no DB lookup), else None.
+        """
+        cached = self._api_keys.get(key_hash)
+        return cached[1] if cached else None
+
+    async def resolve_api_key(self, db: AsyncSession, key_hash: str) -> Optional[int]:
+        """
+        User id for an active API key (None if unknown / revoked); records the use.
+        """
+        cached = self._api_keys.get(key_hash)
+        if cached is None:
+            result = await db.execute(
+                select(ApiKey.id, ApiKey.user_id).where(ApiKey.key_hash == key_hash, ApiKey.is_active == True)
+            )
+            row = result.first()
+            if not row:
+                return None
+            cached = (row.id, row.user_id)
+            self._api_keys.put(key_hash, cached, settings.AUTH_CACHE_TTL_SECONDS)
+
+        key_id, user_id = cached
+        self._last_used[key_id] = datetime.now(timezone.utc)
+        return user_id
+
+    async def get_user(self, db: AsyncSession, user_id: int) -> Optional[User]:
+        """
+        The User, attached to db. From the snapshot cache when possible (no SELECT); the
+        instance is a fresh copy, so request code can modify and commit it as usual.
+        """
+        key = identity_key(User, user_id)
+        existing = db.sync_session.identity_map.get(key)
+        if existing is not None:
+            return existing
+
+        snapshot = self._users.get(user_id)
+        if snapshot is None:
+            result = await db.execute(select(User).where(User.id == user_id))
+            user = result.scalars().first()
+            if user is not None:
+                self._users.put(user_id, self._snapshot(user), settings.AUTH_CACHE_TTL_SECONDS)
+            return user
+
+        user = User(**copy.deepcopy(snapshot))
+        make_transient_to_detached(user)
+        db.add(user)
+        return user
+
+    def _snapshot(self, user: User) -> Dict[str, Any]:
+        return {c.key: copy.deepcopy(getattr(user, c.key)) for c in User.__table__.columns}
+
+    # --- Invalidation ---
+
+    def invalidate(self, user_ids: Iterable[int] = (), key_hashes: Iterable[str] = ()):
+        """
+        Drop entries in this process. Dropping a user also drops its tokens and API keys.
+        """
+        user_ids = {int(u) for u in user_ids}
+        for key_hash in key_hashes:
+            self._api_keys.pop(key_hash)
+        if user_ids:
+            for user_id in user_ids:
+                self._users.pop(user_id)
+            self._tokens.drop_where(lambda _, uid: uid in user_ids)
+            self._api_keys.drop_where(lambda _, value: value[1] in user_ids)
+
+    async def publish_invalidation(self, user_ids: Iterable[int] = (), key_hashes: Iterable[str] = ()):
+        """
+        Invalidate here and in every other process listening on AUTH_INVALIDATION_CHANNEL.
+        """
+        user_ids, key_hashes = [int(u) for u in user_ids], list(key_hashes)
+        self.invalidate(user_ids, key_hashes)
+        try:
+            if self._redis is None:
+                from redis import asyncio as aioredis
+                self._redis = aioredis.from_url(settings.REDIS_URL)
+            await self._redis.publish(AUTH_INVALIDATION_CHANNEL, json.dumps({"user_ids": user_ids, "key_hashes": key_hashes}))
+        except Exception as e:
+            print(f"Auth Cache: invalidation publish failed: {e}")
+
+    async def listen(self):
+        """
+        Apply invalidations published by other processes (runs for the process lifetime).
+        """
+        from redis import asyncio as aioredis
+        while True:
+            try:
+                redis = aioredis.from_url(settings.REDIS_URL)
+                pubsub = redis.pubsub()
+                await pubsub.subscribe(AUTH_INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    data = json.loads(message["data"])
+                    self.invalidate(data.get("user_ids", []), data.get("key_hashes", []))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Entries may be stale until the TTL runs out; drop everything and reconnect
+                print(f"Auth Cache: invalidation listener error: {e}")
+                self.clear()
+                await asyncio.sleep(5)
+
+    def clear(self):
+        self._tokens.clear()
+        self._api_keys.clear()
+        self._users.clear()
+
+    def _after_flush(self, session: Session, flush_context):
+        user_ids, key_hashes = set(), set()
+        for obj in list(session.dirty) + list(session.deleted):
+            if isinstance(obj, User) and obj.id is not None:
+                user_ids.add(obj.id)
+            elif isinstance(obj, ApiKey) and obj.key_hash:
+                key_hashes.add(obj.key_hash)
+        if not user_ids and not key_hashes:
+            return
+        self.invalidate(user_ids, key_hashes)
+        try:
+            asyncio.get_running_loop().create_task(self.publish_invalidation(user_ids, key_hashes))
+        except RuntimeError:
+            # Sync caller without a loop: other processes catch up via the TTL
+            pass
+
+    # --- last_used_at ---
+
+    async def flush_last_used(self):
+        """
+        Write the collected API key uses in one statement.
+        """
+        if not self._last_used:
+            return
+        pending, self._last_used = self._last_used, {}
+        from app.db.session import AsyncSessionLocal
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    update(ApiKey.__table__).where(ApiKey.__table__.c.id == bindparam("key_id")).values(last_used_at=bindparam("used_at")),
+                    [{"key_id": key_id, "used_at": used_at} for key_id, used_at in pending.items()]
+                )
+                await db.commit()
+        except Exception as e:
+            print(f"Auth Cache: last_used_at flush failed: {e}")
+            for key_id, used_at in pending.items():
+                self._last_used.setdefault(key_id, used_at)
+
+    async def run_last_used_flusher(self):
+        while True:
+            await asyncio.sleep(settings.API_KEY_LAST_USED_FLUSH_SECONDS)
+            await self.flush_last_used()
+
+auth_cache = AuthCache()
+
+event.listen(Session, "after_flush", auth_cache._after_flush)
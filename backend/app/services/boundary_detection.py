@@ -0,0 +1,117 @@
+"""
+Boundary Detection: Where does a long text change topic, for as few embedding calls as possible.
+
+Semantic chunking breaks between sentences i-1 and i when the cosine similarity of their
+embeddings is below a threshold. Most gaps are not close calls, so a lexical pre-filter
+(TextTiling-style cohesion between the BOUNDARY_WINDOW sentences on each side) settles them:
+- windows sharing a good part of their vocabulary -> cohesive, no break
+- windows with enough content words each and none in common -> break
+- everything else is ambiguous: only those gaps are embedded and judged by the threshold
+Embeddings are computed for the sentences around ambiguous gaps only. If embedding fails,
+the lexical breaks still stand and ambiguous gaps are treated as no break.
+"""
+import re
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List, Tuple
+import numpy as np
+
+from app.core.config import settings
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have
+having he her here hers herself him himself his how i if in into is it its itself just me more most
+my myself no nor not now of off on once only or other our ours ourselves out over own same she should
+so some such than that the their theirs them themselves then there these they this those through to
+too under until up very was we were what when where which while who whom why will with would you your
+yours yourself yourselves also may might must shall us let get got one two
+""".split())
+
+
+def content_terms(sentence: str) -> Counter:
+    return Counter(w for w in WORD_PATTERN.findall(sentence.lower()) if len(w) > 2 and w not in STOPWORDS)
+
+
+def _cosine(a: Counter, b: Counter) -> float:
+    if not a or not b:
+        return 0.0
+    small, large = (a, b) if len(a) <= len(b) else (b, a)
+    dot = sum(count * large.get(term, 0) for term, count in small.items())
+    if not dot:
+        return 0.0
+    norm_a = sum(c * c for c in a.values()) ** 0.5
+    norm_b = sum(c * c for c in b.values()) ** 0.5
+    return dot / (norm_a * norm_b)
+
+
+class BoundaryDetector:
+    def __init__(self, window: int = None, cohesive: float = None, min_terms: int = None):
+        self.window = window or settings.BOUNDARY_WINDOW
+        self.cohesive = settings.BOUNDARY_COHESIVE_SIMILARITY if cohesive is None else cohesive
+        self.min_terms = settings.BOUNDARY_MIN_TERMS if min_terms is None else min_terms
+
+    def classify_gaps(self, sentences: List[str]) -> Tuple[List[int], List[int]]:
+        """
+        Lexical pass. Gap i sits before sentence i (1 <= i < n).
+        Returns (certain breaks, ambiguous gaps); gaps in neither are cohesive.
+        """
+        terms = [content_terms(s) for s in sentences]
+        breaks, ambiguous = [], []
+        for i in range(1, len(sentences)):
+            left = Counter()
+            for t in terms[max(0, i - self.window):i]:
+                left.update(t)
+            right = Counter()
+            for t in terms[i:i + self.window]:
+                right.update(t)
+
+            similarity = _cosine(left, right)
+            if similarity >= self.cohesive:
+                continue
+            if similarity == 0.0 and len(left) >= self.min_terms and len(right) >= self.min_terms:
+                breaks.append(i)
+            else:
+                ambiguous.append(i)
+        return breaks, ambiguous
+
+    async def detect(
+        self,
+        sentences: List[str],
+        embed: Callable[[List[str]], Awaitable[List[List[float]]]],
+        threshold: float
+    ) -> Tuple[List[int], Dict[str, int]]:
+        """
+        Breakpoints (sentence indices that start a new topic) and counts of how gaps were decided.
+        embed() is only called for the sentences next to ambiguous gaps.
+        """
+        breaks, ambiguous = self.classify_gaps(sentences)
+        stats = {"gaps": max(0, len(sentences) - 1), "lexical_breaks": len(breaks), "ambiguous": len(ambiguous), "embedded": 0}
+        if not ambiguous:
+            return breaks, stats
+
+        needed = sorted({j for i in ambiguous for j in (i - 1, i)})
+        try:
+            vectors = await embed([sentences[j] for j in needed])
+        except Exception as e:
+            # Keep the lexical breaks; ambiguous gaps count as cohesive
+            print(f"Boundary Detection: embedding failed, using lexical breaks only: {e}")
+            return breaks, stats
+        stats["embedded"] = len(needed)
+        row = {j: k for k, j in enumerate(needed)}
+
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1)
+        left = np.array([row[i - 1] for i in ambiguous])
+        right = np.array([row[i] for i in ambiguous])
+        dots = np.sum(matrix[left] * matrix[right], axis=1)
+        norm_products = norms[left] * norms[right]
+        similarities = np.zeros_like(dots)
+        nonzero = norm_products > 1e-9
+        similarities[nonzero] = dots[nonzero] / norm_products[nonzero]
+
+        breaks.extend(i for i, sim in zip(ambiguous, similarities) if sim < threshold)
+        return sorted(breaks), stats
+
+boundary_detector = BoundaryDetector()
@@ -0,0 +1,158 @@
+"""
+Chat History: What the agent sees of a conversation, at a flat cost per turn.
+- Window: the most recent messages, newest first, until CHAT_HISTORY_TOKENS
+  (the current message is always included)
+- Summary: everything before the window, folded into ChatSession.summary by the LLM.
+  ChatSession.summary_through_id marks the last message it covers, so each turn reads
+  only the unsummarized tail (at most CHAT_HISTORY_MAX_MESSAGES rows).
+- Folding runs in the background once the messages that fell out of the window reach
+  CHAT_SUMMARY_BATCH_TOKENS, so a turn never waits for it. Until then those messages
+  stay in the context verbatim: every message is either in the summary or sent as is,
+  and a turn costs about CHAT_HISTORY_TOKENS + CHAT_SUMMARY_BATCH_TOKENS.
+"""
+import asyncio
+from typing import List, Optional, Set, Tuple
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, BaseMessage
+from sqlalchemy import update
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.chat import ChatMessage, ChatSession, MessageRole
+from app.services.token_counter import token_counter
+
+# Per message, in the transcript handed to the summarizer
+SUMMARY_MESSAGE_CHARS = 2000
+
+# Summary updates per scheduled run
+SUMMARY_MAX_ROUNDS = 10
+
+
+def to_message(role: str, content: str) -> BaseMessage:
+    if role == MessageRole.ASSISTANT:
+        return AIMessage(content=content)
+    if role == MessageRole.SYSTEM:
+        return SystemMessage(content=content)
+    return HumanMessage(content=content)
+
+
+class ChatHistoryManager:
+    def __init__(self, window_tokens: int = None, max_messages: int = None, batch_tokens: int = None):
+        self.window_tokens = window_tokens or settings.CHAT_HISTORY_TOKENS
+        self.max_messages = max_messages or settings.CHAT_HISTORY_MAX_MESSAGES
+        self.batch_tokens = batch_tokens or settings.CHAT_SUMMARY_BATCH_TOKENS
+        self._running: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def split_window(self, rows: List[Tuple[int, str, str]]) -> Tuple[int, int]:
+        """
+        rows: unsummarized (id, role, content), oldest first.
+        Returns (index where the window starts, tokens of the rows before it).
+        """
+        if not rows:
+            return 0, 0
+        counts = token_counter.count_batch([content for _, _, content in rows])
+        start, tokens = len(rows) - 1, counts[-1]
+        while start > 0 and tokens + counts[start - 1] <= self.window_tokens:
+            start -= 1
+            tokens += counts[start]
+        return start, sum(counts[:start])
+
+    async def _unsummarized(self, db, session_id: int, limit: int) -> Tuple[Optional[ChatSession], List[Tuple[int, str, str]]]:
+        session = await db.get(ChatSession, session_id)
+        if session is None:
+            return None, []
+        result = await db.execute(
+            select(ChatMessage.id, ChatMessage.role, ChatMessage.content)
+            .where(ChatMessage.session_id == session_id, ChatMessage.id > (session.summary_through_id or 0))
+            .order_by(ChatMessage.id.desc())
+            .limit(limit)
+        )
+        return session, [tuple(r) for r in reversed(result.all())]
+
+    async def load(self, session_id: int) -> List[BaseMessage]:
+        """
+        Summary (as a system message) plus every message it does not cover yet, oldest first.
+        Schedules a summary update when enough messages have left the window.
+        """
+        async with AsyncSessionLocal() as db:
+            session, rows = await self._unsummarized(db, session_id, self.max_messages)
+        if session is None:
+            return []
+
+        _, overflow_tokens = self.split_window(rows)
+        # A full page means older unsummarized messages exist beyond it
+        if overflow_tokens >= self.batch_tokens or len(rows) >= self.max_messages:
+            self.schedule_summary(session_id)
+
+        messages: List[BaseMessage] = []
+        if session.summary:
+            messages.append(SystemMessage(content=f"Summary of the earlier conversation:\n{session.summary}"))
+        # Messages before the window are dropped only once folded into the summary
+        messages.extend(to_message(role, content) for _, role, content in rows)
+        return messages
+
+    def schedule_summary(self, session_id: int):
+        if session_id in self._running:
+            return
+        self._running.add(session_id)
+        task = asyncio.get_running_loop().create_task(self._summarize_task(session_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _summarize_task(self, session_id: int):
+        try:
+            # A long unsummarized backlog (e.g. sessions older than summaries) takes several rounds
+            for _ in range(SUMMARY_MAX_ROUNDS):
+                if not await self.summarize(session_id):
+                    break
+        except Exception as e:
+            print(f"Chat History: summary of session {session_id} failed: {e}")
+        finally:
+            self._running.discard(session_id)
+
+    async def summarize(self, session_id: int) -> bool:
+        """
+        Fold the oldest unsummarized messages before the current window (up to
+        CHAT_HISTORY_MAX_MESSAGES) into the session summary. Returns True if it did.
+        """
+        from app.services.llm_service import llm_service
+
+        async with AsyncSessionLocal() as db:
+            session, recent = await self._unsummarized(db, session_id, self.max_messages)
+            if session is None or not recent:
+                return False
+            start, _ = self.split_window(recent)
+            result = await db.execute(
+                select(ChatMessage.id, ChatMessage.role, ChatMessage.content)
+                .where(
+                    ChatMessage.session_id == session_id,
+                    ChatMessage.id > (session.summary_through_id or 0),
+                    ChatMessage.id < recent[start][0]
+                )
+                .order_by(ChatMessage.id.asc())
+                .limit(self.max_messages)
+            )
+            folded = [tuple(r) for r in result.all()]
+        if not folded:
+            return False
+
+        transcript = "\n".join(f"{role}: {content[:SUMMARY_MESSAGE_CHARS]}" for _, role, content in folded)
+        summary = await llm_service.summarize_conversation(session.summary, transcript, max_words=settings.CHAT_SUMMARY_MAX_WORDS)
+        if not summary:
+            return False
+
+        async with AsyncSessionLocal() as db:
+            # Compare-and-set: another process may have folded these messages meanwhile
+            previous = session.summary_through_id
+            through = ChatSession.summary_through_id == previous if previous is not None else ChatSession.summary_through_id.is_(None)
+            result = await db.execute(
+                update(ChatSession)
+                .where(ChatSession.id == session_id, through)
+                # Keep updated_at: a background summary is not chat activity
+                .values(summary=summary, summary_through_id=folded[-1][0], updated_at=ChatSession.updated_at)
+            )
+            await db.commit()
+        return result.rowcount == 1
+
+chat_history_manager = ChatHistoryManager()
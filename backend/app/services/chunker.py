@@ -0,0 +1,171 @@
+"""
+Chunker: Token-budgeted chunking over precomputed sentence boundaries.
+- Sentences are split once and token-counted in one batch (services/token_counter.py),
+  keeping their character offsets: a chunk is a slice of the original text, so newlines,
+  lists and markdown structure survive
+- Chunks are assembled in a single pass with running token counts,
+  so chunking is linear in document length
+- A chunk never exceeds max_tokens (sentences longer than that are cut at whitespace first)
+- Optional breakpoints (e.g. semantic topic shifts) end a chunk early once it has min_tokens
+- Chunks cut by the budget carry overlap_tokens of trailing sentences into the next one;
+  chunks ended at a breakpoint do not (the topic changed)
+"""
+import re
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Set, Tuple
+
+from app.services.token_counter import token_counter
+
+# Sentence ends (. ? ! followed by whitespace) and paragraph breaks
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.?!])\s+|\n\s*\n")
+
+
+def _strip_span(text: str, start: int, end: int) -> Tuple[int, int]:
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def sentence_spans(text: str) -> List[Tuple[int, int]]:
+    """
+    (start, end) character offsets of each sentence, whitespace stripped.
+    """
+    spans = []
+    pos = 0
+    for match in SENTENCE_BOUNDARY.finditer(text or ""):
+        spans.append(_strip_span(text, pos, match.start()))
+        pos = match.end()
+    if text:
+        spans.append(_strip_span(text, pos, len(text)))
+    return [(a, b) for a, b in spans if b > a]
+
+
+def split_sentences(text: str) -> List[str]:
+    return [text[a:b] for a, b in sentence_spans(text)]
+
+
+@dataclass
+class Chunk:
+    text: str
+    tokens: int
+    start: int  # Index of the first sentence
+    end: int  # Index past the last sentence
+
+
+class TokenChunker:
+    def __init__(self, max_tokens: int, overlap_tokens: int = 0, min_tokens: int = 0):
+        if max_tokens <= 0:
+            raise ValueError("max_tokens must be positive")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = max(0, min(overlap_tokens, max_tokens // 2))
+        self.min_tokens = min_tokens
+
+    def prepare(self, text: str) -> tuple:
+        """
+        (sentences, token counts, spans) with every sentence within max_tokens; spans are the
+        sentences' character offsets in text. Callers that also need the sentences (e.g. to
+        embed them) reuse this for chunk_sentences().
+        """
+        spans = sentence_spans(text)
+        counts = token_counter.count_batch([text[a:b] for a, b in spans])
+        if any(c > self.max_tokens for c in counts):
+            fitted, fitted_counts = [], []
+            for (a, b), count in zip(spans, counts):
+                if count <= self.max_tokens:
+                    fitted.append((a, b))
+                    fitted_counts.append(count)
+                    continue
+                for piece_start, piece_end, piece_count in self._fit(text, a, b, count):
+                    fitted.append((piece_start, piece_end))
+                    fitted_counts.append(piece_count)
+            spans, counts = fitted, fitted_counts
+        return [text[a:b] for a, b in spans], counts, spans
+
+    def chunk(self, text: str) -> List[str]:
+        _, counts, spans = self.prepare(text)
+        return [c.text for c in self.chunk_sentences(text, spans, counts)]
+
+    def chunk_sentences(
+        self,
+        text: str,
+        spans: List[Tuple[int, int]],
+        counts: List[int],
+        breakpoints: Optional[Iterable[int]] = None
+    ) -> List[Chunk]:
+        """
+        Single pass over the sentences. breakpoints are sentence indices a new chunk may start at.
+        """
+        breaks: Set[int] = set(breakpoints or ())
+        # Tokens of the whitespace before each sentence (kept in the chunk text)
+        gaps = [0] + token_counter.count_batch([text[spans[i - 1][1]:spans[i][0]] for i in range(1, len(spans))])
+        chunks: List[Chunk] = []
+
+        start, tokens = 0, 0
+        for i, count in enumerate(counts):
+            cost = count + (gaps[i] if i > start else 0)
+            if i > start and (tokens + cost > self.max_tokens or (i in breaks and tokens >= self.min_tokens)):
+                chunks.append(self._emit(text, spans, start, i, tokens))
+                if i in breaks:
+                    start, tokens = i, 0
+                else:
+                    start, tokens = self._overlap_start(counts, gaps, start, i)
+                cost = count + (gaps[i] if i > start else 0)
+                if tokens + cost > self.max_tokens:
+                    # Overlap plus this sentence does not fit: drop the overlap
+                    start, tokens, cost = i, 0, count
+            tokens += cost
+
+        if start < len(spans):
+            chunks.append(self._emit(text, spans, start, len(spans), tokens))
+        return chunks
+
+    def _overlap_start(self, counts: List[int], gaps: List[int], start: int, end: int) -> tuple:
+        """
+        Walk back from end while the trailing sentences fit in overlap_tokens.
+        Returns (new chunk start, its running token count).
+        """
+        if not self.overlap_tokens:
+            return end, 0
+        new_start, tokens = end, 0
+        while new_start - 1 > start:
+            cost = counts[new_start - 1] + (gaps[new_start] if tokens else 0)
+            if tokens + cost > self.overlap_tokens:
+                break
+            tokens += cost
+            new_start -= 1
+        return new_start, tokens
+
+    def _emit(self, text: str, spans: List[Tuple[int, int]], start: int, end: int, tokens: int) -> Chunk:
+        return Chunk(text=text[spans[start][0]:spans[end - 1][1]], tokens=tokens, start=start, end=end)
+
+    def _fit(self, text: str, start: int, end: int, count: int) -> List[tuple]:
+        """
+        (start, end, tokens) pieces of the over-long sentence text[start:end], each within max_tokens.
+        """
+        pieces = self._cut(text, start, end, count)
+        fitted = []
+        for (a, b), piece_count in zip(pieces, token_counter.count_batch([text[a:b] for a, b in pieces])):
+            if piece_count > self.max_tokens and b - a < end - start:
+                fitted.extend(self._fit(text, a, b, piece_count))
+            else:
+                fitted.append((a, b, piece_count))
+        return fitted
+
+    def _cut(self, text: str, start: int, end: int, count: int) -> List[Tuple[int, int]]:
+        """
+        Split an over-long sentence at whitespace into pieces of about max_tokens.
+        """
+        chars_per_piece = max(1, int((end - start) * self.max_tokens / count * 0.9))
+        pieces = []
+        pos = start
+        while end - pos > chars_per_piece:
+            cut = text.rfind(" ", pos, pos + chars_per_piece)
+            if cut <= pos:
+                cut = pos + chars_per_piece
+            pieces.append(_strip_span(text, pos, cut))
+            pos = _strip_span(text, cut, end)[0]
+        if pos < end:
+            pieces.append((pos, end))
+        return [(a, b) for a, b in pieces if b > a]
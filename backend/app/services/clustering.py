@@ -0,0 +1,315 @@
+"""
+Clustering Service: Near-duplicate grouping of a user's memories into MemoryClusters
+- Full pass: blockwise mutual kNN over all of the user's vectors (first run, large change sets)
+- Incremental pass: index ANN neighbours of the memories changed since the last run only
+"""
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Any
+import numpy as np
+from sqlalchemy import or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.models.memory import Memory
+from app.models.cluster import MemoryCluster
+from app.services.vector_store import vector_store
+from app.core.config import settings
+
+# Rows of the similarity matrix computed at once (memory bound: BLOCK x N floats)
+BLOCK_SIZE = 512
+
+
+def cluster_memory_ids(cluster: MemoryCluster) -> List[int]:
+    """
+    MemoryCluster.memory_ids is a JSON list; older rows stored a json.dumps() string.
+    """
+    ids = cluster.memory_ids
+    if isinstance(ids, str):
+        try:
+            ids = json.loads(ids)
+        except ValueError:
+            return []
+    return [int(i) for i in ids or []]
+
+
+class UnionFind:
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]  # Path halving
+            i = self.parent[i]
+        return i
+
+    def union(self, i: int, j: int):
+        ri, rj = self.find(i), self.find(j)
+        if ri != rj:
+            self.parent[max(ri, rj)] = min(ri, rj)
+
+
+def neighbour_components(
+    vectors: np.ndarray,
+    threshold: float,
+    k: int = 10,
+    block_size: int = BLOCK_SIZE
+) -> List[List[int]]:
+    """
+    Connected components (size >= 2) of the mutual kNN graph, keeping edges with cosine >= threshold.
+    Similarities are computed block by block, so memory stays O(block_size * N).
+    """
+    n = len(vectors)
+    if n < 2:
+        return []
+
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    unit = (vectors / (norms + 1e-10)).astype(np.float32)
+    k = min(k, n - 1)
+
+    neighbours: List[set] = []
+    for start in range(0, n, block_size):
+        sims = unit[start:start + block_size] @ unit.T
+        rows = np.arange(sims.shape[0])
+        sims[rows, rows + start] = -1.0  # Ignore self
+
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        for r in rows:
+            neighbours.append({int(j) for j in top[r] if sims[r, j] >= threshold})
+
+    uf = UnionFind(n)
+    for i, near in enumerate(neighbours):
+        for j in near:
+            if i in neighbours[j]:  # Mutual: avoids chaining through hub memories
+                uf.union(i, j)
+
+    groups: Dict[int, List[int]] = {}
+    for i in range(n):
+        groups.setdefault(uf.find(i), []).append(i)
+    return [g for g in groups.values() if len(g) > 1]
+
+
+def _describe(members: List[int], vectors: Dict[int, np.ndarray], titles: Dict[int, str]):
+    """
+    Average pairwise cosine and medoid title of one cluster.
+    """
+    ids = [m for m in members if m in vectors]
+    if len(ids) < 2:
+        return 0.0, titles.get(members[0], "")
+    sub = np.array([vectors[m] for m in ids], dtype=np.float32)
+    sub = sub / (np.linalg.norm(sub, axis=1, keepdims=True) + 1e-10)
+    sims = sub @ sub.T
+    m = len(ids)
+    avg_similarity = float((sims.sum() - np.trace(sims)) / (m * (m - 1)))
+    return avg_similarity, titles[ids[int(np.argmax(sims.sum(axis=1)))]]
+
+
+class ClusteringService:
+    def _active_memories(self, user_id: int):
+        return select(Memory.id, Memory.title, Memory.embedding_id).where(
+            Memory.user_id == user_id,
+            Memory.embedding_id != None,
+            Memory.status.notin_(["discarded", "merged"])
+        )
+
+    async def _load_vectors(self, user_id: int, db: AsyncSession):
+        rows = (await db.execute(self._active_memories(user_id).order_by(Memory.id))).all()
+        if len(rows) < 2:
+            return [], None
+
+        stored = await vector_store.fetch([r.embedding_id for r in rows])
+        kept = [r for r in rows if stored.get(r.embedding_id, {}).get("values")]
+        if len(kept) < 2:
+            return [], None
+        return kept, np.array([stored[r.embedding_id]["values"] for r in kept], dtype=np.float32)
+
+    async def _member_vectors(self, user_id: int, db: AsyncSession, memory_ids: set):
+        rows = (await db.execute(self._active_memories(user_id).where(Memory.id.in_(list(memory_ids))))).all()
+        stored = await vector_store.fetch([r.embedding_id for r in rows])
+        vectors = {r.id: np.array(stored[r.embedding_id]["values"], dtype=np.float32)
+                   for r in rows if stored.get(r.embedding_id, {}).get("values")}
+        return vectors, {r.id: r.title for r in rows}
+
+    async def _changed_components(self, user_id: int, db: AsyncSession, changed: List[Any], pending: List[set]) -> List[set]:
+        """
+        Incremental pass: mutual top-k neighbours (index ANN query) of the changed memories only,
+        unioned into the stored pending clusters (changed memories leave their old cluster first).
+        """
+        where = {"user_id": {"$in": [user_id, str(user_id)]}}
+        k = settings.CLUSTER_NEIGHBOURS
+        threshold = settings.CLUSTER_SIMILARITY_THRESHOLD
+        changed_ids = {r.id for r in changed}
+        neighbours: Dict[str, List[Any]] = {}
+
+        async def _near(vector_id: str) -> set:
+            if vector_id not in neighbours:
+                neighbours[vector_id] = await vector_store.query_by_id(vector_id, n_results=k, where=where)
+            return {vid for vid, score in neighbours[vector_id] if score >= threshold}
+
+        edges = []
+        for row in changed:
+            near = await _near(row.embedding_id)
+            if not near:
+                continue
+            # Neighbours are chunk vectors; a memory is represented by its embedding_id (first chunk)
+            owners = (await db.execute(self._active_memories(user_id).where(Memory.embedding_id.in_(list(near))))).all()
+            for owner in owners:
+                if owner.id != row.id and row.embedding_id in await _near(owner.embedding_id):
+                    edges.append((row.id, owner.id))
+
+        groups = [members - changed_ids for members in pending] + [{i, j} for i, j in edges]
+        ids = sorted(set().union(*groups)) if groups else []
+        position = {memory_id: n for n, memory_id in enumerate(ids)}
+        uf = UnionFind(len(ids))
+        for members in groups:
+            members = sorted(members)
+            for other in members[1:]:
+                uf.union(position[members[0]], position[other])
+
+        components: Dict[int, set] = {}
+        for memory_id in ids:
+            components.setdefault(uf.find(position[memory_id]), set()).add(memory_id)
+        return [c for c in components.values() if len(c) > 1]
+
+    async def cluster_user(self, user_id: int, db: AsyncSession, since: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Re-cluster one user's memories and reconcile with existing clusters.
+        1. Components:
+           - full pass (first run, or more than CLUSTER_INCREMENTAL_MAX changes): fetch every memory's
+             vector and build mutual-kNN components above the threshold (O(N^2), blockwise)
+           - otherwise: ANN neighbours of the memories changed `since`, unioned into the stored clusters
+             (an edit can add or move a memory; members linked only through it stay together until
+             the next full pass)
+        2. Match components to existing pending clusters by member overlap (keeps ids stable)
+        3. Create new clusters, update changed ones, drop pending clusters that dissolved
+        Dismissed/merged clusters are never re-proposed for the same members.
+        """
+        stats = {"created": 0, "updated": 0, "removed": 0}
+
+        existing = (await db.execute(
+            select(MemoryCluster).where(MemoryCluster.user_id == user_id)
+        )).scalars().all()
+        pending = {c.id: c for c in existing if c.status == "pending"}
+        closed = [set(cluster_memory_ids(c)) for c in existing if c.status != "pending"]
+        pending_members = {cid: set(cluster_memory_ids(c)) for cid, c in pending.items()}
+
+        changed = None
+        if since:
+            changed = (await db.execute(self._active_memories(user_id).where(
+                or_(Memory.created_at >= since, Memory.updated_at >= since)
+            ).limit(settings.CLUSTER_INCREMENTAL_MAX + 1))).all()
+            if len(changed) > settings.CLUSTER_INCREMENTAL_MAX:
+                changed = None
+
+        if changed is None:
+            rows, vectors = await self._load_vectors(user_id, db)
+            components, touched = [], None
+            if rows:
+                components = [
+                    {rows[i].id for i in component}
+                    for component in neighbour_components(
+                        vectors,
+                        threshold=settings.CLUSTER_SIMILARITY_THRESHOLD,
+                        k=settings.CLUSTER_NEIGHBOURS
+                    )
+                ]
+            loaded = ({r.id: vectors[i] for i, r in enumerate(rows)}, {r.id: r.title for r in rows})
+        else:
+            components = await self._changed_components(user_id, db, changed, list(pending_members.values()))
+            touched = {r.id for r in changed}
+            loaded = None
+
+        # Stable ids: reuse the pending cluster sharing the most members
+        plan = []
+        for members in components:
+            if any(members <= done for done in closed):
+                continue
+            best_id, best_overlap = None, 0
+            for cid, old_members in pending_members.items():
+                overlap = len(members & old_members)
+                if overlap > best_overlap:
+                    best_id, best_overlap = cid, overlap
+            if best_id is not None:
+                old_members = pending_members.pop(best_id)
+                refresh = old_members != members or touched is None or bool(members & touched)
+            else:
+                refresh = True
+            plan.append((members, best_id, refresh))
+
+        # Similarity / medoid only for clusters that are new or changed
+        if loaded is None:
+            refreshed = set().union(*(members for members, _, refresh in plan if refresh)) if plan else set()
+            loaded = await self._member_vectors(user_id, db, refreshed) if refreshed else ({}, {})
+
+        new_clusters = []
+        for members, best_id, refresh in plan:
+            member_list = sorted(members)
+            if best_id is not None:
+                cluster = pending.pop(best_id)
+                if set(cluster_memory_ids(cluster)) != members or isinstance(cluster.memory_ids, str):
+                    cluster.memory_ids = member_list
+                    stats["updated"] += 1
+                if refresh:
+                    avg_similarity, medoid_title = _describe(member_list, *loaded)
+                    cluster.avg_similarity = round(avg_similarity, 4)
+                    cluster.representative_text = f"Cluster centered on: {medoid_title}"
+            else:
+                avg_similarity, medoid_title = _describe(member_list, *loaded)
+                cluster = MemoryCluster(
+                    user_id=user_id,
+                    memory_ids=member_list,
+                    representative_text=f"Cluster centered on: {medoid_title}",
+                    avg_similarity=round(avg_similarity, 4),
+                    status="pending"
+                )
+                db.add(cluster)
+                new_clusters.append(cluster)
+                stats["created"] += 1
+
+        # Pending clusters with no surviving component
+        for cluster in pending.values():
+            await db.delete(cluster)
+            stats["removed"] += 1
+
+        await db.commit()
+
+        if new_clusters:
+            from app.services.dedupe_job import dedupe_service
+            for cluster in new_clusters:
+                await dedupe_service._publish_update({
+                    "type": "new_cluster",
+                    "cluster_id": cluster.id,
+                    "count": len(cluster.memory_ids)
+                }, user_id=str(user_id))
+
+        return stats
+
+    async def users_to_cluster(self, db: AsyncSession, since: Optional[datetime] = None) -> List[int]:
+        """
+        Users with memories added or edited since the last pass (all users on the first pass).
+        """
+        stmt = select(Memory.user_id).distinct()
+        if since:
+            stmt = stmt.where(or_(Memory.created_at >= since, Memory.updated_at >= since))
+        return list((await db.execute(stmt)).scalars().all())
+
+    async def cluster_all(self, db_session_factory, since: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        One clustering pass over every user with changes. Each user gets its own session,
+        so one failing vault doesn't abort the pass.
+        """
+        async with db_session_factory() as db:
+            user_ids = await self.users_to_cluster(db, since)
+
+        totals = {"users": 0, "created": 0, "updated": 0, "removed": 0}
+        for user_id in user_ids:
+            try:
+                async with db_session_factory() as db:
+                    stats = await self.cluster_user(user_id, db, since=since)
+                totals["users"] += 1
+                for key, value in stats.items():
+                    totals[key] += value
+            except Exception as e:
+                print(f"Clustering failed for user {user_id}: {e}")
+        return totals
+
+clustering_service = ClusteringService()
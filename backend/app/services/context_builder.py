@@ -1,47 +1,170 @@
-from typing import List, Dict, Any
-from app.services.vector_store import vector_store
+"""
+Context API: the one retrieval path behind /llm/retrieve_context, /prompts/generate,
+the MCP tools and the agent pre-fetch.
+- Candidates come from RetrievalService (facts, graph hops, MMR + reranked chunks)
+- They are deduplicated and packed into the token budget (ContextPacker)
+- Packed results are cached per process for CONTEXT_CACHE_TTL_SECONDS, so a client
+  repeating a query (agent turns, MCP retries) does not pay for retrieval twice
+- Writes to a user's memories, documents or facts call publish_invalidation(), which drops
+  the user's entries here and, over CONTEXT_INVALIDATION_CHANNEL, in the other API / MCP
+  processes. The TTL bounds staleness if a message is lost.
+"""
+import asyncio
+import copy
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services.context_packer import context_packer
 from app.core.config import settings
 
+# Client purpose / task type -> RetrievalService view
+PURPOSE_VIEWS = {
+    "general": "auto",
+    "code": "semantic",
+    "summary": "semantic",
+    "creative": "semantic",
+    "fact-check": "state",
+    "facts": "state",
+    "timeline": "episodic",
+}
+RETRIEVAL_VIEWS = {"auto", "semantic", "state", "episodic", "graph"}
+
+CONTEXT_INVALIDATION_CHANNEL = "brain_vault_context"
+
+
+def resolve_view(purpose: Optional[str]) -> str:
+    """
+    Map a client hint ("code", "fact-check", ...) or a retrieval view name to a view.
+    Unknown hints fall back to "auto".
+    """
+    purpose = (purpose or "general").strip().lower()
+    if purpose in RETRIEVAL_VIEWS:
+        return purpose
+    return PURPOSE_VIEWS.get(purpose, "auto")
+
+
 class ContextBuilder:
     def __init__(self):
-        pass
-
-    async def build_context(self, query: str, user_id: int, limit_tokens: int = 2000) -> Dict[str, Any]:
-        """
-        Retrieve and format context. 
-        TODO: Implement advanced compression/deduplication.
-        """
-        # 1. Retrieve
-        results = await vector_store.query(
-            query, 
-            n_results=5, 
-            where={"user_id": user_id}
-        )
-        
-        snippets = []
-        if results["documents"]:
-            snippets = results["documents"][0]
-            
-        # 2. Simple Format (Deduping can happen here if we had semantic checks)
-        # For now, just join
-        
-        # 3. Truncate to limit (Approx chars)
-        limit_chars = limit_tokens * 4
-        current_chars = 0
-        final_snippets = []
-        context_text = ""
-        
-        for snippet in snippets:
-            if current_chars + len(snippet) > limit_chars:
-                break
-            final_snippets.append(snippet)
-            context_text += snippet + "\n\n---\n\n"
-            current_chars += len(snippet)
-            
-        return {
-            "text": context_text,
-            "snippets": final_snippets,
-            "token_count": int(current_chars / 4)
+        # (user_id, query, view, limit_tokens, top_k) -> (expires_at, context)
+        self._cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+    async def build_context(
+        self,
+        query: str,
+        user_id: int,
+        limit_tokens: int = 2000,
+        view: Optional[str] = None,
+        db: Optional[AsyncSession] = None,
+        top_k: Optional[int] = None,
+        use_cache: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Retrieve and format context.
+        1. Cache lookup
+        2. RetrievalService.search_memories() in the resolved view (own session unless db is given)
+        3. Dedupe + pack into limit_tokens by relevance per token
+           (summaries stand in for chunks that do not fit, see ContextPacker)
+        Returns {"text", "snippets", "token_count", "items", "view"}.
+        """
+        view = resolve_view(view)
+        top_k = top_k or settings.CONTEXT_CANDIDATES
+        key = (user_id, query.strip(), view, limit_tokens, top_k)
+
+        # 1. Cache
+        if use_cache:
+            cached = self._cache_get(key)
+            if cached is not None:
+                return cached
+
+        # 2. Retrieve
+        from app.services.retrieval_service import retrieval_service
+        if db is None:
+            from app.db.session import AsyncSessionLocal
+            async with AsyncSessionLocal() as session:
+                results = await retrieval_service.search_memories(query, user_id, session, top_k=top_k, view=view)
+        else:
+            results = await retrieval_service.search_memories(query, user_id, db, top_k=top_k, view=view)
+
+        # 3. Dedupe + pack into the budget
+        packed = context_packer.pack(context_packer.candidates_from_results(results), limit_tokens)
+
+        context = {
+            "text": packed.text,
+            "snippets": packed.snippets,
+            "token_count": packed.token_count,
+            "items": packed.items,
+            "view": view
         }
+        if use_cache:
+            self._cache_put(key, context)
+        return context
+
+    def invalidate(self, user_id: int):
+        """
+        Drop a user's cached contexts in this process.
+        """
+        for key in [k for k in self._cache if k[0] == user_id]:
+            del self._cache[key]
+
+    async def publish_invalidation(self, user_id: int):
+        """
+        Invalidate here and in every other process listening on CONTEXT_INVALIDATION_CHANNEL.
+        """
+        self.invalidate(user_id)
+        try:
+            from redis import asyncio as aioredis
+            # Short-lived client: callers include Celery tasks, each on its own event loop
+            redis = aioredis.from_url(settings.REDIS_URL)
+            try:
+                await redis.publish(CONTEXT_INVALIDATION_CHANNEL, json.dumps({"user_id": int(user_id)}))
+            finally:
+                await redis.aclose()
+        except Exception as e:
+            print(f"Context Builder: invalidation publish failed: {e}")
+
+    async def listen(self):
+        """
+        Apply invalidations published by other processes (runs for the process lifetime).
+        """
+        from redis import asyncio as aioredis
+        while True:
+            try:
+                redis = aioredis.from_url(settings.REDIS_URL)
+                pubsub = redis.pubsub()
+                await pubsub.subscribe(CONTEXT_INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    self.invalidate(json.loads(message["data"])["user_id"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Entries may be stale until the TTL runs out; drop everything and reconnect
+                print(f"Context Builder: invalidation listener error: {e}")
+                self._cache.clear()
+                await asyncio.sleep(5)
+
+    def _cache_get(self, key: tuple) -> Optional[Dict[str, Any]]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires_at, context = entry
+        if expires_at < time.monotonic():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        # Callers may modify what they get back
+        return copy.deepcopy(context)
+
+    def _cache_put(self, key: tuple, context: Dict[str, Any]):
+        if settings.CONTEXT_CACHE_TTL_SECONDS <= 0:
+            return
+        self._cache[key] = (time.monotonic() + settings.CONTEXT_CACHE_TTL_SECONDS, copy.deepcopy(context))
+        self._cache.move_to_end(key)
+        while len(self._cache) > settings.CONTEXT_CACHE_SIZE:
+            self._cache.popitem(last=False)
 
 context_builder = ContextBuilder()
@@ -0,0 +1,172 @@
+"""
+Context Packer: Fit retrieved chunks, summaries and facts into a token budget.
+- Real token counts (shared token counter, see services/token_counter.py)
+- Near-duplicate and overlapping snippets are dropped before packing
+- Selection is a knapsack by relevance per token: each source offers its full text and,
+  when it has one, its summary as a cheaper alternative; at most one of them is taken
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from app.services.token_counter import token_counter
+
+# Separator placed between packed snippets
+SNIPPET_SEPARATOR = "\n\n---\n\n"
+
+# Relevance kept by a summary relative to the full chunk
+SUMMARY_VALUE = 0.6
+# Overlap coefficient of word trigrams above which a lower-ranked snippet is a duplicate
+DUPLICATE_OVERLAP = 0.8
+
+# Marker build_enriched_text() puts between chunk text and its summary / Q&A
+ENRICHMENT_MARKER = "\n\n-- Context --\n"
+
+
+def count_tokens(text: str) -> int:
+    return token_counter.count(text)
+
+
+@dataclass
+class ContextCandidate:
+    text: str
+    score: float
+    kind: str = "chunk"  # "chunk" | "fact" | "summary"
+    key: Optional[str] = None  # Source id (chunk / fact / vector id)
+    summary: Optional[str] = None
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class PackedContext:
+    items: List[Dict[str, Any]]
+    token_count: int
+    dropped_duplicates: int = 0
+    dropped_budget: int = 0
+
+    @property
+    def snippets(self) -> List[str]:
+        return [item["text"] for item in self.items]
+
+    @property
+    def text(self) -> str:
+        return "".join(item["text"] + SNIPPET_SEPARATOR for item in self.items)
+
+
+def _shingles(text: str) -> set:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < 3:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + 3]) for i in range(len(words) - 2)}
+
+
+class ContextPacker:
+    def candidates_from_results(self, results: List[Dict[str, Any]]) -> List[ContextCandidate]:
+        """
+        RetrievalService.search_memories() results -> candidates (facts, graph hops, reranked chunks).
+        """
+        candidates = []
+        for res in results or []:
+            meta = res.get("metadata") or {}
+            if meta.get("fact_id") is not None:
+                kind, key = "fact", f"fact_{meta['fact_id']}"
+            else:
+                kind = "chunk"
+                key = meta.get("memory_id") or meta.get("document_id")
+                key = str(key) if key is not None else None
+            candidates.append(ContextCandidate(
+                text=(res.get("text") or "").split(ENRICHMENT_MARKER, 1)[0],
+                score=float(res.get("score") or 0.0),
+                kind=kind,
+                key=key,
+                summary=meta.get("summary") or None,
+                metadata=meta
+            ))
+        return candidates
+
+    def dedupe(self, candidates: List[ContextCandidate]) -> List[ContextCandidate]:
+        """
+        Keep the best-scored of near-duplicate / overlapping snippets.
+        """
+        kept, kept_shingles = [], []
+        for cand in sorted(candidates, key=lambda c: c.score, reverse=True):
+            if not cand.text.strip():
+                continue
+            shingles = _shingles(cand.text)
+            duplicate = False
+            for other in kept_shingles:
+                smaller = min(len(shingles), len(other))
+                if smaller and len(shingles & other) / smaller >= DUPLICATE_OVERLAP:
+                    duplicate = True
+                    break
+            if not duplicate:
+                kept.append(cand)
+                kept_shingles.append(shingles)
+        return kept
+
+    def pack(self, candidates: List[ContextCandidate], budget_tokens: int) -> PackedContext:
+        """
+        1. Dedupe
+        2. Options per source: full text (value = score) and summary (value = score * SUMMARY_VALUE)
+        3. Greedy by value per token, one option per source, within budget
+        4. Upgrade summaries to full text where the leftover budget allows
+        5. Keep the better of that and the single most valuable option that fits (knapsack bound)
+        Items come back in relevance order, which is how they are presented to the model.
+        """
+        unique = self.dedupe(candidates)
+        separator_tokens = count_tokens(SNIPPET_SEPARATOR)
+
+        options = []  # (value, cost, source index, kind, text)
+        for i, cand in enumerate(unique):
+            value = max(cand.score, 1e-6)
+            cost = count_tokens(cand.text) + separator_tokens
+            options.append((value, cost, i, cand.kind, cand.text))
+            if cand.summary and cand.kind == "chunk":
+                summary_cost = count_tokens(cand.summary) + separator_tokens
+                if summary_cost < cost:
+                    options.append((value * SUMMARY_VALUE, summary_cost, i, "summary", cand.summary))
+
+        chosen: Dict[int, tuple] = {}
+        used = 0
+        for option in sorted(options, key=lambda o: o[0] / max(o[1], 1), reverse=True):
+            value, cost, i = option[0], option[1], option[2]
+            if i in chosen or used + cost > budget_tokens:
+                continue
+            chosen[i] = option
+            used += cost
+
+        for i, option in list(chosen.items()):
+            if option[3] != "summary":
+                continue
+            full = next(o for o in options if o[2] == i and o[3] != "summary")
+            if used - option[1] + full[1] <= budget_tokens:
+                chosen[i] = full
+                used += full[1] - option[1]
+
+        fitting = [o for o in options if o[1] <= budget_tokens]
+        if fitting:
+            best_single = max(fitting, key=lambda o: o[0])
+            if best_single[0] > sum(o[0] for o in chosen.values()):
+                chosen = {best_single[2]: best_single}
+                used = best_single[1]
+
+        items = []
+        for i in sorted(chosen):
+            value, cost, _, kind, text = chosen[i]
+            cand = unique[i]
+            items.append({
+                "text": text,
+                "kind": kind,
+                "key": cand.key,
+                "score": cand.score,
+                "tokens": cost - separator_tokens,
+                "metadata": cand.metadata
+            })
+
+        return PackedContext(
+            items=items,
+            token_count=used,
+            dropped_duplicates=len(candidates) - len(unique),
+            dropped_budget=len(unique) - len(items)
+        )
+
+context_packer = ContextPacker()
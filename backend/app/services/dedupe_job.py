@@ -1,7 +1,6 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.models.memory import Memory
-from app.models.cluster import MemoryCluster
 from app.services.vector_store import vector_store
 from app.services.websocket import manager
 from app.db.session import AsyncSessionLocal
@@ -79,7 +78,7 @@ class DedupeService:
                     # Pinecone returns similarity score (0-1), not distance.
                     similarity = dist * 100
                     
-                    if similarity > 40: 
+                    if similarity > settings.DEDUPE_MIN_SIMILARITY: 
                         try:
                             sid = int(match_id_val)
                             similar_ids.append(sid)
@@ -149,37 +148,17 @@ class DedupeService:
                         "action": "analyzed"
                     })
 
-                # Create Cluster
-                if similar_ids:
-                    cluster = MemoryCluster(
-                        user_id=memory.user_id,
-                        memory_ids=json.dumps(similar_ids + [memory.id]),
-                        representative_text=f"Cluster centered on: {memory.title}",
-                        status="pending"
-                    )
-                    db.add(cluster)
-                    await db.commit()
-                    print("Dedupe: Committed cluster")
-                    
-                    if memory.user_id:
-                        await self._publish_update({
-                            "type": "new_cluster", 
-                            "cluster_id": cluster.id,
-                            "count": len(similar_ids) + 1
-                        }, user_id=str(memory.user_id))
-                    
+                # Clusters are built in batch by clustering_service (see run_periodic_check)
+
         except Exception as e:
             print(f"Dedupe job failed: {e}")
 
-    async def run_periodic_check(self, db_session_factory):
+    async def run_periodic_check(self, db_session_factory, since=None):
         """
-        Periodically run dedupe checks or other background maintenance.
+        One maintenance pass: re-cluster memories of users with memories added/edited since `since`.
+        Scheduled by Celery beat (app.maintenance.recluster_memories_task), not from the API process.
         """
-        while True:
-            try:
-                await asyncio.sleep(60) 
-            except Exception as e:
-                print(f"Background job error: {e}")
-                await asyncio.sleep(60)
+        from app.services.clustering import clustering_service
+        return await clustering_service.cluster_all(db_session_factory, since=since)
 
 dedupe_service = DedupeService()
@@ -0,0 +1,320 @@
+"""
+Deletion Service: Cascading delete of a memory, document or user across SQL, vectors and facts
+"""
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Optional
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from redis import asyncio as aioredis
+from app.models.memory import Memory
+from app.models.document import Document, Chunk
+from app.models.fact import Fact
+from app.models.feedback import FeedbackEvent
+from app.models.history import MemoryHistory
+from app.models.cluster import MemoryCluster
+from app.models.entity import Entity, EntityAlias, EntityPosting
+from app.services.tag_index import tag_index
+from app.services.context_builder import context_builder
+from app.services.vector_store import vector_store
+from app.core.config import settings
+
+JOB_KEY = "deletion_job:{job_id}"
+JOB_TTL_SECONDS = 7 * 86400
+
+# Max ids per IN() clause / per SQL statement
+SQL_BATCH = 1000
+
+SCOPES = ("memory", "document", "user")
+
+
+def _batches(ids: List[Any], size: int):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+class DeletionService:
+    async def compute_closure(self, db: AsyncSession, scope: str, target_id: int, user_id: int) -> Dict[str, List[Any]]:
+        """
+        Everything that has to go with the target:
+        memories/documents -> chunks -> facts (by source chunk or memory) -> vector ids.
+        Feedback, history, entity postings and clusters are resolved from these ids at delete time.
+        """
+        memory_ids: List[int] = []
+        document_ids: List[int] = []
+
+        if scope == "memory":
+            memory_ids = [target_id]
+        elif scope == "document":
+            document_ids = [target_id]
+        elif scope == "user":
+            memory_ids = list((await db.execute(select(Memory.id).where(Memory.user_id == user_id))).scalars().all())
+            document_ids = list((await db.execute(select(Document.id).where(Document.user_id == user_id))).scalars().all())
+        else:
+            raise ValueError(f"Unknown deletion scope: {scope}")
+
+        chunk_rows = []
+        for batch in _batches(memory_ids, SQL_BATCH):
+            chunk_rows += (await db.execute(select(Chunk.id, Chunk.embedding_id).where(Chunk.memory_id.in_(batch)))).all()
+        for batch in _batches(document_ids, SQL_BATCH):
+            chunk_rows += (await db.execute(select(Chunk.id, Chunk.embedding_id).where(Chunk.document_id.in_(batch)))).all()
+        chunk_ids = [r.id for r in chunk_rows]
+
+        if scope == "user":
+            fact_ids = list((await db.execute(select(Fact.id).where(Fact.user_id == user_id))).scalars().all())
+        else:
+            found = set()
+            for batch in _batches(chunk_ids, SQL_BATCH):
+                found.update((await db.execute(select(Fact.id).where(Fact.source_chunk_id.in_(batch)))).scalars().all())
+            for batch in _batches(memory_ids, SQL_BATCH):
+                found.update((await db.execute(select(Fact.id).where(Fact.source_memory_id.in_(batch)))).scalars().all())
+            fact_ids = sorted(found)
+
+        # Memory.embedding_id is normally its first chunk's id, but include it for legacy rows
+        vector_ids = {r.embedding_id for r in chunk_rows if r.embedding_id}
+        for batch in _batches(memory_ids, SQL_BATCH):
+            vector_ids.update(
+                (await db.execute(select(Memory.embedding_id).where(Memory.id.in_(batch), Memory.embedding_id != None))).scalars().all()
+            )
+        vector_ids.update(f"fact_{fid}" for fid in fact_ids)
+
+        return {
+            "memory_ids": memory_ids,
+            "document_ids": document_ids,
+            "chunk_ids": chunk_ids,
+            "fact_ids": fact_ids,
+            "vector_ids": sorted(vector_ids)
+        }
+
+    # --- Job handle (Redis hash) ---
+
+    def _redis(self):
+        return aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+
+    async def create_job(self, scope: str, target_id: int, user_id: int, delete_account: bool = False) -> str:
+        job_id = uuid.uuid4().hex
+        redis = self._redis()
+        try:
+            key = JOB_KEY.format(job_id=job_id)
+            await redis.hset(key, mapping={
+                "job_id": job_id,
+                "scope": scope,
+                "target_id": target_id,
+                "user_id": user_id,
+                "delete_account": int(delete_account),
+                "status": "queued",
+                "phase": "queued",
+                "created_at": datetime.now(timezone.utc).isoformat()
+            })
+            await redis.expire(key, JOB_TTL_SECONDS)
+        finally:
+            await redis.close()
+        return job_id
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        redis = self._redis()
+        try:
+            job = await redis.hgetall(JOB_KEY.format(job_id=job_id))
+        finally:
+            await redis.close()
+        if not job:
+            return None
+
+        for field in ("target_id", "user_id", "total_vectors", "deleted_vectors", "total_rows", "deleted_rows"):
+            if field in job:
+                job[field] = int(job[field])
+        job["delete_account"] = job.get("delete_account") == "1"
+        total = job.get("total_vectors", 0) + job.get("total_rows", 0)
+        done = job.get("deleted_vectors", 0) + job.get("deleted_rows", 0)
+        job["progress"] = round(done / total, 3) if total else (1.0 if job["status"] == "done" else 0.0)
+        return job
+
+    async def _update_job(self, redis, job_id: Optional[str], **fields):
+        if not job_id or redis is None:
+            return
+        await redis.hset(JOB_KEY.format(job_id=job_id), mapping={k: v for k, v in fields.items() if v is not None})
+
+    # --- Execution ---
+
+    async def _delete_rows(self, db: AsyncSession, column, ids: List[Any], progress) -> int:
+        deleted = 0
+        for batch in _batches(ids, SQL_BATCH):
+            result = await db.execute(delete(column.class_).where(column.in_(batch)))
+            await db.commit()
+            deleted += result.rowcount or 0
+            await progress(len(batch))
+        return deleted
+
+    async def _prune_clusters(self, db: AsyncSession, user_id: int, memory_ids: List[int], whole_user: bool):
+        from app.services.clustering import cluster_memory_ids
+
+        if whole_user:
+            await db.execute(delete(MemoryCluster).where(MemoryCluster.user_id == user_id))
+            await db.commit()
+            return
+
+        gone = set(memory_ids)
+        clusters = (await db.execute(select(MemoryCluster).where(MemoryCluster.user_id == user_id))).scalars().all()
+        for cluster in clusters:
+            members = cluster_memory_ids(cluster)
+            if not gone.intersection(members):
+                continue
+            remaining = [m for m in members if m not in gone]
+            if len(remaining) < 2:
+                await db.delete(cluster)
+            else:
+                cluster.memory_ids = remaining
+        await db.commit()
+
+    async def execute(
+        self,
+        db: AsyncSession,
+        scope: str,
+        target_id: int,
+        user_id: int,
+        job_id: Optional[str] = None,
+        delete_account: bool = False,
+        closure: Optional[Dict[str, List[Any]]] = None
+    ) -> Dict[str, int]:
+        """
+        Delete the closure of a memory / document / user (computed here unless the caller already has it).
+        1. Vectors first, in batches (a failure here leaves SQL intact, so the job can be retried)
+        2. SQL bottom-up in id batches: postings, feedback, facts, chunks, history, clusters, tags, memories, documents
+        3. scope == "user" with delete_account: account rows and the user itself
+        Progress is written to the job hash after every batch.
+        """
+        from app.services.graph_service import graph_service
+
+        redis = self._redis() if job_id else None
+        counters = {"deleted_vectors": 0, "deleted_rows": 0}
+
+        async def _progress_rows(n):
+            counters["deleted_rows"] += n
+            await self._update_job(redis, job_id, deleted_rows=counters["deleted_rows"])
+
+        try:
+            await self._update_job(redis, job_id, status="running", phase="closure", started_at=datetime.now(timezone.utc).isoformat())
+            if closure is None:
+                closure = await self.compute_closure(db, scope, target_id, user_id)
+            total_rows = sum(len(closure[k]) for k in ("memory_ids", "document_ids", "chunk_ids", "fact_ids"))
+            await self._update_job(
+                redis, job_id,
+                phase="vectors",
+                total_vectors=len(closure["vector_ids"]),
+                total_rows=total_rows,
+                deleted_vectors=0,
+                deleted_rows=0
+            )
+
+            # 1. Vectors
+            for batch in _batches(closure["vector_ids"], settings.DELETE_VECTOR_BATCH):
+                await vector_store.delete(batch)
+                counters["deleted_vectors"] += len(batch)
+                await self._update_job(redis, job_id, deleted_vectors=counters["deleted_vectors"])
+
+            # 2. SQL (children before parents)
+            await self._update_job(redis, job_id, phase="sql")
+            chunk_ids, fact_ids = closure["chunk_ids"], closure["fact_ids"]
+            memory_ids, document_ids = closure["memory_ids"], closure["document_ids"]
+
+            if scope == "user":
+                await db.execute(delete(EntityPosting).where(EntityPosting.user_id == user_id))
+                await db.execute(delete(FeedbackEvent).where(FeedbackEvent.user_id == user_id))
+                await db.commit()
+            else:
+                for batch in _batches(chunk_ids, SQL_BATCH):
+                    await db.execute(delete(EntityPosting).where(EntityPosting.chunk_id.in_(batch)))
+                    await db.execute(delete(FeedbackEvent).where(FeedbackEvent.chunk_id.in_(batch)))
+                for batch in _batches(fact_ids, SQL_BATCH):
+                    await db.execute(delete(EntityPosting).where(EntityPosting.fact_id.in_(batch)))
+                for batch in _batches(document_ids, SQL_BATCH):
+                    await db.execute(delete(FeedbackEvent).where(FeedbackEvent.document_id.in_(batch)))
+                await db.commit()
+
+            await self._delete_rows(db, Fact.id, fact_ids, _progress_rows)
+            graph_service.remove_facts(user_id, fact_ids)
+            await self._delete_rows(db, Chunk.id, chunk_ids, _progress_rows)
+
+            for batch in _batches(memory_ids, SQL_BATCH):
+                await db.execute(delete(MemoryHistory).where(MemoryHistory.memory_id.in_(batch)))
+            await db.commit()
+            await self._prune_clusters(db, user_id, memory_ids, whole_user=(scope == "user"))
+
+            if scope == "user":
+                await tag_index.drop_user(db, user_id)
+            else:
+                await tag_index.unlink(db, memory_ids=memory_ids, document_ids=document_ids)
+            await db.commit()
+
+            await self._delete_rows(db, Memory.id, memory_ids, _progress_rows)
+            await self._delete_rows(db, Document.id, document_ids, _progress_rows)
+
+            # 3. Account
+            if scope == "user":
+                await db.execute(delete(EntityAlias).where(EntityAlias.user_id == user_id))
+                await db.execute(delete(Entity).where(Entity.user_id == user_id))
+                await db.commit()
+                graph_service.invalidate(user_id)
+                if delete_account:
+                    await self._delete_account(db, user_id)
+
+            await context_builder.publish_invalidation(user_id)
+
+            await self._update_job(redis, job_id, status="done", phase="done", finished_at=datetime.now(timezone.utc).isoformat())
+            print(f"Deletion: {scope} {target_id} removed {counters['deleted_vectors']} vectors, {counters['deleted_rows']} rows")
+            return counters
+        except Exception as e:
+            await self._update_job(redis, job_id, status="failed", error=str(e)[:500])
+            raise
+        finally:
+            if redis is not None:
+                await redis.close()
+
+    async def _delete_account(self, db: AsyncSession, user_id: int):
+        from app.models.user import User
+        from app.models.chat import ChatSession, ChatMessage
+        from app.models.api_key import ApiKey
+        from app.models.client import AIClient
+        from app.models.usage import UserUsage, UsageHourly, UsageDaily
+
+        session_ids = select(ChatSession.id).where(ChatSession.user_id == user_id)
+        await db.execute(delete(ChatMessage).where(ChatMessage.session_id.in_(session_ids)))
+        await db.execute(delete(ChatSession).where(ChatSession.user_id == user_id))
+        await db.execute(delete(ApiKey).where(ApiKey.user_id == user_id))
+        await db.execute(delete(AIClient).where(AIClient.user_id == user_id))
+        await db.execute(delete(UserUsage).where(UserUsage.user_id == user_id))
+        await db.execute(delete(UsageHourly).where(UsageHourly.user_id == user_id))
+        await db.execute(delete(UsageDaily).where(UsageDaily.user_id == user_id))
+        await db.execute(delete(User).where(User.id == user_id))
+        await db.commit()
+
+        # Bulk deletes skip the flush hooks: drop cached sessions / keys explicitly
+        from app.services.auth_cache import auth_cache
+        await auth_cache.publish_invalidation(user_ids=[user_id])
+
+    async def delete(
+        self,
+        db: AsyncSession,
+        scope: str,
+        target_id: int,
+        user_id: int,
+        delete_account: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Entry point for routers. Small closures are deleted inline; large ones (or whole users)
+        become a background job and the caller gets a job handle to poll.
+        """
+        if scope != "user":
+            closure = await self.compute_closure(db, scope, target_id, user_id)
+            if len(closure["vector_ids"]) + len(closure["chunk_ids"]) <= settings.DELETE_INLINE_MAX:
+                result = await self.execute(db, scope, target_id, user_id, closure=closure)
+                return {"status": "success", **result}
+
+        from app.worker import delete_closure_task
+
+        job_id = await self.create_job(scope, target_id, user_id, delete_account=delete_account)
+        delete_closure_task.delay(job_id, scope, target_id, user_id, delete_account)
+        return {"status": "accepted", "job_id": job_id}
+
+deletion_service = DeletionService()
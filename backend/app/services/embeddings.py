@@ -0,0 +1,224 @@
+"""
+Embedding Providers: One interface for every place that turns text into vectors.
+- "bedrock": Amazon Titan v2 over the network (the default; the vector index is built with it)
+- "local": a sentence-transformer exported to ONNX, run on CPU with ONNX Runtime
+  (int8-quantized on first load, batched, inference on a small thread pool)
+
+Providers are picked per purpose (settings):
+- "index"    EMBEDDING_PROVIDER: documents and queries stored in / searched against Pinecone.
+             Changing it means re-embedding the index (dimensions and spaces differ).
+- "chunking" CHUNKING_EMBEDDING_PROVIDER: sentence vectors for semantic chunk boundaries.
+             Only compared with each other, so a cheap local model is enough.
+
+The local provider needs onnxruntime and tokenizers (both project dependencies) and a
+model directory (LOCAL_EMBEDDING_MODEL_PATH) holding model.onnx and tokenizer.json,
+e.g. an ONNX export of sentence-transformers/all-MiniLM-L6-v2. Quantizing on first load
+also needs the onnx package; without it a shipped model_quantized.onnx or the fp32 model is used.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+import numpy as np
+
+from app.core.config import settings
+
+PURPOSES = ("index", "chunking")
+
+
+class EmbeddingProvider:
+    name = "base"
+
+    async def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+    async def embed_query(self, text: str) -> List[float]:
+        vectors = await self.embed_documents([text])
+        return vectors[0] if vectors else []
+
+    def warm_up(self):
+        """
+        Load models / clients ahead of the first request (blocking).
+        """
+
+
+class BedrockEmbeddingProvider(EmbeddingProvider):
+    name = "bedrock"
+
+    def __init__(self, model_id: str = "amazon.titan-embed-text-v2:0"):
+        import boto3
+        from langchain_aws import BedrockEmbeddings
+        from app.core.aws_config import AWS_CONFIG
+
+        client = boto3.client("bedrock-runtime", region_name=os.getenv("AWS_REGION", "us-east-1"), config=AWS_CONFIG)
+        self.embeddings = BedrockEmbeddings(model_id=model_id, client=client)
+
+    async def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        try:
+            # Titan v2 takes single inputs: fire them concurrently
+            return await asyncio.gather(*[self.embeddings.aembed_query(t) for t in texts])
+        except Exception as e:
+            print(f"Bedrock Async Embedding Failed: {e}")
+            # Fallback
+            return await asyncio.to_thread(self.embeddings.embed_documents, texts)
+
+    async def embed_query(self, text: str) -> List[float]:
+        return await self.embeddings.aembed_query(text)
+
+
+class LocalOnnxEmbeddingProvider(EmbeddingProvider):
+    """
+    Mean-pooled, L2-normalized sentence embeddings from an ONNX model on CPU.
+    The session is created lazily (or by warm_up) and shared by the pool threads.
+    """
+    name = "local"
+
+    def __init__(self, model_path: str, quantize: bool = True, batch_size: int = 32, threads: int = 2, max_length: int = 256):
+        import onnxruntime  # noqa: F401 (fail at construction, not on first request)
+        from tokenizers import Tokenizer  # noqa: F401
+
+        if not model_path or not os.path.isdir(model_path):
+            raise ValueError(f"LOCAL_EMBEDDING_MODEL_PATH is not a directory: {model_path!r}")
+        self.model_path = model_path
+        self.quantize = quantize
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="embed")
+        self._session = None
+        self._tokenizer = None
+        self._input_names: List[str] = []
+        self._lock = threading.Lock()
+
+    def _model_file(self) -> str:
+        quantized = os.path.join(self.model_path, "model_quantized.onnx")
+        if os.path.exists(quantized):
+            return quantized
+        model = os.path.join(self.model_path, "model.onnx")
+        if not self.quantize:
+            return model
+        try:
+            # Dynamic int8 quantization once; later loads reuse the file
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            quantize_dynamic(model, quantized, weight_type=QuantType.QInt8)
+            print(f"Embeddings: wrote int8 model {quantized}")
+            return quantized
+        except Exception as e:
+            print(f"Embeddings: quantization failed, using fp32 model: {e}")
+            return model
+
+    def _load(self):
+        with self._lock:
+            if self._session is not None:
+                return
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+
+            tokenizer = Tokenizer.from_file(os.path.join(self.model_path, "tokenizer.json"))
+            tokenizer.enable_truncation(max_length=self.max_length)
+            tokenizer.enable_padding()
+
+            options = ort.SessionOptions()
+            # Parallelism comes from the pool; each run stays on one core
+            options.intra_op_num_threads = 1
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            session = ort.InferenceSession(self._model_file(), sess_options=options, providers=["CPUExecutionProvider"])
+
+            self._tokenizer = tokenizer
+            self._input_names = [i.name for i in session.get_inputs()]
+            self._session = session
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        if self._session is None:
+            self._load()
+        encodings = self._tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feed = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feed["token_type_ids"] = np.zeros_like(input_ids)
+        output = self._session.run(None, {k: v for k, v in feed.items() if k in self._input_names})[0]
+
+        if output.ndim == 3:
+            # Token embeddings -> mean over real tokens
+            mask = attention_mask[..., None].astype(np.float32)
+            output = (output * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        norms = np.linalg.norm(output, axis=1, keepdims=True)
+        return output / np.maximum(norms, 1e-12)
+
+    async def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        loop = asyncio.get_running_loop()
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        results = await asyncio.gather(*[
+            loop.run_in_executor(self.executor, self._embed_batch, batch) for batch in batches
+        ])
+        return [row.tolist() for matrix in results for row in matrix]
+
+    def warm_up(self):
+        self._embed_batch(["warm up"])
+
+
+class EmbeddingProviders:
+    """
+    Provider per purpose; instances are shared (one Bedrock client, one ONNX session per process).
+    """
+    def __init__(self):
+        self._instances: Dict[str, Optional[EmbeddingProvider]] = {}
+        self._lock = threading.Lock()
+
+    def provider_name(self, purpose: str) -> str:
+        if purpose == "chunking":
+            return settings.CHUNKING_EMBEDDING_PROVIDER
+        return settings.EMBEDDING_PROVIDER
+
+    def get(self, purpose: str = "index") -> Optional[EmbeddingProvider]:
+        """
+        The provider for a purpose, or None if it could not be initialized.
+        A local chunking provider that fails to load falls back to the index provider.
+        """
+        name = self.provider_name(purpose)
+        provider = self._create(name)
+        if provider is None and purpose != "index" and name != self.provider_name("index"):
+            print(f"Embeddings: '{name}' unavailable for {purpose}, using the index provider")
+            provider = self._create(self.provider_name("index"))
+        return provider
+
+    def _create(self, name: str) -> Optional[EmbeddingProvider]:
+        with self._lock:
+            if name in self._instances:
+                return self._instances[name]
+            try:
+                if name == "bedrock":
+                    provider = BedrockEmbeddingProvider()
+                elif name == "local":
+                    provider = LocalOnnxEmbeddingProvider(
+                        settings.LOCAL_EMBEDDING_MODEL_PATH,
+                        quantize=settings.LOCAL_EMBEDDING_QUANTIZE,
+                        batch_size=settings.LOCAL_EMBEDDING_BATCH_SIZE,
+                        threads=settings.LOCAL_EMBEDDING_THREADS,
+                        max_length=settings.LOCAL_EMBEDDING_MAX_LENGTH
+                    )
+                else:
+                    raise ValueError(f"Unknown embedding provider '{name}'")
+            except Exception as e:
+                print(f"Warning: Failed to load '{name}' embeddings: {e}")
+                provider = None
+            self._instances[name] = provider
+            return provider
+
+    def warm_up(self):
+        """
+        Initialize and warm the providers this deployment uses (blocking; run off the event loop).
+        """
+        for purpose in PURPOSES:
+            provider = self.get(purpose)
+            if provider is None:
+                continue
+            try:
+                provider.warm_up()
+            except Exception as e:
+                print(f"Embeddings: warm-up of '{provider.name}' failed: {e}")
+
+embedding_providers = EmbeddingProviders()
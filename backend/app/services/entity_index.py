@@ -0,0 +1,321 @@
+"""
+Entity Index: Per-user entity dictionary + inverted postings (entity -> chunks / facts)
+"""
+import re
+from typing import Dict, List, Any, Iterable, Optional
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.models.entity import Entity, EntityAlias, EntityPosting
+from app.core.config import settings
+
+# Longest entity name (in words) we try to match inside a query
+MAX_ENTITY_WORDS = 6
+
+LEADING_ARTICLES = ("the ", "a ", "an ")
+ORG_SUFFIXES = {"inc", "corp", "corporation", "co", "ltd", "llc", "plc", "gmbh"}
+
+
+def normalize_entity(name: str) -> str:
+    """
+    Normalize an entity name into a lookup key.
+    "Melanie's " -> "melanie", "New  York." -> "new york"
+    """
+    if not name:
+        return ""
+    text = name.strip().lower()
+    text = re.sub(r"['’]s\b", "", text)  # Possessives
+    text = re.sub(r"[^\w\s\-]", " ", text)
+    text = re.sub(r"\s+", " ", text)
+    return text.strip(" -_")
+
+
+def canonical_entity_key(name: str) -> str:
+    """
+    Alias rules on top of normalize_entity, so surface variants share one Entity.
+    "The Acme Corp." -> "acme", "Project Phoenix" -> "project phoenix"
+    """
+    key = normalize_entity(name)
+    for article in LEADING_ARTICLES:
+        if key.startswith(article) and len(key) > len(article):
+            key = key[len(article):]
+            break
+
+    words = key.split()
+    if len(words) > 1 and words[-1] in ORG_SUFFIXES:
+        words = words[:-1]
+    return " ".join(words)
+
+
+def query_entity_keys(query: str, max_words: int = MAX_ENTITY_WORDS) -> List[str]:
+    """
+    All canonical n-gram keys of the query (n <= max_words), for one IN() lookup.
+    """
+    words = normalize_entity(query).split()
+    keys = []
+    seen = set()
+    for i in range(len(words)):
+        for n in range(1, min(max_words, len(words) - i) + 1):
+            key = canonical_entity_key(" ".join(words[i:i + n]))
+            if key and key not in seen:
+                seen.add(key)
+                keys.append(key)
+    return keys
+
+
+class EntityIndexService:
+    async def _resolve(self, db: AsyncSession, user_id: int, names: Iterable[str]) -> Dict[str, int]:
+        """
+        Get-or-create Entities for surface names. Returns {canonical key: entity_id}.
+        Fact extraction saves in parallel sessions, so creation runs in a savepoint
+        and falls back to a re-select when another session won the race.
+        """
+        display = {}
+        for name in names:
+            if not isinstance(name, str):
+                continue
+            key = canonical_entity_key(name)
+            if key and len(key.split()) <= MAX_ENTITY_WORDS:
+                display.setdefault(key, name.strip())
+        if not display:
+            return {}
+
+        stmt = select(EntityAlias.alias, EntityAlias.entity_id).where(
+            EntityAlias.user_id == user_id,
+            EntityAlias.alias.in_(list(display.keys()))
+        )
+        resolved = {row.alias: row.entity_id for row in (await db.execute(stmt)).all()}
+
+        for key, name in display.items():
+            if key in resolved:
+                continue
+            try:
+                async with db.begin_nested():
+                    entity = Entity(user_id=user_id, name=name, normalized_name=key)
+                    db.add(entity)
+                    await db.flush()
+                    db.add(EntityAlias(user_id=user_id, entity_id=entity.id, alias=key))
+                    await db.flush()
+                resolved[key] = entity.id
+            except IntegrityError:
+                existing = await db.execute(
+                    select(EntityAlias.entity_id).where(EntityAlias.user_id == user_id, EntityAlias.alias == key)
+                )
+                entity_id = existing.scalar()
+                if entity_id:
+                    resolved[key] = entity_id
+        return resolved
+
+    async def _add_postings(self, db: AsyncSession, postings: List[EntityPosting]):
+        """
+        Best-effort: the postings are written in a savepoint, so a failed flush rolls back
+        only them and the caller's chunk / fact writes can still commit.
+        """
+        if not postings:
+            return
+        async with db.begin_nested():
+            db.add_all(postings)
+            await db.flush()
+
+    async def index_chunks(self, db: AsyncSession, user_id: int, chunks: List[Any]):
+        """
+        Add postings for saved (flushed) Chunks from their enrichment `entities` list.
+        """
+        chunks = [c for c in chunks if c.id and c.entities]
+        if not chunks:
+            return
+
+        try:
+            names = [name for c in chunks for name in c.entities]
+            resolved = await self._resolve(db, user_id, names)
+
+            postings = []
+            for chunk in chunks:
+                entity_ids = {resolved.get(canonical_entity_key(n)) for n in chunk.entities if isinstance(n, str)}
+                for entity_id in entity_ids - {None}:
+                    postings.append(EntityPosting(user_id=user_id, entity_id=entity_id, chunk_id=chunk.id))
+            await self._add_postings(db, postings)
+        except Exception as e:
+            print(f"Entity indexing failed for chunks: {e}")
+
+    async def index_facts(self, db: AsyncSession, user_id: int, facts: List[Any]):
+        """
+        Add postings for saved Facts, keyed by their subjects (one resolve for the batch).
+        """
+        facts = [f for f in facts if f.id and f.subject]
+        if not facts:
+            return
+
+        try:
+            resolved = await self._resolve(db, user_id, [f.subject for f in facts])
+            postings = []
+            for fact in facts:
+                entity_id = resolved.get(canonical_entity_key(fact.subject))
+                if entity_id:
+                    postings.append(EntityPosting(user_id=user_id, entity_id=entity_id, fact_id=fact.id))
+            await self._add_postings(db, postings)
+        except Exception as e:
+            print(f"Entity indexing failed for facts: {e}")
+
+    async def index_fact(self, db: AsyncSession, user_id: int, fact: Any):
+        """
+        Add a posting for a saved Fact, keyed by its subject.
+        """
+        await self.index_facts(db, user_id, [fact])
+
+    async def add_alias(self, db: AsyncSession, user_id: int, entity_id: int, alias: str) -> Optional[str]:
+        """
+        Map another surface form onto an existing Entity (e.g. "Bob" -> "Robert Smith").
+        Returns the stored alias key, or None if it already belongs to another entity.
+        """
+        key = canonical_entity_key(alias)
+        if not key:
+            return None
+
+        existing = await db.execute(
+            select(EntityAlias).where(EntityAlias.user_id == user_id, EntityAlias.alias == key)
+        )
+        row = existing.scalars().first()
+        if row:
+            return key if row.entity_id == entity_id else None
+
+        db.add(EntityAlias(user_id=user_id, entity_id=entity_id, alias=key))
+        await db.commit()
+        return key
+
+    async def match_query(self, query: str, user_id: int, db: AsyncSession) -> Dict[str, Any]:
+        """
+        Find entities named in the query and return their postings.
+        Two indexed queries regardless of vault size:
+        1. n-gram keys IN entity_aliases
+        2. postings (joined to chunks for embedding ids), capped at ENTITY_MAX_POSTINGS
+        """
+        from app.models.document import Chunk
+
+        match = {"entity_ids": [], "names": [], "chunk_ids": set(), "embedding_ids": [], "fact_ids": set()}
+        keys = query_entity_keys(query)
+        if not keys:
+            return match
+
+        alias_stmt = (
+            select(Entity.id, Entity.name)
+            .join(EntityAlias, EntityAlias.entity_id == Entity.id)
+            .where(EntityAlias.user_id == user_id, EntityAlias.alias.in_(keys))
+            .distinct()
+        )
+        entities = (await db.execute(alias_stmt)).all()
+        if not entities:
+            return match
+
+        match["entity_ids"] = [e.id for e in entities]
+        match["names"] = [e.name for e in entities]
+
+        postings_stmt = (
+            select(EntityPosting.chunk_id, EntityPosting.fact_id, Chunk.embedding_id)
+            .outerjoin(Chunk, Chunk.id == EntityPosting.chunk_id)
+            .where(EntityPosting.user_id == user_id, EntityPosting.entity_id.in_(match["entity_ids"]))
+            .order_by(EntityPosting.id.desc())
+            .limit(settings.ENTITY_MAX_POSTINGS)
+        )
+        for row in (await db.execute(postings_stmt)).all():
+            if row.chunk_id and row.embedding_id:
+                if row.chunk_id not in match["chunk_ids"]:
+                    match["chunk_ids"].add(row.chunk_id)
+                    match["embedding_ids"].append(row.embedding_id)
+            elif row.fact_id:
+                match["fact_ids"].add(row.fact_id)
+        return match
+
+    async def list_entities(self, user_id: int, db: AsyncSession, prefix: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        counts = (
+            select(
+                EntityPosting.entity_id.label("entity_id"),
+                func.count(EntityPosting.chunk_id).label("chunk_count"),
+                func.count(EntityPosting.fact_id).label("fact_count")
+            )
+            .where(EntityPosting.user_id == user_id)
+            .group_by(EntityPosting.entity_id)
+            .subquery()
+        )
+        stmt = (
+            select(Entity, counts.c.chunk_count, counts.c.fact_count)
+            .outerjoin(counts, counts.c.entity_id == Entity.id)
+            .where(Entity.user_id == user_id)
+        )
+        if prefix:
+            stmt = stmt.where(Entity.normalized_name.startswith(canonical_entity_key(prefix), autoescape=True))
+        stmt = stmt.order_by(Entity.normalized_name).limit(limit)
+
+        rows = (await db.execute(stmt)).all()
+        return [
+            {
+                "id": entity.id,
+                "name": entity.name,
+                "normalized_name": entity.normalized_name,
+                "chunk_count": chunk_count or 0,
+                "fact_count": fact_count or 0
+            }
+            for entity, chunk_count, fact_count in rows
+        ]
+
+    async def rebuild_user_index(self, user_id: int, db: AsyncSession) -> int:
+        """
+        Backfill postings from existing Chunks and Facts (vaults ingested before the index existed).
+        Aliases are kept so manual alias mappings survive. Returns the number of postings written.
+        """
+        from sqlalchemy import delete, or_
+        from app.models.document import Chunk, Document
+        from app.models.memory import Memory
+        from app.models.fact import Fact
+
+        await db.execute(delete(EntityPosting).where(EntityPosting.user_id == user_id))
+
+        chunk_stmt = (
+            select(Chunk)
+            .outerjoin(Memory, Chunk.memory_id == Memory.id)
+            .outerjoin(Document, Chunk.document_id == Document.id)
+            .where(or_(Memory.user_id == user_id, Document.user_id == user_id))
+        )
+        chunks = (await db.execute(chunk_stmt)).scalars().all()
+        await self.index_chunks(db, user_id, chunks)
+
+        fact_stmt = select(Fact).where(
+            Fact.user_id == user_id,
+            Fact.valid_until == None,
+            Fact.is_superseded == False
+        )
+        await self.index_facts(db, user_id, (await db.execute(fact_stmt)).scalars().all())
+
+        await db.commit()
+        total = await db.execute(select(func.count(EntityPosting.id)).where(EntityPosting.user_id == user_id))
+        return total.scalar() or 0
+
+    async def backfill_users(self, db_session_factory, after_user_id: int = 0, limit: int = 50) -> Dict[str, int]:
+        """
+        Rebuild the index of up to `limit` users past `after_user_id` (by id) that have no postings yet,
+        i.e. vaults ingested before the index existed. Returns the last user id looked at
+        (the caller's watermark) and the work done.
+        """
+        from app.models.user import User
+
+        async with db_session_factory() as db:
+            user_ids = (await db.execute(
+                select(User.id).where(User.id > after_user_id).order_by(User.id).limit(limit)
+            )).scalars().all()
+            if not user_ids:
+                return {"last_user_id": after_user_id, "users": 0, "postings": 0}
+            indexed = set((await db.execute(
+                select(EntityPosting.user_id).where(EntityPosting.user_id.in_(user_ids)).distinct()
+            )).scalars().all())
+
+        rebuilt = postings = 0
+        for user_id in user_ids:
+            if user_id in indexed:
+                continue
+            async with db_session_factory() as db:
+                postings += await self.rebuild_user_index(user_id, db)
+            rebuilt += 1
+        return {"last_user_id": user_ids[-1], "users": rebuilt, "postings": postings}
+
+entity_index = EntityIndexService()
@@ -0,0 +1,219 @@
+"""
+Export Service: Streams a user's vault as NDJSON, JSON or Markdown.
+Rows come from server-side cursors (yield_per) and are encoded one at a time, so memory
+stays flat regardless of vault size and the download starts with the first row.
+Record shapes are versioned (EXPORT_FORMAT_VERSION) so archives can be read back.
+"""
+import json
+import zlib
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, Tuple
+from sqlalchemy import or_
+from sqlalchemy.future import select
+from app.db.session import AsyncSessionLocal
+from app.models.memory import Memory
+from app.models.document import Document, Chunk
+from app.models.fact import Fact
+from app.services.vector_store import vector_store
+
+EXPORT_FORMAT_VERSION = 1
+
+# Rows per server-side cursor fetch
+YIELD_PER = 500
+# Chunks per vector fetch when embeddings are included
+EMBEDDING_BATCH = 100
+# Flush the encoder output once this many bytes are buffered
+FLUSH_BYTES = 64 * 1024
+
+MEMORY_FIELDS = ("id", "title", "content", "tags", "source_llm", "model_name", "importance_score",
+                 "status", "show_in_inbox", "trusted", "task_type", "version", "created_at", "updated_at")
+DOCUMENT_FIELDS = ("id", "title", "content", "source", "file_type", "doc_type", "tags", "created_at", "updated_at")
+CHUNK_FIELDS = ("id", "memory_id", "document_id", "chunk_index", "text", "embedding_id", "summary", "generated_qas",
+                "tokens_count", "entities", "tags", "trust_score", "feedback_score")
+FACT_FIELDS = ("id", "subject", "predicate", "object", "confidence", "source_memory_id", "source_chunk_id",
+               "valid_from", "valid_until", "location", "is_superseded", "created_at")
+
+# Record kind -> key of its array in the JSON format
+JSON_KEYS = {"memory": "memories", "document": "documents", "chunk": "chunks", "fact": "facts"}
+
+
+def _row_dict(obj, fields: Iterable[str]) -> Dict[str, Any]:
+    data = {}
+    for field in fields:
+        value = getattr(obj, field)
+        data[field] = value.isoformat() if isinstance(value, datetime) else value
+    return data
+
+
+def _chunk_vector_id(record: Dict[str, Any]):
+    return record.get("embedding_id")
+
+
+def _fact_vector_id(record: Dict[str, Any]):
+    return f"fact_{record['id']}"
+
+
+class ExportService:
+    async def iter_records(
+        self,
+        user_id: int,
+        include_chunks: bool = False,
+        include_facts: bool = False,
+        include_embeddings: bool = False
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Yield ("memory" | "document" | "chunk" | "fact", record) in that order.
+        Opens its own session: the generator outlives the request's dependencies.
+        """
+        async with AsyncSessionLocal() as db:
+            # 1. Memories
+            result = await db.stream(
+                select(Memory).where(Memory.user_id == user_id).order_by(Memory.id).execution_options(yield_per=YIELD_PER)
+            )
+            async for memory in result.scalars():
+                yield "memory", _row_dict(memory, MEMORY_FIELDS)
+
+            # 2. Documents
+            result = await db.stream(
+                select(Document).where(Document.user_id == user_id).order_by(Document.id).execution_options(yield_per=YIELD_PER)
+            )
+            async for document in result.scalars():
+                yield "document", _row_dict(document, DOCUMENT_FIELDS)
+
+            # 3. Chunks (+ stored vectors, fetched per batch)
+            if include_chunks:
+                stmt = (
+                    select(Chunk)
+                    .outerjoin(Memory, Chunk.memory_id == Memory.id)
+                    .outerjoin(Document, Chunk.document_id == Document.id)
+                    .where(or_(Memory.user_id == user_id, Document.user_id == user_id))
+                    .order_by(Chunk.id)
+                    .execution_options(yield_per=YIELD_PER)
+                )
+                result = await db.stream(stmt)
+                batch = []
+                async for chunk in result.scalars():
+                    record = _row_dict(chunk, CHUNK_FIELDS)
+                    record["metadata"] = chunk.metadata_json
+                    batch.append(record)
+                    if len(batch) >= EMBEDDING_BATCH:
+                        for item in await self._with_embeddings(batch, include_embeddings):
+                            yield "chunk", item
+                        batch = []
+                for item in await self._with_embeddings(batch, include_embeddings):
+                    yield "chunk", item
+
+            # 4. Facts (+ stored vectors)
+            if include_facts:
+                result = await db.stream(
+                    select(Fact).where(Fact.user_id == user_id).order_by(Fact.id).execution_options(yield_per=YIELD_PER)
+                )
+                batch = []
+                async for fact in result.scalars():
+                    batch.append(_row_dict(fact, FACT_FIELDS))
+                    if len(batch) >= EMBEDDING_BATCH:
+                        for item in await self._with_embeddings(batch, include_embeddings, _fact_vector_id):
+                            yield "fact", item
+                        batch = []
+                for item in await self._with_embeddings(batch, include_embeddings, _fact_vector_id):
+                    yield "fact", item
+
+    async def _with_embeddings(self, records, include_embeddings: bool, vector_id=_chunk_vector_id):
+        if not include_embeddings or not records:
+            return records
+        ids = [vector_id(r) for r in records if vector_id(r)]
+        try:
+            stored = await vector_store.fetch(ids) if ids else {}
+        except Exception as e:
+            print(f"Export: Failed to fetch embeddings: {e}")
+            stored = {}
+        for record in records:
+            vector = stored.get(vector_id(record))
+            record["embedding"] = vector["values"] if vector else None
+        return records
+
+    # --- Encoders ---
+
+    async def to_ndjson(self, user_id: int, **options) -> AsyncIterator[str]:
+        """
+        One {"type": ..., **record} object per line, preceded by a header line.
+        """
+        yield json.dumps({"type": "header", "format": "brain_vault", "version": EXPORT_FORMAT_VERSION}) + "\n"
+        async for kind, record in self.iter_records(user_id, **options):
+            yield json.dumps({"type": kind, **record}, default=str) + "\n"
+
+    async def to_json(self, user_id: int, **options) -> AsyncIterator[str]:
+        """
+        {"version": 1, "memories": [...], "documents": [...], "chunks": [...], "facts": [...]},
+        written incrementally, one array per record kind in stream order (empty arrays included).
+        """
+        kinds = ["memory", "document"]
+        if options.get("include_chunks"):
+            kinds.append("chunk")
+        if options.get("include_facts"):
+            kinds.append("fact")
+
+        yield '{"version": %d' % EXPORT_FORMAT_VERSION
+        opened = -1
+        first = True
+        async for kind, record in self.iter_records(user_id, **options):
+            while opened < kinds.index(kind):
+                yield "\n]" if opened >= 0 else ""
+                opened += 1
+                yield ',\n"%s": [' % JSON_KEYS[kinds[opened]]
+                first = True
+            yield ("\n" if first else ",\n") + json.dumps(record, default=str)
+            first = False
+        while opened < len(kinds) - 1:
+            yield "\n]" if opened >= 0 else ""
+            opened += 1
+            yield ',\n"%s": [' % JSON_KEYS[kinds[opened]]
+        yield "\n]}\n"
+
+    async def to_markdown(self, user_id: int, email: str, **options) -> AsyncIterator[str]:
+        yield f"# Brain Vault Export for {email}\n\n"
+        section = None
+        headings = {"memory": "Memories", "document": "Documents", "chunk": "Chunks", "fact": "Facts"}
+        async for kind, record in self.iter_records(user_id, **options):
+            if kind != section:
+                section = kind
+                yield f"## {headings[kind]}\n\n"
+            if kind == "memory":
+                yield f"### {record['title']}\n"
+                tags = " ".join(f"#{t}" for t in (record.get("tags") or []) if isinstance(t, str))
+                if tags:
+                    yield f"{tags}\n"
+                yield f"{record['content']}\n\n"
+            elif kind == "document":
+                yield f"### {record['title']}\nSource: {record['source']}\n\n"
+                if record.get("content"):
+                    yield f"{record['content']}\n\n"
+            elif kind == "chunk":
+                owner = f"memory {record['memory_id']}" if record.get("memory_id") else f"document {record['document_id']}"
+                yield f"#### Chunk {record['chunk_index']} of {owner}\n{record['text']}\n\n"
+            else:
+                yield f"- {record['subject']} {record['predicate']} {record['object']}\n"
+
+    async def encode(self, chunks: AsyncIterator[str], gzip: bool = False) -> AsyncIterator[bytes]:
+        """
+        Text pieces -> bytes, buffered to FLUSH_BYTES and optionally gzip-compressed on the fly.
+        """
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+        buffer, size = [], 0
+        async for piece in chunks:
+            data = piece.encode("utf-8")
+            buffer.append(data)
+            size += len(data)
+            if size >= FLUSH_BYTES:
+                out = b"".join(buffer)
+                buffer, size = [], 0
+                out = compressor.compress(out) if compressor else out
+                if out:
+                    yield out
+        out = b"".join(buffer)
+        if compressor:
+            out = compressor.compress(out) + compressor.flush()
+        if out:
+            yield out
+
+export_service = ExportService()
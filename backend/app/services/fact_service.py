@@ -23,7 +23,9 @@ class FactService:
         db: AsyncSession
     ):
         """
-        Create facts concurrently (Phase 1) then write sequentially (Phase 2).
+        Create facts concurrently (Phase 1) then write sequentially (Phase 2) and commit.
+        The in-memory graph and the vector index are updated only after the commit, so a
+        rolled-back batch leaves no edges or vectors for facts that do not exist.
         """
         import asyncio
         
@@ -48,7 +50,10 @@ class FactService:
             
         # Phase 2: Sequential Execution (DB Writes)
         from app.services.vector_store import vector_store
-        
+        from app.services.graph_service import graph_service
+        from app.services.entity_index import entity_index
+
+        superseded_ids, created = [], []
         for i, decision_res in enumerate(decisions):
             f_data = facts_data[i]
             decision = decision_res.get("decision", "NEW")
@@ -65,6 +70,7 @@ class FactService:
                         target_f.valid_until = func.now()
                         target_f.is_superseded = True
                         db.add(target_f)
+                        superseded_ids.append(target_id)
                 except Exception as e:
                     print(f"Error superseding fact {target_id}: {e}")
             
@@ -99,29 +105,43 @@ class FactService:
                      
             db.add(new_fact)
             await db.flush() # Get ID
-            
-            # Index immediately
-            if new_fact.id:
-                try:
-                    fact_text = f"{subject} {predicate} {obj}"
-                    meta = {
-                        "type": "fact",
-                        "fact_id": str(new_fact.id),
-                        "user_id": str(user_id),
-                        "valid_from": str(new_fact.valid_from),
-                        "source": "ingestion"
-                    }
-                    # We can't await vector store here individually if we want speed?
-                    # But vector store adds are fast-ish.
-                    # Or collect them and batch add at end?
-                    # Batch add is better.
-                    await vector_store.add_documents(
-                        ids=[f"fact_{new_fact.id}"],
-                        documents=[fact_text],
-                        metadatas=[meta]
-                    )
-                except Exception as e:
-                    print(f"Error indexing fact {new_fact.id}: {e}")
+            created.append(new_fact)
+
+        await entity_index.index_facts(db, user_id, created)
+        await db.commit()
+
+        # Graph and vectors follow the committed rows
+        graph_service.remove_facts(user_id, superseded_ids)
+        for fact in created:
+            graph_service.add_fact(user_id, fact)
+
+        if created:
+            try:
+                payloads = [self.vector_payload(fact, user_id) for fact in created]
+                await vector_store.add_documents(
+                    ids=[p[0] for p in payloads],
+                    documents=[p[1] for p in payloads],
+                    metadatas=[p[2] for p in payloads]
+                )
+            except Exception as e:
+                print(f"Error indexing facts {[fact.id for fact in created]}: {e}")
+
+        if decisions:
+            from app.services.context_builder import context_builder
+            await context_builder.publish_invalidation(user_id)
+
+    def vector_payload(self, fact: Fact, user_id: int, source: str = "ingestion"):
+        """
+        (vector id, embedded text, metadata) for a Fact's vector.
+        """
+        meta = {
+            "type": "fact",
+            "fact_id": str(fact.id),
+            "user_id": str(user_id),
+            "valid_from": str(fact.valid_from),
+            "source": source
+        }
+        return f"fact_{fact.id}", f"{fact.subject} {fact.predicate} {fact.object}", meta
 
     async def _analyze_fact(self, f_data, user_id):
         """
@@ -136,8 +156,7 @@ class FactService:
         from app.services.vector_store import vector_store
         import json
         import re
-        from langchain_aws import ChatBedrock
-        from app.core.aws_config import AWS_CONFIG
+        from app.services.provider_router import provider_router
         from langchain_core.messages import HumanMessage
         
         try:
@@ -176,10 +195,9 @@ class FactService:
             Output JSON: {{"decision": "DUPLICATE" | "SUPERSEDE" | "NEW", "target_id": "fact_123"}}
             """
             
-            llm = ChatBedrock(model_id="apac.amazon.nova-pro-v1:0", model_kwargs={"temperature": 0}, config=AWS_CONFIG)
-            res = await llm.ainvoke([HumanMessage(content=judge_prompt)])
+            text, _ = await provider_router.invoke("judge", [HumanMessage(content=judge_prompt)], json_mode=True)
             
-            clean_json = res.content.replace("```json", "").replace("```", "").strip()
+            clean_json = text.replace("```json", "").replace("```", "").strip()
             match = re.search(r'\{.*\}', clean_json, re.DOTALL)
             if match:
                 data = json.loads(match.group())
@@ -0,0 +1,243 @@
+"""
+Knowledge Graph Service: In-memory adjacency graph over SPO facts for multi-hop retrieval
+"""
+import time
+import heapq
+import asyncio
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Any
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.models.fact import Fact
+from app.core.config import settings
+from app.services.entity_index import normalize_entity, MAX_ENTITY_WORDS
+
+
+@dataclass
+class GraphEdge:
+    fact_id: int
+    subject: str  # Normalized node key
+    predicate: str
+    object: str  # Normalized node key
+    confidence: float = 1.0
+    valid_from: Optional[datetime] = None
+
+    def other(self, node: str) -> str:
+        return self.object if node == self.subject else self.subject
+
+
+class UserGraph:
+    """
+    Adjacency graph for a single user. Nodes are normalized entity names,
+    edges are facts (undirected for traversal, direction kept on the edge).
+    """
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.labels: Dict[str, str] = {}  # node key -> display name
+        self.adjacency: Dict[str, List[GraphEdge]] = defaultdict(list)
+        self.edges: Dict[int, GraphEdge] = {}
+        self.max_fact_id = 0
+        self.max_node_words = 1
+        self.built_at = time.monotonic()
+        self.synced_at = self.built_at
+
+    def add_fact(
+        self,
+        fact_id: int,
+        subject: str,
+        predicate: str,
+        obj: str,
+        confidence: Optional[float] = 1.0,
+        valid_from: Optional[datetime] = None
+    ):
+        self.max_fact_id = max(self.max_fact_id, fact_id)
+        if fact_id in self.edges:
+            return
+
+        s_key = normalize_entity(subject)
+        o_key = normalize_entity(obj)
+        if not s_key or not o_key or s_key == o_key:
+            return
+
+        edge = GraphEdge(
+            fact_id=fact_id,
+            subject=s_key,
+            predicate=predicate or "related_to",
+            object=o_key,
+            confidence=confidence if confidence is not None else 1.0,
+            valid_from=valid_from
+        )
+        self.edges[fact_id] = edge
+        self.adjacency[s_key].append(edge)
+        self.adjacency[o_key].append(edge)
+
+        for key, label in ((s_key, subject), (o_key, obj)):
+            self.labels.setdefault(key, label.strip())
+            self.max_node_words = min(MAX_ENTITY_WORDS, max(self.max_node_words, len(key.split())))
+
+    def remove_fact(self, fact_id: int):
+        edge = self.edges.pop(fact_id, None)
+        if not edge:
+            return
+        for node in (edge.subject, edge.object):
+            remaining = [e for e in self.adjacency.get(node, []) if e.fact_id != fact_id]
+            if remaining:
+                self.adjacency[node] = remaining
+            else:
+                self.adjacency.pop(node, None)
+                self.labels.pop(node, None)
+
+    def find_entities(self, query: str) -> List[str]:
+        """
+        Greedy longest-match of graph nodes inside the query text.
+        Cost is O(words * max_node_words) dict lookups, independent of graph size.
+        """
+        words = normalize_entity(query).split()
+        found = []
+        i = 0
+        while i < len(words):
+            matched = False
+            for n in range(min(self.max_node_words, len(words) - i), 0, -1):
+                candidate = " ".join(words[i:i + n])
+                if candidate in self.adjacency:
+                    if candidate not in found:
+                        found.append(candidate)
+                    i += n
+                    matched = True
+                    break
+            if not matched:
+                i += 1
+        return found
+
+    def expand(
+        self,
+        seeds: List[str],
+        max_hops: int = 2,
+        fan_out: int = 8,
+        max_facts: int = 40
+    ) -> Dict[int, int]:
+        """
+        Bounded BFS from seed nodes.
+        Each visited node contributes at most `fan_out` edges (highest confidence first),
+        and the walk stops once `max_facts` edges were collected.
+        Returns {fact_id: hop}.
+        """
+        visited = set(seeds)
+        frontier = [s for s in seeds if s in self.adjacency]
+        reached: Dict[int, int] = {}
+
+        for hop in range(1, max_hops + 1):
+            next_frontier = []
+            for node in frontier:
+                edges = self.adjacency.get(node, [])
+                if len(edges) > fan_out:
+                    edges = heapq.nlargest(fan_out, edges, key=lambda e: (e.confidence, e.fact_id))
+                for edge in edges:
+                    if edge.fact_id not in reached:
+                        reached[edge.fact_id] = hop
+                        if len(reached) >= max_facts:
+                            return reached
+                    neighbour = edge.other(node)
+                    if neighbour not in visited:
+                        visited.add(neighbour)
+                        next_frontier.append(neighbour)
+            if not next_frontier:
+                break
+            frontier = next_frontier
+
+        return reached
+
+
+class KnowledgeGraphService:
+    def __init__(self):
+        # LRU of per-user graphs: {user_id: UserGraph}
+        self._graphs: "OrderedDict[int, UserGraph]" = OrderedDict()
+        self._locks: Dict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    async def get_graph(self, user_id: int, db: AsyncSession) -> UserGraph:
+        """
+        Return the user's graph, building it lazily.
+        Facts are mostly written by Celery workers (another process), so loaded graphs
+        catch up by pulling facts with id > max_fact_id at most every GRAPH_SYNC_INTERVAL_SECONDS,
+        and are fully rebuilt every GRAPH_REBUILD_SECONDS to drop superseded edges.
+        """
+        async with self._locks[user_id]:
+            now = time.monotonic()
+            graph = self._graphs.get(user_id)
+
+            if graph is None or now - graph.built_at > settings.GRAPH_REBUILD_SECONDS:
+                graph = UserGraph(user_id)
+                await self._load_facts(graph, db)
+                self._graphs[user_id] = graph
+            elif now - graph.synced_at > settings.GRAPH_SYNC_INTERVAL_SECONDS:
+                await self._load_facts(graph, db, after_id=graph.max_fact_id)
+                graph.synced_at = now
+
+            self._graphs.move_to_end(user_id)
+            while len(self._graphs) > settings.GRAPH_MAX_USERS:
+                evicted, _ = self._graphs.popitem(last=False)
+                self._locks.pop(evicted, None)
+
+            return graph
+
+    async def _load_facts(self, graph: UserGraph, db: AsyncSession, after_id: int = 0):
+        stmt = select(
+            Fact.id, Fact.subject, Fact.predicate, Fact.object, Fact.confidence, Fact.valid_from
+        ).where(
+            Fact.user_id == graph.user_id,
+            Fact.id > after_id,
+            Fact.valid_until == None,
+            Fact.is_superseded == False
+        ).order_by(Fact.id)
+
+        result = await db.execute(stmt)
+        for row in result.all():
+            graph.add_fact(row.id, row.subject, row.predicate, row.object, row.confidence, row.valid_from)
+
+    def add_fact(self, user_id: int, fact: Fact):
+        """
+        Incremental update from FactService.create_facts. No-op if the graph isn't loaded
+        in this process; it will pick the fact up on its next sync.
+        """
+        graph = self._graphs.get(user_id)
+        if graph and fact.id:
+            graph.add_fact(fact.id, fact.subject, fact.predicate, fact.object, fact.confidence, fact.valid_from)
+
+    def remove_facts(self, user_id: int, fact_ids: List[int]):
+        graph = self._graphs.get(user_id)
+        if graph:
+            for fid in fact_ids:
+                graph.remove_fact(fid)
+
+    def invalidate(self, user_id: int):
+        self._graphs.pop(user_id, None)
+
+    async def expand_query(
+        self,
+        query: str,
+        user_id: int,
+        db: AsyncSession,
+        max_hops: Optional[int] = None,
+        fan_out: Optional[int] = None,
+        max_facts: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Find entities named in the query and walk the graph from them.
+        Returns {"seeds": [node keys], "facts": {fact_id: hop}}.
+        """
+        graph = await self.get_graph(user_id, db)
+        seeds = graph.find_entities(query)
+        if not seeds:
+            return {"seeds": [], "facts": {}}
+
+        reached = graph.expand(
+            seeds,
+            max_hops=max_hops or settings.GRAPH_MAX_HOPS,
+            fan_out=fan_out or settings.GRAPH_FAN_OUT,
+            max_facts=max_facts or settings.GRAPH_MAX_FACTS
+        )
+        return {"seeds": [graph.labels.get(s, s) for s in seeds], "facts": reached}
+
+graph_service = KnowledgeGraphService()
@@ -0,0 +1,542 @@
+"""
+Import Service: Bulk restore of a vault from an export archive (see services/export_service.py).
+Accepts the NDJSON and JSON export formats, plain or gzipped; both are streamed.
+- Rows are inserted in batches of IMPORT_BATCH_SIZE
+- Chunks and facts that come with embeddings are upserted as-is (no enrichment, no embedding calls)
+- Everything else is ingested by one coalesced Celery job per batch
+- All or nothing: if a record fails, the rows and vectors already written are deleted again
+"""
+import gzip
+import io
+import itertools
+import json
+import uuid
+from datetime import datetime
+from typing import Any, Dict, IO, Iterator, List, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.db.session import AsyncSessionLocal
+from app.models.memory import Memory
+from app.models.document import Document, Chunk
+from app.models.fact import Fact
+from app.services.export_service import JSON_KEYS
+from app.services.vector_store import vector_store
+from app.services.context_builder import context_builder
+from app.core.config import settings
+
+RECORD_KINDS = ("memory", "document", "chunk", "fact")
+
+
+def _parse_dt(value: Any) -> Optional[datetime]:
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+class _JsonArchiveReader:
+    """
+    Incremental reader for the JSON export format: the record arrays are yielded element by
+    element, so only one record (plus a read buffer) is in memory at a time.
+    """
+    READ_SIZE = 1 << 16
+
+    def __init__(self, text: IO[str], initial: str = ""):
+        self.text = text
+        self.buf = initial
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self, size: int = None) -> bool:
+        data = self.text.read(size or self.READ_SIZE)
+        if not data:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf) or not self._fill():
+                return self.buf[self.pos] if self.pos < len(self.buf) else ""
+
+    def _expect(self, chars: str) -> str:
+        char = self._peek()
+        if not char or char not in chars:
+            raise ValueError("Unsupported archive format")
+        self.pos += 1
+        return char
+
+    def _value(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # Incomplete value: read as much again as is buffered (large records parse in O(n))
+                if self.eof or not self._fill(max(self.READ_SIZE, len(self.buf) - self.pos)):
+                    raise ValueError("Unsupported archive format")
+                continue
+            # A number may continue past the buffer
+            if end == len(self.buf) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def records(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        kinds = {key: kind for kind, key in JSON_KEYS.items()}
+        self._expect("{")
+        if self._peek() == "}":
+            return
+        while True:
+            key = self._value()
+            self._expect(":")
+            if key in kinds and self._peek() == "[":
+                self.pos += 1
+                if self._peek() == "]":
+                    self.pos += 1
+                else:
+                    while True:
+                        yield kinds[key], self._value()
+                        if self._expect(",]") == "]":
+                            break
+            else:
+                self._value()  # "version" and anything unknown
+            if self._expect(",}") == "}":
+                return
+
+
+def read_archive(fileobj: IO[bytes]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Yield (kind, record) from an export archive, streaming either format.
+    NDJSON is read line by line. JSON is parsed incrementally, so its arrays must come in
+    export order (memories, documents, chunks, facts) as to_json() writes them.
+    """
+    head = fileobj.read(2)
+    fileobj.seek(0)
+    if head == b"\x1f\x8b":
+        fileobj = gzip.GzipFile(fileobj=fileobj)
+    text = io.TextIOWrapper(fileobj, encoding="utf-8")
+
+    first = text.readline()
+    try:
+        first_obj = json.loads(first) if first.strip() else None
+    except ValueError:
+        first_obj = None
+
+    # NDJSON: every line is a {"type": ...} object (header line first)
+    if isinstance(first_obj, dict) and "type" in first_obj:
+        for line in itertools.chain([first], text):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            kind = record.pop("type", None)
+            if kind in RECORD_KINDS:
+                yield kind, record
+        return
+
+    # JSON: {"version", "memories": [...], "documents": [...], "chunks": [...], "facts": [...]}
+    last = 0
+    for kind, record in _JsonArchiveReader(text, first).records():
+        order = RECORD_KINDS.index(kind)
+        if order < last:
+            raise ValueError("JSON archive arrays must be in export order: memories, documents, chunks, facts")
+        last = order
+        yield kind, record
+
+
+def _batched(records: Iterator[Tuple[str, Dict[str, Any]]], size: int) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+    """
+    Group consecutive records of the same kind into lists of at most `size`.
+    """
+    kind, batch = None, []
+    for record_kind, record in records:
+        if batch and (record_kind != kind or len(batch) >= size):
+            yield kind, batch
+            batch = []
+        kind = record_kind
+        batch.append(record)
+    if batch:
+        yield kind, batch
+
+
+class ImportService:
+    async def import_archive(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        records: Iterator[Tuple[str, Dict[str, Any]]],
+        reuse_embeddings: bool = True,
+        extract_metadata: bool = False,
+        ingest_missing: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Restore an archive into the user's vault. Ids are re-mapped (archive id -> new id), so
+        importing into a non-empty vault or another deployment is safe.
+        Records must come in export order: memories, documents, chunks, facts.
+        1. Insert rows batch by batch (chunks/facts are linked through the id maps)
+        2. Upsert stored embeddings of restored chunks directly
+        3. Queue ingestion: memories/documents without restored chunks, chunks and facts without
+           usable embeddings -> one ingest_import_batch_task per IMPORT_BATCH_SIZE
+           (skipped with ingest_missing=False: a pure restore makes no LLM / embedding calls)
+        Batches are committed as they go; if a later record fails (e.g. a malformed line), everything
+        inserted so far is removed again through the deletion service and the error is re-raised.
+        """
+        from app.services.entity_index import entity_index
+
+        stats = {"memories": 0, "documents": 0, "chunks": 0, "facts": 0, "skipped": 0, "reused_embeddings": 0}
+        memory_map: Dict[int, int] = {}
+        document_map: Dict[int, int] = {}
+        chunk_map: Dict[int, int] = {}
+        approved_memories: List[int] = []
+        owners_with_chunks = set()
+        reembed_chunks: List[str] = []
+        index_facts: List[int] = []
+
+        # Shaped like a deletion closure, so a failed import can be undone in one call
+        inserted: Dict[str, List[Any]] = {"memory_ids": [], "document_ids": [], "chunk_ids": [], "fact_ids": [], "vector_ids": []}
+
+        try:
+            for kind, batch in _batched(records, settings.IMPORT_BATCH_SIZE):
+                # 1. Rows
+                if kind == "memory":
+                    rows = [self._memory_row(user_id, r) for r in batch]
+                    db.add_all(rows)
+                    await db.flush()
+                    inserted["memory_ids"].extend(row.id for row in rows)
+                    for record, row in zip(batch, rows):
+                        if record.get("id") is not None:
+                            memory_map[record["id"]] = row.id
+                        if row.status == "approved":
+                            approved_memories.append(row.id)
+                    stats["memories"] += len(rows)
+
+                elif kind == "document":
+                    rows = [self._document_row(user_id, r) for r in batch]
+                    db.add_all(rows)
+                    await db.flush()
+                    inserted["document_ids"].extend(row.id for row in rows)
+                    for record, row in zip(batch, rows):
+                        if record.get("id") is not None:
+                            document_map[record["id"]] = row.id
+                    stats["documents"] += len(rows)
+
+                elif kind == "chunk":
+                    kept, rows, vectors = [], [], []
+                    for record in batch:
+                        memory_id = memory_map.get(record.get("memory_id"))
+                        document_id = document_map.get(record.get("document_id"))
+                        if not memory_id and not document_id:
+                            stats["skipped"] += 1
+                            continue
+                        row = self._chunk_row(user_id, record, memory_id, document_id)
+                        kept.append(record)
+                        rows.append(row)
+                        vectors.append(record.get("embedding") if reuse_embeddings else None)
+                        owners_with_chunks.add(("memory", memory_id) if memory_id else ("document", document_id))
+                    db.add_all(rows)
+                    await db.flush()
+                    inserted["chunk_ids"].extend(row.id for row in rows)
+                    inserted["vector_ids"].extend(row.embedding_id for row in rows)
+                    for record, row in zip(kept, rows):
+                        if record.get("id") is not None:
+                            chunk_map[record["id"]] = row.id
+                    await entity_index.index_chunks(db, user_id, rows)
+                    await self._set_memory_embedding_ids(db, rows)
+                    await db.commit()
+
+                    # 2. Stored embeddings (after the commit: a failed batch never leaves orphan vectors)
+                    reused = await self._upsert_stored_vectors(rows, vectors)
+                    reembed_chunks.extend(row.embedding_id for row in rows if row.embedding_id not in reused)
+                    stats["reused_embeddings"] += len(reused)
+                    stats["chunks"] += len(rows)
+
+                elif kind == "fact":
+                    rows = [self._fact_row(user_id, r, memory_map, chunk_map) for r in batch]
+                    db.add_all(rows)
+                    await db.flush()
+                    inserted["fact_ids"].extend(row.id for row in rows)
+                    inserted["vector_ids"].extend(f"fact_{row.id}" for row in rows)
+                    active, vectors = [], []
+                    for record, row in zip(batch, rows):
+                        if row.valid_until is None and not row.is_superseded:
+                            await entity_index.index_fact(db, user_id, row)
+                            active.append(row)
+                            vectors.append(record.get("embedding") if reuse_embeddings else None)
+                    await db.commit()
+
+                    reused = await self._upsert_fact_vectors(user_id, active, vectors)
+                    index_facts.extend(row.id for row in active if row.id not in reused)
+                    stats["reused_embeddings"] += len(reused)
+                    stats["facts"] += len(rows)
+
+                await db.commit()
+        except Exception:
+            await db.rollback()
+            await self._discard(db, user_id, inserted)
+            raise
+
+        # Restored rows and reused vectors are searchable now; cached contexts must not hide them
+        await context_builder.publish_invalidation(user_id)
+
+        # 3. Ingestion for whatever the archive did not carry
+        memory_ids = [m for m in approved_memories if ("memory", m) not in owners_with_chunks]
+        document_ids = [d for d in document_map.values() if ("document", d) not in owners_with_chunks]
+        if ingest_missing:
+            stats["queued_jobs"] = self._enqueue(user_id, memory_ids, document_ids, reembed_chunks, index_facts)
+            stats["queued_memories"] = len(memory_ids)
+            stats["queued_documents"] = len(document_ids)
+            stats["queued_chunks"] = len(reembed_chunks)
+        else:
+            stats["missing_vectors"] = len(reembed_chunks) + len(index_facts)
+            stats["not_ingested"] = len(memory_ids) + len(document_ids)
+
+        if extract_metadata:
+            from app.worker import process_memory_metadata_task
+            for memory_id in memory_map.values():
+                process_memory_metadata_task.delay(memory_id, user_id)
+
+        return stats
+
+    async def _discard(self, db: AsyncSession, user_id: int, inserted: Dict[str, List[Any]]):
+        """
+        Undo a failed import: rows committed by earlier batches and the vectors upserted for them.
+        """
+        from app.services.deletion_service import deletion_service
+
+        if not any(inserted.values()):
+            return
+        try:
+            await deletion_service.execute(db, "memory", 0, user_id, closure=inserted)
+        except Exception as e:
+            print(f"Import: Cleanup after failed import for user {user_id} failed: {e}")
+
+    # --- Row builders ---
+
+    def _memory_row(self, user_id: int, record: Dict[str, Any]) -> Memory:
+        memory = Memory(
+            user_id=user_id,
+            title=record.get("title"),
+            content=record.get("content") or "",
+            tags=record.get("tags"),
+            source_llm=record.get("source_llm") or "import",
+            model_name=record.get("model_name"),
+            importance_score=record.get("importance_score") or 0.0,
+            status=record.get("status") or "approved",
+            show_in_inbox=record.get("show_in_inbox", False),
+            trusted=record.get("trusted", True),
+            task_type=record.get("task_type"),
+            version=record.get("version") or 1
+        )
+        created_at = _parse_dt(record.get("created_at"))
+        if created_at:
+            memory.created_at = created_at
+        return memory
+
+    def _document_row(self, user_id: int, record: Dict[str, Any]) -> Document:
+        document = Document(
+            user_id=user_id,
+            title=record.get("title"),
+            content=record.get("content"),
+            source=record.get("source"),
+            file_type=record.get("file_type"),
+            doc_type=record.get("doc_type") or "file",
+            tags=record.get("tags")
+        )
+        created_at = _parse_dt(record.get("created_at"))
+        if created_at:
+            document.created_at = created_at
+        return document
+
+    def _chunk_row(self, user_id: int, record: Dict[str, Any], memory_id: Optional[int], document_id: Optional[int]) -> Chunk:
+        # Fresh vector ids: the archive's ids may still exist in this index
+        meta = dict(record.get("metadata") or {})
+        meta["user_id"] = str(user_id)
+        meta["document_id"] = memory_id or document_id
+        if memory_id:
+            meta["memory_id"] = memory_id
+        else:
+            meta.pop("memory_id", None)
+        meta["chunk_index"] = record.get("chunk_index")
+
+        return Chunk(
+            memory_id=memory_id,
+            document_id=document_id,
+            chunk_index=record.get("chunk_index"),
+            text=record.get("text") or "",
+            embedding_id=str(uuid.uuid4()),
+            summary=record.get("summary"),
+            generated_qas=record.get("generated_qas"),
+            tokens_count=record.get("tokens_count"),
+            entities=record.get("entities"),
+            tags=record.get("tags"),
+            trust_score=record.get("trust_score", 0.5),
+            feedback_score=record.get("feedback_score") or 0.0,
+            metadata_json=meta
+        )
+
+    def _fact_row(self, user_id: int, record: Dict[str, Any], memory_map: Dict[int, int], chunk_map: Dict[int, int]) -> Fact:
+        fact = Fact(
+            user_id=user_id,
+            subject=record.get("subject") or "",
+            predicate=record.get("predicate") or "",
+            object=record.get("object") or "",
+            confidence=record.get("confidence", 1.0),
+            source_memory_id=memory_map.get(record.get("source_memory_id")),
+            source_chunk_id=chunk_map.get(record.get("source_chunk_id")),
+            valid_until=_parse_dt(record.get("valid_until")),
+            location=record.get("location"),
+            is_superseded=bool(record.get("is_superseded"))
+        )
+        valid_from = _parse_dt(record.get("valid_from"))
+        if valid_from:
+            fact.valid_from = valid_from
+        return fact
+
+    # --- Vectors / jobs ---
+
+    async def _set_memory_embedding_ids(self, db: AsyncSession, chunks: List[Chunk]):
+        # Same convention as ingestion: Memory.embedding_id is the first chunk's vector id
+        first = {c.memory_id: c.embedding_id for c in chunks if c.memory_id and c.chunk_index == 0}
+        if not first:
+            return
+        result = await db.execute(select(Memory).where(Memory.id.in_(list(first.keys()))))
+        for memory in result.scalars().all():
+            memory.embedding_id = first[memory.id]
+
+    async def _upsert_stored_vectors(self, chunks: List[Chunk], vectors: List[Optional[List[float]]]) -> set:
+        from app.services.ingestion import ingestion_service
+
+        ids, values, texts, metadatas = [], [], [], []
+        for chunk, vector in zip(chunks, vectors):
+            if not vector:
+                continue
+            ids.append(chunk.embedding_id)
+            values.append(vector)
+            texts.append(ingestion_service.build_enriched_text(chunk.text, chunk.summary, chunk.generated_qas))
+            metadatas.append(chunk.metadata_json)
+
+        if ids and await vector_store.upsert_embeddings(ids, values, texts, metadatas):
+            return set(ids)
+        return set()
+
+    async def _upsert_fact_vectors(self, user_id: int, facts: List[Fact], vectors: List[Optional[List[float]]]) -> set:
+        from app.services.fact_service import fact_service
+
+        fact_ids, ids, values, texts, metadatas = [], [], [], [], []
+        for fact, vector in zip(facts, vectors):
+            if not vector:
+                continue
+            vector_id, text, meta = fact_service.vector_payload(fact, user_id, source="import")
+            fact_ids.append(fact.id)
+            ids.append(vector_id)
+            values.append(vector)
+            texts.append(text)
+            metadatas.append(meta)
+
+        if ids and await vector_store.upsert_embeddings(ids, values, texts, metadatas):
+            return set(fact_ids)
+        return set()
+
+    def _enqueue(self, user_id: int, memory_ids: List[int], document_ids: List[int], chunk_embedding_ids: List[str], fact_ids: List[int]) -> int:
+        from app.worker import ingest_import_batch_task
+
+        size = settings.IMPORT_BATCH_SIZE
+        parts = {"memory_ids": memory_ids, "document_ids": document_ids, "chunk_embedding_ids": chunk_embedding_ids, "fact_ids": fact_ids}
+        jobs = 0
+        # Job i carries slice i of every list
+        for start in range(0, max(len(ids) for ids in parts.values()), size):
+            ingest_import_batch_task.delay(user_id, **{key: ids[start:start + size] for key, ids in parts.items()})
+            jobs += 1
+        return jobs
+
+    async def ingest_batch(
+        self,
+        user_id: int,
+        memory_ids: List[int] = (),
+        document_ids: List[int] = (),
+        chunk_embedding_ids: List[str] = (),
+        fact_ids: List[int] = ()
+    ):
+        """
+        Worker side of one import batch (ingest_import_batch_task).
+        - Memories: the regular ingestion pipeline (chunking, enrichment, embeddings, facts)
+        - Documents: chunking, enrichment, embeddings
+        - Restored chunks / facts: embedding only
+        """
+        from app.worker import ingest_memory
+        from app.services.reconciliation import reconciliation_service
+
+        if memory_ids:
+            async with AsyncSessionLocal() as db:
+                memories = (await db.execute(select(Memory).where(Memory.id.in_(list(memory_ids))))).scalars().all()
+            for memory in memories:
+                await ingest_memory(memory.id, user_id, memory.content, memory.title, memory.tags, memory.source_llm)
+
+        for document_id in document_ids:
+            await self._ingest_document(user_id, document_id)
+
+        if chunk_embedding_ids or fact_ids:
+            async with AsyncSessionLocal() as db:
+                if chunk_embedding_ids:
+                    await reconciliation_service.reindex_chunks(db, list(chunk_embedding_ids))
+                if fact_ids:
+                    await reconciliation_service.reindex_facts(db, [f"fact_{i}" for i in fact_ids])
+
+        await context_builder.publish_invalidation(user_id)
+        print(f"Import: Batch done for user {user_id} ({len(memory_ids)} memories, {len(document_ids)} documents, "
+              f"{len(chunk_embedding_ids)} chunks, {len(fact_ids)} facts)")
+
+    async def _ingest_document(self, user_id: int, document_id: int):
+        from app.services.ingestion import ingestion_service
+        from app.services.entity_index import entity_index
+
+        try:
+            async with AsyncSessionLocal() as db:
+                document = (await db.execute(select(Document).where(Document.id == document_id))).scalars().first()
+                if not document or not (document.content or "").strip():
+                    return
+
+                ids, texts, enriched_texts, metadatas = await ingestion_service.process_text(
+                    text=document.content,
+                    document_id=document.id,
+                    title=document.title,
+                    doc_type=document.doc_type,
+                    metadata={"user_id": str(user_id)}
+                )
+                if not ids:
+                    return
+
+                chunks = []
+                for i, (embedding_id, text) in enumerate(zip(ids, texts)):
+                    meta = metadatas[i]
+                    chunk = Chunk(
+                        document_id=document.id,
+                        chunk_index=i,
+                        text=text,
+                        embedding_id=embedding_id,
+                        summary=meta.get("summary"),
+                        generated_qas=json.loads(meta.get("generated_qas") or "[]"),
+                        entities=json.loads(meta.get("entities") or "[]"),
+                        tokens_count=meta.get("tokens_count"),
+                        metadata_json=meta
+                    )
+                    db.add(chunk)
+                    chunks.append(chunk)
+                await db.flush()
+                await entity_index.index_chunks(db, user_id, chunks)
+                await db.commit()
+
+            await vector_store.add_documents(ids=ids, documents=enriched_texts, metadatas=metadatas)
+        except Exception as e:
+            print(f"Import: Document {document_id} ingestion failed: {e}")
+
+import_service = ImportService()
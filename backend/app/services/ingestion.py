@@ -1,53 +1,42 @@
 """
 Ingestion Service: Handle text chunking and embedding generation
 """
-from typing import List, Dict
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from typing import List, Dict, Any
 import uuid
 import numpy as np
-import numpy as np
 import os
-from langchain_aws import BedrockEmbeddings
 import re
 import json
 import asyncio
 from app.services.llm_service import llm_service
-from app.core.aws_config import AWS_CONFIG
-import boto3
+from app.services.token_counter import token_counter
+from app.services.chunker import TokenChunker
+from app.services.boundary_detection import boundary_detector
+from app.core.config import settings
 
 class IngestionService:
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+    def __init__(self, max_tokens: int = None, overlap_tokens: int = None):
         """
-        Initialize the ingestion service with a text splitter.
+        Initialize the ingestion service with a token-budgeted chunker.
         
         Args:
-            chunk_size: Maximum size of each chunk
-            chunk_overlap: Number of characters to overlap between chunks
+            max_tokens: Maximum tokens per chunk (default CHUNK_MAX_TOKENS)
+            overlap_tokens: Tokens carried into the next chunk when one is cut by the budget
         """
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-            length_function=len,
-            separators=["\n\n", "\n", ". ", " ", ""]
+        self.chunker = TokenChunker(
+            max_tokens=max_tokens or settings.CHUNK_MAX_TOKENS,
+            overlap_tokens=settings.CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens,
+            min_tokens=settings.CHUNK_MIN_TOKENS
         )
-        # Initialize semantic model
-        try:
-            # Create a boto3 client with custom config
-            client = boto3.client("bedrock-runtime", region_name=os.getenv("AWS_REGION", "us-east-1"), config=AWS_CONFIG)
-            
-            self.bedrock_embeddings = BedrockEmbeddings(
-                model_id="amazon.titan-embed-text-v2:0",
-                client=client
-            )
-        except Exception as e:
-            print(f"Warning: Failed to load Bedrock embeddings: {e}")
-            self.bedrock_embeddings = None
+        # Sentence embeddings for semantic boundaries (CHUNKING_EMBEDDING_PROVIDER)
+        from app.services.embeddings import embedding_providers
+        self.embeddings = embedding_providers.get("chunking")
     
     def chunk_text(self, text: str) -> List[str]:
         """
-        Chunk text using RecursiveCharacterTextSplitter.
+        Chunk text by sentences within the token budget (no embeddings).
         """
-        return self.text_splitter.split_text(text)
+        return self.chunker.chunk(text)
     
     async def process_text(
         self, 
@@ -63,11 +52,12 @@ class IngestionService:
         Uses Semantic Chunking and LLM Enrichment.
         Now optimized with parallel processing.
         """
-        # 1. Chunking (Wait for this, it's CPU + Embedding bound)
-        if len(text) < 500:
+        # 1. Chunking (token-budgeted; sentence embeddings only for longer texts)
+        text_tokens = token_counter.count(text)
+        if text_tokens <= self.chunker.max_tokens:
              chunks = [text] 
-        elif len(text) < 3000:
-             chunks = self.text_splitter.split_text(text)
+        elif text_tokens < settings.SEMANTIC_CHUNK_MIN_TOKENS:
+             chunks = self.chunker.chunk(text)
         else:
              chunks = await self.semantic_chunk_text(text) # Now Async!
         
@@ -106,6 +96,7 @@ class IngestionService:
                 print(f"Enrichment failed: {res}. Raising exception to trigger retry.")
                 raise res
         enriched_chunk_texts = [] # Text to be embedded
+        chunk_tokens = token_counter.count_batch(chunks)
         
         # Assemble Results
         for i, chunk_text in enumerate(chunks):
@@ -115,6 +106,7 @@ class IngestionService:
             
             chunk_metadata = base_metadata.copy()
             chunk_metadata["chunk_index"] = i
+            chunk_metadata["tokens_count"] = chunk_tokens[i]
             
             # Process Enrichment Result
             result = enrichment_results[i] if i < len(enrichment_results) else None
@@ -135,98 +127,58 @@ class IngestionService:
             chunk_metadata["entities"] = json.dumps(entities)
             
             # Construct Enriched Text
-            enriched_text = chunk_text
-            if summary or qas:
-                enrichment_context = f"\n\n-- Context --\nSummary: {summary}\n"
-                if qas:
-                    enrichment_context += "Q&A:\n"
-                    for qa in qas:
-                            if isinstance(qa, dict):
-                                enrichment_context += f"Q: {qa.get('question', '')}\nA: {qa.get('answer', '')}\n"
-                            elif isinstance(qa, str):
-                                enrichment_context += f"{qa}\n"
-                enriched_text += enrichment_context
-            
-            enriched_chunk_texts.append(enriched_text)
+            enriched_chunk_texts.append(self.build_enriched_text(chunk_text, summary, qas))
             metadatas.append(chunk_metadata)
         
         return embedding_ids, chunk_texts, enriched_chunk_texts, metadatas
 
+    def build_enriched_text(self, chunk_text: str, summary: str = "", qas: List[Any] = None) -> str:
+        """
+        Text that gets embedded for a chunk: raw text + summary + Q&A context.
+        """
+        enriched_text = chunk_text
+        if summary or qas:
+            enrichment_context = f"\n\n-- Context --\nSummary: {summary or ''}\n"
+            if qas:
+                enrichment_context += "Q&A:\n"
+                for qa in qas:
+                        if isinstance(qa, dict):
+                            enrichment_context += f"Q: {qa.get('question', '')}\nA: {qa.get('answer', '')}\n"
+                        elif isinstance(qa, str):
+                            enrichment_context += f"{qa}\n"
+            enriched_text += enrichment_context
+        return enriched_text
+
     async def semantic_chunk_text(self, text: str, threshold: float = 0.5) -> List[str]:
         """
-        Split text semantically using cosine similarity of adjacent sentences.
-        Parallelized embedding generation.
+        Split text semantically: a new chunk starts where adjacent sentences are less similar
+        than threshold (cosine of their embeddings); the chunker still enforces the token budget.
+        A lexical pre-filter settles clear gaps, so only sentences around ambiguous gaps are embedded
+        (see services/boundary_detection.py).
         """
-        # Split sentences
-        sentences = re.split(r'(?<=[.?!])\s+', text)
-        sentences = [s.strip() for s in sentences if s.strip()]
+        # Split sentences (once, with token counts)
+        sentences, counts, spans = self.chunker.prepare(text)
         
         if not sentences: return []
         if len(sentences) == 1: return sentences
         
-        # Optimized Parallel Embedding Generation
+        # Boundaries: lexical cohesion first, sentence embeddings for the ambiguous gaps
         try:
-            # Create concurrent tasks for each sentence
-            # Titan v2 requires single inputs, so we fire them all at once.
-            tasks = [self.bedrock_embeddings.aembed_query(s) for s in sentences]
-            embeddings = await asyncio.gather(*tasks)
+            if not self.embeddings:
+                raise Exception("Embeddings not initialized")
+            breakpoints, stats = await boundary_detector.detect(sentences, self.embeddings.embed_documents, threshold)
+            print(f"Semantic Chunking: {stats['gaps']} gaps, {stats['lexical_breaks']} lexical breaks, "
+                  f"{stats['ambiguous']} ambiguous, {stats['embedded']}/{len(sentences)} sentences embedded")
         except Exception as e:
-            print(f"Bedrock Parallel Embedding failed: {e}")
-            # Fallback to sync call if async fails for some reason
-            try:
-                embeddings = self.bedrock_embeddings.embed_documents(sentences)
-            except Exception as inner_e:
-                print(f"Fallback Embedding failed: {inner_e}")
-                return self.text_splitter.split_text(text)
-            
-        # Optimization: Vectorized Cosine Similarity
-        embeddings_np = np.array(embeddings) # Shape: (N, D)
-        
-        # Compute Norms
-        norms = np.linalg.norm(embeddings_np, axis=1) # Shape: (N,)
-        
-        # Compute Dot Products for adjacent pairs
-        # dot(v[i-1], v[i]) for i=1..N-1
-        vec_a = embeddings_np[:-1]
-        vec_b = embeddings_np[1:]
-        dots = np.sum(vec_a * vec_b, axis=1)
-        
-        # Compute Cosine Similarities
-        norm_products = norms[:-1] * norms[1:]
-        similarities = np.zeros_like(dots)
-        
-        # Avoid division by zero
-        nonzero = norm_products > 1e-9
-        similarities[nonzero] = dots[nonzero] / norm_products[nonzero]
-        
-        # Form Chunks
-        chunks = []
-        current_chunk = [sentences[0]]
-        
-        for i in range(1, len(sentences)):
-            sim = similarities[i-1] 
-            
-            if sim < threshold and len(" ".join(current_chunk)) > 150: 
-                chunks.append(" ".join(current_chunk))
-                current_chunk = [sentences[i]]
-            else:
-                if len(" ".join(current_chunk)) + len(sentences[i]) > 2000:
-                     chunks.append(" ".join(current_chunk))
-                     current_chunk = [sentences[i]]
-                else:
-                    current_chunk.append(sentences[i])
-                
-        if current_chunk:
-            chunks.append(" ".join(current_chunk))
-            
-        return chunks
+            print(f"Sentence Embedding failed, using lexical breaks only: {e}")
+            breakpoints, _ = boundary_detector.classify_gaps(sentences)
+
+        return [c.text for c in self.chunker.chunk_sentences(text, spans, counts, breakpoints)]
 
     def count_tokens(self, text: str) -> int:
         """
-        Estimate token count (approx 4 chars per token).
+        Token count of a chunk (shared token counter, see services/token_counter.py).
         """
-        if not text:
-            return 0
-        return len(text) // 4
+        return token_counter.count(text)
 
 ingestion_service = IngestionService()
@@ -1,39 +1,44 @@
 import json
+import time
 import asyncio
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, List, Optional, Dict, Any
 from langchain_openai import ChatOpenAI
 from langchain_aws import ChatBedrock
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage, SystemMessage
-import google.generativeai as genai
 from app.core.config import settings
 from app.core.aws_config import AWS_CONFIG
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 from app.services.usage_service import usage_service
-import tiktoken
+from app.services.token_counter import token_counter
+from app.services.provider_router import provider_router
 
-def count_tokens(text: str, model: str = "gpt-3.5-turbo") -> int:
-    try:
-        encoding = tiktoken.encoding_for_model(model)
-        return len(encoding.encode(text))
-    except:
-        return len(text) // 4
+# Gemini model used for all direct Gemini calls
+GEMINI_MODEL = "gemini-2.5-flash"
+
+NO_CONTEXT_RESPONSE = "I couldn't find any relevant information in your MemWyre to answer that. Please try adding more memories or documents related to your specific question."
 
 class LLMService:
     def __init__(self):
         self.api_key = getattr(settings, "GEMINI_API_KEY", None) or getattr(settings, "OPENAI_API_KEY", None)
         self.openai_api_key = self.api_key # Backwards compatibility for now
-        
-    async def generate_response(self, query: str, context: List[str], provider: str = "openai", api_key: Optional[str] = None, user_id: Optional[int] = None) -> str:
-        if not api_key:
-            return "Error: API Key is required."
-            
-        if not context:
-            return "I couldn't find any relevant information in your MemWyre to answer that. Please try adding more memories or documents related to your specific question."
 
+    def _gemini(self, api_key: str, json_mode: bool = False, **kwargs) -> ChatGoogleGenerativeAI:
+        """
+        Gemini chat model with this request's key (no process-wide genai.configure).
+        Calls go through its native async client, so they never block the event loop.
+        """
+        if json_mode:
+            kwargs["response_mime_type"] = "application/json"
+        return ChatGoogleGenerativeAI(google_api_key=api_key, model=GEMINI_MODEL, **kwargs)
+
+    async def _gemini_generate(self, prompt: str, api_key: str, json_mode: bool = False, **kwargs) -> str:
+        res = await self._gemini(api_key, json_mode=json_mode, **kwargs).ainvoke(prompt)
+        return res.text
+
+    def _system_prompt(self, context: List[str]) -> str:
         context_str = "\n\n".join(context)
-        system_prompt = (
+        return (
             "You are the MemWyre AI, a personal knowledge assistant. "
             "Use ONLY the following Context to answer the user's question. "
             "If the answer is not explicitly supported by the Context, state that you do not have enough information. "
@@ -41,6 +46,15 @@ class LLMService:
             f"Context:\n{context_str}"
         )
         
+    async def generate_response(self, query: str, context: List[str], provider: str = "openai", api_key: Optional[str] = None, user_id: Optional[int] = None) -> str:
+        if not api_key:
+            return "Error: API Key is required."
+            
+        if not context:
+            return NO_CONTEXT_RESPONSE
+
+        system_prompt = self._system_prompt(context)
+        
         if provider == "openai":
             try:
                 llm = ChatOpenAI(api_key=api_key, model="gpt-3.5-turbo")
@@ -48,13 +62,14 @@ class LLMService:
                     SystemMessage(content=system_prompt),
                     HumanMessage(content=query)
                 ]
+                started = time.monotonic()
                 response = await llm.ainvoke(messages)
+                latency_ms = int((time.monotonic() - started) * 1000)
                 
                 # Track Usage
                 if user_id:
-                     tokens_in = count_tokens(system_prompt + query)
-                     tokens_out = count_tokens(response.content)
-                     await usage_service.track_usage(user_id, "openai", "gpt-3.5-turbo", tokens_in, tokens_out)
+                     tokens_in, tokens_out = token_counter.count_batch([system_prompt + query, response.content], model="gpt-3.5-turbo")
+                     await usage_service.track_usage(user_id, "openai", "gpt-3.5-turbo", tokens_in, tokens_out, latency_ms=latency_ms)
                      
                 return response.content
             except Exception as e:
@@ -62,21 +77,18 @@ class LLMService:
 
         elif provider == "gemini":
             try:
-                genai.configure(api_key=api_key)
-                # Using gemini-2.5-flash as requested
-                model = genai.GenerativeModel('gemini-2.5-flash')
-                
                 combined = f"{system_prompt}\n\nUser Question: {query}"
-                response = model.generate_content(combined)
+                started = time.monotonic()
+                response_text = await self._gemini_generate(combined, api_key)
+                latency_ms = int((time.monotonic() - started) * 1000)
                 
                 # Track Usage
                 if user_id:
                      # Gemini doesn't always give token counts in simple response, assume estimate
-                     tokens_in = count_tokens(combined)
-                     tokens_out = count_tokens(response.text)
-                     await usage_service.track_usage(user_id, "gemini", "gemini-2.5-flash", tokens_in, tokens_out)
+                     tokens_in, tokens_out = token_counter.count_batch([combined, response_text], model=GEMINI_MODEL)
+                     await usage_service.track_usage(user_id, "gemini", GEMINI_MODEL, tokens_in, tokens_out, latency_ms=latency_ms)
 
-                return response.text
+                return response_text
             except Exception as e:
                 return f"Gemini Error: {str(e)}"
 
@@ -93,13 +105,14 @@ class LLMService:
                     SystemMessage(content=system_prompt),
                     HumanMessage(content=query)
                 ]
+                started = time.monotonic()
                 response = await llm.ainvoke(messages)
+                latency_ms = int((time.monotonic() - started) * 1000)
                 
                 # Track Usage
                 if user_id:
-                     tokens_in = count_tokens(system_prompt + query)
-                     tokens_out = count_tokens(response.content)
-                     await usage_service.track_usage(user_id, "bedrock", model_id, tokens_in, tokens_out)
+                     tokens_in, tokens_out = token_counter.count_batch([system_prompt + query, response.content], model=model_id)
+                     await usage_service.track_usage(user_id, "bedrock", model_id, tokens_in, tokens_out, latency_ms=latency_ms)
 
                 return response.content
             except Exception as e:
@@ -111,6 +124,58 @@ class LLMService:
         else:
             return "Unsupported provider."
 
+    async def stream_response(self, query: str, context: List[str], provider: str = "openai", api_key: Optional[str] = None, user_id: Optional[int] = None) -> AsyncIterator[str]:
+        """
+        generate_response, streamed: yields text as the provider produces it.
+        Usage is tracked once the stream has finished.
+        """
+        if not api_key:
+            yield "Error: API Key is required."
+            return
+        if not context:
+            yield NO_CONTEXT_RESPONSE
+            return
+
+        system_prompt = self._system_prompt(context)
+        messages = [
+            SystemMessage(content=system_prompt),
+            HumanMessage(content=query)
+        ]
+
+        if provider == "openai":
+            label, usage_provider, model_id = "OpenAI", "openai", "gpt-3.5-turbo"
+            llm = ChatOpenAI(api_key=api_key, model=model_id)
+        elif provider == "gemini":
+            label, usage_provider, model_id = "Gemini", "gemini", GEMINI_MODEL
+            llm = self._gemini(api_key)
+        elif provider == "bedrock" or "nova" in provider:
+            label, usage_provider, model_id = "Bedrock", "bedrock", "apac.amazon.nova-pro-v1:0"
+            llm = ChatBedrock(model_id=model_id, model_kwargs={"temperature": 0.7}, config=AWS_CONFIG)
+        elif provider == "claude":
+            yield "Claude integration not yet implemented."
+            return
+        else:
+            yield "Unsupported provider."
+            return
+
+        started = time.monotonic()
+        parts = []
+        try:
+            async for chunk in llm.astream(messages):
+                text = chunk.text
+                if text:
+                    parts.append(text)
+                    yield text
+        except Exception as e:
+            yield f"{label} Error: {str(e)}"
+            return
+        latency_ms = int((time.monotonic() - started) * 1000)
+
+        # Track Usage
+        if user_id:
+            tokens_in, tokens_out = token_counter.count_batch([system_prompt + query, "".join(parts)], model=model_id)
+            await usage_service.track_usage(user_id, usage_provider, model_id, tokens_in, tokens_out, latency_ms=latency_ms)
+
     async def extract_metadata(self, content: str, existing_tags: List[str] = [], api_key: Optional[str] = None) -> dict:
         """
         Extract Title, Summary, and Tags from content using LLM.
@@ -161,81 +226,37 @@ Existing Tags Context:
         user_message = f"""Content to Analyze:
 {content[:4000]}"""
         
-        # Generate
-        text = ""
-        
-        # 1. Try Bedrock (Nova Pro) First - Preferred and often System Configured
-        used_bedrock = False
+        # Generate (cheapest healthy model for the task, with failover)
         try:
-             # Default to Nova Pro
-             llm = ChatBedrock(model_id="apac.amazon.nova-pro-v1:0", model_kwargs={"temperature": 0}, config=AWS_CONFIG)
-             messages = [
-                 SystemMessage(content=system_instruction),
-                 HumanMessage(content=user_message)
-             ]
-             res = await llm.ainvoke(messages)
-             text = res.content
-             used_bedrock = True
+            text, _ = await provider_router.invoke(
+                "metadata",
+                [SystemMessage(content=system_instruction), HumanMessage(content=user_message)],
+                api_key=target_key,
+                json_mode=True
+            )
         except Exception as e:
-             # Only print error if we have no other fallback or for debugging
-             # print(f"Bedrock metadata extraction failed: {e}")
-             pass
-        
-        if not used_bedrock:
-            if not target_key:
-                 print("LLM Service: Bedrock failed and no API Key provided for fallback.")
-                 return {} # No way to proceed
+            print(f"LLM Service: metadata extraction failed: {e}")
+            return {}
 
-            if target_key.startswith("sk-"): # OpenAI
-                llm = ChatOpenAI(api_key=target_key, model="gpt-3.5-turbo", temperature=0)
-                messages = [
-                    SystemMessage(content=system_instruction),
-                    HumanMessage(content=user_message)
-                ]
-                res = await llm.ainvoke(messages)
-                text = res.content
-            elif target_key: # Assume Gemini
-                genai.configure(api_key=target_key)
+        # Clean JSON
+        text = text.replace("```json", "").replace("```", "").strip()
+        print(f"LLM Raw Response: {text}")
+        
+        try:
+            data = json.loads(text)
+            print(f"LLM Service: Parsed Data: {data}")
+            return data
+        except json.JSONDecodeError:
+            print(f"LLM Service: JSON Decode Error. Raw: {text}")
+            # Fallback: try to extract JSON substring if mixed with text
+            match = re.search(r'\{.*\}', text, re.DOTALL)
+            if match:
                 try:
-                    # Try gemini-2.5-flash w/ JSON mode
-                    try:
-                        model = genai.GenerativeModel('gemini-2.5-flash', generation_config={"response_mime_type": "application/json"})
-                        combined_prompt = f"{system_instruction}\n\n{user_message}"
-                        # Check if model supports it (response_mime_type)
-                        res = model.generate_content(combined_prompt)
-                        text = res.text
-                    except Exception as e_model:
-                        print(f"Gemini 2.5 failed ({e_model}), trying gemini-2.5-flash fallback")
-                        model = genai.GenerativeModel('gemini-2.5-flash', generation_config={"response_mime_type": "application/json"})
-                        combined_prompt = f"{system_instruction}\n\n{user_message}"
-                        res = model.generate_content(combined_prompt)
-                        text = res.text
-                except Exception as e:
-                    print(f"Gemini generation failed: {e}")
-                    return {}
-            else: 
-                 return {}
-
-            # Clean JSON
-            text = text.replace("```json", "").replace("```", "").strip()
-            print(f"LLM Raw Response: {text}")
-            
-            try:
-                data = json.loads(text)
-                print(f"LLM Service: Parsed Data: {data}")
-                return data
-            except json.JSONDecodeError:
-                print(f"LLM Service: JSON Decode Error. Raw: {text}")
-                # Fallback: try to extract JSON substring if mixed with text
-                match = re.search(r'\{.*\}', text, re.DOTALL)
-                if match:
-                    try:
-                        return json.loads(match.group())
-                    except:
-                        pass
-                return {}
+                    return json.loads(match.group())
+                except:
+                    pass
+            return {}
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
     async def generate_chunk_enrichment(self, content: str, api_key: Optional[str] = None) -> dict:
         """
         Generate summary, Q&A, and entities for a text chunk.
@@ -266,36 +287,13 @@ Rules:
         user_message = f"Chunk Content:\n{content[:2000]}"
         
         try:
-            used_bedrock = False
-            # 1. Try Bedrock (Nova Pro) First - Always attempt if available
-            try:
-                 # We assume availability of AWS credentials
-                 llm = ChatBedrock(model_id="apac.amazon.nova-pro-v1:0", model_kwargs={"temperature": 0}, config=AWS_CONFIG)
-                 messages = [SystemMessage(content=system_prompt), HumanMessage(content=user_message)]
-                 res = await llm.ainvoke(messages)
-                 text = res.content
-                 used_bedrock = True
-            except Exception as e:
-                 # Only print if we expected it to work or for debugging
-                 # print(f"Bedrock chunk enrichment failed: {e}")
-                 pass
-
-            if not used_bedrock:
-                # Fallback to configured keys
-                if target_key and target_key.startswith("sk-"):
-                    llm = ChatOpenAI(api_key=target_key, model="gpt-3.5-turbo", temperature=0)
-                    messages = [SystemMessage(content=system_prompt), HumanMessage(content=user_message)]
-                    res = await llm.ainvoke(messages)
-                    text = res.content
-                elif target_key:
-                    # Gemini
-                    genai.configure(api_key=target_key)
-                    model = genai.GenerativeModel('gemini-2.5-flash', generation_config={"response_mime_type": "application/json"})
-                    res = model.generate_content(f"{system_prompt}\n\n{user_message}")
-                    text = res.text
-                else:
-                    return {}
-                
+            text, _ = await provider_router.invoke(
+                "enrichment",
+                [SystemMessage(content=system_prompt), HumanMessage(content=user_message)],
+                api_key=target_key,
+                json_mode=True
+            )
+
             import json
             import re
             
@@ -313,7 +311,6 @@ Rules:
             print(f"Chunk enrichment failed: {e}")
             return {}
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
     async def extract_facts_from_text(self, text: str, api_key: Optional[str] = None, reference_date: Optional[datetime] = None) -> List[dict]:
         """
         Extract Atomic Facts (Subject-Predicate-Object) from text.
@@ -364,32 +361,12 @@ Rules:
         user_message = f"Text to Analyze:\n{text[:2000]}"
         
         try:
-            # 1. Try Bedrock (Nova Pro)
-            used_bedrock = False
-            try:
-                llm = ChatBedrock(model_id="apac.amazon.nova-pro-v1:0", model_kwargs={"temperature": 0}, config=AWS_CONFIG)
-                messages = [SystemMessage(content=system_prompt), HumanMessage(content=user_message)]
-                res = await llm.ainvoke(messages)
-                text_response = res.content
-                used_bedrock = True
-            except Exception as e:
-                print(f"Bedrock Fact Extraction Failed: {e}")
-                pass
-                
-            if not used_bedrock:
-                # Fallback
-                if target_key and target_key.startswith("sk-"):
-                    llm = ChatOpenAI(api_key=target_key, model="gpt-3.5-turbo", temperature=0)
-                    messages = [SystemMessage(content=system_prompt), HumanMessage(content=user_message)]
-                    res = await llm.ainvoke(messages)
-                    text_response = res.content
-                elif target_key: # Gemini
-                    genai.configure(api_key=target_key)
-                    model = genai.GenerativeModel('gemini-2.5-flash', generation_config={"response_mime_type": "application/json"})
-                    res = model.generate_content(f"{system_prompt}\n\n{user_message}")
-                    text_response = res.text
-                else:
-                    return []
+            text_response, _ = await provider_router.invoke(
+                "facts",
+                [SystemMessage(content=system_prompt), HumanMessage(content=user_message)],
+                api_key=target_key,
+                json_mode=True
+            )
 
             import json
             import re
@@ -426,12 +403,6 @@ Rules:
         """
         Generate a concise (3-6 words) title for a chat session.
         """
-        target_key = api_key or self.api_key
-        
-        if not target_key:
-            print("Title Generation: No API Key found.")
-            return "New Chat"
-        
         system_prompt = (
             "You are a helpful assistant that generates concise titles for chat sessions. "
             "Generate a short, descriptive title (maximum 6 words) for the provided conversation start. "
@@ -439,30 +410,37 @@ Rules:
         )
         
         try:
-            used_bedrock = False
-             # 1. Try Bedrock
-            if not target_key or (len(target_key) < 10):
-                try:
-                     llm = ChatBedrock(model_id="apac.amazon.nova-pro-v1:0", model_kwargs={"temperature": 0.7}, config=AWS_CONFIG)
-                     messages = [SystemMessage(content=system_prompt), HumanMessage(content=conversation_context)]
-                     res = await llm.ainvoke(messages)
-                     return res.content.strip()
-                except Exception as e:
-                     print(f"Bedrock title gen failed: {e}")
-
-            if target_key and target_key.startswith("sk-"):
-                llm = ChatOpenAI(api_key=target_key, model="gpt-3.5-turbo", temperature=0.7)
-                messages = [SystemMessage(content=system_prompt), HumanMessage(content=conversation_context)]
-                res = await llm.ainvoke(messages)
-                return res.content.strip()
-            else:
-                # Gemini
-                if target_key: genai.configure(api_key=target_key)
-                model = genai.GenerativeModel('gemini-2.5-flash')
-                res = model.generate_content(f"{system_prompt}\n\nConversation:\n{conversation_context}")
-                return res.text.strip()
+            text, _ = await provider_router.invoke(
+                "title",
+                [SystemMessage(content=system_prompt), HumanMessage(content=f"Conversation:\n{conversation_context}")],
+                api_key=api_key,
+                temperature=0.7
+            )
+            return text.strip() or "New Chat"
         except Exception as e:
             print(f"Title generation failed: {e}")
             return "New Chat"
 
+    async def summarize_conversation(self, summary: Optional[str], transcript: str, max_words: int = 200, api_key: Optional[str] = None) -> Optional[str]:
+        """
+        Fold older chat messages into a running summary. Returns None on failure.
+        """
+        system_prompt = (
+            "You maintain a running summary of a conversation between a user and an assistant. "
+            "Update the summary with the new messages. Keep facts, names, decisions, open questions and user preferences; "
+            f"drop pleasantries. Write at most {max_words} words of plain text, no preamble."
+        )
+        user_message = f"Current summary:\n{summary or '(none)'}\n\nNew messages:\n{transcript}"
+
+        try:
+            text, _ = await provider_router.invoke(
+                "summary",
+                [SystemMessage(content=system_prompt), HumanMessage(content=user_message)],
+                api_key=api_key
+            )
+            return text.strip() or None
+        except Exception as e:
+            print(f"Conversation summary failed: {e}")
+            return None
+
 llm_service = LLMService()
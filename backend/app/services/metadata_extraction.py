@@ -61,16 +61,9 @@ class MetadataExtractionService:
             # 3. Get Existing Tags (for context)
             existing_tags = []
             try:
-                result = await db.execute(select(Memory.tags).where(Memory.user_id == user_id).limit(100))
-                all_mem_tags = result.all()
-                tag_set = set()
-                for m in all_mem_tags:
-                    # m is a Row, likely m.tags or m[0]
-                    tags_val = m.tags if hasattr(m, 'tags') else m[0]
-                    if tags_val:
-                        for t in tags_val:
-                            tag_set.add(t)
-                existing_tags = list(tag_set)
+                from app.services.tag_index import tag_index
+                # Most used tags first, so the prompt's tag context keeps the core taxonomy
+                existing_tags = await tag_index.top_tags(db, user_id, limit=100)
             except Exception as e:
                 print(f"Error fetching existing tags: {e}")
 
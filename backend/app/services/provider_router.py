@@ -0,0 +1,268 @@
+"""
+Provider Router: Which model serves an LLM call, and what to do when it fails.
+- Catalog: every model we can call, with a quality level and cost per 1M tokens
+- Tasks ask for a minimum quality (TASK_POLICIES): enrichment / metadata / titles / summaries
+  are fine on the cheapest tier, fact extraction, the fact judge and the chat agent's default
+  model (client_for) need the stronger one
+- Per model: EWMA latency and error rate, and a circuit breaker. The breaker opens after
+  ROUTER_BREAKER_FAILURES consecutive failures, or at once on throttling. It stays open for
+  a cooldown that doubles each time it re-opens. After the cooldown one trial call
+  (half-open) decides whether it closes again.
+- Selection: the cheapest model that meets the tier, has credentials and an open path,
+  preferring ones within the task's latency budget; on failure the next one is tried.
+  A caller's own API key is billed to them, so models on it come after every model on
+  system credentials (Bedrock, system OpenAI / Gemini keys), whatever the price.
+- Clients are built with ROUTER_CLIENT_MAX_RETRIES: a throttled model fails fast and
+  trips its breaker instead of backing off inside the client
+- Cost: tokens and USD actually spent per model (from the response's usage metadata)
+Stats are per process (each API / worker process learns on its own), which is what keeps
+one worker's enrichment jobs off a provider that is throttling it.
+"""
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+# Error text that means "slow down" rather than "broken"
+THROTTLE_MARKERS = ("throttl", "429", "rate limit", "ratelimit", "too many requests", "resource_exhausted", "resourceexhausted", "quota")
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    name: str
+    provider: str  # "bedrock" (system AWS credentials), "openai", "gemini"
+    model_id: str
+    quality: int  # 1 = light tasks, 2 = extraction / judging / chat
+    cost_in: float  # USD per 1M tokens
+    cost_out: float
+
+    @property
+    def cost(self) -> float:
+        return self.cost_in + self.cost_out
+
+
+MODELS = (
+    ModelSpec("nova-lite", "bedrock", "apac.amazon.nova-lite-v1:0", 1, 0.06, 0.24),
+    ModelSpec("gemini-2.5-flash", "gemini", "gemini-2.5-flash", 2, 0.10, 0.30),
+    ModelSpec("gpt-3.5-turbo", "openai", "gpt-3.5-turbo", 1, 0.50, 1.50),
+    ModelSpec("nova-pro", "bedrock", "apac.amazon.nova-pro-v1:0", 2, 0.80, 2.40),
+)
+
+
+@dataclass(frozen=True)
+class TaskPolicy:
+    quality: int
+    latency_budget_ms: int
+
+
+TASK_POLICIES = {
+    "enrichment": TaskPolicy(1, 30_000),
+    "metadata": TaskPolicy(1, 30_000),
+    "summary": TaskPolicy(1, 30_000),
+    "title": TaskPolicy(1, 5_000),
+    "facts": TaskPolicy(2, 30_000),
+    "judge": TaskPolicy(2, 15_000),
+    "chat": TaskPolicy(2, 10_000),
+}
+
+
+class NoProviderAvailable(Exception):
+    pass
+
+
+@dataclass
+class ModelHealth:
+    latency_ms: Optional[float] = None  # EWMA of successful calls
+    error_rate: float = 0.0  # EWMA over calls (1 = failed)
+    calls: int = 0
+    failures: int = 0  # Consecutive
+    state: str = CLOSED
+    opened_at: float = 0.0
+    cooldown: float = 0.0
+    trial_running: bool = False
+    tokens_in: int = 0
+    tokens_out: int = 0
+    cost: float = 0.0  # USD spent, at the catalog rates
+    last_error: Optional[str] = field(default=None, repr=False)
+
+
+def is_throttle(error: Exception) -> bool:
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in THROTTLE_MARKERS)
+
+
+class ProviderRouter:
+    def __init__(self, models=MODELS):
+        self.models = list(models)
+        self.health: Dict[str, ModelHealth] = {m.name: ModelHealth() for m in self.models}
+
+    # --- Health ---
+
+    def _available(self, health: ModelHealth, now: float) -> bool:
+        if health.state == CLOSED:
+            return True
+        if health.state == OPEN and now - health.opened_at >= health.cooldown:
+            health.state = HALF_OPEN
+            health.trial_running = False
+        # Half-open: one trial call at a time
+        return health.state == HALF_OPEN and not health.trial_running
+
+    def record_success(self, spec: ModelSpec, latency_ms: float, usage: Optional[Dict[str, Any]] = None):
+        health = self.health[spec.name]
+        if usage:
+            tokens_in, tokens_out = usage.get("input_tokens") or 0, usage.get("output_tokens") or 0
+            health.tokens_in += tokens_in
+            health.tokens_out += tokens_out
+            health.cost += (tokens_in * spec.cost_in + tokens_out * spec.cost_out) / 1_000_000
+        alpha = settings.ROUTER_EWMA_ALPHA
+        health.latency_ms = latency_ms if health.latency_ms is None else alpha * latency_ms + (1 - alpha) * health.latency_ms
+        health.error_rate = (1 - alpha) * health.error_rate
+        health.calls += 1
+        health.failures = 0
+        health.trial_running = False
+        if health.state != CLOSED:
+            print(f"Provider Router: {spec.name} recovered")
+            health.state, health.cooldown = CLOSED, 0.0
+
+    def record_failure(self, spec: ModelSpec, error: Exception):
+        health = self.health[spec.name]
+        alpha = settings.ROUTER_EWMA_ALPHA
+        health.error_rate = alpha + (1 - alpha) * health.error_rate
+        health.calls += 1
+        health.failures += 1
+        health.trial_running = False
+        health.last_error = str(error)[:200]
+
+        if health.state == HALF_OPEN or is_throttle(error) or health.failures >= settings.ROUTER_BREAKER_FAILURES:
+            if health.state == CLOSED:
+                health.cooldown = settings.ROUTER_BREAKER_COOLDOWN_SECONDS
+            else:
+                health.cooldown = min(max(health.cooldown, settings.ROUTER_BREAKER_COOLDOWN_SECONDS) * 2, settings.ROUTER_BREAKER_MAX_COOLDOWN_SECONDS)
+            health.state, health.opened_at = OPEN, time.monotonic()
+            print(f"Provider Router: {spec.name} open for {health.cooldown:.0f}s: {health.last_error}")
+
+    # --- Selection ---
+
+    def credentials(self, api_key: Optional[str] = None) -> Dict[str, Tuple[Optional[str], bool]]:
+        """
+        (key, is the caller's own) per provider: the caller's key (sk- is OpenAI, anything
+        else Gemini) where given, else the system ones.
+        """
+        keys = {
+            "bedrock": ("system", False),
+            "openai": (settings.OPENAI_API_KEY, False),
+            "gemini": (settings.GEMINI_API_KEY, False)
+        }
+        if api_key:
+            keys["openai" if api_key.startswith("sk-") else "gemini"] = (api_key, True)
+        return keys
+
+    def candidates(self, task: str, api_key: Optional[str] = None) -> List[Tuple[ModelSpec, Optional[str]]]:
+        """
+        Models to try for a task, in order: cheapest first, models on the caller's own key
+        after system ones, models over the latency budget or with a high error rate last.
+        Models behind an open breaker are left out.
+        """
+        policy = TASK_POLICIES.get(task, TASK_POLICIES["chat"])
+        keys = self.credentials(api_key)
+        now = time.monotonic()
+
+        ranked = []
+        for spec in self.models:
+            key, own_key = keys.get(spec.provider, (None, False))
+            if spec.quality < policy.quality or not key or not self._available(self.health[spec.name], now):
+                continue
+            health = self.health[spec.name]
+            degraded = (health.latency_ms or 0) > policy.latency_budget_ms or health.error_rate > settings.ROUTER_MAX_ERROR_RATE
+            ranked.append(((degraded, own_key, spec.cost, health.latency_ms or 0), spec, key))
+        ranked.sort(key=lambda item: item[0])
+        return [(spec, key) for _, spec, key in ranked]
+
+    def _build(self, spec: ModelSpec, key: str, temperature: float, json_mode: bool, max_tokens: Optional[int] = None):
+        retries = settings.ROUTER_CLIENT_MAX_RETRIES
+        if spec.provider == "bedrock":
+            from botocore.config import Config
+            from langchain_aws import ChatBedrock
+            from app.core.aws_config import AWS_CONFIG
+            config = AWS_CONFIG.merge(Config(retries={"max_attempts": retries + 1, "mode": "standard"}))
+            model_kwargs = {"temperature": temperature}
+            if max_tokens:
+                model_kwargs["maxTokens"] = max_tokens
+            return ChatBedrock(model_id=spec.model_id, model_kwargs=model_kwargs, config=config)
+        if spec.provider == "openai":
+            from langchain_openai import ChatOpenAI
+            return ChatOpenAI(api_key=key, model=spec.model_id, temperature=temperature, max_tokens=max_tokens, max_retries=retries)
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        kwargs = {"response_mime_type": "application/json"} if json_mode else {}
+        return ChatGoogleGenerativeAI(google_api_key=key, model=spec.model_id, temperature=temperature,
+                                      max_output_tokens=max_tokens, max_retries=retries, **kwargs)
+
+    def client_for(
+        self,
+        task: str,
+        api_key: Optional[str] = None,
+        temperature: float = 0,
+        max_tokens: Optional[int] = None
+    ) -> Tuple[Any, ModelSpec]:
+        """
+        Client of the best model for callers that drive the model themselves (the chat agent binds
+        tools and streams), so no failover and no recorded outcome. Half-open models are skipped:
+        their trial has to come from invoke(), which records it.
+        """
+        for spec, key in self.candidates(task, api_key):
+            if self.health[spec.name].state != HALF_OPEN:
+                return self._build(spec, key, temperature, False, max_tokens), spec
+        raise NoProviderAvailable(f"No model available for '{task}' (credentials missing or all breakers open)")
+
+    async def invoke(
+        self,
+        task: str,
+        messages: List[Any],
+        api_key: Optional[str] = None,
+        temperature: float = 0,
+        json_mode: bool = False
+    ) -> Tuple[str, ModelSpec]:
+        """
+        Run messages on the best model for the task, failing over down the candidate list.
+        Returns (response text, model used). Raises NoProviderAvailable if every candidate failed.
+        """
+        candidates = self.candidates(task, api_key)
+        if not candidates:
+            raise NoProviderAvailable(f"No model available for '{task}' (credentials missing or all breakers open)")
+
+        errors = []
+        for spec, key in candidates:
+            health = self.health[spec.name]
+            if health.state == HALF_OPEN:
+                if health.trial_running:
+                    continue
+                health.trial_running = True
+            started = time.monotonic()
+            try:
+                res = await self._build(spec, key, temperature, json_mode).ainvoke(messages)
+            except Exception as e:
+                self.record_failure(spec, e)
+                errors.append(f"{spec.name}: {e}")
+                continue
+            finally:
+                # Also when cancelled, so a half-open model is not stuck waiting on its trial
+                health.trial_running = False
+            self.record_success(spec, (time.monotonic() - started) * 1000, getattr(res, "usage_metadata", None))
+            return res.text, spec
+
+        raise NoProviderAvailable(f"All models failed for '{task}': {'; '.join(errors)[:500]}")
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            name: {
+                "state": h.state, "latency_ms": round(h.latency_ms, 1) if h.latency_ms is not None else None,
+                "error_rate": round(h.error_rate, 3), "calls": h.calls, "last_error": h.last_error,
+                "tokens_in": h.tokens_in, "tokens_out": h.tokens_out, "cost": round(h.cost, 6)
+            }
+            for name, h in self.health.items()
+        }
+
+provider_router = ProviderRouter()
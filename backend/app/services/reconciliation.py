@@ -0,0 +1,187 @@
+"""
+Reconciliation Service: Diff vector index ids against SQL (chunks.embedding_id, fact_<id>)
+and repair drift in both directions.
+- Orphan vectors: in the index, no SQL row -> batch delete
+- Ghost chunks/facts: SQL row, no vector -> re-index
+"""
+import time
+from typing import Dict, List, Any, Set
+from sqlalchemy.future import select
+from redis import asyncio as aioredis
+from app.models.document import Chunk
+from app.models.fact import Fact
+from app.services.vector_store import vector_store
+from app.core.config import settings
+
+PENDING_KEY = "reconcile:pending:{kind}"
+
+# SQL keys checked against the index per round trip (ghost pass)
+GHOST_CHECK_BATCH = 1000
+
+
+class ReconciliationService:
+    async def _orphans_in_page(self, page: List[str], db) -> List[str]:
+        """
+        Ids of one index page with no SQL row behind them.
+        """
+        fact_ids = {}
+        chunk_vector_ids = []
+        for vid in page:
+            if vid.startswith("fact_") and vid[5:].isdigit():
+                fact_ids[int(vid[5:])] = vid
+            else:
+                chunk_vector_ids.append(vid)
+
+        known: Set[str] = set()
+        if chunk_vector_ids:
+            rows = await db.execute(select(Chunk.embedding_id).where(Chunk.embedding_id.in_(chunk_vector_ids)))
+            known.update(rows.scalars().all())
+        if fact_ids:
+            rows = await db.execute(select(Fact.id).where(Fact.id.in_(list(fact_ids.keys()))))
+            known.update(fact_ids[fid] for fid in rows.scalars().all())
+
+        return [vid for vid in page if vid not in known]
+
+    async def _confirm(self, redis, kind: str, candidates: List[str]) -> List[str]:
+        """
+        Two-phase confirmation: a difference is only acted on once it has been seen for
+        RECONCILE_GRACE_SECONDS (ingestion writes vectors and rows at different times).
+        Candidates that disappeared since the last run are forgotten.
+        """
+        key = PENDING_KEY.format(kind=kind)
+        now = time.time()
+        first_seen = await redis.hgetall(key)
+
+        current = set(candidates)
+        stale = [c for c in first_seen if c not in current]
+        if stale:
+            await redis.hdel(key, *stale)
+        new = {c: now for c in candidates if c not in first_seen}
+        if new:
+            await redis.hset(key, mapping=new)
+
+        confirmed = [c for c in candidates if c in first_seen and now - float(first_seen[c]) >= settings.RECONCILE_GRACE_SECONDS]
+        return confirmed[:settings.RECONCILE_MAX_REPAIRS]
+
+    async def _forget(self, redis, kind: str, ids: List[str]):
+        if ids:
+            await redis.hdel(PENDING_KEY.format(kind=kind), *ids)
+
+    async def reindex_chunks(self, db, embedding_ids: List[str]) -> int:
+        from sqlalchemy.orm import selectinload
+        from app.services.ingestion import ingestion_service
+
+        stmt = (
+            select(Chunk)
+            .options(selectinload(Chunk.memory), selectinload(Chunk.document))
+            .where(Chunk.embedding_id.in_(embedding_ids))
+        )
+        chunks = (await db.execute(stmt)).scalars().all()
+
+        ids, texts, metadatas = [], [], []
+        for chunk in chunks:
+            owner = chunk.memory or chunk.document
+            if not owner:
+                continue
+            meta = dict(chunk.metadata_json or {})
+            meta["user_id"] = str(owner.user_id)
+            if chunk.chunk_index is not None:
+                meta.setdefault("chunk_index", chunk.chunk_index)
+            ids.append(chunk.embedding_id)
+            texts.append(ingestion_service.build_enriched_text(chunk.text, chunk.summary, chunk.generated_qas))
+            metadatas.append(meta)
+
+        repaired = 0
+        batch = settings.RECONCILE_REINDEX_BATCH
+        for start in range(0, len(ids), batch):
+            if await vector_store.add_documents(ids[start:start + batch], texts[start:start + batch], metadatas[start:start + batch]):
+                repaired += len(ids[start:start + batch])
+        return repaired
+
+    async def reindex_facts(self, db, vector_ids: List[str]) -> int:
+        from app.services.fact_service import fact_service
+
+        fact_ids = [int(vid[5:]) for vid in vector_ids]
+        facts = (await db.execute(select(Fact).where(Fact.id.in_(fact_ids)))).scalars().all()
+
+        payloads = [fact_service.vector_payload(f, f.user_id, source="reconciliation") for f in facts]
+        repaired = 0
+        batch = settings.RECONCILE_REINDEX_BATCH
+        for start in range(0, len(payloads), batch):
+            part = payloads[start:start + batch]
+            if await vector_store.add_documents([p[0] for p in part], [p[1] for p in part], [p[2] for p in part]):
+                repaired += len(part)
+        return repaired
+
+    async def _ghosts(self, result, to_vector_id) -> List[str]:
+        """
+        Page through streamed SQL keys and ask the index which of each page it holds,
+        so memory stays bounded by the page size rather than the index size.
+        """
+        ghosts: List[str] = []
+        async for keys in result.scalars().partitions(GHOST_CHECK_BATCH):
+            vector_ids = [to_vector_id(k) for k in keys]
+            present = await vector_store.existing_ids(vector_ids)
+            ghosts.extend(vid for vid in vector_ids if vid not in present)
+        return ghosts
+
+    async def reconcile(self, db_session_factory, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        1. Stream the index page by page; each page is diffed against SQL (orphans)
+        2. Stream chunk / active fact keys from SQL page by page; each page is fetched from the index (ghosts)
+        3. After the grace period: delete orphans in batches, re-index ghosts
+        Vector ids carry no user prefix, so the index is walked once for all users and
+        ownership comes from SQL.
+        """
+        stats = {"index_vectors": 0, "orphans_seen": 0, "ghosts_seen": 0, "deleted": 0, "reindexed": 0}
+        redis = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+
+        try:
+            # 1. Index -> SQL
+            orphans: List[str] = []
+            async with db_session_factory() as db:
+                async for page in vector_store.list_id_pages():
+                    stats["index_vectors"] += len(page)
+                    orphans.extend(await self._orphans_in_page(page, db))
+            stats["orphans_seen"] = len(orphans)
+
+            # 2. SQL -> Index (only reached if the full listing succeeded)
+            async with db_session_factory() as db:
+                result = await db.stream(
+                    select(Chunk.embedding_id).where(Chunk.embedding_id != None).execution_options(yield_per=GHOST_CHECK_BATCH)
+                )
+                ghost_chunks = await self._ghosts(result, lambda embedding_id: embedding_id)
+
+                result = await db.stream(
+                    select(Fact.id).where(Fact.valid_until == None, Fact.is_superseded == False).execution_options(yield_per=GHOST_CHECK_BATCH)
+                )
+                ghost_facts = await self._ghosts(result, lambda fact_id: f"fact_{fact_id}")
+            stats["ghosts_seen"] = len(ghost_chunks) + len(ghost_facts)
+
+            orphans = await self._confirm(redis, "orphans", orphans)
+            ghost_chunks = await self._confirm(redis, "chunks", ghost_chunks)
+            ghost_facts = await self._confirm(redis, "facts", ghost_facts)
+
+            if dry_run:
+                stats.update({"would_delete": len(orphans), "would_reindex": len(ghost_chunks) + len(ghost_facts)})
+                return stats
+
+            # 3. Repair
+            if orphans:
+                await vector_store.delete(orphans)
+                await self._forget(redis, "orphans", orphans)
+                stats["deleted"] = len(orphans)
+
+            async with db_session_factory() as db:
+                if ghost_chunks:
+                    stats["reindexed"] += await self.reindex_chunks(db, ghost_chunks)
+                    await self._forget(redis, "chunks", ghost_chunks)
+                if ghost_facts:
+                    stats["reindexed"] += await self.reindex_facts(db, ghost_facts)
+                    await self._forget(redis, "facts", ghost_facts)
+
+            return stats
+        finally:
+            await redis.close()
+
+reconciliation_service = ReconciliationService()
@@ -5,6 +5,9 @@ from datetime import datetime, timezone
 from sqlalchemy.orm import selectinload
 from app.models.document import Chunk
 from app.services.vector_store import vector_store
+from app.services.graph_service import graph_service
+from app.services.entity_index import entity_index
+from app.core.config import settings
 
 class RetrievalService:
     async def search_memories(
@@ -21,14 +24,21 @@ class RetrievalService:
         - semantic: Vector Search (Default)
         - state: Fact Store Lookup (Current Truth)
         - episodic: Time-based Memory Log
-        - auto: Hybrid (Logic to select best view, currently defaults to semantic+state)
+        - graph: Multi-hop walk over the Fact graph from entities named in the query
+        - auto: Hybrid (Logic to select best view, currently defaults to semantic+state+graph)
         """
-        if view == "state":
-            return await self._search_state(query, user_id, db, top_k)
+        if view == "graph":
+            return await self._search_graph(query, user_id, db, top_k)
         elif view == "episodic":
             return await self._search_episodic(query, user_id, db, top_k)
+
+        # Entities named in the query (resolved once, shared by state + semantic ranking)
+        entity_match = await self._match_entities(query, user_id, db)
+
+        if view == "state":
+            return await self._search_state(query, user_id, db, top_k, entity_match=entity_match)
         elif view == "semantic":
-            return await self._search_semantic(query, user_id, db, top_k)
+            return await self._search_semantic(query, user_id, db, top_k, entity_match=entity_match)
         else:
             # Auto: Unified Search (Single Vector Call)
             str_user_id = str(user_id)
@@ -41,13 +51,44 @@ class RetrievalService:
             # _search_state needs int user_id for SQL, _search_semantic needs int or str?
             # Let's look at signatures. _search_state(user_id: int). _search_semantic(user_id: int).
             # So pass user_id (int) to both.
-            state_task = self._search_state(query, user_id, db, top_k=3, pre_fetched=unified_results["facts"])
-            semantic_task = self._search_semantic(query, user_id, db, top_k=top_k, pre_fetched=unified_results["memories"])
+            state_task = self._search_state(query, user_id, db, top_k=3, pre_fetched=unified_results["facts"], entity_match=entity_match)
+            semantic_task = self._search_semantic(query, user_id, db, top_k=top_k, pre_fetched=unified_results["memories"], entity_match=entity_match)
             
             results = await asyncio.gather(state_task, semantic_task)
             state_results, semantic_results = results
+
+            # Graph walk runs after the gather: it shares the db session and is in-memory anyway
+            seen_fact_ids = {r["metadata"].get("fact_id") for r in state_results}
+            graph_results = await self._search_graph(query, user_id, db, top_k=3, exclude_fact_ids=seen_fact_ids)
             
-            return state_results + semantic_results
+            return state_results + graph_results + semantic_results
+
+    async def _match_entities(self, query: str, user_id: int, db: AsyncSession) -> Optional[Dict[str, Any]]:
+        try:
+            match = await entity_index.match_query(query, user_id, db)
+            return match if match["entity_ids"] else None
+        except Exception as e:
+            print(f"Entity match failed: {e}")
+            return None
+
+    def _merge_vector_results(self, base: Dict, extra: Dict) -> Dict:
+        """
+        Union of two query()-format results (ids not already in base are appended).
+        """
+        if not extra.get("ids") or not extra["ids"][0]:
+            return base
+        if not base.get("ids") or not base["ids"][0]:
+            return extra
+
+        merged = {key: [list(base[key][0])] if base.get(key) else [[]] for key in ("ids", "distances", "metadatas", "documents", "embeddings")}
+        seen = set(merged["ids"][0])
+        for i, rid in enumerate(extra["ids"][0]):
+            if rid in seen:
+                continue
+            for key in merged:
+                if extra.get(key) and extra[key][0]:
+                    merged[key][0].append(extra[key][0][i])
+        return merged
 
     async def _search_unified(self, query: str, user_id: str, top_k: int) -> Dict[str, Any]:
         """
@@ -88,12 +129,12 @@ class RetrievalService:
                 
         return {"facts": facts_res, "memories": mems_res}
 
-    async def _search_state(self, query: str, user_id: int, db: AsyncSession, top_k: int = 5, pre_fetched: Dict = None) -> List[Dict[str, Any]]:
+    async def _search_state(self, query: str, user_id: int, db: AsyncSession, top_k: int = 5, pre_fetched: Dict = None, entity_match: Dict = None) -> List[Dict[str, Any]]:
         """
         Search for current truths (Facts) using Hybrid Strategy:
         1. Semantic Search (Vector Store) -> Finds "parade" from "procession"
-        2. Keyword Search (SQL) -> Finds exact matches
-        3. Merge & Rank (Semantic + Recency)
+        2. Entity Postings -> Facts whose subject is named in the query
+        3. Merge & Rank (Semantic + Entity + Recency)
         """
         from app.models.fact import Fact
         from sqlalchemy import or_
@@ -133,16 +174,21 @@ class RetrievalService:
              print(f"Vector search for facts failed: {e}")
              return []
 
-        if not semantic_fact_ids:
+        # Facts about a named entity the vector search missed (newest postings first)
+        entity_fact_ids = []
+        if entity_match:
+            entity_fact_ids = sorted(entity_match["fact_ids"] - set(semantic_fact_ids), reverse=True)[:top_k]
+
+        if not semantic_fact_ids and not entity_fact_ids:
             return []
 
         # 2. SQL Hydration (Get actual Fact objects)
-        # We ONLY fetch what Vector Store found. No fuzzy keyword search.
+        # We ONLY fetch what Vector Store / Entity Index found. No fuzzy keyword search.
         filters = [
             Fact.user_id == user_id, 
             Fact.valid_until == None,
             Fact.is_superseded == False,
-            Fact.id.in_(semantic_fact_ids)
+            Fact.id.in_(semantic_fact_ids + entity_fact_ids)
         ]
         
         # Fetch Facts with Eager Loading of Chunk for context
@@ -166,6 +212,9 @@ class RetrievalService:
                 # Optional: Add raw vector score?
                 # score += fact_score_map[f.id] * 0.5 
  
+            # Entity Boost: subject is named in the query
+            if entity_match and f.id in entity_match["fact_ids"]:
+                score += 1.0
             
             # Recency Boost (User Request: "recent one should be given more score")
             # Logic: Add up to +0.5 score for facts within last 30 days.
@@ -266,11 +315,80 @@ class RetrievalService:
                  stmt = update(Fact).where(Fact.id.in_(facts_to_supersede)).values(is_superseded=True)
                  await db.execute(stmt)
                  await db.commit()
+                 graph_service.remove_facts(user_id, facts_to_supersede)
              except Exception as e:
                  print(f"Cleanup Failed: {e}")
 
         return results
 
+    async def _search_graph(self, query: str, user_id: int, db: AsyncSession, top_k: int = 5, exclude_fact_ids: set = None) -> List[Dict[str, Any]]:
+        """
+        Answer multi-hop questions with a bounded BFS over the user's Fact graph.
+        1. Match entities named in the query against graph nodes
+        2. Expand (hop/fan-out capped) from those seeds
+        3. Hydrate active Facts from SQL and rank by hop distance + query overlap
+        """
+        from app.models.fact import Fact
+
+        try:
+            walk = await graph_service.expand_query(query, user_id, db)
+        except Exception as e:
+            print(f"Graph expansion failed: {e}")
+            return []
+
+        reached = walk["facts"]
+        if exclude_fact_ids:
+            reached = {fid: hop for fid, hop in reached.items() if fid not in exclude_fact_ids}
+        if not reached:
+            return []
+
+        stmt = select(Fact).options(selectinload(Fact.chunk)).where(
+            Fact.user_id == user_id,
+            Fact.valid_until == None,
+            Fact.is_superseded == False,
+            Fact.id.in_(list(reached.keys()))
+        )
+        result = await db.execute(stmt)
+        facts = result.scalars().all()
+
+        query_terms = set(query.lower().split())
+
+        ranked = []
+        for f in facts:
+            hop = reached[f.id]
+            score = (f.confidence or 1.0) + 2.0 / hop
+
+            # Edges that also touch other query terms are likely the "bridge" of a multi-hop question
+            fact_terms = set(f"{f.predicate} {f.object} {f.subject}".lower().replace("_", " ").split())
+            if query_terms:
+                score += 0.5 * len(query_terms & fact_terms) / len(query_terms)
+
+            ranked.append((f, hop, score))
+
+        ranked.sort(key=lambda x: (x[2], x[0].valid_from or datetime.min, x[0].id), reverse=True)
+
+        results = []
+        for f, hop, score in ranked[:top_k]:
+            text = f"{f.subject} {f.predicate} {f.object}"
+            if f.valid_from:
+                date_str = f.valid_from.astimezone().strftime('%Y-%m-%d')
+                text += f" (This event took place on {date_str})"
+
+            results.append({
+                "text": text,
+                "score": score,
+                "metadata": {
+                    "type": "fact",
+                    "fact_id": f.id,
+                    "confidence": f.confidence,
+                    "valid_from": str(f.valid_from),
+                    "hop": hop,
+                    "graph_seeds": walk["seeds"]
+                },
+                "chunk": f.chunk
+            })
+        return results
+
     async def _search_episodic(self, query: str, user_id: int, db: AsyncSession, top_k: int = 5) -> List[Dict[str, Any]]:
         """
         Search Memories primarily by time/recency matching query constraints?
@@ -303,7 +421,7 @@ class RetrievalService:
             })
         return results
 
-    async def _search_semantic(self, query: str, user_id: int, db: AsyncSession, top_k: int = 5, pre_fetched: Dict = None) -> List[Dict[str, Any]]:
+    async def _search_semantic(self, query: str, user_id: int, db: AsyncSession, top_k: int = 5, pre_fetched: Dict = None, entity_match: Dict = None) -> List[Dict[str, Any]]:
         # 1. Fetch Candidates (or use pre-fetched)
         fetch_k = top_k * 10
         
@@ -317,6 +435,15 @@ class RetrievalService:
                 where={"user_id": user_id},
                 include_values=True # Required for MMR
             )
+
+        # Entity Pre-filter: if the query names entities with a small posting set,
+        # score those chunks directly so they compete even when outside the global top-k
+        if entity_match and 0 < len(entity_match["embedding_ids"]) <= settings.ENTITY_PREFILTER_MAX:
+            fetched_ids = set(results["ids"][0]) if results.get("ids") else set()
+            missing = [eid for eid in entity_match["embedding_ids"] if eid not in fetched_ids]
+            if missing:
+                direct = await vector_store.score_ids(query, missing)
+                results = self._merge_vector_results(results, direct)
         
         if not results.get("ids") or not results["ids"][0]:
             return []
@@ -457,7 +584,11 @@ class RetrievalService:
                     days_diff = (now - created_at).days
                     recency_mod = 1 + (0.1 / max(1, days_diff))
                 
-                final_score = base_score * feedback_mod * (0.5 + trust_mod) * recency_mod
+                entity_mod = 1.0
+                if entity_match and chunk.id in entity_match["chunk_ids"]:
+                    entity_mod = settings.ENTITY_BOOST
+
+                final_score = base_score * feedback_mod * (0.5 + trust_mod) * recency_mod * entity_mod
                 
                 meta = candidate_metadatas[i]
                 meta["summary"] = chunk.summary
@@ -465,6 +596,8 @@ class RetrievalService:
                 meta["trust_score"] = chunk.trust_score
                 meta["memory_id"] = chunk.id
                 meta["recency_boost"] = round(recency_mod, 2)
+                if entity_mod != 1.0:
+                    meta["entity_match"] = entity_match["names"]
                 
                 display_text = chunk.text
                 if created_at:
@@ -0,0 +1,188 @@
+"""
+Vault Snapshots: Portable backup / migration format that carries the embeddings.
+
+<snapshot dir>/
+  manifest.json             format, version, counts, embedding dtype/dim
+  memories.ndjson           export records (services/export_service.py), one per line
+  documents.ndjson
+  chunks.ndjson
+  facts.ndjson
+  chunks.npy                (n_chunks, dim) float16|float32, row i = line i of chunks.ndjson
+  chunks_mask.npy           (n_chunks,) bool, False where the index had no vector
+  facts.npy / facts_mask.npy
+
+Embedding matrices are written and read through memory maps, so neither side holds a
+vault's vectors in RAM. Restore bulk-loads SQL and the vector index from the files alone:
+no enrichment, no embedding calls.
+"""
+import json
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Optional, Tuple
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+
+SNAPSHOT_FORMAT = "brain_vault_snapshot"
+SNAPSHOT_VERSION = 1
+
+RECORD_FILES = {"memory": "memories.ndjson", "document": "documents.ndjson", "chunk": "chunks.ndjson", "fact": "facts.ndjson"}
+MATRIX_FILES = {"chunk": "chunks", "fact": "facts"}
+
+# Rows copied per block when finalizing a matrix
+COPY_BLOCK = 4096
+
+
+class _MatrixWriter:
+    """
+    Append-only embedding matrix: rows are streamed to a raw file, then wrapped into a .npy
+    (the row count is only known at the end). Rows without a vector are zero and masked out.
+    """
+    def __init__(self, directory: str, name: str, dtype: str):
+        self.npy_path = os.path.join(directory, f"{name}.npy")
+        self.mask_path = os.path.join(directory, f"{name}_mask.npy")
+        self.raw_path = self.npy_path + ".tmp"
+        self.dtype = np.dtype(dtype)
+        self.dim: Optional[int] = None
+        self.mask = []
+        self._pending_empty = 0
+        self._raw = open(self.raw_path, "wb")
+
+    def append(self, vector: Optional[list]):
+        if vector and self.dim is None:
+            self.dim = len(vector)
+            # Rows seen before the dimension was known
+            self._raw.write(np.zeros((self._pending_empty, self.dim), dtype=self.dtype).tobytes())
+            self._pending_empty = 0
+
+        has_vector = bool(vector) and len(vector) == self.dim
+        self.mask.append(has_vector)
+        if self.dim is None:
+            self._pending_empty += 1
+        elif has_vector:
+            self._raw.write(np.asarray(vector, dtype=self.dtype).tobytes())
+        else:
+            self._raw.write(np.zeros(self.dim, dtype=self.dtype).tobytes())
+
+    def close(self) -> Dict[str, Any]:
+        self._raw.close()
+        rows = len(self.mask)
+        try:
+            if self.dim is None or rows == 0:
+                return {"rows": rows, "dim": None, "vectors": 0}
+
+            raw = np.memmap(self.raw_path, dtype=self.dtype, mode="r", shape=(rows, self.dim))
+            out = np.lib.format.open_memmap(self.npy_path, mode="w+", dtype=self.dtype, shape=(rows, self.dim))
+            for start in range(0, rows, COPY_BLOCK):
+                out[start:start + COPY_BLOCK] = raw[start:start + COPY_BLOCK]
+            out.flush()
+            del raw, out
+            np.save(self.mask_path, np.asarray(self.mask, dtype=bool))
+            return {"rows": rows, "dim": self.dim, "vectors": int(sum(self.mask))}
+        finally:
+            os.remove(self.raw_path)
+
+
+class VaultSnapshot:
+    """
+    Reader for a snapshot directory.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"{path} is not a vault snapshot")
+        if self.manifest.get("version", 0) > SNAPSHOT_VERSION:
+            raise ValueError(f"Snapshot version {self.manifest['version']} is newer than supported ({SNAPSHOT_VERSION})")
+
+    def records(self, kind: str) -> Iterator[Dict[str, Any]]:
+        file_path = os.path.join(self.path, RECORD_FILES[kind])
+        if not os.path.exists(file_path):
+            return
+        with open(file_path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def embeddings(self, kind: str) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """
+        (matrix, mask) memory-mapped read-only, or (None, None) if the snapshot has no vectors of that kind.
+        """
+        name = MATRIX_FILES[kind]
+        npy_path = os.path.join(self.path, f"{name}.npy")
+        if not os.path.exists(npy_path):
+            return None, None
+        return np.load(npy_path, mmap_mode="r"), np.load(os.path.join(self.path, f"{name}_mask.npy"), mmap_mode="r")
+
+    def iter_archive(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        (kind, record) in export order, with record["embedding"] attached from the matrices,
+        i.e. the stream services/import_service.py consumes.
+        """
+        for kind in ("memory", "document", "chunk", "fact"):
+            matrix, mask = self.embeddings(kind) if kind in MATRIX_FILES else (None, None)
+            for i, record in enumerate(self.records(kind)):
+                if matrix is not None and i < len(mask) and mask[i]:
+                    record["embedding"] = matrix[i].astype(np.float32).tolist()
+                yield kind, record
+
+
+class SnapshotService:
+    async def create(self, user_id: int, path: str, dtype: str = "float16") -> Dict[str, Any]:
+        """
+        Write a snapshot of the user's vault to `path` (created if missing).
+        Records stream from the export service; vectors are fetched from the index per batch.
+        """
+        from app.services.export_service import export_service, EXPORT_FORMAT_VERSION
+
+        if dtype not in ("float16", "float32"):
+            raise ValueError("dtype must be float16 or float32")
+        os.makedirs(path, exist_ok=True)
+
+        files = {kind: open(os.path.join(path, name), "w", encoding="utf-8") for kind, name in RECORD_FILES.items()}
+        matrices = {kind: _MatrixWriter(path, name, dtype) for kind, name in MATRIX_FILES.items()}
+        counts = {kind: 0 for kind in RECORD_FILES}
+        try:
+            records = export_service.iter_records(user_id, include_chunks=True, include_facts=True, include_embeddings=True)
+            async for kind, record in records:
+                if kind in matrices:
+                    matrices[kind].append(record.pop("embedding", None))
+                files[kind].write(json.dumps(record, default=str) + "\n")
+                counts[kind] += 1
+        finally:
+            for f in files.values():
+                f.close()
+            matrix_info = {kind: writer.close() for kind, writer in matrices.items()}
+
+        manifest = {
+            "format": SNAPSHOT_FORMAT,
+            "version": SNAPSHOT_VERSION,
+            "record_version": EXPORT_FORMAT_VERSION,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "source_user_id": user_id,
+            "counts": counts,
+            "embedding_dtype": dtype,
+            "embeddings": matrix_info
+        }
+        with open(os.path.join(path, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+    async def restore(self, db: AsyncSession, user_id: int, path: str) -> Dict[str, Any]:
+        """
+        Load a snapshot into the user's vault: SQL rows in batches, stored vectors upserted as-is.
+        Nothing is queued for ingestion; rows whose vectors were missing from the snapshot
+        are reported (and later re-indexed by the reconciliation job).
+        """
+        from app.services.import_service import import_service
+
+        snapshot = VaultSnapshot(path)
+        return await import_service.import_archive(
+            db,
+            user_id,
+            snapshot.iter_archive(),
+            reuse_embeddings=True,
+            ingest_missing=False
+        )
+
+snapshot_service = SnapshotService()
@@ -0,0 +1,278 @@
+"""
+Tag Index: Normalized per-user tags (tags / memory_tags) with usage counts.
+Memory.tags / Document.tags stay the source of truth; the index is kept in sync on every
+ORM flush, so tag listing, autocomplete and tag filters are index lookups instead of
+whole-vault JSON scans.
+"""
+import ast
+import json
+from collections import defaultdict
+from typing import Dict, List, Any, Iterable, Optional
+from sqlalchemy import event, inspect, delete, update, insert, exists, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session
+from app.models.tag import Tag, MemoryTag
+from app.models.memory import Memory
+from app.models.document import Document
+
+# Owner model -> (link column, count column)
+TAGGED = {
+    Memory: ("memory_id", "memory_count"),
+    Document: ("document_id", "document_count"),
+}
+
+# Max ids per IN() clause / rows per INSERT
+SQL_BATCH = 1000
+
+
+def clean_tags(tags: Any) -> List[str]:
+    """
+    Tag list as stored in a JSON column -> unique, stripped tag names (order kept).
+    Accepts the legacy string forms too ('["a", "b"]', "['a', 'b']", "a, b").
+    """
+    if not tags:
+        return []
+    if isinstance(tags, str):
+        try:
+            tags = json.loads(tags)
+        except ValueError:
+            try:
+                tags = ast.literal_eval(tags)
+            except (ValueError, SyntaxError):
+                tags = tags.split(",")
+        if isinstance(tags, str):
+            tags = [tags]
+    if not isinstance(tags, (list, tuple, set)):
+        return []
+
+    result = []
+    for tag in tags:
+        if not isinstance(tag, str):
+            continue
+        tag = tag.strip()
+        if tag and tag not in result:
+            result.append(tag)
+    return result
+
+
+def _insert_ignore(conn, rows: List[Dict[str, Any]]):
+    """
+    INSERT tags, skipping names the user already has (concurrent writers race on uq_tags_user_name).
+    """
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        # No portable ON CONFLICT: insert what is missing right now
+        user_id = rows[0]["user_id"]
+        existing = set(conn.execute(
+            select(Tag.name).where(Tag.user_id == user_id, Tag.name.in_([r["name"] for r in rows]))
+        ).scalars().all())
+        missing = [r for r in rows if r["name"] not in existing]
+        if missing:
+            conn.execute(insert(Tag), missing)
+        return
+    conn.execute(dialect_insert(Tag).on_conflict_do_nothing(index_elements=["user_id", "name"]), rows)
+
+
+class TagIndexService:
+    # --- Write path (sync, runs inside the ORM flush) ---
+
+    def _ensure_tags(self, conn, user_id: int, names: List[str]) -> Dict[str, int]:
+        """
+        Get-or-create Tag rows, returns {name: tag_id}.
+        """
+        rows = [{"user_id": user_id, "name": n, "normalized": n.lower(), "memory_count": 0, "document_count": 0} for n in names]
+        _insert_ignore(conn, rows)
+        result = conn.execute(select(Tag.id, Tag.name).where(Tag.user_id == user_id, Tag.name.in_(names)))
+        return {name: tag_id for tag_id, name in result.all()}
+
+    def _adjust_counts(self, conn, count_column: str, tag_ids: Iterable[int], delta: int):
+        tag_ids = list(tag_ids)
+        if not tag_ids:
+            return
+        column = getattr(Tag, count_column)
+        conn.execute(update(Tag).where(Tag.id.in_(tag_ids)).values({count_column: column + delta}))
+
+    def sync_links(self, conn, user_id: int, model, owner_id: int, tags: Any):
+        """
+        Make the links of one Memory/Document match its tags and adjust the counts by the diff.
+        """
+        link_column, count_column = TAGGED[model]
+        owner_column = getattr(MemoryTag, link_column)
+        wanted = clean_tags(tags)
+
+        current = conn.execute(
+            select(Tag.name, Tag.id).join(MemoryTag, MemoryTag.tag_id == Tag.id).where(owner_column == owner_id)
+        ).all()
+        current = {name: tag_id for name, tag_id in current}
+
+        removed = [tag_id for name, tag_id in current.items() if name not in wanted]
+        if removed:
+            conn.execute(delete(MemoryTag).where(owner_column == owner_id, MemoryTag.tag_id.in_(removed)))
+            self._adjust_counts(conn, count_column, removed, -1)
+
+        added = [name for name in wanted if name not in current]
+        if added:
+            tag_ids = self._ensure_tags(conn, user_id, added)
+            conn.execute(insert(MemoryTag), [
+                {"user_id": user_id, "tag_id": tag_ids[name], link_column: owner_id}
+                for name in added if name in tag_ids
+            ])
+            self._adjust_counts(conn, count_column, tag_ids.values(), 1)
+
+    def _before_flush(self, session: Session, flush_context, instances):
+        # Deleted owners: unlink before the row goes (FK cascades would drop links without fixing counts)
+        deleted = [obj for obj in session.deleted if type(obj) in TAGGED and obj.id is not None]
+        if not deleted:
+            return
+        conn = session.connection()
+        for obj in deleted:
+            self.sync_links(conn, obj.user_id, type(obj), obj.id, None)
+
+    def _after_flush(self, session: Session, flush_context):
+        # New / re-tagged owners: ids are assigned now, attribute history still shows the change
+        changed = [obj for obj in session.new if type(obj) in TAGGED and obj.tags]
+        changed += [
+            obj for obj in session.dirty
+            if type(obj) in TAGGED and inspect(obj).attrs.tags.history.has_changes()
+        ]
+        if not changed:
+            return
+        conn = session.connection()
+        for obj in changed:
+            self.sync_links(conn, obj.user_id, type(obj), obj.id, obj.tags)
+
+    # --- Bulk deletes (core DELETE statements bypass the flush hooks) ---
+
+    async def unlink(self, db: AsyncSession, memory_ids: List[int] = (), document_ids: List[int] = ()):
+        """
+        Remove the links of memories/documents about to be bulk-deleted and decrement the counts.
+        """
+        for model, ids in ((Memory, list(memory_ids)), (Document, list(document_ids))):
+            link_column, count_column = TAGGED[model]
+            owner_column = getattr(MemoryTag, link_column)
+            for start in range(0, len(ids), SQL_BATCH):
+                batch = ids[start:start + SQL_BATCH]
+                per_tag = await db.execute(
+                    select(MemoryTag.tag_id, func.count(MemoryTag.id))
+                    .where(owner_column.in_(batch))
+                    .group_by(MemoryTag.tag_id)
+                )
+                by_delta = defaultdict(list)
+                for tag_id, n in per_tag.all():
+                    by_delta[n].append(tag_id)
+                for n, tag_ids in by_delta.items():
+                    column = getattr(Tag, count_column)
+                    await db.execute(update(Tag).where(Tag.id.in_(tag_ids)).values({count_column: column - n}))
+                await db.execute(delete(MemoryTag).where(owner_column.in_(batch)))
+
+    async def drop_user(self, db: AsyncSession, user_id: int):
+        await db.execute(delete(MemoryTag).where(MemoryTag.user_id == user_id))
+        await db.execute(delete(Tag).where(Tag.user_id == user_id))
+
+    # --- Read path ---
+
+    def has_tag(self, owner_id_column, user_id: int, tag: str):
+        """
+        EXISTS clause "owner carries tag" for Memory.id / Document.id,
+        resolved through uq_tags_user_name + ix_memory_tags_tag_*.
+        """
+        link_column = MemoryTag.memory_id if owner_id_column.class_ is Memory else MemoryTag.document_id
+        return exists().where(
+            Tag.user_id == user_id,
+            Tag.name == tag.strip(),
+            MemoryTag.tag_id == Tag.id,
+            link_column == owner_id_column
+        )
+
+    async def list_tags(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        prefix: Optional[str] = None,
+        limit: Optional[int] = None,
+        kind: str = "memory",
+        by_count: bool = False
+    ) -> List[Tag]:
+        """
+        Tags in use by `kind` ("memory", "document" or "all"), optionally filtered by a
+        case-insensitive name prefix. Sorted by name, or by usage when by_count is set.
+        """
+        usage = {
+            "memory": Tag.memory_count,
+            "document": Tag.document_count,
+            "all": Tag.memory_count + Tag.document_count
+        }[kind]
+
+        stmt = select(Tag).where(Tag.user_id == user_id, usage > 0)
+        if prefix:
+            stmt = stmt.where(Tag.normalized.startswith(prefix.strip().lower(), autoescape=True))
+        stmt = stmt.order_by(usage.desc(), Tag.name) if by_count else stmt.order_by(Tag.normalized, Tag.name)
+        if limit:
+            stmt = stmt.limit(limit)
+        return (await db.execute(stmt)).scalars().all()
+
+    async def tag_names(self, db: AsyncSession, user_id: int, prefix: Optional[str] = None, limit: Optional[int] = None) -> List[str]:
+        """
+        Sorted names of all tags used by the user's memories.
+        """
+        tags = await self.list_tags(db, user_id, prefix=prefix, limit=limit)
+        return sorted(t.name for t in tags)
+
+    async def top_tags(self, db: AsyncSession, user_id: int, limit: int = 100) -> List[str]:
+        """
+        Most used tags across memories and documents (taxonomy context for metadata extraction).
+        """
+        tags = await self.list_tags(db, user_id, limit=limit, kind="all", by_count=True)
+        return [t.name for t in tags]
+
+    async def rebuild_user_tags(self, db: AsyncSession, user_id: int) -> int:
+        """
+        Rebuild the user's tags and links from Memory.tags / Document.tags
+        (vaults written before the index existed, or after drift). Returns the number of tags.
+        """
+        await self.drop_user(db, user_id)
+
+        counts: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+        links = []
+        for slot, model in enumerate((Memory, Document)):
+            result = await db.stream(
+                select(model.id, model.tags).where(model.user_id == user_id, model.tags != None).execution_options(yield_per=1000)
+            )
+            async for owner_id, tags in result:
+                for name in clean_tags(tags):
+                    counts[name][slot] += 1
+                    links.append((name, slot, owner_id))
+
+        if counts:
+            names = list(counts)
+            for start in range(0, len(names), SQL_BATCH):
+                await db.execute(insert(Tag), [
+                    {"user_id": user_id, "name": n, "normalized": n.lower(), "memory_count": counts[n][0], "document_count": counts[n][1]}
+                    for n in names[start:start + SQL_BATCH]
+                ])
+            tag_ids = dict((await db.execute(select(Tag.name, Tag.id).where(Tag.user_id == user_id))).all())
+            rows = [
+                {
+                    "user_id": user_id,
+                    "tag_id": tag_ids[name],
+                    "memory_id": owner_id if slot == 0 else None,
+                    "document_id": owner_id if slot == 1 else None
+                }
+                for name, slot, owner_id in links
+            ]
+            for start in range(0, len(rows), SQL_BATCH):
+                await db.execute(insert(MemoryTag), rows[start:start + SQL_BATCH])
+
+        await db.commit()
+        return len(counts)
+
+tag_index = TagIndexService()
+
+# Every Session (AsyncSession runs on a sync Session underneath) keeps the index in sync
+event.listen(Session, "before_flush", tag_index._before_flush)
+event.listen(Session, "after_flush", tag_index._after_flush)
@@ -0,0 +1,115 @@
+"""
+Token Counter: One place to count tokens for budgets, usage tracking and chunk sizes.
+- Encoders are loaded once per process per encoding (not per call) and shared by model family
+- count_batch() encodes lists of texts in one call (tiktoken's threaded batch encoder)
+- approximate=True skips the encoder: chars / chars-per-token, where the ratio is calibrated
+  per encoding from the exact counts seen so far (see CALIBRATION_MIN_CHARS)
+Models without a public tokenizer (Gemini, Bedrock / Nova, Claude) are counted with
+cl100k_base, which is within a few percent for English text.
+"""
+import math
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+DEFAULT_ENCODING = "cl100k_base"
+
+# Model name prefix -> encoding (first match wins, so longer prefixes come first)
+MODEL_ENCODINGS = (
+    ("gpt-4o", "o200k_base"),
+    ("gpt-4.1", "o200k_base"),
+    ("o1", "o200k_base"),
+    ("o3", "o200k_base"),
+    ("gpt-4", "cl100k_base"),
+    ("gpt-3.5", "cl100k_base"),
+    ("text-embedding", "cl100k_base"),
+)
+
+# Starting chars-per-token ratios, used until enough text has been counted exactly
+DEFAULT_CHARS_PER_TOKEN = {"cl100k_base": 4.0, "o200k_base": 4.2}
+# Exactly-counted characters after which the observed ratio replaces the default
+CALIBRATION_MIN_CHARS = 20_000
+# Texts at or below this length are always counted exactly (the estimate is noisiest there)
+APPROXIMATE_MIN_CHARS = 256
+
+
+def encoding_name_for(model: Optional[str]) -> str:
+    if not model:
+        return DEFAULT_ENCODING
+    model = model.lower()
+    for prefix, name in MODEL_ENCODINGS:
+        if model.startswith(prefix):
+            return name
+    return DEFAULT_ENCODING
+
+
+@lru_cache(maxsize=None)
+def _encoding(name: str):
+    # Loaded once per process; None (cached too) if tiktoken / its BPE file is unavailable
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        print(f"Token Counter: {name} unavailable, estimating tokens: {e}")
+        return None
+
+
+class TokenCounter:
+    def __init__(self):
+        # encoding name -> [exactly counted chars, tokens]
+        self._observed: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def count(self, text: str, model: Optional[str] = None, approximate: bool = False) -> int:
+        if not text:
+            return 0
+        name = encoding_name_for(model)
+        if approximate and len(text) > APPROXIMATE_MIN_CHARS:
+            return self._estimate(text, name)
+        encoding = _encoding(name)
+        if encoding is None:
+            return self._estimate(text, name)
+        tokens = len(encoding.encode_ordinary(text))
+        self._observe(name, len(text), tokens)
+        return tokens
+
+    def count_batch(self, texts: List[str], model: Optional[str] = None, approximate: bool = False) -> List[int]:
+        """
+        Token counts for many texts at once (one encoder call instead of one per text).
+        """
+        name = encoding_name_for(model)
+        encoding = _encoding(name)
+        if approximate or encoding is None:
+            return [self.count(text, model, approximate=True) for text in texts]
+
+        counts = [0] * len(texts)
+        todo = [i for i, text in enumerate(texts) if text]
+        if todo:
+            encoded = encoding.encode_ordinary_batch([texts[i] for i in todo])
+            for i, tokens in zip(todo, encoded):
+                counts[i] = len(tokens)
+            self._observe(name, sum(len(texts[i]) for i in todo), sum(counts))
+        return counts
+
+    def chars_per_token(self, model: Optional[str] = None) -> float:
+        """
+        Ratio used by approximate counts: observed once calibrated, else the default.
+        """
+        return self._ratio(encoding_name_for(model))
+
+    def _ratio(self, name: str) -> float:
+        chars, tokens = self._observed.get(name, (0, 0))
+        if chars >= CALIBRATION_MIN_CHARS and tokens:
+            return chars / tokens
+        return DEFAULT_CHARS_PER_TOKEN.get(name, 4.0)
+
+    def _estimate(self, text: str, name: str) -> int:
+        return math.ceil(len(text) / self._ratio(name))
+
+    def _observe(self, name: str, chars: int, tokens: int):
+        with self._lock:
+            observed = self._observed.setdefault(name, [0, 0])
+            observed[0] += chars
+            observed[1] += tokens
+
+token_counter = TokenCounter()
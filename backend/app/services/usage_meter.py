@@ -0,0 +1,181 @@
+"""
+Usage Meter: Per-user LLM budget and usage counters in Redis.
+- Budget: a token bucket per user (capacity MAX_DAILY_TOKENS, refilled continuously over
+  24h), so "has the user spent their daily tokens" is one O(1) read instead of a SUM
+- Counters: hourly hashes per user (tokens / cost / calls), kept USAGE_COUNTER_HOURS
+- Rows: each call is queued in Redis and written to user_usage in batches
+  (maintenance flush_usage_task), not one session + commit per LLM call. A batch is moved
+  to a processing list first and deleted from it only after the INSERT commits, so a killed
+  flush loses nothing (the next run writes the leftover batch first; at-least-once).
+Every call is recorded by one Lua script, so bucket, counters and queue change atomically.
+"""
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+
+PENDING_KEY = "usage:pending"
+PROCESSING_KEY = "usage:processing"
+
+# KEYS: bucket, hour counter, pending list
+# ARGV: capacity, refill per second, now, tokens, cost, row json, counter ttl
+RECORD_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'level', 'ts')
+local level = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+level = math.min(capacity, level + math.max(0, now - ts) * tonumber(ARGV[2])) - tonumber(ARGV[4])
+redis.call('HSET', KEYS[1], 'level', level, 'ts', now)
+redis.call('EXPIRE', KEYS[1], 172800)
+redis.call('HINCRBY', KEYS[2], 'tokens', ARGV[4])
+redis.call('HINCRBYFLOAT', KEYS[2], 'cost', ARGV[5])
+redis.call('HINCRBY', KEYS[2], 'calls', 1)
+redis.call('EXPIRE', KEYS[2], ARGV[7])
+redis.call('RPUSH', KEYS[3], ARGV[6])
+return tostring(level)
+"""
+
+# KEYS: bucket; ARGV: capacity, refill per second, now
+PEEK_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local state = redis.call('HMGET', KEYS[1], 'level', 'ts')
+if not state[1] then return tostring(capacity) end
+local level = tonumber(state[1]) + math.max(0, tonumber(ARGV[3]) - tonumber(state[2])) * tonumber(ARGV[2])
+return tostring(math.min(capacity, level))
+"""
+
+
+# KEYS: pending list, processing list; ARGV: batch size
+# Moves up to a batch from the head of pending to processing (LMOVE, batched) and returns it
+CLAIM_SCRIPT = """
+local items = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #items > 0 then
+    redis.call('LTRIM', KEYS[1], #items, -1)
+    redis.call('RPUSH', KEYS[2], unpack(items))
+end
+return items
+"""
+
+
+def _bucket_key(user_id: int) -> str:
+    return f"usage:bucket:{user_id}"
+
+
+def _hour_key(user_id: int, hour: int) -> str:
+    return f"usage:hour:{user_id}:{hour}"
+
+
+class UsageMeter:
+    def __init__(self):
+        self._redis = None
+        self._loop = None
+
+    def _client(self):
+        # Async clients are bound to their event loop (Celery's run_async uses a fresh one per
+        # task; those tasks call close() before their loop ends)
+        loop = asyncio.get_running_loop()
+        if self._redis is None or self._loop is not loop:
+            from redis import asyncio as aioredis
+            self._redis = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+            self._loop = loop
+        return self._redis
+
+    async def close(self):
+        """
+        Close this loop's client and its connections.
+        """
+        if self._redis is not None and self._loop is asyncio.get_running_loop():
+            await self._redis.aclose()
+        self._redis, self._loop = None, None
+
+    def _bucket_args(self, now: float) -> List[Any]:
+        capacity = settings.MAX_DAILY_TOKENS
+        return [capacity, capacity / 86400.0, now]
+
+    async def record(
+        self,
+        user_id: int,
+        provider: str,
+        model_name: Optional[str],
+        tokens_in: int,
+        tokens_out: int,
+        cost: float,
+        **extra: Any
+    ) -> float:
+        """
+        Debit the budget, bump the hourly counter and queue the row. Returns the budget left.
+        """
+        now = time.time()
+        tokens = int(tokens_in) + int(tokens_out)
+        row = {
+            "user_id": user_id,
+            "provider": provider,
+            "model_name": model_name,
+            "tokens_in": int(tokens_in),
+            "tokens_out": int(tokens_out),
+            "estimated_cost": cost,
+            "timestamp": datetime.fromtimestamp(now, timezone.utc).isoformat(),
+            **extra
+        }
+        level = await self._client().eval(
+            RECORD_SCRIPT, 3,
+            _bucket_key(user_id), _hour_key(user_id, int(now // 3600)), PENDING_KEY,
+            *self._bucket_args(now), tokens, cost, json.dumps(row), settings.USAGE_COUNTER_HOURS * 3600
+        )
+        return float(level)
+
+    async def remaining_budget(self, user_id: int) -> float:
+        level = await self._client().eval(PEEK_SCRIPT, 1, _bucket_key(user_id), *self._bucket_args(time.time()))
+        return float(level)
+
+    async def rolling_usage(self, user_id: int, hours: int = 24) -> Dict[str, float]:
+        """
+        Tokens / cost / calls over the last `hours` hourly counters (one round trip).
+        """
+        hours = min(hours, settings.USAGE_COUNTER_HOURS)
+        current = int(time.time() // 3600)
+        pipe = self._client().pipeline(transaction=False)
+        for hour in range(current - hours + 1, current + 1):
+            pipe.hmget(_hour_key(user_id, hour), "tokens", "cost", "calls")
+        totals = {"tokens": 0, "cost": 0.0, "calls": 0}
+        for tokens, cost, calls in await pipe.execute():
+            totals["tokens"] += int(tokens or 0)
+            totals["cost"] += float(cost or 0)
+            totals["calls"] += int(calls or 0)
+        return totals
+
+    async def flush_pending(self, db_factory, batch_size: int = None) -> int:
+        """
+        Move queued rows into user_usage, batch_size rows per INSERT, until the queue is empty.
+        Each batch stays in PROCESSING_KEY until its INSERT commits; a batch left there by a
+        failed or killed run is written first. Runs under the flush job lock (one flusher).
+        """
+        from sqlalchemy import insert
+        from app.models.usage import UserUsage
+
+        batch_size = batch_size or settings.USAGE_FLUSH_BATCH
+        redis = self._client()
+        written = 0
+        while True:
+            raw = await redis.lrange(PROCESSING_KEY, 0, -1)
+            if not raw:
+                raw = await redis.eval(CLAIM_SCRIPT, 2, PENDING_KEY, PROCESSING_KEY, batch_size)
+            if not raw:
+                return written
+
+            rows = [json.loads(item) for item in raw]
+            for row in rows:
+                row["timestamp"] = datetime.fromisoformat(row["timestamp"])
+            columns = set(UserUsage.__table__.columns.keys())
+            async with db_factory() as db:
+                await db.execute(insert(UserUsage), [{k: v for k, v in row.items() if k in columns} for row in rows])
+                await db.commit()
+            # Acknowledge: the rows are in user_usage
+            await redis.delete(PROCESSING_KEY)
+            written += len(rows)
+
+usage_meter = UsageMeter()
@@ -0,0 +1,263 @@
+"""
+Usage Rollup: Hourly and daily usage per (user, provider, model), so cost reporting reads
+a few rollup rows instead of scanning user_usage.
+- rollup(): folds user_usage rows past the watermark (usage_rollup_state.last_usage_id) into
+  usage_hourly / usage_daily. Rollups and watermark commit together, so each row counts once.
+  Ids do not commit in order (API processes insert directly when Redis is down, alongside the
+  flush), so a lower id may still be in flight when a higher one is visible. Each run therefore
+  records the highest id it sees (horizon_id) and rolls up only to the horizon recorded at least
+  USAGE_ROLLUP_LAG_SECONDS earlier: every insert holding a lower id has ended by then.
+- Latency is kept per rollup row as a fixed-bucket histogram. Histograms add up, so
+  percentiles work over any range (interpolated within a bucket).
+- compact(): deletes raw rows older than USAGE_RAW_RETENTION_DAYS (already rolled up) and
+  hourly rollups older than USAGE_HOURLY_RETENTION_DAYS. Daily rollups are kept.
+- analytics(): totals and groups over [start, end), from hourly rollups for short ranges
+  and daily ones otherwise.
+rollup() and compact() run from maintenance jobs only (one writer, under the run_job lock),
+so the newest USAGE_ROLLUP_LAG_SECONDS or so of usage is not yet visible in analytics.
+"""
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.models.usage import UserUsage, UsageHourly, UsageDaily, UsageRollupState
+
+# Upper bounds (ms) of the latency histogram buckets; one more bucket counts anything slower
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+
+PERCENTILES = (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))
+
+GROUP_BY = ("period", "provider", "model", "none")
+
+
+def _utc(ts: datetime) -> datetime:
+    # SQLite hands back naive datetimes; everything here is UTC
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts.astimezone(timezone.utc)
+
+
+def period_start(ts: datetime, period: str) -> datetime:
+    ts = _utc(ts).replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0) if period == "day" else ts
+
+
+def bucket_index(latency_ms: float) -> int:
+    return bisect_left(LATENCY_BUCKETS_MS, latency_ms)
+
+
+def percentile(histogram: List[int], q: float) -> Optional[float]:
+    total = sum(histogram)
+    if not total:
+        return None
+    rank = q * total
+    cumulative = 0
+    for i, count in enumerate(histogram):
+        if count and cumulative + count >= rank:
+            lower = LATENCY_BUCKETS_MS[i - 1] if i > 0 else 0
+            if i >= len(LATENCY_BUCKETS_MS):
+                return float(lower)  # Overflow bucket has no upper bound
+            upper = LATENCY_BUCKETS_MS[i]
+            return round(lower + (upper - lower) * (rank - cumulative) / count, 1)
+        cumulative += count
+    return None
+
+
+def _empty() -> Dict[str, Any]:
+    return {
+        "calls": 0, "tokens_in": 0, "tokens_out": 0, "estimated_cost": 0.0,
+        "latency_count": 0, "latency_sum_ms": 0, "latency_histogram": [0] * (len(LATENCY_BUCKETS_MS) + 1)
+    }
+
+
+def _add(totals: Dict[str, Any], other: Dict[str, Any]):
+    for field in ("calls", "tokens_in", "tokens_out", "estimated_cost", "latency_count", "latency_sum_ms"):
+        totals[field] += other[field] or 0
+    histogram = other["latency_histogram"] or []
+    totals["latency_histogram"] = [a + b for a, b in zip(totals["latency_histogram"], histogram)] + totals["latency_histogram"][len(histogram):]
+
+
+class UsageRollupService:
+    # --- Maintenance ---
+
+    def aggregate(self, rows, period: str) -> Dict[Tuple, Dict[str, Any]]:
+        """
+        Raw usage rows -> totals per (user, provider, model, period start).
+        """
+        groups: Dict[Tuple, Dict[str, Any]] = defaultdict(_empty)
+        for row in rows:
+            key = (row.user_id, row.provider, row.model_name or "", period_start(row.timestamp, period))
+            totals = groups[key]
+            totals["calls"] += 1
+            totals["tokens_in"] += row.tokens_in or 0
+            totals["tokens_out"] += row.tokens_out or 0
+            totals["estimated_cost"] += row.estimated_cost or 0.0
+            if row.latency_ms is not None:
+                totals["latency_count"] += 1
+                totals["latency_sum_ms"] += row.latency_ms
+                totals["latency_histogram"][bucket_index(row.latency_ms)] += 1
+        return groups
+
+    async def _apply(self, db: AsyncSession, model, groups: Dict[Tuple, Dict[str, Any]]):
+        user_ids = {key[0] for key in groups}
+        periods = [key[3] for key in groups]
+        result = await db.execute(
+            select(model).where(model.user_id.in_(user_ids), model.period_start >= min(periods), model.period_start <= max(periods))
+        )
+        existing = {(r.user_id, r.provider, r.model_name, _utc(r.period_start)): r for r in result.scalars().all()}
+
+        for key, totals in groups.items():
+            rollup = existing.get(key)
+            if rollup is None:
+                user_id, provider, model_name, start = key
+                db.add(model(user_id=user_id, provider=provider, model_name=model_name, period_start=start, **totals))
+                continue
+            merged = {
+                "calls": rollup.calls, "tokens_in": rollup.tokens_in, "tokens_out": rollup.tokens_out,
+                "estimated_cost": rollup.estimated_cost, "latency_count": rollup.latency_count,
+                "latency_sum_ms": rollup.latency_sum_ms,
+                "latency_histogram": list(rollup.latency_histogram or [0] * (len(LATENCY_BUCKETS_MS) + 1))
+            }
+            _add(merged, totals)
+            for field, value in merged.items():
+                setattr(rollup, field, value)
+
+    async def rollup(self, db_factory, batch_size: int = None) -> int:
+        """
+        Fold new user_usage rows into the hourly and daily rollups. Returns the rows processed.
+        """
+        batch_size = batch_size or settings.USAGE_ROLLUP_BATCH
+        processed = 0
+        now = datetime.now(timezone.utc)
+        async with db_factory() as db:
+            state = await db.get(UsageRollupState, 1)
+            if state is None:
+                state = UsageRollupState(id=1, last_usage_id=0)
+                db.add(state)
+
+            # Safe limit: the horizon once it is old enough; then take a new one
+            limit = state.last_usage_id
+            if state.horizon_at is None or _utc(state.horizon_at) <= now - timedelta(seconds=settings.USAGE_ROLLUP_LAG_SECONDS):
+                if state.horizon_id is not None:
+                    limit = max(limit, state.horizon_id)
+                state.horizon_id = (await db.execute(select(func.max(UserUsage.id)))).scalar() or 0
+                state.horizon_at = now
+                await db.commit()
+
+            while True:
+                result = await db.execute(
+                    select(
+                        UserUsage.id, UserUsage.user_id, UserUsage.provider, UserUsage.model_name,
+                        UserUsage.tokens_in, UserUsage.tokens_out, UserUsage.estimated_cost,
+                        UserUsage.latency_ms, UserUsage.timestamp
+                    )
+                    .where(UserUsage.id > state.last_usage_id, UserUsage.id <= limit)
+                    .order_by(UserUsage.id)
+                    .limit(batch_size)
+                )
+                rows = result.all()
+                if not rows:
+                    break
+                for model, period in ((UsageHourly, "hour"), (UsageDaily, "day")):
+                    await self._apply(db, model, self.aggregate(rows, period))
+                state.last_usage_id = rows[-1].id
+                await db.commit()
+                processed += len(rows)
+            await db.commit()
+        return processed
+
+    async def compact(self, db_factory) -> Dict[str, int]:
+        """
+        Retention: drop raw rows and hourly rollups already covered by coarser data.
+        """
+        now = datetime.now(timezone.utc)
+        async with db_factory() as db:
+            state = await db.get(UsageRollupState, 1)
+            watermark = state.last_usage_id if state else 0
+            raw = await db.execute(
+                delete(UserUsage).where(
+                    UserUsage.id <= watermark,
+                    UserUsage.timestamp < now - timedelta(days=settings.USAGE_RAW_RETENTION_DAYS)
+                )
+            )
+            hourly = await db.execute(
+                delete(UsageHourly).where(UsageHourly.period_start < now - timedelta(days=settings.USAGE_HOURLY_RETENTION_DAYS))
+            )
+            await db.commit()
+        return {"raw_deleted": raw.rowcount, "hourly_deleted": hourly.rowcount}
+
+    # --- Reporting ---
+
+    def granularity(self, start: datetime, end: datetime) -> str:
+        now = datetime.now(timezone.utc)
+        if end - start <= timedelta(days=settings.USAGE_HOURLY_MAX_RANGE_DAYS) and \
+                start >= now - timedelta(days=settings.USAGE_HOURLY_RETENTION_DAYS):
+            return "hour"
+        return "day"
+
+    def summarize(self, totals: Dict[str, Any]) -> Dict[str, Any]:
+        summary = {
+            "calls": totals["calls"],
+            "tokens_in": totals["tokens_in"],
+            "tokens_out": totals["tokens_out"],
+            "tokens": totals["tokens_in"] + totals["tokens_out"],
+            "cost": round(totals["estimated_cost"], 6),
+            "latency_avg_ms": round(totals["latency_sum_ms"] / totals["latency_count"], 1) if totals["latency_count"] else None
+        }
+        for name, q in PERCENTILES:
+            summary[f"latency_{name}_ms"] = percentile(totals["latency_histogram"], q)
+        return summary
+
+    async def analytics(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        start: datetime,
+        end: datetime,
+        group_by: str = "period"
+    ) -> Dict[str, Any]:
+        """
+        Tokens, cost and latency percentiles over [start, end), aligned to the rollup period.
+        """
+        period = self.granularity(_utc(start), _utc(end))
+        start = period_start(start, period)
+        end = _utc(end)
+        if period_start(end, period) != end:
+            end = period_start(end, period) + (timedelta(days=1) if period == "day" else timedelta(hours=1))
+        model = UsageHourly if period == "hour" else UsageDaily
+
+        result = await db.execute(
+            select(model)
+            .where(model.user_id == user_id, model.period_start >= start, model.period_start < end)
+            .order_by(model.period_start)
+        )
+
+        totals = _empty()
+        groups: Dict[str, Dict[str, Any]] = defaultdict(_empty)
+        for rollup in result.scalars().all():
+            values = {
+                "calls": rollup.calls, "tokens_in": rollup.tokens_in, "tokens_out": rollup.tokens_out,
+                "estimated_cost": rollup.estimated_cost, "latency_count": rollup.latency_count,
+                "latency_sum_ms": rollup.latency_sum_ms, "latency_histogram": rollup.latency_histogram
+            }
+            _add(totals, values)
+            if group_by == "period":
+                _add(groups[_utc(rollup.period_start).isoformat()], values)
+            elif group_by == "provider":
+                _add(groups[rollup.provider], values)
+            elif group_by == "model":
+                _add(groups[f"{rollup.provider}/{rollup.model_name}" if rollup.model_name else rollup.provider], values)
+
+        return {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "granularity": period,
+            "group_by": group_by,
+            "totals": self.summarize(totals),
+            "groups": [{"key": key, **self.summarize(values)} for key, values in groups.items()]
+        }
+
+usage_rollup_service = UsageRollupService()
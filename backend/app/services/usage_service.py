@@ -6,6 +6,7 @@ from datetime import datetime, timedelta
 from app.models.usage import UserUsage
 from app.db.session import AsyncSessionLocal
 from app.core.config import settings
+from app.services.usage_meter import usage_meter
 
 # Simple cost estimation (approximate per 1M tokens)
 # These are rough averages as of 2024
@@ -22,25 +23,34 @@ class UsageService:
         provider: str, 
         model_name: Optional[str], 
         tokens_in: int, 
-        tokens_out: int
+        tokens_out: int,
+        latency_ms: Optional[int] = None
     ):
         """
-        Log usage to DB.
+        Debit the user's budget and queue the row (usage_meter, flushed to DB in batches).
+        Falls back to a direct insert if Redis is unavailable.
         """
+        cost = 0.0
+        rates = COST_RATES.get(provider, {"in": 0, "out": 0})
+
+        cost += (tokens_in / 1_000_000) * rates["in"]
+        cost += (tokens_out / 1_000_000) * rates["out"]
+
+        try:
+            await usage_meter.record(user_id, provider, model_name, tokens_in, tokens_out, cost, latency_ms=latency_ms)
+            return
+        except Exception as e:
+            print(f"Usage Meter unavailable, writing usage directly: {e}")
+
         async with AsyncSessionLocal() as db:
-            cost = 0.0
-            rates = COST_RATES.get(provider, {"in": 0, "out": 0})
-            
-            cost += (tokens_in / 1_000_000) * rates["in"]
-            cost += (tokens_out / 1_000_000) * rates["out"]
-            
             usage = UserUsage(
                 user_id=user_id,
                 provider=provider,
                 model_name=model_name,
                 tokens_in=tokens_in,
                 tokens_out=tokens_out,
-                estimated_cost=cost
+                estimated_cost=cost,
+                latency_ms=latency_ms
             )
             db.add(usage)
             await db.commit()
@@ -50,9 +60,14 @@ class UsageService:
         Check if user has exceeded daily budget.
         Returns True if SAFE, False if EXCEEDED.
         """
-        # Hardcoded daily limit for MVP: 100,000 tokens or $1.00
-        MAX_DAILY_TOKENS = getattr(settings, "MAX_DAILY_TOKENS", 100_000)
-        
+        try:
+            # O(1): the token bucket refills continuously over 24h
+            return await usage_meter.remaining_budget(user_id) > 0
+        except Exception as e:
+            print(f"Usage Meter unavailable, summing usage: {e}")
+
+        MAX_DAILY_TOKENS = settings.MAX_DAILY_TOKENS
+
         async with AsyncSessionLocal() as db:
             # Check usage in last 24h
             since = datetime.now() - timedelta(days=1)
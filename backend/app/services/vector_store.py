@@ -1,13 +1,17 @@
 import logging
 import os
 import asyncio
-from typing import List, Dict, Any
+from collections import OrderedDict
+from typing import List, Dict, Any, AsyncIterator, Set, Tuple
+import numpy as np
 from pinecone import Pinecone
 from app.core.config import settings
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+QUERY_EMBEDDING_CACHE_SIZE = 256
+
 class VectorStore:
     def __init__(self):
         # Initialize Pinecone Client
@@ -21,58 +25,78 @@ class VectorStore:
         # We use the host provided in settings to connect to the specific index
         self.index = self.pc.Index(host=settings.PINECONE_HOST)
         
-        # Initialize Bedrock Embeddings Locally (Titan v2)
-        try:
-            from langchain_aws import BedrockEmbeddings
-            self.bedrock_embeddings = BedrockEmbeddings(
-                model_id="amazon.titan-embed-text-v2:0",
-                region_name=os.getenv("AWS_REGION", "us-east-1")
-            )
-            logger.info("Initialized Bedrock Titan v2 Embeddings locally.")
-        except Exception as e:
-            logger.error(f"Failed to load Bedrock embeddings: {e}")
-            self.bedrock_embeddings = None
+        # Index embeddings (Titan v2 unless EMBEDDING_PROVIDER says otherwise)
+        from app.services.embeddings import embedding_providers
+        self.embeddings = embedding_providers.get("index")
+
+        # Recent query embeddings (one request often embeds the same query several times)
+        self._query_embeddings: "OrderedDict[str, List[float]]" = OrderedDict()
         
+    async def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a query string, memoizing the most recent queries.
+        """
+        cached = self._query_embeddings.get(text)
+        if cached is not None:
+            self._query_embeddings.move_to_end(text)
+            return cached
+
+        embedding = await self.embeddings.embed_query(text)
+        if embedding:
+            self._query_embeddings[text] = embedding
+            if len(self._query_embeddings) > QUERY_EMBEDDING_CACHE_SIZE:
+                self._query_embeddings.popitem(last=False)
+        return embedding
+
     async def _async_get_embeddings(self, texts: List[str]) -> List[List[float]]:
         """
-        Generate embeddings locally using Bedrock (Parallel).
+        Generate document embeddings with the index provider.
         """
-        import asyncio
-        if not self.bedrock_embeddings:
-            raise Exception("Bedrock embeddings not initialized")
-            
-        try:
-            # Parallel execution for Titan v2
-            tasks = [self.bedrock_embeddings.aembed_query(t) for t in texts]
-            return await asyncio.gather(*tasks)
-        except Exception as e:
-            logger.error(f"Bedrock Async Embedding Failed: {e}")
-            # Fallback
-            return self.bedrock_embeddings.embed_documents(texts)
+        if not self.embeddings:
+            raise Exception("Embeddings not initialized")
+        return await self.embeddings.embed_documents(texts)
 
     async def add_documents(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]):
         if not documents:
             return True
 
-        vectors = []
         try:
             # Batch generate embeddings (Parallel)
             embeddings = await self._async_get_embeddings(documents)
             
-            for i, doc in enumerate(documents):
-                # Clean metadata
-                clean_meta = {k: v for k, v in metadatas[i].items() if v is not None}
-                # Add text to metadata for retrieval
-                clean_meta["text_content"] = documents[i] 
-    
-                vectors.append({
-                    "id": ids[i], 
-                    "values": embeddings[i], 
-                    "metadata": clean_meta
-                })
-            
-            # Offload blocking IO to thread
-            await asyncio.to_thread(self.index.upsert, vectors=vectors)
+            return await self.upsert_embeddings(ids, embeddings, documents, metadatas)
+        except Exception as e:
+            print(f"Pinecone Upsert Failed: {e}")
+            return False
+
+    async def upsert_embeddings(
+        self,
+        ids: List[str],
+        embeddings: List[List[float]],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]],
+        batch_size: int = 100
+    ) -> bool:
+        """
+        Upsert precomputed vectors (restores / imports reuse stored embeddings, no Bedrock calls).
+        """
+        try:
+            for start in range(0, len(ids), batch_size):
+                vectors = []
+                for i in range(start, min(start + batch_size, len(ids))):
+                    # Clean metadata
+                    clean_meta = {k: v for k, v in metadatas[i].items() if v is not None}
+                    # Add text to metadata for retrieval
+                    clean_meta["text_content"] = documents[i]
+
+                    vectors.append({
+                        "id": ids[i],
+                        "values": [float(v) for v in embeddings[i]],
+                        "metadata": clean_meta
+                    })
+
+                # Offload blocking IO to thread
+                await asyncio.to_thread(self.index.upsert, vectors=vectors)
             return True
         except Exception as e:
             print(f"Pinecone Upsert Failed: {e}")
@@ -83,17 +107,11 @@ class VectorStore:
         Query Pinecone index asynchronously.
         """
         try:
-            # 1. Generate embedding for query locally
-            if not self.bedrock_embeddings:
+            # 1. Generate embedding for query (index provider, memoized)
+            if not self.embeddings:
                  return {"ids": [[]], "distances": [[]], "metadatas": [[]], "documents": [[]], "embeddings": [[]]}
 
-            # Bedrock embedding is synchronous call usually fast or we can async it too?
-            # embed_query is sync in BedrockEmbeddings? Titan v2 client is sync here?
-            # Actually self.bedrock_embeddings.embed_query is blocking too if it uses boto3 sync client!
-            # Let's wrap it just in case, or use aembed_query if available.
-            # aembed_query was used above.
-            
-            query_embedding = await self.bedrock_embeddings.aembed_query(query_texts)
+            query_embedding = await self.embed_query(query_texts)
             
             if not query_embedding:
                 return {"ids": [[]], "distances": [[]], "metadatas": [[]], "documents": [[]], "embeddings": [[]]}
@@ -144,9 +162,101 @@ class VectorStore:
             print(f"Pinecone Query Failed: {e}")
             return {"ids": [[]], "distances": [[]], "metadatas": [[]], "documents": [[]], "embeddings": [[]]}
 
-    async def delete(self, ids: List[str]):
+    async def fetch(self, ids: List[str], batch_size: int = 100) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch stored vectors by id: {id: {"values": [...], "metadata": {...}}}.
+        Ids missing from the index are absent from the result.
+        """
+        found = {}
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            response = await asyncio.to_thread(self.index.fetch, ids=batch)
+            vectors = response.vectors if hasattr(response, "vectors") else response["vectors"]
+
+            for vid, vec in vectors.items():
+                if isinstance(vec, dict):
+                    values, metadata = vec.get("values"), vec.get("metadata")
+                else:
+                    values, metadata = vec.values, vec.metadata
+                found[vid] = {"values": list(values or []), "metadata": dict(metadata or {})}
+        return found
+
+    async def query_by_id(self, vector_id: str, n_results: int = 10, where: Dict = None) -> List[Tuple[str, float]]:
+        """
+        Nearest neighbours of a stored vector (no embedding call): [(id, cosine)], best first, itself excluded.
+        """
+        response = await asyncio.to_thread(
+            self.index.query, id=vector_id, top_k=n_results + 1, filter=where, include_metadata=False
+        )
+        return [(m["id"], float(m["score"])) for m in response["matches"] if m["id"] != vector_id][:n_results]
+
+    async def existing_ids(self, ids: List[str], batch_size: int = 100) -> Set[str]:
+        """
+        The subset of ids present in the index (same batched fetch, values dropped per batch).
+        """
+        present = set()
+        for start in range(0, len(ids), batch_size):
+            response = await asyncio.to_thread(self.index.fetch, ids=ids[start:start + batch_size])
+            vectors = response.vectors if hasattr(response, "vectors") else response["vectors"]
+            present.update(vectors.keys())
+        return present
+
+    async def score_ids(self, query_texts: str, ids: List[str]) -> Dict:
+        """
+        Cosine-score a known candidate set against the query (no index-wide search).
+        Returns the same format as query(include_values=True), best first.
+        """
+        empty = {"ids": [[]], "distances": [[]], "metadatas": [[]], "documents": [[]], "embeddings": [[]]}
+        if not ids or not self.embeddings:
+            return empty
+
+        try:
+            query_embedding = await self.embed_query(query_texts)
+            stored = await self.fetch(ids)
+            if not query_embedding or not stored:
+                return empty
+
+            found_ids = [vid for vid in ids if vid in stored and stored[vid]["values"]]
+            matrix = np.array([stored[vid]["values"] for vid in found_ids])
+            q = np.array(query_embedding)
+            scores = matrix @ q / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(q) + 1e-10)
+
+            order = np.argsort(-scores)
+            metadatas = [stored[found_ids[i]]["metadata"] for i in order]
+            return {
+                "ids": [[found_ids[i] for i in order]],
+                "distances": [[float(scores[i]) for i in order]],
+                "metadatas": [metadatas],
+                "documents": [[m.get("text_content", "") for m in metadatas]],
+                "embeddings": [[stored[found_ids[i]]["values"] for i in order]]
+            }
+        except Exception as e:
+            print(f"Pinecone Fetch/Score Failed: {e}")
+            return empty
+
+    async def list_id_pages(self, page_size: int = 100) -> AsyncIterator[List[str]]:
+        """
+        Stream every vector id in the index, one page at a time (serverless indexes only).
+        """
+        token = None
+        while True:
+            response = await asyncio.to_thread(
+                self.index.list_paginated, limit=page_size, pagination_token=token
+            )
+            ids = [v.id for v in (response.vectors or [])]
+            if ids:
+                yield ids
+            token = response.pagination.next if response.pagination else None
+            if not token:
+                break
+
+    async def delete(self, ids: List[str], batch_size: int = 1000):
+        """
+        Delete vectors by id, in batches (Pinecone accepts at most 1000 ids per call).
+        """
         if not ids:
             return
-        await asyncio.to_thread(self.index.delete, ids=ids)
+        for start in range(0, len(ids), batch_size):
+            await asyncio.to_thread(self.index.delete, ids=ids[start:start + batch_size])
 
 vector_store = VectorStore()
@@ -48,6 +48,154 @@ def dedupe_memory_task(memory_id: int):
 
     run_async(_dedupe())
 
+async def ingest_memory(memory_id: int, user_id: int, content: str, title: str, tags: list = None, source: str = None):
+    """
+    Ingestion pipeline for one memory: chunk + enrich, embed, save chunks, extract facts.
+    Shared by ingest_memory_task and the bulk import batches.
+    """
+    try:
+        # Fetch Memory created_at for Date Context
+        reference_date = None
+        async with AsyncSessionLocal() as db:
+             result = await db.execute(select(Memory).where(Memory.id == memory_id))
+             mem = result.scalars().first()
+             if mem:
+                 reference_date = mem.created_at
+
+        # 1. Process Text (CPU bound, maybe API bound for embeddings)
+        ids, documents_content, enriched_chunk_texts, metadatas = await ingestion_service.process_text(
+            text=content,
+            document_id=memory_id,
+            title=title,
+            doc_type="memory",
+            metadata={
+                "user_id": str(user_id), 
+                "memory_id": memory_id, 
+                "tags": str(tags) if tags else "", 
+                "source": source,
+                "created_at": str(reference_date) if reference_date else ""
+            }
+        )
+        
+        if ids:
+            # 2. Add to Vector Store (Use Enriched Text)
+            try:
+                await vector_store.add_documents(
+                    ids=ids,
+                    documents=enriched_chunk_texts, # Embed ENRICHED text
+                    metadatas=metadatas
+                )
+            except Exception as e:
+                print(f"Worker Error Adding to Vector Store: {e}")
+                return
+
+            # 3. Parallel Fact Extraction (Optimized with Semaphore)
+            from app.services.llm_service import llm_service
+            from app.services.fact_service import fact_service
+            
+            print(f"Worker: Starting parallel fact extraction for {len(documents_content)} chunks with date context {reference_date}...")
+            
+            # Limit concurrency to prevent Rate Limits and DB Pool Exhaustion
+            # 5-10 is a safe sweet spot for Bedrock/LLM APIs per worker thread
+            sem = asyncio.Semaphore(10) 
+
+            async def _bounded_extraction(txt, ref_dt):
+                async with sem:
+                    return await llm_service.extract_facts_from_text(txt, reference_date=ref_dt)
+
+            extraction_tasks = [_bounded_extraction(text, reference_date) for text in documents_content]
+            # Execute all LLM calls concurrently (throttled)
+            all_facts_results = await asyncio.gather(*extraction_tasks, return_exceptions=True)
+
+            # 4. Update DB with embedding_id AND Save Chunks/Facts
+            async with AsyncSessionLocal() as db:
+                 # Update Memory
+                 result = await db.execute(select(Memory).where(Memory.id == memory_id))
+                 memory = result.scalars().first()
+                 if memory:
+                     memory.embedding_id = ids[0]
+                     db.add(memory)
+
+                 # Save Chunks first to get IDs
+                 saved_chunks = []
+                 for i, (embedding_id, chunk_content) in enumerate(zip(ids, documents_content)):
+                    meta = metadatas[i]
+                    
+                    # Parse JSON fields safely
+                    qas = []
+                    if meta.get("generated_qas"):
+                         try:
+                             qas = json.loads(meta.get("generated_qas"))
+                         except:
+                             pass
+                    
+                    entities = []
+                    if meta.get("entities"):
+                         try:
+                             entities = json.loads(meta.get("entities"))
+                         except:
+                             pass
+
+                    chunk = Chunk(
+                        memory_id=memory_id, # Link to Memory
+                        chunk_index=i,
+                        text=chunk_content,
+                        embedding_id=embedding_id,
+                        summary=meta.get("summary"),
+                        generated_qas=qas,
+                        entities=entities,
+                        tokens_count=meta.get("tokens_count"),
+                        metadata_json=meta
+                    )
+                    db.add(chunk)
+                    saved_chunks.append(chunk)
+
+                 await db.flush() # Get all Chunk IDs at once
+
+                 # Entity postings for the new chunks
+                 from app.services.entity_index import entity_index
+                 await entity_index.index_chunks(db, user_id, saved_chunks)
+
+                 await db.commit() # Commit so parallel sessions can see Chunks
+
+                 # Parallel Fact Processing for ALL chunks
+                 # Helper to run fact saving in its own session to avoid sharing collision
+                 async def _save_facts_safe(facts_res, c_id, u_id, m_id):
+                     async with sem: # Reuse semaphore to limit DB connections
+                         async with AsyncSessionLocal() as local_db:
+                             await fact_service.create_facts(
+                                 facts_data=facts_res,
+                                 user_id=u_id,
+                                 memory_id=m_id,
+                                 chunk_id=c_id,
+                                 db=local_db
+                             )
+
+                 fact_tasks = []
+                 for i, chunk in enumerate(saved_chunks):
+                    facts_result = all_facts_results[i]
+                    
+                    if isinstance(facts_result, list) and facts_result:
+                        fact_tasks.append(
+                            _save_facts_safe(facts_result, chunk.id, user_id, memory_id)
+                        )
+                    elif isinstance(facts_result, Exception):
+                        print(f"Worker Fact Extraction Failed for Chunk {i}: {facts_result}")
+
+                 if fact_tasks:
+                     print(f"Worker: processing {len(fact_tasks)} chunks of facts concurrently (throttled)...")
+                     await asyncio.gather(*fact_tasks)
+                 
+                 from app.services.context_builder import context_builder
+                 await context_builder.publish_invalidation(user_id)
+
+                 print(f"Worker: Ingestion complete for memory {memory_id}")
+        else:
+             print(f"Worker: No chunks generated for memory {memory_id}")
+
+    except Exception as e:
+        print(f"Worker Ingestion Failed: {e}")
+
 @celery_app.task(acks_late=True)
 def ingest_memory_task(memory_id: int, user_id: int, content: str, title: str, tags: list = None, source: str = None):
     """
@@ -58,141 +206,35 @@ def ingest_memory_task(memory_id: int, user_id: int, content: str, title: str, t
     
     # We pass content/title explicitly to avoid fetching if possible, 
     # but we need to update the DB with embedding_id, so we'll need a session anyway.
-    
-    async def _ingest():
-        try:
-            # Fetch Memory created_at for Date Context
-            reference_date = None
-            async with AsyncSessionLocal() as db:
-                 result = await db.execute(select(Memory).where(Memory.id == memory_id))
-                 mem = result.scalars().first()
-                 if mem:
-                     reference_date = mem.created_at
-
-            # 1. Process Text (CPU bound, maybe API bound for embeddings)
-            ids, documents_content, enriched_chunk_texts, metadatas = await ingestion_service.process_text(
-                text=content,
-                document_id=memory_id,
-                title=title,
-                doc_type="memory",
-                metadata={
-                    "user_id": str(user_id), 
-                    "memory_id": memory_id, 
-                    "tags": str(tags) if tags else "", 
-                    "source": source,
-                    "created_at": str(reference_date) if reference_date else ""
-                }
-            )
-            
-            if ids:
-                # 2. Add to Vector Store (Use Enriched Text)
-                try:
-                    await vector_store.add_documents(
-                        ids=ids,
-                        documents=enriched_chunk_texts, # Embed ENRICHED text
-                        metadatas=metadatas
-                    )
-                except Exception as e:
-                    print(f"Worker Error Adding to Vector Store: {e}")
-                    return
-
-                # 3. Parallel Fact Extraction (Optimized with Semaphore)
-                from app.services.llm_service import llm_service
-                from app.services.fact_service import fact_service
-                
-                print(f"Worker: Starting parallel fact extraction for {len(documents_content)} chunks with date context {reference_date}...")
-                
-                # Limit concurrency to prevent Rate Limits and DB Pool Exhaustion
-                # 5-10 is a safe sweet spot for Bedrock/LLM APIs per worker thread
-                sem = asyncio.Semaphore(10) 
-
-                async def _bounded_extraction(txt, ref_dt):
-                    async with sem:
-                        return await llm_service.extract_facts_from_text(txt, reference_date=ref_dt)
-
-                extraction_tasks = [_bounded_extraction(text, reference_date) for text in documents_content]
-                # Execute all LLM calls concurrently (throttled)
-                all_facts_results = await asyncio.gather(*extraction_tasks, return_exceptions=True)
-
-                # 4. Update DB with embedding_id AND Save Chunks/Facts
-                async with AsyncSessionLocal() as db:
-                     # Update Memory
-                     result = await db.execute(select(Memory).where(Memory.id == memory_id))
-                     memory = result.scalars().first()
-                     if memory:
-                         memory.embedding_id = ids[0]
-                         db.add(memory)
-
-                     # Save Chunks first to get IDs
-                     saved_chunks = []
-                     for i, (embedding_id, chunk_content) in enumerate(zip(ids, documents_content)):
-                        meta = metadatas[i]
-                        
-                        # Parse JSON fields safely
-                        qas = []
-                        if meta.get("generated_qas"):
-                             try:
-                                 qas = json.loads(meta.get("generated_qas"))
-                             except:
-                                 pass
-                        
-                        entities = []
-                        if meta.get("entities"):
-                             try:
-                                 entities = json.loads(meta.get("entities"))
-                             except:
-                                 pass
-
-                        chunk = Chunk(
-                            memory_id=memory_id, # Link to Memory
-                            chunk_index=i,
-                            text=chunk_content,
-                            embedding_id=embedding_id,
-                            summary=meta.get("summary"),
-                            generated_qas=qas,
-                            entities=entities,
-                            metadata_json=meta
-                        )
-                        db.add(chunk)
-                        saved_chunks.append(chunk)
-
-                     await db.flush() # Get all Chunk IDs at once
-                     await db.commit() # Commit so parallel sessions can see Chunks
-
-                     # Parallel Fact Processing for ALL chunks
-                     # Helper to run fact saving in its own session to avoid sharing collision
-                     async def _save_facts_safe(facts_res, c_id, u_id, m_id):
-                         async with sem: # Reuse semaphore to limit DB connections
-                             async with AsyncSessionLocal() as local_db:
-                                 await fact_service.create_facts(
-                                     facts_data=facts_res,
-                                     user_id=u_id,
-                                     memory_id=m_id,
-                                     chunk_id=c_id,
-                                     db=local_db
-                                 )
-                                 await local_db.commit()
-
-                     fact_tasks = []
-                     for i, chunk in enumerate(saved_chunks):
-                        facts_result = all_facts_results[i]
-                        
-                        if isinstance(facts_result, list) and facts_result:
-                            fact_tasks.append(
-                                _save_facts_safe(facts_result, chunk.id, user_id, memory_id)
-                            )
-                        elif isinstance(facts_result, Exception):
-                            print(f"Worker Fact Extraction Failed for Chunk {i}: {facts_result}")
-
-                     if fact_tasks:
-                         print(f"Worker: processing {len(fact_tasks)} chunks of facts concurrently (throttled)...")
-                         await asyncio.gather(*fact_tasks)
-                     
-                     print(f"Worker: Ingestion complete for memory {memory_id}")
-            else:
-                 print(f"Worker: No chunks generated for memory {memory_id}")
-
-        except Exception as e:
-            print(f"Worker Ingestion Failed: {e}")
-
-    run_async(_ingest())
+    run_async(ingest_memory(memory_id, user_id, content, title, tags, source))
+
+@celery_app.task(acks_late=True)
+def delete_closure_task(job_id: str, scope: str, target_id: int, user_id: int, delete_account: bool = False):
+    """
+    Background task for large cascading deletes (whole users, big documents).
+    Progress is reported on the job hash (see DeletionService.get_job).
+    """
+    from app.services.deletion_service import deletion_service
+    print(f"Worker: Starting deletion job {job_id} ({scope} {target_id})")
+
+    async def _delete():
+        async with AsyncSessionLocal() as db:
+            await deletion_service.execute(db, scope, target_id, user_id, job_id=job_id, delete_account=delete_account)
+
+    run_async(_delete())
+
+@celery_app.task(acks_late=True)
+def ingest_import_batch_task(user_id: int, memory_ids: list = None, document_ids: list = None, chunk_embedding_ids: list = None, fact_ids: list = None):
+    """
+    One coalesced ingestion job per bulk-import batch (instead of three tasks per memory).
+    """
+    from app.services.import_service import import_service
+    print(f"Worker: Starting import batch for user {user_id}")
+
+    run_async(import_service.ingest_batch(
+        user_id,
+        memory_ids=memory_ids or [],
+        document_ids=document_ids or [],
+        chunk_embedding_ids=chunk_embedding_ids or [],
+        fact_ids=fact_ids or []
+    ))
@@ -8,7 +8,6 @@ from typing import Any, List, Optional
 from mcp.server.fastmcp import FastMCP
 from sqlalchemy.future import select
 from sqlalchemy import delete
-from sqlalchemy.orm import selectinload
 
 # --- STDOUT PROTECTION ---
 # Force all logging to stderr
@@ -48,105 +47,120 @@ def redirect_stdout_to_stderr():
 with redirect_stdout_to_stderr():
     from app.services.vector_store import vector_store
     from app.services.ingestion import ingestion_service
-    from app.db.session import AsyncSessionLocal
+    from app.db.session import PooledSessionLocal
+    from app.services.auth_cache import auth_cache
     from app.models.document import Document
     from app.models.user import User
     from app.models.memory import Memory
     # Import ChatSession to ensure relationship mapper works
     from app.models.chat import ChatSession
     from app.services.context_builder import context_builder
+    from app.services.deletion_service import deletion_service
     # Import Worker Tasks
     from app.worker import process_memory_metadata_task, dedupe_memory_task
 
+# Process-wide auth cache tasks (the lifespan runs once per connection on SSE)
+_auth_tasks: List[asyncio.Task] = []
+
+@contextlib.asynccontextmanager
+async def lifespan(server):
+    # Shared auth cache: invalidations from the API / workers, batched API key last_used_at;
+    # context cache invalidations
+    if not _auth_tasks:
+        _auth_tasks.append(asyncio.create_task(auth_cache.listen()))
+        _auth_tasks.append(asyncio.create_task(auth_cache.run_last_used_flusher()))
+        _auth_tasks.append(asyncio.create_task(context_builder.listen()))
+    try:
+        yield {}
+    finally:
+        await auth_cache.flush_last_used()
+
 # Initialize FastMCP Server
-mcp = FastMCP("Brain Vault")
+mcp = FastMCP("Brain Vault", lifespan=lifespan)
 
-# Import Context and ApiKey
+# Import Context
 from mcp.server.fastmcp import Context
-from app.models.api_key import ApiKey
-from app.core.config import settings
-from jose import jwt, JWTError
+from jose import JWTError
 import hashlib
+import weakref
+
+# Connection (MCP session) -> credential it authenticated with, resolved once per connection
+_session_credentials: "weakref.WeakKeyDictionary[Any, str]" = weakref.WeakKeyDictionary()
+# Single-tenant fallback (BRAIN_VAULT_USER_EMAIL / _ID), resolved once per process
+_env_user_id: Optional[int] = None
 
 def hash_key(key: str) -> str:
     return hashlib.sha256(key.encode()).hexdigest()
 
+def _header_credential(ctx: Context) -> Optional[str]:
+    """
+    API key / access token from the HTTP request behind this call (SSE / HTTP transports).
+    """
+    request = getattr(ctx.request_context, "request", None) if ctx else None
+    headers = getattr(request, "headers", None)
+    if not headers:
+        return None
+    auth_header = headers.get("authorization")
+    if auth_header and auth_header.startswith("Bearer "):
+        return auth_header.split(" ", 1)[1]
+    return headers.get("x-brain-vault-key")
+
+def _resolve_credential(ctx: Context) -> Optional[str]:
+    """
+    1. Credential already resolved for this connection
+    2. HTTP headers (Multi-Tenant, SSE / HTTP)
+    3. BRAIN_VAULT_API_KEY (Stdio / Single User)
+    """
+    session = getattr(ctx.request_context, "session", None) if ctx else None
+    if session is not None:
+        credential = _session_credentials.get(session)
+        if credential:
+            return credential
+
+    credential = _header_credential(ctx) or os.environ.get("BRAIN_VAULT_API_KEY")
+    if credential and session is not None:
+        _session_credentials[session] = credential
+    return credential
+
 # Helper to get current user async
 async def get_current_user(db, ctx: Context = None):
     """
-    Get the current user based on:
-    1. HTTP Headers (Multi-Tenant via Context)
-    2. Environment Variables (Single-Tenant fallback)
-    """
-    api_key = None
-    
-    # 1. Check Context for Headers (HTTP Mode)
-    if ctx and hasattr(ctx, 'request_context'):
-        # Context structure depends on transport, safely navigation
-        # Assuming request_context might contain headers directly or in a 'headers' dict
-        # Common convention for FastMCP context structure:
-        # ctx.request_context.headers['Authorization']
+    Get the current user through the API's cached auth layer (app/services/auth_cache.py):
+    repeated calls on a connection cost in-memory lookups, not queries.
+    Falls back to BRAIN_VAULT_USER_EMAIL / BRAIN_VAULT_USER_ID when no credential is given.
+    """
+    global _env_user_id
+    credential = _resolve_credential(ctx)
+
+    if credential:
         try:
-            headers = getattr(ctx.request_context, 'headers', {})
-            auth_header = headers.get('authorization') or headers.get('Authorization')
-            
-            if auth_header and auth_header.startswith("Bearer "):
-                 # Check if it's an API Key (starts with bv_sk_)
-                 token = auth_header.split(" ")[1]
-                 if token.startswith("bv_sk_"):
-                     api_key = token
-            
-            # Also check custom header
-            if not api_key:
-                api_key = headers.get('x-brain-vault-key') or headers.get('X-Brain-Vault-Key')
-        except Exception:
-            pass
-
-    # 2. Check Environment Variables (Stdio Mode / Single User)
-    if not api_key:
-        api_key = os.environ.get("BRAIN_VAULT_API_KEY")
-
-    # 3. Authenticate
-    if api_key:
-        # A. Persistent API Key
-        if api_key.startswith("bv_sk_"):
-            hashed = hash_key(api_key)
-            result = await db.execute(select(ApiKey).filter(ApiKey.key_hash == hashed, ApiKey.is_active == True))
-            key_record = result.scalars().first()
-            if key_record:
-                # Update last used (fire and forget / async)
-                # To avoid blocking, we could skip this or spawn a task. For now, skip to keep simple.
-                # key_record.last_used_at = func.now() 
-                # await db.commit() 
-                
-                result_user = await db.execute(select(User).filter(User.id == key_record.user_id))
-                return result_user.scalars().first()
-        
-        # B. OAuth2 Access Token (JWT)
-        else:
-            try:
-                # Verify JWT
-                payload = jwt.decode(api_key, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-                user_id: str = payload.get("sub")
-                if user_id:
-                    result = await db.execute(select(User).filter(User.id == int(user_id)))
-                    return result.scalars().first()
-            except JWTError:
-                # Invalid or expired token
-                pass
-
-    # 4. Fallback Legacy Auth (Env Vars for ID/Email)
-    # Only if NO API KEY was provided/found (to prevent accidental bypass)
-    if not api_key:
+            if credential.startswith("bv_sk_"):
+                # A. Persistent API Key (last_used_at is batched by the auth cache)
+                user_id = await auth_cache.resolve_api_key(db, hash_key(credential))
+            else:
+                # B. OAuth2 Access Token (JWT)
+                user_id = auth_cache.decode_token(credential)
+        except (JWTError, ValueError):
+            user_id = None
+        if user_id is None:
+            # Revoked / expired: the connection has to present a valid credential again
+            session = getattr(ctx.request_context, "session", None) if ctx else None
+            if session is not None:
+                _session_credentials.pop(session, None)
+            return None
+        return await auth_cache.get_user(db, user_id)
+
+    # Fallback Legacy Auth (Env Vars for ID/Email)
+    # Only if NO credential was provided/found (to prevent accidental bypass)
+    if _env_user_id is None:
         user_email = os.environ.get("BRAIN_VAULT_USER_EMAIL")
         if user_email:
-            result = await db.execute(select(User).filter(User.email == user_email))
-            return result.scalars().first()
-            
-        user_id = os.environ.get("BRAIN_VAULT_USER_ID")
-        if user_id:
-            result = await db.execute(select(User).filter(User.id == int(user_id)))
-            return result.scalars().first()
+            result = await db.execute(select(User.id).filter(User.email == user_email))
+            _env_user_id = result.scalar()
+        elif os.environ.get("BRAIN_VAULT_USER_ID"):
+            _env_user_id = int(os.environ["BRAIN_VAULT_USER_ID"])
+    if _env_user_id is not None:
+        return await auth_cache.get_user(db, _env_user_id)
 
     return None
 
@@ -160,7 +174,7 @@ async def save_memory(text: str, ctx: Context, source: str = "mcp", tags: Option
         source: Source of memory (default 'mcp').
         tags: Optional list of tags.
     """
-    async with AsyncSessionLocal() as db:
+    async with PooledSessionLocal() as db:
         try:
             user = await get_current_user(db, ctx)
             if not user:
@@ -246,15 +260,14 @@ async def search_brain_vault(query: str, ctx: Context, purpose: str = "general")
         query: The semantic search query (e.g., "python fastapi project structure" or "notes on meeting with Bob").
         purpose: Optional hint for context formatting ("general", "code", "summary").
     """
-    async with AsyncSessionLocal() as db:
+    async with PooledSessionLocal() as db:
         try:
             user = await get_current_user(db, ctx)
             if not user:
                 return "Error: No user found."
                 
-            # Context builder uses vector store (network/sync)
-            ctx = context_builder.build_context(query=query, user_id=user.id, limit_tokens=2000)
-            return ctx["text"]
+            context = await context_builder.build_context(query=query, user_id=user.id, limit_tokens=2000, view=purpose, db=db)
+            return context["text"] or "No relevant memories found."
         except Exception as e:
             return f"Error searching vault: {str(e)}"
 
@@ -263,7 +276,7 @@ async def get_inbox(ctx: Context) -> str:
     """
     Get list of pending memories in the Inbox.
     """
-    async with AsyncSessionLocal() as db:
+    async with PooledSessionLocal() as db:
         try:
             user = await get_current_user(db, ctx)
             if not user:
@@ -295,7 +308,7 @@ async def get_document(doc_id: int, ctx: Context) -> str:
     Args:
         doc_id: The ID of the document.
     """
-    async with AsyncSessionLocal() as db:
+    async with PooledSessionLocal() as db:
         try:
             user = await get_current_user(db, ctx)
             if not user:
@@ -325,15 +338,15 @@ async def generate_prompt(query: str, ctx: Context, template: str = "standard")
         query: The user's question or request.
         template: The template to use ("standard", "code", "summary").
     """
-    async with AsyncSessionLocal() as db:
+    async with PooledSessionLocal() as db:
         try:
             user = await get_current_user(db, ctx)
             if not user:
                 return "Error: No user found."
             
             # 1. Retrieve Context using ContextBuilder (Standardized)
-            ctx = context_builder.build_context(query=query, user_id=user.id, limit_tokens=2000)
-            context_str = ctx["text"]
+            context = await context_builder.build_context(query=query, user_id=user.id, limit_tokens=2000, view=template, db=db)
+            context_str = context["text"]
             
             # 3. Apply Template
             if template == "code":
@@ -382,7 +395,7 @@ async def update_memory(memory_id: str, content: str, ctx: Context) -> str:
     if not memory_id.startswith("mem_"):
         return "Error: Only memories (starting with 'mem_') can be updated via this tool."
 
-    async with AsyncSessionLocal() as db:
+    async with PooledSessionLocal() as db:
         try:
             user = await get_current_user(db, ctx)
             if not user:
@@ -431,6 +444,7 @@ async def update_memory(memory_id: str, content: str, ctx: Context) -> str:
                     metadatas=metadatas
                 )
 
+            await context_builder.publish_invalidation(user.id)
             return f"Memory {memory_id} updated successfully."
         except Exception as e:
             return f"Error updating memory: {str(e)}"
@@ -442,62 +456,43 @@ async def delete_memory(memory_id: str, ctx: Context) -> str:
     Args:
         memory_id: The ID of the item (e.g., 'mem_1' or 'doc_5').
     """
-    async with AsyncSessionLocal() as db:
+    async with PooledSessionLocal() as db:
         try:
             user = await get_current_user(db, ctx)
             if not user:
                 return "Error: No user found."
 
+            # Same cascade as DELETE /memories/{id}: chunks, facts, postings, clusters, vectors
             if memory_id.startswith("doc_"):
-                # Handle Document Deletion
                 try:
                     doc_id = int(memory_id.split("_")[1])
                 except ValueError:
                     return "Error: Invalid ID format."
 
-                # Eager load chunks because they are accessed
-                result = await db.execute(
-                    select(Document).options(selectinload(Document.chunks)).filter(Document.id == doc_id, Document.user_id == user.id)
-                )
-                document = result.scalars().first()
-
-                if not document:
+                result = await db.execute(select(Document.id).where(Document.id == doc_id, Document.user_id == user.id))
+                if not result.scalar():
                     return "Error: Document not found."
-                
-                # Delete chunks from vector store
-                for chunk in document.chunks:
-                    if chunk.embedding_id:
-                        try:
-                            vector_store.delete(ids=[chunk.embedding_id])
-                        except:
-                            pass # Ignore vector store errors
-                
-                await db.delete(document)
-                await db.commit()
+
+                outcome = await deletion_service.delete(db, "document", doc_id, user.id)
+                if outcome["status"] == "accepted":
+                    return f"Document {memory_id} is being deleted in the background (job {outcome['job_id']})."
                 return f"Document {memory_id} deleted successfully."
-                
+
             elif memory_id.startswith("mem_"):
-                # Handle Memory Deletion
                 try:
                     mem_id = int(memory_id.split("_")[1])
                 except ValueError:
                     return "Error: Invalid ID format."
 
-                result = await db.execute(select(Memory).filter(Memory.id == mem_id, Memory.user_id == user.id))
-                memory = result.scalars().first()
-                if not memory:
+                result = await db.execute(select(Memory.id).where(Memory.id == mem_id, Memory.user_id == user.id))
+                if not result.scalar():
                     return "Error: Memory not found."
-                
-                if memory.embedding_id:
-                    try:
-                        vector_store.delete(ids=[memory.embedding_id])
-                    except:
-                        pass
-                    
-                await db.delete(memory)
-                await db.commit()
+
+                outcome = await deletion_service.delete(db, "memory", mem_id, user.id)
+                if outcome["status"] == "accepted":
+                    return f"Memory {memory_id} is being deleted in the background (job {outcome['job_id']})."
                 return f"Memory {memory_id} deleted successfully."
-            
+
             else:
                 return "Error: ID must start with 'mem_' or 'doc_'."
         except Exception as e:
@@ -511,7 +506,7 @@ async def list_memories(ctx: Context, limit: int = 10, offset: int = 0) -> str:
         limit: Number of items to return (default 10).
         offset: Pagination offset (default 0).
     """
-    async with AsyncSessionLocal() as db:
+    async with PooledSessionLocal() as db:
         try:
             user = await get_current_user(db, ctx)
             if not user:
@@ -549,7 +544,7 @@ async def get_inbox_resource(ctx: Context) -> str:
     """
     Read the current contents of the Inbox directly as a resource.
     """
-    async with AsyncSessionLocal() as db:
+    async with PooledSessionLocal() as db:
         try:
             user = await get_current_user(db, ctx)
             if not user:
@@ -597,7 +592,7 @@ async def search_by_date(start_date: str, ctx: Context, end_date: Optional[str]
         start_date: Start date in YYYY-MM-DD format.
         end_date: End date in YYYY-MM-DD format (optional, defaults to end of start_date).
     """
-    async with AsyncSessionLocal() as db:
+    async with PooledSessionLocal() as db:
         try:
             user = await get_current_user(db, ctx)
             if not user:
@@ -640,28 +635,14 @@ async def get_all_tags(ctx: Context) -> str:
     Get a list of all tags currently used in the Brain Vault. 
     Use this to understand the taxonomy of the user's knowledge.
     """
-    async with AsyncSessionLocal() as db:
+    async with PooledSessionLocal() as db:
         try:
             user = await get_current_user(db, ctx)
             if not user:
                 return "Error: No user found."
             
-            # Inefficient but valid for MVP: Fetch all and aggregate
-            result = await db.execute(select(Memory).filter(Memory.user_id == user.id))
-            memories = result.scalars().all()
-            
-            all_tags = set()
-            for mem in memories:
-                if mem.tags:
-                    try:
-                        # mem.tags might be a list or a string repr of list depending on SQLite/JSON handling
-                        tags_list = mem.tags if isinstance(mem.tags, list) else eval(mem.tags)
-                        for tag in tags_list:
-                            all_tags.add(tag)
-                    except:
-                        pass
-                        
-            sorted_tags = sorted(list(all_tags))
+            from app.services.tag_index import tag_index
+            sorted_tags = await tag_index.tag_names(db, user.id)
             
             if not sorted_tags:
                 return "No tags found."
@@ -0,0 +1,62 @@
+import sys
+import os
+import asyncio
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.future import select
+from app.db.session import AsyncSessionLocal
+import app.models # Register models
+from app.models.user import User
+from app.services.snapshot import snapshot_service
+
+async def _get_user(db, email: str):
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
+
+async def create_snapshot(email: str, path: str, dtype: str):
+    """Write a snapshot (records + embedding matrices) of a user's vault"""
+    async with AsyncSessionLocal() as db:
+        user = await _get_user(db, email)
+    if not user:
+        print(f"User with email '{email}' not found.")
+        return
+
+    manifest = await snapshot_service.create(user.id, path, dtype=dtype)
+    print(f"Snapshot written to {path}: {manifest['counts']}")
+    for kind, info in manifest["embeddings"].items():
+        print(f"  {kind} embeddings: {info['vectors']}/{info['rows']} (dim {info['dim']}, {dtype})")
+
+async def restore_snapshot(path: str, email: str):
+    """Load a snapshot into a user's vault (no LLM or embedding calls)"""
+    async with AsyncSessionLocal() as db:
+        user = await _get_user(db, email)
+        if not user:
+            print(f"User with email '{email}' not found.")
+            return
+
+        try:
+            stats = await snapshot_service.restore(db, user.id, path)
+            print(f"Restored {path} into '{email}': {stats}")
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            await db.rollback()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create or restore portable vault snapshots")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    create = sub.add_parser("create", help="Snapshot a user's vault into a directory")
+    create.add_argument("email")
+    create.add_argument("path")
+    create.add_argument("--float32", action="store_true", help="Store embeddings as float32 (default float16)")
+
+    restore = sub.add_parser("restore", help="Restore a snapshot directory into a user's vault")
+    restore.add_argument("path")
+    restore.add_argument("email")
+
+    args = parser.parse_args()
+    if args.command == "create":
+        asyncio.run(create_snapshot(args.email, args.path, "float32" if args.float32 else "float16"))
+    else:
+        asyncio.run(restore_snapshot(args.path, args.email))
@@ -0,0 +1,46 @@
+import sys
+import time
+from pathlib import Path
+
+# Add backend directory to sys.path
+backend_path = str(Path(__file__).parent.parent)
+if backend_path not in sys.path:
+    sys.path.insert(0, backend_path)
+
+import pytest
+from jose import jwt, JWTError
+from app.core.config import settings
+from app.services.auth_cache import AuthCache
+
+
+def _token(sub, exp_in=3600):
+    return jwt.encode({"sub": str(sub), "exp": int(time.time()) + exp_in}, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+
+def test_decoded_tokens_are_cached_until_invalidated():
+    cache = AuthCache()
+    token = _token(7)
+    assert cache.decode_token(token) == 7
+    assert cache._tokens.get(token) == 7
+
+    cache.invalidate(user_ids=[7])
+    assert cache._tokens.get(token) is None
+
+
+def test_invalid_tokens_are_rejected_and_not_cached():
+    cache = AuthCache()
+    with pytest.raises(JWTError):
+        cache.decode_token("not-a-jwt")
+    expired = _token(7, exp_in=-10)
+    with pytest.raises(JWTError):
+        cache.decode_token(expired)
+    assert cache._tokens.get(expired) is None
+
+
+def test_invalidating_a_user_drops_its_api_keys():
+    cache = AuthCache()
+    cache._api_keys.put("hash-a", (1, 7), 60)
+    cache._api_keys.put("hash-b", (2, 8), 60)
+    cache.invalidate(user_ids=[7])
+    assert cache._api_keys.get("hash-a") is None
+    assert cache._api_keys.get("hash-b") == (2, 8)
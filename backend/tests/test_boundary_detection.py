@@ -0,0 +1,60 @@
+import sys
+import asyncio
+from pathlib import Path
+
+# Add backend directory to sys.path
+backend_path = str(Path(__file__).parent.parent)
+if backend_path not in sys.path:
+    sys.path.insert(0, backend_path)
+
+from app.services.boundary_detection import BoundaryDetector
+
+GARDEN = [
+    "The tomato plants in the garden need water every morning.",
+    "Garden tomato plants grow best with morning water and sun.",
+    "Water the tomato garden before the morning sun gets strong.",
+]
+ENGINE = [
+    "Diesel engines compress intake air until fuel ignites spontaneously.",
+    "Turbochargers force additional air into cylinders, raising engine output.",
+    "Injector timing controls combustion pressure inside each cylinder.",
+]
+
+
+def test_clear_topic_shift_needs_no_embeddings():
+    detector = BoundaryDetector(window=3, cohesive=0.3, min_terms=6)
+    calls = []
+
+    async def embed(texts):
+        calls.append(texts)
+        return [[1.0, 0.0] for _ in texts]
+
+    breaks, stats = asyncio.run(detector.detect(GARDEN + ENGINE, embed, threshold=0.5))
+    assert 3 in breaks
+    assert stats["embedded"] < len(GARDEN + ENGINE)
+
+
+def test_ambiguous_gaps_use_embedding_threshold():
+    detector = BoundaryDetector(window=1, cohesive=0.99, min_terms=100)
+    sentences = ["alpha beta", "beta gamma", "delta epsilon"]
+    vectors = {"alpha beta": [1.0, 0.0], "beta gamma": [0.9, 0.1], "delta epsilon": [0.0, 1.0]}
+
+    async def embed(texts):
+        return [vectors[t] for t in texts]
+
+    breaks, stats = asyncio.run(detector.detect(sentences, embed, threshold=0.5))
+    assert breaks == [2]
+    assert stats["ambiguous"] == 2 and stats["embedded"] == 3
+
+
+def test_embedding_failure_keeps_lexical_breaks():
+    detector = BoundaryDetector(window=3, cohesive=0.3, min_terms=6)
+    sentences = GARDEN + ENGINE + ["Tomato engines compress garden water."]
+    lexical, ambiguous = detector.classify_gaps(sentences)
+    assert 3 in lexical and ambiguous
+
+    async def embed(texts):
+        raise RuntimeError("embedding service down")
+
+    breaks, _ = asyncio.run(detector.detect(sentences, embed, threshold=0.5))
+    assert breaks == lexical
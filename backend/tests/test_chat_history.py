@@ -0,0 +1,75 @@
+import sys
+from pathlib import Path
+
+# Add backend directory to sys.path
+backend_path = str(Path(__file__).parent.parent)
+if backend_path not in sys.path:
+    sys.path.insert(0, backend_path)
+
+from langchain_core.messages import AIMessage, HumanMessage
+from app.services.chat_history import ChatHistoryManager, to_message
+from app.services.token_counter import token_counter
+
+
+def _rows(n, words=50):
+    return [(i + 1, "user" if i % 2 == 0 else "assistant", " ".join(["word"] * words)) for i in range(n)]
+
+
+def test_window_is_token_budgeted_and_keeps_the_newest_messages():
+    rows = _rows(20)
+    per_message = token_counter.count(rows[0][2])
+    manager = ChatHistoryManager(window_tokens=per_message * 5, max_messages=40, batch_tokens=100)
+    start, overflow = manager.split_window(rows)
+    assert start == 15
+    assert overflow == per_message * 15
+
+
+def test_window_cost_is_flat_as_the_session_grows():
+    manager = ChatHistoryManager(window_tokens=500, max_messages=40, batch_tokens=100)
+    windows = []
+    for n in (10, 100, 1000):
+        rows = _rows(n)
+        start, _ = manager.split_window(rows)
+        windows.append(len(rows) - start)
+    assert windows[1] == windows[2]
+
+
+def test_current_message_is_kept_even_over_budget():
+    manager = ChatHistoryManager(window_tokens=5, max_messages=40, batch_tokens=100)
+    start, overflow = manager.split_window(_rows(3, words=200))
+    assert start == 2 and overflow > 0
+
+
+def test_to_message_roles():
+    assert isinstance(to_message("user", "hi"), HumanMessage)
+    assert isinstance(to_message("assistant", "hello"), AIMessage)
+
+
+def test_load_keeps_unsummarized_overflow_until_it_is_folded(monkeypatch):
+    import asyncio
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from app.db.base import Base
+    from app.models.chat import ChatSession, ChatMessage
+    from app.services import chat_history as chat_history_module
+
+    async def _run():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=[ChatSession.__table__, ChatMessage.__table__])
+        factory = async_sessionmaker(engine, expire_on_commit=False)
+        monkeypatch.setattr(chat_history_module, "AsyncSessionLocal", factory)
+        async with factory() as db:
+            db.add(ChatSession(id=1, user_id=1, summary="Earlier: the user likes tea.", summary_through_id=2))
+            for id, role, content in _rows(6, words=20):
+                db.add(ChatMessage(id=id, session_id=1, role=role, content=content))
+            await db.commit()
+
+        # Window holds one message; the rest is under the batch, so no fold is scheduled
+        manager = ChatHistoryManager(window_tokens=1, max_messages=40, batch_tokens=10_000)
+        messages = await manager.load(1)
+        await engine.dispose()
+        return messages
+
+    messages = asyncio.run(_run())
+    assert "likes tea" in messages[0].content
+    assert len(messages) == 1 + 4  # Summary, then messages 3-6 (1-2 are in the summary)
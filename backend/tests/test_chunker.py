@@ -0,0 +1,56 @@
+import sys
+from pathlib import Path
+
+# Add backend directory to sys.path
+backend_path = str(Path(__file__).parent.parent)
+if backend_path not in sys.path:
+    sys.path.insert(0, backend_path)
+
+from app.services.chunker import TokenChunker, split_sentences
+from app.services.token_counter import token_counter
+
+
+def _text(n):
+    return " ".join(f"Sentence number {i} talks about topic {i % 7} in some detail." for i in range(n))
+
+
+def test_chunks_respect_budget_and_cover_text():
+    chunker = TokenChunker(max_tokens=60)
+    sentences = split_sentences(_text(40))
+    chunks = chunker.chunk(_text(40))
+    assert len(chunks) > 1
+    assert all(token_counter.count(c) <= 60 for c in chunks)
+    assert " ".join(chunks) == " ".join(sentences)
+
+
+def test_overlap_repeats_trailing_sentences():
+    chunker = TokenChunker(max_tokens=60, overlap_tokens=20)
+    text = _text(20)
+    _, counts, spans = chunker.prepare(text)
+    chunks = chunker.chunk_sentences(text, spans, counts)
+    for prev, nxt in zip(chunks, chunks[1:]):
+        assert prev.start < nxt.start < prev.end
+
+
+def test_breakpoints_end_chunks_without_overlap():
+    chunker = TokenChunker(max_tokens=500, overlap_tokens=20, min_tokens=5)
+    text = _text(10)
+    _, counts, spans = chunker.prepare(text)
+    chunks = chunker.chunk_sentences(text, spans, counts, breakpoints=[4])
+    assert [(c.start, c.end) for c in chunks] == [(0, 4), (4, 10)]
+
+
+def test_long_sentence_is_cut():
+    chunker = TokenChunker(max_tokens=30)
+    chunks = chunker.chunk("word " * 500)
+    assert len(chunks) > 1
+    assert all(token_counter.count(c) <= 30 for c in chunks)
+
+
+def test_chunks_keep_line_breaks_and_markdown():
+    text = "# Title\n\nIntro para.\n- item one.\n- item two."
+    assert TokenChunker(max_tokens=500).chunk(text) == [text]
+    chunks = TokenChunker(max_tokens=8).chunk(text)
+    assert len(chunks) > 1
+    assert all(c in text for c in chunks)
+    assert any("\n" in c for c in chunks)
@@ -0,0 +1,91 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add backend directory to sys.path
+backend_path = str(Path(__file__).parent.parent)
+if backend_path not in sys.path:
+    sys.path.insert(0, backend_path)
+
+from app.services.clustering import neighbour_components, cluster_memory_ids
+from app.models.cluster import MemoryCluster
+
+
+def test_components_group_near_duplicates():
+    rng = np.random.default_rng(0)
+    base = rng.normal(size=(3, 64))
+    vectors = np.vstack([
+        base[0], base[0] + 0.01 * rng.normal(size=64),
+        base[1], base[1] + 0.01 * rng.normal(size=64), base[1] + 0.01 * rng.normal(size=64),
+        base[2],
+    ])
+
+    components = sorted(sorted(c) for c in neighbour_components(vectors, threshold=0.95, k=3, block_size=2))
+    assert components == [[0, 1], [2, 3, 4]]
+
+
+def test_components_need_two_members():
+    assert neighbour_components(np.ones((1, 8)), threshold=0.5) == []
+
+
+def test_cluster_memory_ids_accepts_legacy_strings():
+    assert cluster_memory_ids(MemoryCluster(memory_ids="[3, 1]")) == [3, 1]
+    assert cluster_memory_ids(MemoryCluster(memory_ids=[2, 5])) == [2, 5]
+
+
+def test_incremental_pass_queries_neighbours_of_changed_memories_only(monkeypatch):
+    import asyncio
+    from datetime import datetime, timedelta, timezone
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from sqlalchemy.future import select
+    from app.db.base import Base
+    import app.models  # noqa: F401 (registers every table)
+    from app.models.memory import Memory
+    from app.services import clustering as clustering_module
+    from app.services.clustering import ClusteringService
+
+    # vec_3 (new) is a mutual neighbour of vec_2, which already shares a pending cluster with vec_1
+    index = {"vec_1": [1.0, 0.0], "vec_2": [0.99, 0.1], "vec_3": [0.98, 0.12], "vec_4": [0.0, 1.0]}
+    neighbour_lists = {"vec_3": [("vec_2", 0.99), ("vec_4", 0.1)], "vec_2": [("vec_3", 0.99), ("vec_1", 0.99)]}
+    queried, fetched = [], []
+
+    async def _query_by_id(vector_id, n_results=10, where=None):
+        queried.append(vector_id)
+        return neighbour_lists.get(vector_id, [])
+
+    async def _fetch(ids):
+        fetched.extend(ids)
+        return {vid: {"values": index[vid], "metadata": {}} for vid in ids}
+
+    async def _full_pass(*args):
+        raise AssertionError("incremental pass must not load every vector")
+
+    monkeypatch.setattr(clustering_module.vector_store, "query_by_id", _query_by_id)
+    monkeypatch.setattr(clustering_module.vector_store, "fetch", _fetch)
+    service = ClusteringService()
+    service._load_vectors = _full_pass
+
+    async def _run():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        old = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+            db.add_all([
+                Memory(id=i, user_id=1, title=f"m{i}", content="c", embedding_id=f"vec_{i}", created_at=old)
+                for i in (1, 2, 4)
+            ])
+            db.add(Memory(id=3, user_id=1, title="m3", content="c", embedding_id="vec_3", created_at=old + timedelta(days=2)))
+            db.add(MemoryCluster(user_id=1, memory_ids=[1, 2], representative_text="x", avg_similarity=0.9, status="pending"))
+            await db.commit()
+            stats = await service.cluster_user(1, db, since=old + timedelta(days=1))
+            clusters = (await db.execute(select(MemoryCluster))).scalars().all()
+        await engine.dispose()
+        return stats, [cluster_memory_ids(c) for c in clusters]
+
+    stats, clusters = asyncio.run(_run())
+    assert stats == {"created": 0, "updated": 1, "removed": 0}
+    assert clusters == [[1, 2, 3]]
+    assert queried == ["vec_3", "vec_2"]
+    assert sorted(fetched) == ["vec_1", "vec_2", "vec_3"]
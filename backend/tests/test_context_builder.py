@@ -0,0 +1,50 @@
+import sys
+import asyncio
+from pathlib import Path
+
+# Add backend directory to sys.path
+backend_path = str(Path(__file__).parent.parent)
+if backend_path not in sys.path:
+    sys.path.insert(0, backend_path)
+
+from app.services.context_builder import ContextBuilder, resolve_view
+from app.services.retrieval_service import retrieval_service
+
+
+def test_resolve_view():
+    assert resolve_view("code") == "semantic"
+    assert resolve_view("fact-check") == "state"
+    assert resolve_view("graph") == "graph"
+    assert resolve_view(None) == "auto"
+    assert resolve_view("standard") == "auto"
+
+
+def test_build_context_packs_retrieval_results_and_caches(monkeypatch):
+    calls = []
+
+    async def fake_search(query, user_id, db, top_k=5, view="auto"):
+        calls.append(view)
+        return [
+            {"text": "Alice leads Project Atlas", "score": 0.9, "metadata": {"type": "fact", "fact_id": 7}, "chunk": None},
+            {"text": "Atlas kickoff notes\n\n-- Context --\nsummary", "score": 0.5,
+             "metadata": {"memory_id": 3, "title": "Kickoff"}, "chunk": None},
+        ]
+
+    monkeypatch.setattr(retrieval_service, "search_memories", fake_search)
+    builder = ContextBuilder()
+
+    ctx = asyncio.run(builder.build_context("who leads atlas?", 1, limit_tokens=500, view="fact-check", db=object()))
+    assert [item["key"] for item in ctx["items"]] == ["fact_7", "3"]
+    assert ctx["snippets"][1] == "Atlas kickoff notes"
+    assert ctx["view"] == "state"
+
+    again = asyncio.run(builder.build_context("who leads atlas?", 1, limit_tokens=500, view="fact-check", db=object()))
+    assert again == ctx and calls == ["state"]
+    # Cache hits are copies: a caller changing one does not change the next
+    again["items"].clear()
+    third = asyncio.run(builder.build_context("who leads atlas?", 1, limit_tokens=500, view="fact-check", db=object()))
+    assert len(third["items"]) == 2 and calls == ["state"]
+
+    builder.invalidate(1)
+    asyncio.run(builder.build_context("who leads atlas?", 1, limit_tokens=500, view="fact-check", db=object()))
+    assert calls == ["state", "state"]
@@ -0,0 +1,34 @@
+import sys
+from pathlib import Path
+
+# Add backend directory to sys.path
+backend_path = str(Path(__file__).parent.parent)
+if backend_path not in sys.path:
+    sys.path.insert(0, backend_path)
+
+from app.services.context_packer import context_packer, ContextCandidate, count_tokens
+
+
+def test_pack_drops_overlapping_chunks():
+    text = "the quarterly report shows revenue growth in every region " * 5
+    candidates = [
+        ContextCandidate(text, 0.9, key="a"),
+        ContextCandidate(text + "and a closing remark", 0.7, key="b"),
+        ContextCandidate("completely different note about travel plans to Lisbon", 0.5, key="c"),
+    ]
+    packed = context_packer.pack(candidates, 1000)
+    assert [item["key"] for item in packed.items] == ["a", "c"]
+    assert packed.dropped_duplicates == 1
+
+
+def test_pack_respects_budget_and_falls_back_to_summary():
+    long_text = "detailed meeting notes about the migration plan " * 40
+    candidates = [
+        ContextCandidate(long_text, 0.9, key="long", summary="Migration plan meeting summary."),
+        ContextCandidate("Alice owns the rollout checklist.", 0.6, kind="fact", key="fact_1"),
+    ]
+    budget = count_tokens(long_text) // 2
+    packed = context_packer.pack(candidates, budget)
+    assert packed.token_count <= budget
+    kinds = {item["key"]: item["kind"] for item in packed.items}
+    assert kinds == {"long": "summary", "fact_1": "fact"}
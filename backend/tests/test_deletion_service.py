@@ -0,0 +1,160 @@
+import sys
+import asyncio
+from pathlib import Path
+
+# Add backend directory to sys.path
+backend_path = str(Path(__file__).parent.parent)
+if backend_path not in sys.path:
+    sys.path.insert(0, backend_path)
+
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.future import select
+from app.db.base import Base
+import app.models  # noqa: F401 (registers every table)
+from app.models.memory import Memory
+from app.models.document import Document, Chunk
+from app.models.fact import Fact
+from app.services import deletion_service as deletion_module
+from app.services.deletion_service import DeletionService
+
+
+class _Redis:
+    # Just the job-hash operations execute() / create_job() use
+    def __init__(self):
+        self.hashes = {}
+
+    async def hset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update({k: str(v) for k, v in mapping.items()})
+
+    async def expire(self, key, seconds):
+        pass
+
+    async def close(self):
+        pass
+
+
+async def _seed(db):
+    memory = Memory(user_id=1, title="m", content="c", embedding_id="legacy_vec")
+    document = Document(user_id=1, title="d")
+    other = Memory(user_id=2, title="o", content="c")
+    db.add_all([memory, document, other])
+    await db.flush()
+    chunks = [
+        Chunk(memory_id=memory.id, chunk_index=0, text="a", embedding_id="vec_a"),
+        Chunk(memory_id=memory.id, chunk_index=1, text="b", embedding_id="vec_b"),
+        Chunk(document_id=document.id, chunk_index=0, text="d", embedding_id="vec_d")
+    ]
+    db.add_all(chunks)
+    await db.flush()
+    db.add_all([
+        Fact(user_id=1, subject="s", predicate="p", object="o", source_chunk_id=chunks[0].id),
+        Fact(user_id=1, subject="s", predicate="p", object="o2", source_memory_id=memory.id),
+        Fact(user_id=1, subject="s", predicate="p", object="o3", source_chunk_id=chunks[2].id)
+    ])
+    await db.commit()
+    return memory, document
+
+
+def _with_db(body):
+    async def _run():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+            result = await body(db)
+        await engine.dispose()
+        return result
+    return asyncio.run(_run())
+
+
+def _patch_side_effects(monkeypatch):
+    deleted_vectors = []
+
+    async def _delete(ids):
+        deleted_vectors.extend(ids)
+
+    async def _publish(user_id):
+        pass
+
+    monkeypatch.setattr(deletion_module.vector_store, "delete", _delete)
+    monkeypatch.setattr(deletion_module.context_builder, "publish_invalidation", _publish)
+    return deleted_vectors
+
+
+def test_closure_covers_chunks_facts_and_vectors():
+    async def body(db):
+        memory, document = await _seed(db)
+        service = DeletionService()
+        return (
+            await service.compute_closure(db, "memory", memory.id, 1),
+            await service.compute_closure(db, "user", 0, 1)
+        )
+
+    memory_closure, user_closure = _with_db(body)
+    assert len(memory_closure["chunk_ids"]) == 2
+    # One fact by source chunk, one by source memory; the document's fact stays
+    assert len(memory_closure["fact_ids"]) == 2
+    fact_vectors = {f"fact_{fid}" for fid in memory_closure["fact_ids"]}
+    assert set(memory_closure["vector_ids"]) == {"legacy_vec", "vec_a", "vec_b"} | fact_vectors
+    assert len(user_closure["memory_ids"]) == 1 and len(user_closure["document_ids"]) == 1
+    assert len(user_closure["fact_ids"]) == 3 and "vec_d" in user_closure["vector_ids"]
+
+
+def test_small_delete_runs_inline_with_a_single_closure(monkeypatch):
+    deleted_vectors = _patch_side_effects(monkeypatch)
+    service = DeletionService()
+    calls = []
+    compute = service.compute_closure
+
+    async def _counting(*args):
+        calls.append(args[1:])
+        return await compute(*args)
+
+    service.compute_closure = _counting
+
+    async def body(db):
+        memory, _ = await _seed(db)
+        result = await service.delete(db, "memory", memory.id, 1)
+        left = {
+            "memories": (await db.execute(select(Memory.id).where(Memory.user_id == 1))).scalars().all(),
+            "chunks": (await db.execute(select(Chunk.id).where(Chunk.memory_id == memory.id))).scalars().all(),
+            "facts": (await db.execute(select(Fact.id))).scalars().all()
+        }
+        return result, left
+
+    result, left = _with_db(body)
+    assert result["status"] == "success"
+    assert len(calls) == 1
+    assert left["memories"] == [] and left["chunks"] == [] and len(left["facts"]) == 1
+    assert "legacy_vec" in deleted_vectors and "vec_d" not in deleted_vectors
+    assert result["deleted_vectors"] == len(deleted_vectors)
+
+
+def test_large_or_user_delete_becomes_a_job(monkeypatch):
+    import app.worker as worker
+
+    _patch_side_effects(monkeypatch)
+    redis = _Redis()
+    queued = []
+    monkeypatch.setattr(worker.delete_closure_task, "delay", lambda *args: queued.append(args))
+    monkeypatch.setattr(deletion_module.settings, "DELETE_INLINE_MAX", 2)
+    service = DeletionService()
+    service._redis = lambda: redis
+
+    async def body(db):
+        memory, _ = await _seed(db)
+        over_limit = await service.delete(db, "memory", memory.id, 1)
+        whole_user = await service.delete(db, "user", 0, 1)
+        # What the worker then runs for the queued job
+        job_id, scope, target_id, user_id, delete_account = queued[0]
+        await service.execute(db, scope, target_id, user_id, job_id=job_id, delete_account=delete_account)
+        return over_limit, whole_user
+
+    over_limit, whole_user = _with_db(body)
+    assert over_limit["status"] == "accepted" and whole_user["status"] == "accepted"
+    assert [args[1] for args in queued] == ["memory", "user"]
+
+    job = redis.hashes[deletion_module.JOB_KEY.format(job_id=over_limit["job_id"])]
+    assert job["status"] == "done" and job["phase"] == "done"
+    assert job["deleted_vectors"] == job["total_vectors"] == "5"
+    assert job["deleted_rows"] == job["total_rows"]
@@ -0,0 +1,66 @@
+import sys
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+import numpy as np
+
+# Add backend directory to sys.path
+backend_path = str(Path(__file__).parent.parent)
+if backend_path not in sys.path:
+    sys.path.insert(0, backend_path)
+
+from app.core.config import settings
+from app.services.embeddings import EmbeddingProviders, EmbeddingProvider, LocalOnnxEmbeddingProvider
+
+
+class _FakeTokenizer:
+    def encode_batch(self, texts):
+        width = max(len(t.split()) for t in texts)
+        out = []
+        for t in texts:
+            n = len(t.split())
+            out.append(SimpleNamespace(ids=[1] * n + [0] * (width - n), attention_mask=[1] * n + [0] * (width - n)))
+        return out
+
+
+class _FakeSession:
+    def run(self, _, feed):
+        # Token embedding = [1, position]; padding positions are large so masking matters
+        ids = feed["input_ids"]
+        b, t = ids.shape
+        pos = np.broadcast_to(np.arange(t, dtype=np.float32), (b, t))
+        pos = np.where(feed["attention_mask"] == 1, pos, 100.0)
+        return [np.stack([np.ones((b, t), dtype=np.float32), pos], axis=-1)]
+
+
+def test_local_provider_mean_pools_and_normalizes(tmp_path):
+    provider = LocalOnnxEmbeddingProvider(str(tmp_path), batch_size=1, threads=2)
+    provider._session, provider._tokenizer = _FakeSession(), _FakeTokenizer()
+    provider._input_names = ["input_ids", "attention_mask"]
+
+    vectors = asyncio.run(provider.embed_documents(["a b c", "a"]))
+    assert len(vectors) == 2
+    assert np.allclose([np.linalg.norm(v) for v in vectors], 1.0)
+    # "a b c": mean of [1,0],[1,1],[1,2] = [1,1]
+    assert np.allclose(vectors[0], np.array([1, 1]) / np.sqrt(2))
+
+
+def test_chunking_falls_back_to_index_provider(monkeypatch):
+    monkeypatch.setattr(settings, "CHUNKING_EMBEDDING_PROVIDER", "local")
+    monkeypatch.setattr(settings, "LOCAL_EMBEDDING_MODEL_PATH", "/nonexistent")
+    providers = EmbeddingProviders()
+    index_provider = EmbeddingProvider()
+    providers._instances["bedrock"] = index_provider
+    assert providers.get("chunking") is index_provider
+    assert providers._instances["local"] is None
+
+
+def test_local_index_window_shorter_than_chunks_warns(capsys):
+    from app.core.config import Settings
+
+    Settings(EMBEDDING_PROVIDER="local", LOCAL_EMBEDDING_MAX_LENGTH=256, CHUNK_MAX_TOKENS=400)
+    assert "LOCAL_EMBEDDING_MAX_LENGTH (256) is below CHUNK_MAX_TOKENS (400)" in capsys.readouterr().out
+
+    Settings(EMBEDDING_PROVIDER="local", LOCAL_EMBEDDING_MAX_LENGTH=512, CHUNK_MAX_TOKENS=400)
+    Settings(EMBEDDING_PROVIDER="bedrock", LOCAL_EMBEDDING_MAX_LENGTH=256, CHUNK_MAX_TOKENS=400)
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,123 @@
+import sys
+from pathlib import Path
+
+# Add backend directory to sys.path
+backend_path = str(Path(__file__).parent.parent)
+if backend_path not in sys.path:
+    sys.path.insert(0, backend_path)
+
+from app.services.entity_index import canonical_entity_key, query_entity_keys
+
+
+def test_canonical_key_applies_alias_rules():
+    assert canonical_entity_key("The Acme Corp.") == "acme"
+    assert canonical_entity_key("Acme Inc") == "acme"
+    assert canonical_entity_key("Melanie's") == "melanie"
+    # Single words are never stripped down to nothing
+    assert canonical_entity_key("Corp") == "corp"
+    assert canonical_entity_key("The") == "the"
+
+
+def test_query_keys_cover_ngrams():
+    keys = query_entity_keys("Where does Project Phoenix run?")
+    assert "project phoenix" in keys
+    assert "phoenix" in keys
+    assert len(keys) == len(set(keys))
+
+
+class _Fact:
+    def __init__(self, id, subject):
+        self.id = id
+        self.subject = subject
+
+
+def test_failed_posting_write_does_not_poison_the_callers_session():
+    import asyncio
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from sqlalchemy.future import select
+    from app.db.base import Base
+    from app.models.entity import Entity, EntityAlias, EntityPosting
+    from app.services.entity_index import entity_index
+
+    async def _run():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=[Entity.__table__, EntityAlias.__table__, EntityPosting.__table__])
+            await conn.execute(text("CREATE TRIGGER no_postings BEFORE INSERT ON entity_postings BEGIN SELECT RAISE(ABORT, 'posting rejected'); END"))
+        async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+            # The caller's own pending write (e.g. the chunk / fact being saved)
+            db.add(Entity(user_id=1, name="Caller", normalized_name="caller"))
+            await db.flush()
+            for fact in [_Fact(1, "Melanie"), _Fact(2, "Acme Corp")]:
+                await entity_index.index_fact(db, 1, fact)
+            await db.commit()
+            names = (await db.execute(select(Entity.normalized_name).order_by(Entity.normalized_name))).scalars().all()
+            postings = (await db.execute(select(EntityPosting.id))).all()
+        await engine.dispose()
+        return names, postings
+
+    names, postings = asyncio.run(_run())
+    assert names == ["acme", "caller", "melanie"]
+    assert postings == []
+
+
+def test_facts_resolve_in_one_batch(monkeypatch):
+    import asyncio
+    from app.services.entity_index import entity_index
+
+    calls = []
+
+    async def resolve(db, user_id, names):
+        calls.append(list(names))
+        return {}
+
+    monkeypatch.setattr(entity_index, "_resolve", resolve)
+    asyncio.run(entity_index.index_facts(None, 1, [_Fact(1, "Melanie"), _Fact(2, "Acme"), _Fact(3, None)]))
+    assert calls == [["Melanie", "Acme"]]
+
+
+def test_backfill_indexes_only_users_without_postings():
+    import asyncio
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from sqlalchemy.future import select
+    from app.db.base import Base
+    import app.models  # noqa: F401 (registers every table)
+    from app.models.user import User
+    from app.models.memory import Memory
+    from app.models.document import Chunk
+    from app.models.fact import Fact
+    from app.models.entity import EntityPosting
+    from app.services.entity_index import entity_index
+
+    async def _run():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        factory = async_sessionmaker(engine, expire_on_commit=False)
+        async with factory() as db:
+            db.add_all([User(id=i, email=f"u{i}@example.com", hashed_password="x") for i in (1, 2, 3)])
+            db.add_all([Memory(id=1, user_id=1, content="c"), Memory(id=2, user_id=2, content="c")])
+            await db.flush()
+            db.add_all([
+                Chunk(memory_id=1, chunk_index=0, text="t", entities=["Acme Corp"]),
+                Chunk(memory_id=2, chunk_index=0, text="t", entities=["Phoenix"]),
+                Fact(user_id=1, subject="Melanie", predicate="likes", object="tea")
+            ])
+            await db.commit()
+            # User 2 was indexed at ingest time already
+            await entity_index.rebuild_user_index(2, db)
+
+        first = await entity_index.backfill_users(factory, after_user_id=0, limit=2)
+        second = await entity_index.backfill_users(factory, after_user_id=first["last_user_id"], limit=2)
+        done = await entity_index.backfill_users(factory, after_user_id=second["last_user_id"], limit=2)
+        async with factory() as db:
+            users = (await db.execute(select(EntityPosting.user_id))).scalars().all()
+        await engine.dispose()
+        return first, second, done, users
+
+    first, second, done, users = asyncio.run(_run())
+    assert first == {"last_user_id": 2, "users": 1, "postings": 2}
+    assert second == {"last_user_id": 3, "users": 1, "postings": 0}
+    assert done == {"last_user_id": 3, "users": 0, "postings": 0}
+    assert sorted(users) == [1, 1, 2]
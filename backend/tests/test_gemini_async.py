@@ -0,0 +1,52 @@
+import sys
+import asyncio
+from pathlib import Path
+
+# Add backend directory to sys.path
+backend_path = str(Path(__file__).parent.parent)
+if backend_path not in sys.path:
+    sys.path.insert(0, backend_path)
+
+from langchain_core.messages import AIMessage
+from app.services import llm_service as llm_module
+from app.services.llm_service import LLMService
+
+
+class _FakeGemini:
+    # Records the key each instance was built with; "responds" after a delay without blocking
+    calls = []
+
+    def __init__(self, google_api_key, model, **kwargs):
+        self.key = google_api_key
+        self.kwargs = kwargs
+
+    async def ainvoke(self, prompt):
+        await asyncio.sleep(0.05)
+        _FakeGemini.calls.append(self.key)
+        return AIMessage(content=f"title for {self.key}")
+
+
+def test_gemini_calls_use_per_request_keys_and_run_concurrently(monkeypatch):
+    monkeypatch.setattr(llm_module, "ChatGoogleGenerativeAI", _FakeGemini)
+    _FakeGemini.calls = []
+    service = LLMService()
+
+    async def _run():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        titles = await asyncio.gather(*[
+            service._gemini_generate("User: hi", f"gemini-key-{i:04d}") for i in range(10)
+        ])
+        return titles, loop.time() - started
+
+    titles, elapsed = asyncio.run(_run())
+    assert titles == [f"title for gemini-key-{i:04d}" for i in range(10)]
+    assert sorted(_FakeGemini.calls) == [f"gemini-key-{i:04d}" for i in range(10)]
+    # Ten 50ms calls overlap instead of running back to back
+    assert elapsed < 0.3
+
+
+def test_json_mode_sets_response_mime_type(monkeypatch):
+    monkeypatch.setattr(llm_module, "ChatGoogleGenerativeAI", _FakeGemini)
+    model = LLMService()._gemini("k", json_mode=True)
+    assert model.kwargs["response_mime_type"] == "application/json"
@@ -0,0 +1,96 @@
+import sys
+from pathlib import Path
+
+# Add backend directory to sys.path
+backend_path = str(Path(__file__).parent.parent)
+if backend_path not in sys.path:
+    sys.path.insert(0, backend_path)
+
+from app.services.graph_service import UserGraph, normalize_entity
+
+
+def build_graph():
+    graph = UserGraph(user_id=1)
+    graph.add_fact(1, "Melanie", "works_at", "Acme Corp")
+    graph.add_fact(2, "Acme Corp", "located_in", "Berlin")
+    graph.add_fact(3, "Berlin", "capital_of", "Germany")
+    graph.add_fact(4, "Caroline", "friend_of", "Melanie's")
+    return graph
+
+
+def test_normalize_entity():
+    assert normalize_entity("Melanie's ") == "melanie"
+    assert normalize_entity("New  York.") == "new york"
+
+
+def test_find_entities_prefers_longest_match():
+    graph = build_graph()
+    assert graph.find_entities("Where is Acme Corp based?") == ["acme corp"]
+    assert graph.find_entities("Did Melanie meet Caroline?") == ["melanie", "caroline"]
+
+
+def test_expand_respects_hops():
+    graph = build_graph()
+    one_hop = graph.expand(["melanie"], max_hops=1)
+    assert one_hop == {1: 1, 4: 1}
+
+    two_hops = graph.expand(["melanie"], max_hops=2)
+    assert two_hops[2] == 2
+    assert 3 not in two_hops
+
+
+def test_expand_caps_fan_out_and_total():
+    graph = UserGraph(user_id=1)
+    for i in range(1, 21):
+        graph.add_fact(i, "Hub", "links", f"Leaf {i}", confidence=i / 20)
+
+    reached = graph.expand(["hub"], max_hops=1, fan_out=5)
+    assert sorted(reached) == [16, 17, 18, 19, 20]
+
+    assert len(graph.expand(["hub"], max_hops=1, fan_out=20, max_facts=3)) == 3
+
+
+def test_remove_fact_drops_orphan_nodes():
+    graph = build_graph()
+    graph.remove_fact(3)
+    assert "germany" not in graph.adjacency
+    assert graph.expand(["berlin"], max_hops=1) == {2: 1}
+
+
+def test_create_facts_updates_graph_only_after_commit(monkeypatch):
+    import asyncio
+    from app.services.fact_service import fact_service
+    from app.services.graph_service import graph_service
+    from app.services.entity_index import entity_index
+
+    class _Session:
+        def __init__(self, fail_commit):
+            self.fail_commit = fail_commit
+
+        def add(self, obj):
+            pass
+
+        async def flush(self):
+            pass
+
+        async def commit(self):
+            if self.fail_commit:
+                raise RuntimeError("commit failed")
+
+    async def analyze(f_data, user_id):
+        return {"decision": "NEW"}
+
+    async def no_postings(db, user_id, facts):
+        pass
+
+    added = []
+    monkeypatch.setattr(fact_service, "_analyze_fact", analyze)
+    monkeypatch.setattr(entity_index, "index_facts", no_postings)
+    monkeypatch.setattr(graph_service, "add_fact", lambda user_id, fact: added.append(fact.subject))
+
+    facts = [{"subject": "Melanie", "predicate": "works_at", "object": "Acme Corp"}]
+    try:
+        asyncio.run(fact_service.create_facts(facts, 1, 1, 1, _Session(fail_commit=True)))
+    except RuntimeError:
+        pass
+    assert added == []
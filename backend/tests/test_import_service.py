@@ -0,0 +1,129 @@
+import gzip
+import io
+import json
+import sys
+from pathlib import Path
+
+# Add backend directory to sys.path
+backend_path = str(Path(__file__).parent.parent)
+if backend_path not in sys.path:
+    sys.path.insert(0, backend_path)
+
+from app.services.import_service import read_archive, _JsonArchiveReader
+
+
+def test_read_ndjson_archive_gzipped():
+    lines = [
+        {"type": "header", "format": "brain_vault", "version": 1},
+        {"type": "memory", "id": 1, "content": "a"},
+        {"type": "chunk", "id": 7, "memory_id": 1, "text": "a"},
+    ]
+    raw = "".join(json.dumps(line) + "\n" for line in lines).encode()
+    records = list(read_archive(io.BytesIO(gzip.compress(raw))))
+    assert records == [("memory", {"id": 1, "content": "a"}), ("chunk", {"id": 7, "memory_id": 1, "text": "a"})]
+
+
+def test_read_json_archive_streams_records(monkeypatch):
+    # Tiny reads: records and numbers span buffer refills
+    monkeypatch.setattr(_JsonArchiveReader, "READ_SIZE", 5)
+    data = {"version": 1, "memories": [{"id": 1, "content": "a, b]}"}, {"id": 123456789}], "documents": [],
+            "chunks": [{"id": 7, "generated_qas": [{"q": "x"}]}], "facts": [{"id": 3, "confidence": 0.25}]}
+    for raw in (json.dumps(data), json.dumps(data, indent=2)):
+        records = list(read_archive(io.BytesIO(raw.encode())))
+        assert records == [("memory", data["memories"][0]), ("memory", data["memories"][1]),
+                           ("chunk", data["chunks"][0]), ("fact", data["facts"][0])]
+
+
+def test_read_json_archive_requires_export_order():
+    data = {"version": 1, "facts": [{"id": 3}], "memories": [{"id": 1}]}
+    try:
+        list(read_archive(io.BytesIO(json.dumps(data).encode())))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("expected ValueError")
+
+
+def test_failed_import_removes_the_batches_already_written(monkeypatch):
+    import asyncio
+    from sqlalchemy import func
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from sqlalchemy.future import select
+    from app.db.base import Base
+    import app.models  # noqa: F401 (registers every table)
+    from app.models.memory import Memory
+    from app.models.document import Chunk
+    from app.models.fact import Fact
+    from app.services import import_service as import_module
+    from app.services import deletion_service as deletion_module
+    from app.services.import_service import ImportService
+
+    upserted, deleted = [], []
+
+    async def _upsert(ids, values, texts, metadatas):
+        upserted.extend(ids)
+        return True
+
+    async def _delete(ids):
+        deleted.extend(ids)
+
+    async def _publish(user_id):
+        pass
+
+    monkeypatch.setattr(import_module.vector_store, "upsert_embeddings", _upsert)
+    monkeypatch.setattr(deletion_module.vector_store, "delete", _delete)
+    monkeypatch.setattr(deletion_module.context_builder, "publish_invalidation", _publish)
+    monkeypatch.setattr(import_module.settings, "IMPORT_BATCH_SIZE", 2)
+
+    def _records():
+        for i in range(3):
+            yield "memory", {"id": i, "content": f"m{i}"}
+        yield "chunk", {"id": 10, "memory_id": 0, "chunk_index": 0, "text": "m0", "embedding": [0.1, 0.2]}
+        yield "fact", {"id": 20, "subject": "a", "predicate": "b", "object": "c", "source_memory_id": 0, "embedding": [0.3]}
+        raise ValueError("truncated archive")
+
+    async def _run():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+            try:
+                await ImportService().import_archive(db, 1, _records(), ingest_missing=False)
+            except ValueError:
+                pass
+            else:
+                raise AssertionError("expected ValueError")
+            counts = [(await db.execute(select(func.count()).select_from(model))).scalar() for model in (Memory, Chunk, Fact)]
+        await engine.dispose()
+        return counts
+
+    assert asyncio.run(_run()) == [0, 0, 0]
+    assert upserted and set(upserted) <= set(deleted)
+
+
+def test_import_invalidates_cached_contexts(monkeypatch):
+    import asyncio
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from app.db.base import Base
+    import app.models  # noqa: F401 (registers every table)
+    from app.services import import_service as import_module
+    from app.services.import_service import ImportService
+
+    published = []
+
+    async def _publish(user_id):
+        published.append(user_id)
+
+    monkeypatch.setattr(import_module.context_builder, "publish_invalidation", _publish)
+
+    async def _run():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+            stats = await ImportService().import_archive(db, 7, iter([("memory", {"id": 1, "content": "m"})]), ingest_missing=False)
+        await engine.dispose()
+        return stats
+
+    assert asyncio.run(_run())["memories"] == 1
+    assert published == [7]
@@ -0,0 +1,74 @@
+import sys
+import asyncio
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+# Add backend directory to sys.path
+backend_path = str(Path(__file__).parent.parent)
+if backend_path not in sys.path:
+    sys.path.insert(0, backend_path)
+
+from fastapi import Response
+from sqlalchemy import update
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from app.db.base import Base
+import app.models  # noqa: F401 (registers every table)
+from app.models.memory import Memory
+from app.models.document import Document
+from app.models.user import User
+from app.routers.memory import read_memories, _encode_cursor, _decode_cursor, _sort_key, SORT_KEY_EPOCH
+
+
+def _pages(page_size):
+    async def _run():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+            user = User(email="u@example.com", hashed_password="x")
+            db.add(user)
+            await db.flush()
+            start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+            memories = [Memory(user_id=user.id, title=f"m{i}", content="c", created_at=start + timedelta(hours=i)) for i in range(4)]
+            documents = [Document(user_id=user.id, title=f"d{i}", content="c", created_at=start + timedelta(hours=i, minutes=30)) for i in range(3)]
+            undated = [Memory(user_id=user.id, title="m-undated", content="c"), Document(user_id=user.id, title="d-undated", content="c")]
+            db.add_all(memories + documents + undated)
+            await db.flush()
+            await db.execute(update(Memory).where(Memory.id == undated[0].id).values(created_at=None))
+            await db.execute(update(Document).where(Document.id == undated[1].id).values(created_at=None))
+            await db.commit()
+
+            pages, cursor = [], None
+            while True:
+                response = Response()
+                rows = await read_memories(response, skip=0, limit=page_size, tag=None, cursor=cursor, db=db, current_user=user)
+                pages.append([row["title"] for row in rows])
+                cursor = response.headers.get("X-Next-Cursor")
+                if not cursor:
+                    break
+        await engine.dispose()
+        return pages
+    return asyncio.run(_run())
+
+
+def test_keyset_pages_merge_memories_and_documents_newest_first():
+    pages = _pages(3)
+    titles = [title for page in pages for title in page]
+    assert titles[:7] == ["m3", "d2", "m2", "d1", "m1", "d0", "m0"]
+    # Undated rows come last instead of vanishing or breaking the cursor
+    assert sorted(titles[7:]) == ["d-undated", "m-undated"]
+    assert [len(page) for page in pages] == [3, 3, 3]
+
+
+def test_page_ending_on_an_undated_row_still_has_a_valid_cursor():
+    pages = _pages(8)
+    assert len(pages) == 2 and len(pages[0]) == 8 and len(pages[1]) == 1
+
+
+def test_postgres_sort_key_is_coalesced_and_cursor_round_trips():
+    from app.models.memory import Memory as MemoryModel
+
+    sql = str(_sort_key(MemoryModel.created_at, "postgresql").compile(dialect=postgresql.dialect()))
+    assert sql.startswith("coalesce(memories.created_at")
+    assert _decode_cursor(_encode_cursor(SORT_KEY_EPOCH, "mem", 7), "postgresql") == (SORT_KEY_EPOCH, "mem", 7)
@@ -0,0 +1,146 @@
+import sys
+import asyncio
+from pathlib import Path
+
+# Add backend directory to sys.path
+backend_path = str(Path(__file__).parent.parent)
+if backend_path not in sys.path:
+    sys.path.insert(0, backend_path)
+
+from app.services import provider_router as router_module
+from app.services.provider_router import ProviderRouter, NoProviderAvailable, OPEN, HALF_OPEN, CLOSED
+
+
+class _Reply:
+    def __init__(self, text):
+        self.text = text
+        self.usage_metadata = {"input_tokens": 1000, "output_tokens": 500}
+
+
+class _FakeLLM:
+    def __init__(self, name, outcomes):
+        self.name = name
+        self.outcomes = outcomes
+
+    async def ainvoke(self, messages):
+        outcome = self.outcomes.get(self.name, "ok")
+        if outcome == "hang":
+            await asyncio.sleep(10)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return _Reply(f"{self.name}:{outcome}")
+
+
+def _router(outcomes=None):
+    router = ProviderRouter()
+    outcomes = outcomes if outcomes is not None else {}
+    router._build = lambda spec, key, temperature, json_mode: _FakeLLM(spec.name, outcomes)
+    return router, outcomes
+
+
+def test_cheapest_model_meeting_the_task_tier_comes_first():
+    router, _ = _router()
+    light = [spec.name for spec, _ in router.candidates("enrichment", api_key="sk-user")]
+    strong = [spec.name for spec, _ in router.candidates("facts", api_key="sk-user")]
+    assert light[0] == "nova-lite"
+    assert "gpt-3.5-turbo" in light
+    assert all(spec.quality >= 2 for spec, _ in router.candidates("facts", api_key="sk-user"))
+    assert "nova-lite" not in strong
+
+
+def test_caller_key_picks_the_provider(monkeypatch):
+    monkeypatch.setattr(router_module.settings, "OPENAI_API_KEY", None)
+    monkeypatch.setattr(router_module.settings, "GEMINI_API_KEY", None)
+    router, _ = _router()
+    names = [spec.name for spec, _ in router.candidates("enrichment", api_key="AIza-user")]
+    assert "gemini-2.5-flash" in names and "gpt-3.5-turbo" not in names
+
+
+def test_callers_own_key_comes_after_system_credentials(monkeypatch):
+    monkeypatch.setattr(router_module.settings, "GEMINI_API_KEY", None)
+    router, _ = _router()
+    names = [spec.name for spec, _ in router.candidates("facts", api_key="AIza-user")]
+    # Gemini is cheaper, but on the user's key: system Bedrock first
+    assert names == ["nova-pro", "gemini-2.5-flash"]
+
+
+def test_cost_is_recorded_per_model():
+    router, _ = _router()
+    _, spec = asyncio.run(router.invoke("enrichment", []))
+    stats = router.stats()[spec.name]
+    assert (stats["tokens_in"], stats["tokens_out"]) == (1000, 500)
+    assert stats["cost"] == round((1000 * spec.cost_in + 500 * spec.cost_out) / 1_000_000, 6)
+
+
+def test_failure_fails_over_to_the_next_model():
+    router, _ = _router({"nova-lite": RuntimeError("boom")})
+    text, spec = asyncio.run(router.invoke("enrichment", []))
+    assert spec.name != "nova-lite" and text.startswith(spec.name)
+    assert router.health["nova-lite"].failures == 1
+    assert router.health["nova-lite"].state == CLOSED
+
+
+def test_throttling_opens_the_breaker_then_half_open_trial_closes_it(monkeypatch):
+    router, outcomes = _router({"nova-lite": RuntimeError("ThrottlingException: Too many requests")})
+    asyncio.run(router.invoke("summary", []))
+    health = router.health["nova-lite"]
+    assert health.state == OPEN
+    assert "nova-lite" not in [spec.name for spec, _ in router.candidates("summary")]
+
+    # Cooldown elapsed: one trial call, which succeeds and closes the breaker
+    health.opened_at -= health.cooldown
+    outcomes.clear()
+    assert router.candidates("summary")[0][0].name == "nova-lite"
+    assert health.state == HALF_OPEN
+    _, spec = asyncio.run(router.invoke("summary", []))
+    assert spec.name == "nova-lite" and health.state == CLOSED
+
+
+def test_cancelled_trial_does_not_strand_the_model():
+    router, outcomes = _router({"nova-lite": RuntimeError("429 rate limit")})
+    asyncio.run(router.invoke("title", []))
+    health = router.health["nova-lite"]
+    health.opened_at -= health.cooldown
+    outcomes["nova-lite"] = "hang"
+
+    async def _cancel_trial():
+        task = asyncio.create_task(router.invoke("title", []))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(_cancel_trial())
+    assert health.state == HALF_OPEN and not health.trial_running
+    assert router.candidates("title")[0][0].name == "nova-lite"
+
+
+def test_all_models_failing_raises():
+    router, outcomes = _router()
+    for spec in router.models:
+        outcomes[spec.name] = RuntimeError("down")
+    try:
+        asyncio.run(router.invoke("judge", []))
+    except NoProviderAvailable:
+        pass
+    else:
+        raise AssertionError("expected NoProviderAvailable")
+
+
+def test_chat_client_skips_half_open_models(monkeypatch):
+    monkeypatch.setattr(router_module.settings, "GEMINI_API_KEY", None)
+    monkeypatch.setattr(router_module.settings, "OPENAI_API_KEY", None)
+    router = ProviderRouter()
+    router._build = lambda spec, key, temperature, json_mode, max_tokens=None: (spec.name, max_tokens)
+    client, spec = router.client_for("chat", max_tokens=256)
+    assert client == ("nova-pro", 256) and spec.quality >= 2
+
+    router.health["nova-pro"].state = HALF_OPEN
+    try:
+        router.client_for("chat")
+    except NoProviderAvailable:
+        pass
+    else:
+        raise AssertionError("expected NoProviderAvailable")
@@ -0,0 +1,55 @@
+import sys
+import time
+import hashlib
+from pathlib import Path
+
+# Add backend directory to sys.path
+backend_path = str(Path(__file__).parent.parent)
+if backend_path not in sys.path:
+    sys.path.insert(0, backend_path)
+
+from jose import jwt
+from starlette.requests import Request
+from app.core.config import settings
+from app.core.rate_limiter import account_key
+from app.services.auth_cache import auth_cache
+
+
+def _request(token=None, path="/api/v1/llm/chat", path_params=None, client="10.0.0.1"):
+    headers = [(b"authorization", f"Bearer {token}".encode())] if token else []
+    return Request({
+        "type": "http",
+        "method": "POST",
+        "path": path,
+        "headers": headers,
+        "path_params": path_params or {},
+        "client": (client, 1234),
+    })
+
+
+def test_jwt_requests_are_limited_per_user_not_per_ip():
+    token = jwt.encode({"sub": "42", "exp": int(time.time()) + 3600}, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    assert account_key(_request(token, client="10.0.0.1")) == "user:42"
+    assert account_key(_request(token, client="10.0.0.2")) == "user:42"
+
+
+def test_api_keys_use_the_cached_owner_or_the_key_itself():
+    key = "bv_sk_test"
+    key_hash = hashlib.sha256(key.encode()).hexdigest()
+    assert account_key(_request(key)) == f"key:{key_hash[:32]}"
+
+    auth_cache._api_keys.put(key_hash, (1, 9), 60)
+    try:
+        assert account_key(_request(key)) == "user:9"
+    finally:
+        auth_cache.clear()
+
+
+def test_anonymous_and_invalid_credentials_fall_back_to_ip():
+    assert account_key(_request()) == "10.0.0.1"
+    assert account_key(_request("garbage", client="10.0.0.3")) == "10.0.0.3"
+
+
+def test_drop_endpoint_is_limited_per_drop_token():
+    key = account_key(_request(path="/api/v1/inbox/drop/abc", path_params={"token": "abc"}))
+    assert key.startswith("drop:") and "abc" not in key
@@ -0,0 +1,77 @@
+import sys
+import asyncio
+from pathlib import Path
+
+# Add backend directory to sys.path
+backend_path = str(Path(__file__).parent.parent)
+if backend_path not in sys.path:
+    sys.path.insert(0, backend_path)
+
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from app.db.base import Base
+import app.models  # noqa: F401 (registers every table)
+from app.models.document import Chunk
+from app.models.fact import Fact
+from app.services import reconciliation as reconciliation_module
+from app.services.reconciliation import ReconciliationService
+
+
+class _Redis:
+    # The pending-hash operations _confirm / _forget use
+    def __init__(self):
+        self.hashes = {}
+
+    async def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    async def hset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update({k: str(v) for k, v in mapping.items()})
+
+    async def hdel(self, key, *fields):
+        for field in fields:
+            self.hashes.get(key, {}).pop(field, None)
+
+    async def close(self):
+        pass
+
+
+def test_ghosts_are_checked_against_the_index_page_by_page(monkeypatch):
+    index = {"vec_0", "vec_2", "vec_4", "fact_1", "orphan_a", "orphan_b"}
+    lookups = []
+
+    async def _list_id_pages():
+        ids = sorted(index)
+        for start in range(0, len(ids), 4):
+            yield ids[start:start + 4]
+
+    async def _existing_ids(ids):
+        lookups.append(list(ids))
+        return {vid for vid in ids if vid in index}
+
+    redis = _Redis()
+    monkeypatch.setattr(reconciliation_module.vector_store, "list_id_pages", _list_id_pages)
+    monkeypatch.setattr(reconciliation_module.vector_store, "existing_ids", _existing_ids)
+    monkeypatch.setattr(reconciliation_module.aioredis, "from_url", lambda *args, **kwargs: redis)
+    monkeypatch.setattr(reconciliation_module, "GHOST_CHECK_BATCH", 2)
+
+    async def _run():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        factory = async_sessionmaker(engine, expire_on_commit=False)
+        async with factory() as db:
+            db.add_all([Chunk(chunk_index=i, text="t", embedding_id=f"vec_{i}") for i in range(5)])
+            db.add_all([Fact(id=i, user_id=1, subject="s", predicate="p", object="o") for i in (1, 2)])
+            await db.commit()
+        stats = await ReconciliationService().reconcile(factory, dry_run=True)
+        await engine.dispose()
+        return stats
+
+    stats = asyncio.run(_run())
+    assert stats["index_vectors"] == 6
+    assert stats["orphans_seen"] == 2
+    # vec_1, vec_3 and fact_2 are in SQL only
+    assert stats["ghosts_seen"] == 3
+    assert set(redis.hashes["reconcile:pending:chunks"]) == {"vec_1", "vec_3"}
+    assert set(redis.hashes["reconcile:pending:facts"]) == {"fact_2"}
+    assert all(len(ids) <= 2 for ids in lookups)
@@ -0,0 +1,42 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add backend directory to sys.path
+backend_path = str(Path(__file__).parent.parent)
+if backend_path not in sys.path:
+    sys.path.insert(0, backend_path)
+
+from app.services.snapshot import _MatrixWriter, VaultSnapshot, SNAPSHOT_FORMAT, SNAPSHOT_VERSION
+
+
+def test_matrix_writer_masks_missing_rows(tmp_path):
+    writer = _MatrixWriter(str(tmp_path), "chunks", "float16")
+    for vector in (None, [1.0, 2.0], [], [3.0, 4.0]):
+        writer.append(vector)
+    info = writer.close()
+
+    assert info == {"rows": 4, "dim": 2, "vectors": 2}
+    assert not os.path.exists(tmp_path / "chunks.npy.tmp")
+    matrix = np.load(tmp_path / "chunks.npy", mmap_mode="r")
+    assert matrix.dtype == np.float16
+    assert matrix[0].tolist() == [0.0, 0.0]
+    assert matrix[3].tolist() == [3.0, 4.0]
+
+
+def test_snapshot_reader_attaches_embeddings(tmp_path):
+    (tmp_path / "manifest.json").write_text(json.dumps({"format": SNAPSHOT_FORMAT, "version": SNAPSHOT_VERSION}))
+    (tmp_path / "memories.ndjson").write_text(json.dumps({"id": 1, "content": "a"}) + "\n")
+    (tmp_path / "chunks.ndjson").write_text("".join(json.dumps({"id": i, "memory_id": 1}) + "\n" for i in range(2)))
+    writer = _MatrixWriter(str(tmp_path), "chunks", "float32")
+    writer.append([0.5, 0.5])
+    writer.append(None)
+    writer.close()
+
+    records = list(VaultSnapshot(str(tmp_path)).iter_archive())
+    assert [kind for kind, _ in records] == ["memory", "chunk", "chunk"]
+    assert records[1][1]["embedding"] == [0.5, 0.5]
+    assert "embedding" not in records[2][1]
@@ -0,0 +1,73 @@
+import sys
+import json
+import asyncio
+from pathlib import Path
+
+# Add backend directory to sys.path
+backend_path = str(Path(__file__).parent.parent)
+if backend_path not in sys.path:
+    sys.path.insert(0, backend_path)
+
+from langchain_core.messages import AIMessage, AIMessageChunk, ToolMessage
+from app.core.sse import sse_event
+from app.services.agent_service import AgentService, add_sources
+
+
+class _Graph:
+    def __init__(self, events):
+        self.events = events
+
+    async def astream_events(self, inputs, version):
+        for event in self.events:
+            yield event
+
+
+class _History:
+    def __init__(self):
+        self.saved = []
+
+    async def add_message(self, message):
+        self.saved.append(message.content)
+        return 99
+
+
+def test_sse_event_frames():
+    frame = sse_event("token", {"content": "Hi\nthere"})
+    assert frame.startswith("event: token\ndata: ")
+    assert frame.endswith("\n\n")
+    assert json.loads(frame.split("data: ", 1)[1]) == {"content": "Hi\nthere"}
+
+
+def test_add_sources_dedupes_by_id():
+    sources = []
+    observation = "Source: Doc A [ID: 5]\nContent: alpha\n\n---\n\nSource: Doc A [ID: 5]\nContent: alpha again"
+    add_sources(sources, observation)
+    assert sources == [{"title": "Doc A", "id": "5", "content": "alpha\n\n---"}]
+
+
+def test_stream_message_emits_tokens_tools_and_saves_final_answer():
+    history = _History()
+    graph = _Graph([
+        {"event": "on_chat_model_end", "name": "model", "data": {"output": AIMessage(content="", tool_calls=[{"name": "search_memory", "args": {"query": "q"}, "id": "1"}])}},
+        {"event": "on_tool_start", "name": "search_memory", "data": {"input": {"query": "q"}}},
+        {"event": "on_tool_end", "name": "search_memory", "data": {"output": ToolMessage(content="Source: Note [ID: 1]\nContent: x", tool_call_id="1")}},
+        {"event": "on_chat_model_stream", "name": "model", "data": {"chunk": AIMessageChunk(content="Hel")}},
+        {"event": "on_chat_model_stream", "name": "model", "data": {"chunk": AIMessageChunk(content="lo")}},
+        {"event": "on_chat_model_end", "name": "model", "data": {"output": AIMessage(content="Hello")}},
+    ])
+
+    service = AgentService()
+
+    async def _prepare(*args):
+        return graph, [], history
+    service._prepare = _prepare
+
+    async def _collect():
+        return [e async for e in service.stream_message(1, 1, "hi")]
+
+    events = asyncio.run(_collect())
+    types = [e["type"] for e in events]
+    assert types == ["tool_start", "sources", "tool_end", "token", "token", "done"]
+    assert events[1]["sources"][0]["id"] == "1"
+    assert events[-1]["content"] == "Hello" and events[-1]["message_id"] == 99
+    assert history.saved == ["Hello"]
@@ -0,0 +1,20 @@
+import sys
+from pathlib import Path
+
+# Add backend directory to sys.path
+backend_path = str(Path(__file__).parent.parent)
+if backend_path not in sys.path:
+    sys.path.insert(0, backend_path)
+
+from app.services.tag_index import clean_tags
+
+
+def test_clean_tags_dedupes_and_strips():
+    assert clean_tags(["python", " python ", "", "ML", None, 3]) == ["python", "ML"]
+    assert clean_tags(None) == []
+
+
+def test_clean_tags_accepts_legacy_strings():
+    assert clean_tags('["a", "b"]') == ["a", "b"]
+    assert clean_tags("['a', 'b']") == ["a", "b"]
+    assert clean_tags("a, b") == ["a", "b"]
@@ -0,0 +1,33 @@
+import sys
+from pathlib import Path
+
+# Add backend directory to sys.path
+backend_path = str(Path(__file__).parent.parent)
+if backend_path not in sys.path:
+    sys.path.insert(0, backend_path)
+
+from app.services.token_counter import TokenCounter, encoding_name_for, CALIBRATION_MIN_CHARS
+
+
+def test_model_families_share_encodings():
+    assert encoding_name_for("gpt-4o-mini") == "o200k_base"
+    assert encoding_name_for("gpt-3.5-turbo") == "cl100k_base"
+    assert encoding_name_for("apac.amazon.nova-pro-v1:0") == "cl100k_base"
+    assert encoding_name_for(None) == "cl100k_base"
+
+
+def test_batch_matches_single_counts():
+    counter = TokenCounter()
+    texts = ["", "hello world", "Token budgets are enforced per request. " * 20]
+    assert counter.count_batch(texts) == [counter.count(t) for t in texts]
+    assert counter.count_batch(texts)[0] == 0
+
+
+def test_approximate_mode_uses_calibrated_ratio():
+    counter = TokenCounter()
+    text = "x" * 3000
+    assert counter.count(text, approximate=True) == 750  # default 4 chars per token
+
+    counter._observe("cl100k_base", CALIBRATION_MIN_CHARS * 3, CALIBRATION_MIN_CHARS)
+    assert counter.chars_per_token() == 3.0
+    assert counter.count(text, approximate=True) == 1000
@@ -0,0 +1,73 @@
+import sys
+import json
+import asyncio
+from pathlib import Path
+
+# Add backend directory to sys.path
+backend_path = str(Path(__file__).parent.parent)
+if backend_path not in sys.path:
+    sys.path.insert(0, backend_path)
+
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.future import select
+from app.db.base import Base
+from app.models.usage import UserUsage
+from app.services.usage_meter import UsageMeter, PENDING_KEY, PROCESSING_KEY
+
+
+class _Redis:
+    # The list operations flush_pending uses; eval() runs CLAIM_SCRIPT
+    def __init__(self):
+        self.lists = {PENDING_KEY: [], PROCESSING_KEY: []}
+
+    async def lrange(self, key, start, end):
+        items = self.lists[key]
+        return list(items[start:] if end == -1 else items[start:end + 1])
+
+    async def eval(self, script, numkeys, pending, processing, batch_size):
+        items = self.lists[pending][:batch_size]
+        del self.lists[pending][:len(items)]
+        self.lists[processing].extend(items)
+        return items
+
+    async def delete(self, key):
+        self.lists[key] = []
+
+
+def _row(user_id):
+    return json.dumps({"user_id": user_id, "provider": "openai", "model_name": "gpt", "tokens_in": 1,
+                       "tokens_out": 1, "estimated_cost": 0.0, "timestamp": "2026-01-01T09:00:00+00:00"})
+
+
+def test_batches_are_acknowledged_only_after_commit():
+    async def _run():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=[UserUsage.__table__])
+        factory = async_sessionmaker(engine, expire_on_commit=False)
+
+        meter, redis = UsageMeter(), _Redis()
+        meter._client = lambda: redis
+        # A batch claimed by a run that was killed before its INSERT
+        redis.lists[PROCESSING_KEY] = [_row(1)]
+        redis.lists[PENDING_KEY] = [_row(2), _row(3), _row(4)]
+
+        def failing_factory():
+            raise RuntimeError("database down")
+
+        try:
+            await meter.flush_pending(failing_factory, batch_size=2)
+        except RuntimeError:
+            pass
+        unacked = list(redis.lists[PROCESSING_KEY])
+
+        written = await meter.flush_pending(factory, batch_size=2)
+        async with factory() as db:
+            users = (await db.execute(select(UserUsage.user_id).order_by(UserUsage.id))).scalars().all()
+        await engine.dispose()
+        return unacked, written, users, redis.lists
+
+    unacked, written, users, lists = asyncio.run(_run())
+    assert unacked == [_row(1)]
+    assert written == 4 and users == [1, 2, 3, 4]
+    assert lists == {PENDING_KEY: [], PROCESSING_KEY: []}
@@ -0,0 +1,119 @@
+import sys
+from pathlib import Path
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+# Add backend directory to sys.path
+backend_path = str(Path(__file__).parent.parent)
+if backend_path not in sys.path:
+    sys.path.insert(0, backend_path)
+
+from app.services.usage_rollup import usage_rollup_service, percentile, bucket_index, LATENCY_BUCKETS_MS, _add
+
+
+def _row(minute, latency_ms=None, model_name="gpt", tokens=10, hour=9):
+    return SimpleNamespace(
+        user_id=1, provider="openai", model_name=model_name, tokens_in=tokens, tokens_out=tokens,
+        estimated_cost=0.5, latency_ms=latency_ms, timestamp=datetime(2026, 1, 1, hour, minute)
+    )
+
+
+def test_aggregate_groups_rows_by_period_and_model():
+    rows = [_row(5, 120), _row(50, 900), _row(10, hour=10), _row(10, model_name=None)]
+    hourly = usage_rollup_service.aggregate(rows, "hour")
+    nine = hourly[(1, "openai", "gpt", datetime(2026, 1, 1, 9, tzinfo=timezone.utc))]
+    assert nine["calls"] == 2 and nine["tokens_in"] == 20
+    assert nine["latency_count"] == 2 and nine["latency_sum_ms"] == 1020
+    assert sum(nine["latency_histogram"]) == 2
+    assert (1, "openai", "", datetime(2026, 1, 1, 9, tzinfo=timezone.utc)) in hourly
+
+    daily = usage_rollup_service.aggregate(rows, "day")
+    assert daily[(1, "openai", "gpt", datetime(2026, 1, 1, tzinfo=timezone.utc))]["calls"] == 3
+
+
+def test_percentiles_from_merged_histograms():
+    first = {"calls": 0, "tokens_in": 0, "tokens_out": 0, "estimated_cost": 0.0, "latency_count": 0, "latency_sum_ms": 0,
+             "latency_histogram": [0] * (len(LATENCY_BUCKETS_MS) + 1)}
+    second = dict(first, latency_histogram=list(first["latency_histogram"]))
+    for latency in [50] * 90:
+        first["latency_histogram"][bucket_index(latency)] += 1
+    for latency in [3000] * 10:
+        second["latency_histogram"][bucket_index(latency)] += 1
+
+    _add(first, second)
+    assert percentile(first["latency_histogram"], 0.5) <= 100
+    assert 2000 <= percentile(first["latency_histogram"], 0.95) <= 4000
+    assert percentile([0] * (len(LATENCY_BUCKETS_MS) + 1), 0.5) is None
+
+
+def test_overflow_bucket_reports_its_lower_bound():
+    histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+    histogram[bucket_index(10 ** 6)] = 1
+    assert percentile(histogram, 0.99) == float(LATENCY_BUCKETS_MS[-1])
+
+
+def test_rollup_waits_for_ids_that_may_still_be_in_flight():
+    import asyncio
+    from datetime import timedelta
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from sqlalchemy.future import select
+    from app.db.base import Base
+    from app.models.usage import UserUsage, UsageHourly, UsageDaily, UsageRollupState
+
+    def usage(id):
+        return UserUsage(id=id, user_id=1, provider="openai", model_name="gpt", tokens_in=1, tokens_out=1,
+                         estimated_cost=0.0, timestamp=datetime(2026, 1, 1, 9, tzinfo=timezone.utc))
+
+    async def _run():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=[t.__table__ for t in (UserUsage, UsageHourly, UsageDaily, UsageRollupState)])
+        factory = async_sessionmaker(engine, expire_on_commit=False)
+
+        async def age_horizon():
+            async with factory() as db:
+                state = await db.get(UsageRollupState, 1)
+                state.horizon_at = state.horizon_at - timedelta(hours=1)
+                await db.commit()
+
+        async with factory() as db:
+            db.add_all([usage(1), usage(2), usage(3)])
+            await db.commit()
+        processed = [await usage_rollup_service.rollup(factory)]  # Takes the first horizon (id 3)
+
+        async with factory() as db:
+            db.add_all([usage(5), usage(4)])  # 4 commits after 5 was visible
+            await db.commit()
+        await age_horizon()
+        processed.append(await usage_rollup_service.rollup(factory))  # Up to the old horizon only
+        await age_horizon()
+        processed.append(await usage_rollup_service.rollup(factory))
+
+        async with factory() as db:
+            calls = (await db.execute(select(UsageHourly.calls))).scalar()
+        await engine.dispose()
+        return processed, calls
+
+    processed, calls = asyncio.run(_run())
+    assert processed == [0, 3, 2]
+    assert calls == 5
+
+
+def test_analytics_accepts_bounds_without_an_offset(monkeypatch):
+    import asyncio
+    from app.routers import usage as usage_router
+
+    seen = {}
+
+    async def _analytics(db, user_id, start, end, group_by="period"):
+        seen.update(start=start, end=end)
+        return {}
+
+    monkeypatch.setattr(usage_router.usage_rollup_service, "analytics", _analytics)
+    user = SimpleNamespace(id=1)
+    asyncio.run(usage_router.usage_analytics(start=datetime(2026, 10, 1), end=None, group_by="period", db=None, current_user=user))
+    assert seen["start"] == datetime(2026, 10, 1, tzinfo=timezone.utc)
+    assert seen["end"].tzinfo is not None
+
+    asyncio.run(usage_router.usage_analytics(start=None, end=datetime(2026, 10, 8), group_by="period", db=None, current_user=user))
+    assert seen["start"] == datetime(2026, 10, 1, tzinfo=timezone.utc)